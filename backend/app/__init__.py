@@ -1,4 +1,6 @@
 import os
+import importlib
+import pkgutil
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -16,6 +18,16 @@ migrate = Migrate()
 jwt = JWTManager()
 mail = Mail()
 
+def import_models():
+    """
+    Importiert alle Module aus app.models, damit db.metadata alle Tabellen kennt
+    (für db.create_all und die automatische Erkennung von flask db migrate)
+    """
+    import app.models
+    
+    for module in pkgutil.iter_modules(app.models.__path__):
+        importlib.import_module(f"app.models.{module.name}")
+
 def create_app(config_class=None):
     """
     Erstellt und konfiguriert die Flask-Anwendung
@@ -26,6 +38,9 @@ def create_app(config_class=None):
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key-change-in-production')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///buchhaltung.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Tabellen und Suchindizes beim Start per db.create_all anlegen (nur für Entwicklung);
+    # sonst wird das Schema ausschließlich mit flask db upgrade gepflegt
+    app.config['DATABASE_AUTO_CREATE'] = os.environ.get('DATABASE_AUTO_CREATE', 'False').lower() in ('true', '1', 't')
     app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'jwt-dev-key-change-in-production')
     
     # E-Mail-Konfiguration
@@ -36,6 +51,57 @@ def create_app(config_class=None):
     app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
     app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER')
     
+    # Intervallrechnungen: Anzahl der Vorlagen, die pro Block generiert und committet werden
+    app.config['RECURRING_BATCH_SIZE'] = int(os.environ.get('RECURRING_BATCH_SIZE', 500))
+    # Verpasste Zeiträume (z.B. nach Ausfall des Schedulers) in einem Lauf nachholen
+    app.config['RECURRING_CATCH_UP'] = os.environ.get('RECURRING_CATCH_UP', 'False').lower() in ('true', '1', 't')
+    
+    # PDF-Erstellung: Anzahl der Worker-Prozesse (0 = Anzahl der CPU-Kerne)
+    app.config['PDF_RENDER_WORKERS'] = int(os.environ.get('PDF_RENDER_WORKERS', 0))
+    # Cache für gerenderte PDFs auf der lokalen Festplatte (Standard: 256 MB)
+    app.config['PDF_CACHE_DIR'] = os.environ.get('PDF_CACHE_DIR', os.path.join(app.instance_path, 'pdf_cache'))
+    app.config['PDF_CACHE_MAX_BYTES'] = int(os.environ.get('PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    
+    # E-Mail-Versand: parallele SMTP-Verbindungen, Nachrichten pro Sekunde je Server (0 = unbegrenzt)
+    # und Anzahl der Einträge des Postausgangs, die pro Block versendet werden
+    app.config['EMAIL_WORKERS'] = int(os.environ.get('EMAIL_WORKERS', 4))
+    app.config['EMAIL_RATE_LIMIT'] = float(os.environ.get('EMAIL_RATE_LIMIT', 10))
+    app.config['EMAIL_OUTBOX_CHUNK_SIZE'] = int(os.environ.get('EMAIL_OUTBOX_CHUNK_SIZE', 100))
+    # Wiederholung fehlgeschlagener E-Mails mit exponentiell wachsendem Abstand
+    app.config['EMAIL_MAX_ATTEMPTS'] = int(os.environ.get('EMAIL_MAX_ATTEMPTS', 6))
+    app.config['EMAIL_RETRY_BASE_SECONDS'] = int(os.environ.get('EMAIL_RETRY_BASE_SECONDS', 60))
+    app.config['EMAIL_RETRY_MAX_SECONDS'] = int(os.environ.get('EMAIL_RETRY_MAX_SECONDS', 3600))
+    app.config['EMAIL_RETRY_INTERVAL_MINUTES'] = int(os.environ.get('EMAIL_RETRY_INTERVAL_MINUTES', 5))
+    app.config['EMAIL_OUTBOX_STALE_SECONDS'] = int(os.environ.get('EMAIL_OUTBOX_STALE_SECONDS', 900))
+    
+    # Geplante Aufgaben in einem Hintergrund-Thread jedes Web-Prozesses ausführen; alternativ
+    # in einem eigenen Prozess mit flask scheduler run (Sperren verhindern doppelte Läufe)
+    app.config['SCHEDULER_ENABLED'] = os.environ.get('SCHEDULER_ENABLED', 'False').lower() in ('true', '1', 't')
+    # Scheduler: Anzahl der Teile, auf die Aufgaben verteilt werden (customer_id % N),
+    # und maximale Laufzeit einer Aufgabe, nach der ihre Sperre als verwaist gilt
+    app.config['SCHEDULER_SHARDS'] = int(os.environ.get('SCHEDULER_SHARDS', 1))
+    app.config['SCHEDULER_LOCK_LEASE_SECONDS'] = int(os.environ.get('SCHEDULER_LOCK_LEASE_SECONDS', 3600))
+    
+    # Maximale Anzahl Rechnungen pro Anfrage beim Anlegen und Stornieren mehrerer Rechnungen
+    app.config['INVOICE_BULK_MAX_SIZE'] = int(os.environ.get('INVOICE_BULK_MAX_SIZE', 10000))
+    
+    # Maximale Größe eines Kontoauszugs beim Import von Zahlungen (Standard: 200 MB)
+    app.config['PAYMENT_IMPORT_MAX_BYTES'] = int(os.environ.get('PAYMENT_IMPORT_MAX_BYTES', 200 * 1024 * 1024))
+    
+    # Maximale Größe eines Anfragekörpers (der Kontoauszug ist der größte Upload). Werkzeug
+    # begrenzt damit auch Uploads ohne Content-Length (chunked) beim Lesen und antwortet mit 413
+    app.config['MAX_CONTENT_LENGTH'] = app.config['PAYMENT_IMPORT_MAX_BYTES']
+    
+    # Autovervollständigung der Artikel aus einem Cache im Prozess; der Versionszähler in der
+    # Datenbank wird höchstens alle N Sekunden gelesen, um Änderungen anderer Worker zu erkennen
+    app.config['ITEM_CACHE_ENABLED'] = os.environ.get('ITEM_CACHE_ENABLED', 'True').lower() in ('true', '1', 't')
+    app.config['ITEM_CACHE_CHECK_SECONDS'] = float(os.environ.get('ITEM_CACHE_CHECK_SECONDS', 2))
+    
+    # Messung von Abfragen und Antwortzeiten (Server-Timing-Header und /metrics)
+    app.config['INSTRUMENTATION_ENABLED'] = os.environ.get('INSTRUMENTATION_ENABLED', 'False').lower() in ('true', '1', 't')
+    # Token, mit dem Prometheus /metrics ohne JWT abrufen darf (ohne Token nur mit JWT)
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    
     # Initialisiere Erweiterungen mit der App
     db.init_app(app)
     migrate.init_app(app, db)
@@ -43,18 +109,65 @@ def create_app(config_class=None):
     mail.init_app(app)
     CORS(app)
     
+    # Optionale Messung der Anfragen
+    from app.instrumentation import init_instrumentation
+    init_instrumentation(app)
+    
+    # Rollup-Tabellen des Dashboards bei jeder Änderung an Rechnungen fortschreiben
+    from app.services.rollup_service import init_rollups
+    init_rollups()
+    
+    # Gezahlte und offene Beträge der Rechnungen bei jeder Änderung an Zahlungen fortschreiben
+    # (nach den Rollups registrieren, siehe init_payment_totals)
+    from app.services.payment_service import init_payment_totals
+    init_payment_totals()
+    
+    # Versionszähler des Artikel-Caches bei jeder Änderung an Artikeln erhöhen
+    from app.services.item_cache_service import init_item_cache, load_item_catalog
+    init_item_cache()
+    
+    # Suchindizes (PostgreSQL: Trigramm-Indizes, SQLite: FTS5-Tabellen) werden mit den Tabellen angelegt
+    from app.services.search_service import ensure_search_indexes
+    
+    # Alle Modelle registrieren, auch solche, die kein Blueprint importiert
+    import_models()
+    
+    # Kommandozeilenbefehle (z.B. flask rollups rebuild, flask search rebuild, flask payments check,
+    # flask scheduler run)
+    from app.cli import rollups_cli, search_cli, payments_cli, scheduler_cli
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(payments_cli)
+    app.cli.add_command(scheduler_cli)
+    
     # Registriere Blueprints
-    from app.api import customers_bp, invoices_bp, items_bp, recurring_invoices_bp, payments_bp, email_templates_bp, users_bp
+    from app.api import customers_bp, invoices_bp, items_bp, recurring_invoices_bp, payments_bp, email_templates_bp, reports_bp, email_bp, pdf_bp
     app.register_blueprint(customers_bp, url_prefix='/api/customers')
     app.register_blueprint(invoices_bp, url_prefix='/api/invoices')
     app.register_blueprint(items_bp, url_prefix='/api/items')
     app.register_blueprint(recurring_invoices_bp, url_prefix='/api/recurring-invoices')
     app.register_blueprint(payments_bp, url_prefix='/api/payments')
     app.register_blueprint(email_templates_bp, url_prefix='/api/email-templates')
-    app.register_blueprint(users_bp, url_prefix='/api/users')
+    app.register_blueprint(reports_bp, url_prefix='/api/reports')
+    app.register_blueprint(email_bp, url_prefix='/api/email')
+    app.register_blueprint(pdf_bp, url_prefix='/api')
+    
+    # Erstelle Datenbanktabellen (ohne DATABASE_AUTO_CREATE fehlen sie evtl. noch, z.B. vor
+    # flask db upgrade; der Artikel-Cache wird dann beim ersten Zugriff geladen)
+    if app.config['DATABASE_AUTO_CREATE']:
+        with app.app_context():
+            db.create_all()
+            ensure_search_indexes()
+            db.session.commit()
+            
+            # Artikel-Cache beim Start füllen
+            if app.config['ITEM_CACHE_ENABLED']:
+                load_item_catalog()
+                db.session.commit()
     
-    # Erstelle Datenbanktabellen
-    with app.app_context():
-        db.create_all()
+    # Starte die geplanten Aufgaben
+    if app.config['SCHEDULER_ENABLED']:
+        from app.scheduler import create_scheduler
+        create_scheduler(app)
     
     return app
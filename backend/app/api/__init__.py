@@ -0,0 +1,14 @@
+"""
+Blueprints der REST-API
+"""
+
+from app.api.company_data import company_data_bp
+from app.api.customers import customers_bp
+from app.api.email import email_bp
+from app.api.email_templates import email_templates_bp
+from app.api.invoices import invoices_bp
+from app.api.items import items_bp
+from app.api.payments import payments_bp
+from app.api.pdf import pdf_bp
+from app.api.recurring_invoices import recurring_invoices_bp
+from app.api.reports import reports_bp
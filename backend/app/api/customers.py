@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from app.models.customer import Customer
 from app.schemas.customer_schema import customer_schema, customers_schema
+from app.api.streaming import wants_ndjson, stream_ndjson
+from app.services.search_service import search, get_limit
 from app import db
 from flask_jwt_extended import jwt_required
 
@@ -11,7 +13,12 @@ customers_bp = Blueprint('customers', __name__)
 def get_customers():
     """
     Gibt alle Kunden zurück
+    
+    Mit ?stream=ndjson werden die Datensätze als NDJSON-Stream exportiert
     """
+    if wants_ndjson():
+        return stream_ndjson(Customer.query.order_by(Customer.customer_id), customer_schema)
+    
     customers = Customer.query.all()
     return jsonify(customers_schema.dump(customers)), 200
 
@@ -111,15 +118,15 @@ def delete_customer(id):
 def search_customers():
     """
     Sucht nach Kunden basierend auf Suchkriterien
+    
+    Query-Parameter:
+        query: Suchbegriff (Firma, Name oder E-Mail, Treffer am Anfang zuerst)
+        limit: Maximale Anzahl der Treffer (Standard: 20, maximal 100)
     """
     query = request.args.get('query', '')
+    limit = get_limit(request.args.get('limit', type=int))
     
-    # Suche in verschiedenen Feldern
-    customers = Customer.query.filter(
-        (Customer.company_name.ilike(f'%{query}%')) |
-        (Customer.first_name.ilike(f'%{query}%')) |
-        (Customer.last_name.ilike(f'%{query}%')) |
-        (Customer.email.ilike(f'%{query}%'))
-    ).all()
+    # Suche über den Suchindex, sortiert nach Relevanz
+    customers = search(Customer, query, limit)
     
     return jsonify(customers_schema.dump(customers)), 200
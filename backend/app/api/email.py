@@ -5,6 +5,7 @@ from app.schemas.email_template_schema import email_log_schema, email_logs_schem
 from app import db
 from flask_jwt_extended import jwt_required
 from app.services.email_service import send_invoice_email
+from app.services.email_outbox_service import enqueue_invoice_emails, start_outbox_job, get_outbox_job_progress
 
 email_bp = Blueprint('email', __name__)
 
@@ -84,7 +85,9 @@ def get_email_log(id):
 @jwt_required()
 def batch_send_invoices():
     """
-    Sendet mehrere Rechnungen per E-Mail
+    Stellt mehrere Rechnungen in den Postausgang und versendet sie im Hintergrund
+    
+    Gibt sofort eine Auftrags-ID zurück, über die der Fortschritt abgefragt werden kann.
     """
     data = request.get_json()
     
@@ -94,49 +97,32 @@ def batch_send_invoices():
     invoice_ids = data.get('invoice_ids')
     template_id = data.get('template_id')
     
-    results = {
+    if not isinstance(invoice_ids, list) or not invoice_ids:
+        return jsonify({"error": "invoice_ids muss eine nicht leere Liste sein"}), 400
+    
+    if not all(isinstance(invoice_id, int) and not isinstance(invoice_id, bool) for invoice_id in invoice_ids):
+        return jsonify({"error": "Rechnungs-IDs müssen ganze Zahlen sein"}), 400
+    
+    job_id, queued, rejected = enqueue_invoice_emails(invoice_ids, template_id)
+    if queued:
+        start_outbox_job(job_id)
+    
+    return jsonify({
+        "job_id": job_id,
         "total": len(invoice_ids),
-        "success": 0,
-        "failed": 0,
-        "details": []
-    }
-    
-    for invoice_id in invoice_ids:
-        # Prüfe, ob die Rechnung existiert
-        invoice = Invoice.query.get(invoice_id)
-        if not invoice:
-            results["details"].append({
-                "invoice_id": invoice_id,
-                "success": False,
-                "error": "Rechnung nicht gefunden"
-            })
-            results["failed"] += 1
-            continue
-        
-        # Prüfe, ob der Kunde eine E-Mail-Adresse hat
-        if not invoice.customer.email:
-            results["details"].append({
-                "invoice_id": invoice_id,
-                "invoice_number": invoice.invoice_number,
-                "success": False,
-                "error": "Kunde hat keine E-Mail-Adresse"
-            })
-            results["failed"] += 1
-            continue
-        
-        # Sende E-Mail
-        result = send_invoice_email(invoice_id, template_id)
-        
-        if result["success"]:
-            results["success"] += 1
-        else:
-            results["failed"] += 1
-        
-        results["details"].append({
-            "invoice_id": invoice_id,
-            "invoice_number": invoice.invoice_number,
-            "success": result["success"],
-            "error": result.get("error")
-        })
-    
-    return jsonify(results), 200
+        "queued": queued,
+        "failed": len(rejected),
+        "details": rejected
+    }), 202
+
+@email_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_email_job(job_id):
+    """
+    Gibt den Fortschritt eines Stapelversands zurück
+    """
+    progress = get_outbox_job_progress(job_id)
+    if not progress:
+        return jsonify({"error": "Auftrag nicht gefunden"}), 404
+    
+    return jsonify(progress), 200
@@ -1,23 +1,139 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app.models.invoice import Invoice, InvoiceItem
 from app.models.customer import Customer
 from app.models.item import Item
 from app.schemas.invoice_schema import invoice_schema, invoices_schema, invoice_item_schema
+from app.api.pagination import paginate_invoices, get_page_size, CursorError
+from app.api.streaming import wants_ndjson, stream_ndjson
+from app.services.invoice_number_service import next_invoice_number
+from app.services.invoice_bulk_service import (
+    create_invoices, cancel_invoices, invoice_items_input_schema, get_referenced_items, build_item_rows
+)
+from app.services.search_service import search, filter_by_text, get_limit
 from app import db
+from sqlalchemy import literal_column
+from sqlalchemy.orm import selectinload
+from sqlalchemy.exc import IntegrityError
 from flask_jwt_extended import jwt_required
+from marshmallow import ValidationError
 from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
 import uuid
 
 invoices_bp = Blueprint('invoices', __name__)
 
+def parse_amount(value):
+    """
+    Liest einen Betrag aus einem Suchparameter (None, wenn leer oder ungültig)
+    """
+    if not value:
+        return None
+    
+    try:
+        amount = Decimal(value.replace(',', '.'))
+    except InvalidOperation:
+        return None
+    
+    return amount if amount.is_finite() else None
+
+def filter_invoices(query, args):
+    """
+    Wendet die Suchkriterien (wie bei /search) auf eine Rechnungsabfrage an
+    
+    Args:
+        query: Die Basisabfrage auf Invoice
+        args: Die Suchparameter (z.B. request.args)
+    """
+    # Suchparameter
+    invoice_number = args.get('invoice_number', '')
+    customer_id = args.get('customer_id')
+    status = args.get('status')
+    payment_status = args.get('payment_status')
+    date_from = args.get('date_from')
+    date_to = args.get('date_to')
+    
+    # Filtere nach Rechnungsnummer (über den Suchindex)
+    if invoice_number:
+        query = filter_by_text(query, Invoice, invoice_number)
+    
+    # Filtere nach Kunde
+    if customer_id:
+        query = query.filter(Invoice.customer_id == customer_id)
+    
+    # Filtere nach Status
+    if status:
+        query = query.filter(Invoice.status == status)
+    
+    # Filtere nach Zahlungsstatus
+    if payment_status:
+        query = query.filter(Invoice.payment_status == payment_status)
+    
+    # Filtere nach Datumsbereich
+    if date_from:
+        try:
+            date_from = datetime.strptime(date_from, '%Y-%m-%d').date()
+            query = query.filter(Invoice.invoice_date >= date_from)
+        except ValueError:
+            pass
+    
+    if date_to:
+        try:
+            date_to = datetime.strptime(date_to, '%Y-%m-%d').date()
+            query = query.filter(Invoice.invoice_date <= date_to)
+        except ValueError:
+            pass
+    
+    # Filtere nach offenem Betrag (ab einem positiven Mindestbetrag über den Teilindex)
+    open_amount_min = parse_amount(args.get('open_amount_min'))
+    open_amount_max = parse_amount(args.get('open_amount_max'))
+    
+    if open_amount_min is not None:
+        if open_amount_min > 0:
+            query = query.filter(Invoice.open_amount > literal_column('0'))
+        query = query.filter(Invoice.open_amount >= open_amount_min)
+    
+    if open_amount_max is not None:
+        query = query.filter(Invoice.open_amount <= open_amount_max)
+    
+    return query
+
 @invoices_bp.route('', methods=['GET'])
 @jwt_required()
 def get_invoices():
     """
-    Gibt alle Rechnungen zurück
+    Gibt die Rechnungen seitenweise zurück (neueste zuerst)
+    
+    Query-Parameter:
+        limit: Anzahl der Rechnungen pro Seite (maximal MAX_PAGE_SIZE)
+        cursor: Wert aus dem Header X-Next-Cursor der vorherigen Seite
+        stream: 'ndjson' für den Export aller Rechnungen als Stream
+        Filter wie bei /search (z.B. status, customer_id, open_amount_min, open_amount_max)
     """
-    invoices = Invoice.query.all()
-    return jsonify(invoices_schema.dump(invoices)), 200
+    # Positionen und Kunden pro Seite mit je einer Abfrage laden statt einzeln pro Rechnung
+    query = Invoice.query.options(
+        selectinload(Invoice.items),
+        selectinload(Invoice.customer)
+    )
+    query = filter_invoices(query, request.args)
+    
+    if wants_ndjson():
+        query = query.order_by(Invoice.invoice_date.desc(), Invoice.invoice_id.desc())
+        return stream_ndjson(query, invoice_schema)
+    
+    try:
+        invoices, next_cursor = paginate_invoices(
+            query,
+            cursor=request.args.get('cursor'),
+            limit=get_page_size()
+        )
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    response = jsonify(invoices_schema.dump(invoices))
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    
+    return response, 200
 
 @invoices_bp.route('/<int:id>', methods=['GET'])
 @jwt_required()
@@ -34,10 +150,27 @@ def create_invoice():
     """
     Erstellt eine neue Rechnung
     """
-    data = request.get_json()
+    data = request.get_json() or {}
+    
+    if not isinstance(data, dict):
+        return jsonify({"error": "Rechnung muss ein Objekt sein"}), 400
+    
+    # Validiere Rechnung und Positionen wie beim Massenanlegen; Rechnungsnummer und
+    # Datumsfelder werden bei Bedarf ergänzt
+    errors = {}
+    try:
+        invoice_data = invoice_schema.load(
+            {key: value for key, value in data.items() if key != 'items'},
+            partial=('invoice_number', 'invoice_date', 'due_date', 'delivery_date')
+        )
+    except ValidationError as e:
+        errors.update(e.messages)
+    
+    try:
+        items_data = invoice_items_input_schema.load(data.get('items') or [])
+    except ValidationError as e:
+        errors['items'] = e.messages
     
-    # Validiere die Daten mit dem Schema
-    errors = invoice_schema.validate(data)
     if errors:
         return jsonify({"errors": errors}), 400
     
@@ -46,30 +179,23 @@ def create_invoice():
     if not customer:
         return jsonify({"error": "Kunde nicht gefunden"}), 404
     
+    # Artikel aller Positionen mit einer Abfrage laden (wie beim Massenanlegen)
+    item_rows, item_messages = build_item_rows(items_data, get_referenced_items(items_data))
+    if item_messages:
+        return jsonify({"error": next(iter(item_messages.values()))['item_id'][0]}), 404
+    
     # Generiere Rechnungsnummer, falls nicht angegeben
     if not data.get('invoice_number'):
         # Format: JAHR-MONAT-LAUFENDE_NUMMER
-        today = datetime.now()
-        prefix = f"{today.year}-{today.month:02d}-"
-        last_invoice = Invoice.query.filter(
-            Invoice.invoice_number.like(f"{prefix}%")
-        ).order_by(Invoice.invoice_number.desc()).first()
-        
-        if last_invoice:
-            last_number = int(last_invoice.invoice_number.split('-')[-1])
-            new_number = last_number + 1
-        else:
-            new_number = 1
-        
-        invoice_number = f"{prefix}{new_number:04d}"
+        invoice_number = next_invoice_number()
     else:
         invoice_number = data.get('invoice_number')
     
     # Setze Standardwerte für Datumsfelder, falls nicht angegeben
     today = datetime.now().date()
-    invoice_date = data.get('invoice_date', today)
-    due_date = data.get('due_date', today + timedelta(days=14))
-    delivery_date = data.get('delivery_date', today)
+    invoice_date = invoice_data.get('invoice_date', today)
+    due_date = invoice_data.get('due_date', today + timedelta(days=14))
+    delivery_date = invoice_data.get('delivery_date', today)
     
     # Erstelle neue Rechnung
     new_invoice = Invoice(
@@ -90,40 +216,54 @@ def create_invoice():
     db.session.add(new_invoice)
     db.session.flush()  # Um die invoice_id zu erhalten
     
-    # Füge Rechnungspositionen hinzu, falls vorhanden
-    if 'items' in data and isinstance(data['items'], list):
-        for i, item_data in enumerate(data['items']):
-            # Prüfe, ob der Artikel existiert, falls eine item_id angegeben ist
-            item = None
-            if 'item_id' in item_data and item_data['item_id']:
-                item = Item.query.get(item_data['item_id'])
-                if not item:
-                    return jsonify({"error": f"Artikel mit ID {item_data['item_id']} nicht gefunden"}), 404
-            
-            # Erstelle Rechnungsposition
-            invoice_item = InvoiceItem(
-                invoice_id=new_invoice.invoice_id,
-                item_id=item.item_id if item else None,
-                position=i + 1,
-                quantity=item_data.get('quantity', 1),
-                unit=item_data.get('unit', item.unit if item else 'Stück'),
-                price_net=item_data.get('price_net', item.price_net if item else 0),
-                vat_rate=item_data.get('vat_rate', item.vat_rate if item else 19.0),
-                description=item_data.get('description', item.description if item else '')
-            )
-            
-            # Berechne Gesamtbeträge
-            invoice_item.calculate_totals()
-            
-            db.session.add(invoice_item)
-    
-    # Berechne Gesamtbeträge der Rechnung
-    new_invoice.calculate_totals()
+    # Positionen erst nach der Berechnung aller Beträge schreiben
+    with db.session.no_autoflush:
+        # Füge Rechnungspositionen hinzu, falls vorhanden
+        for item_row in item_rows:
+            new_invoice.items.append(InvoiceItem(**item_row))
+        
+        # Berechne Positionen und Gesamtbeträge der Rechnung in einem Durchgang
+        new_invoice.calculate_totals()
     
     db.session.commit()
     
     return jsonify(invoice_schema.dump(new_invoice)), 201
 
+@invoices_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def create_invoices_bulk():
+    """
+    Legt viele Rechnungen mit einer Anfrage an
+    
+    Erwartet {"invoices": [...]} mit Rechnungen im Format von POST /api/invoices.
+    Fehlerhafte Rechnungen werden nicht angelegt und mit ihrem Index gemeldet, alle
+    gültigen Rechnungen werden in einer Transaktion geschrieben.
+    """
+    data = request.get_json() or {}
+    invoices = data.get('invoices')
+    
+    if not isinstance(invoices, list) or not invoices:
+        return jsonify({"error": "Keine Rechnungen angegeben"}), 400
+    
+    max_invoices = current_app.config['INVOICE_BULK_MAX_SIZE']
+    if len(invoices) > max_invoices:
+        return jsonify({"error": f"Zu viele Rechnungen ({len(invoices)}, maximal {max_invoices} pro Anfrage)"}), 400
+    
+    try:
+        created, errors = create_invoices(invoices)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Rechnungen konnten nicht gespeichert werden, da eine Rechnungsnummer bereits vergeben ist"}), 409
+    
+    return jsonify({
+        "total": len(invoices),
+        "created": len(created),
+        "failed": len(errors),
+        "invoices": created,
+        "errors": errors
+    }), 201 if created else 400
+
 @invoices_bp.route('/<int:id>', methods=['PUT'])
 @jwt_required()
 def update_invoice(id):
@@ -160,32 +300,28 @@ def update_invoice(id):
     if 'items' in data and isinstance(data['items'], list):
         # Lösche bestehende Positionen
         InvoiceItem.query.filter_by(invoice_id=invoice.invoice_id).delete()
+        db.session.expire(invoice, ['items'])
         
-        # Füge neue Positionen hinzu
-        for i, item_data in enumerate(data['items']):
-            # Prüfe, ob der Artikel existiert, falls eine item_id angegeben ist
-            item = None
-            if 'item_id' in item_data and item_data['item_id']:
-                item = Item.query.get(item_data['item_id'])
-            
-            # Erstelle Rechnungsposition
-            invoice_item = InvoiceItem(
-                invoice_id=invoice.invoice_id,
-                item_id=item.item_id if item else None,
-                position=i + 1,
-                quantity=item_data.get('quantity', 1),
-                unit=item_data.get('unit', item.unit if item else 'Stück'),
-                price_net=item_data.get('price_net', item.price_net if item else 0),
-                vat_rate=item_data.get('vat_rate', item.vat_rate if item else 19.0),
-                description=item_data.get('description', item.description if item else '')
-            )
-            
-            # Berechne Gesamtbeträge
-            invoice_item.calculate_totals()
-            
-            db.session.add(invoice_item)
-    
-    # Berechne Gesamtbeträge der Rechnung
+        # Füge neue Positionen hinzu (erst nach der Berechnung aller Beträge schreiben)
+        with db.session.no_autoflush:
+            for i, item_data in enumerate(data['items']):
+                # Prüfe, ob der Artikel existiert, falls eine item_id angegeben ist
+                item = None
+                if 'item_id' in item_data and item_data['item_id']:
+                    item = Item.query.get(item_data['item_id'])
+                
+                # Erstelle Rechnungsposition
+                invoice.items.append(InvoiceItem(
+                    item_id=item.item_id if item else None,
+                    position=i + 1,
+                    quantity=item_data.get('quantity', 1),
+                    unit=item_data.get('unit', item.unit if item else 'Stück'),
+                    price_net=item_data.get('price_net', item.price_net if item else 0),
+                    vat_rate=item_data.get('vat_rate', item.vat_rate if item else 19.0),
+                    description=item_data.get('description', item.description if item else '')
+                ))
+    
+    # Berechne Positionen und Gesamtbeträge der Rechnung in einem Durchgang
     invoice.calculate_totals()
     
     db.session.commit()
@@ -211,6 +347,7 @@ def cancel_invoice(id):
     invoice.cancellation_date = datetime.now().date()
     invoice.cancellation_reason = data.get('reason', 'Keine Angabe')
     invoice.status = 'storniert'
+    invoice.update_open_amount()
     
     # Erstelle eine Stornorechnung
     storno_invoice = Invoice(
@@ -233,8 +370,7 @@ def cancel_invoice(id):
     
     # Kopiere die Rechnungspositionen mit negativen Beträgen
     for item in invoice.items:
-        storno_item = InvoiceItem(
-            invoice_id=storno_invoice.invoice_id,
+        storno_invoice.items.append(InvoiceItem(
             item_id=item.item_id,
             position=item.position,
             quantity=-item.quantity,  # Negative Menge für Storno
@@ -242,14 +378,10 @@ def cancel_invoice(id):
             price_net=item.price_net,
             vat_rate=item.vat_rate,
             description=item.description
-        )
-        
-        # Berechne Gesamtbeträge (werden automatisch negativ durch negative Menge)
-        storno_item.calculate_totals()
-        
-        db.session.add(storno_item)
+        ))
     
-    # Berechne Gesamtbeträge der Stornorechnung
+    # Berechne Positionen und Gesamtbeträge der Stornorechnung in einem Durchgang
+    # (werden durch die negative Menge exakt zu den negativen Beträgen des Originals)
     storno_invoice.calculate_totals()
     
     db.session.commit()
@@ -260,55 +392,74 @@ def cancel_invoice(id):
         "storno_invoice": invoice_schema.dump(storno_invoice)
     }), 200
 
-@invoices_bp.route('/search', methods=['GET'])
+@invoices_bp.route('/cancel', methods=['POST'])
 @jwt_required()
-def search_invoices():
+def cancel_invoices_bulk():
     """
-    Sucht nach Rechnungen basierend auf verschiedenen Kriterien
+    Storniert mehrere Rechnungen und erstellt die Stornorechnungen in einer Transaktion
+    
+    Erwartet {"invoice_ids": [...], "reason": "..."}. Nicht gefundene oder bereits
+    stornierte Rechnungen werden übersprungen und unter "errors" gemeldet.
     """
-    # Suchparameter
-    invoice_number = request.args.get('invoice_number', '')
-    customer_id = request.args.get('customer_id')
-    status = request.args.get('status')
-    payment_status = request.args.get('payment_status')
-    date_from = request.args.get('date_from')
-    date_to = request.args.get('date_to')
+    data = request.get_json() or {}
+    invoice_ids = data.get('invoice_ids')
     
-    # Basisabfrage
-    query = Invoice.query
+    if not isinstance(invoice_ids, list) or not invoice_ids:
+        return jsonify({"error": "Keine Rechnungs-IDs angegeben"}), 400
     
-    # Filtere nach Rechnungsnummer
-    if invoice_number:
-        query = query.filter(Invoice.invoice_number.ilike(f'%{invoice_number}%'))
+    # bool ist eine Unterklasse von int, True würde sonst Rechnung 1 stornieren
+    if not all(isinstance(invoice_id, int) and not isinstance(invoice_id, bool) for invoice_id in invoice_ids):
+        return jsonify({"error": "Rechnungs-IDs müssen ganze Zahlen sein"}), 400
     
-    # Filtere nach Kunde
-    if customer_id:
-        query = query.filter(Invoice.customer_id == customer_id)
+    max_invoices = current_app.config['INVOICE_BULK_MAX_SIZE']
+    if len(invoice_ids) > max_invoices:
+        return jsonify({"error": f"Zu viele Rechnungen ({len(invoice_ids)}, maximal {max_invoices} pro Anfrage)"}), 400
     
-    # Filtere nach Status
-    if status:
-        query = query.filter(Invoice.status == status)
+    try:
+        cancelled, errors = cancel_invoices(invoice_ids, data.get('reason'))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Stornorechnungen konnten nicht gespeichert werden, da eine Rechnungsnummer bereits vergeben ist"}), 409
     
-    # Filtere nach Zahlungsstatus
-    if payment_status:
-        query = query.filter(Invoice.payment_status == payment_status)
+    return jsonify({
+        "total": len(invoice_ids),
+        "cancelled": len(cancelled),
+        "failed": len(errors),
+        "invoice_numbers": [entry['invoice_number'] for entry in cancelled],
+        "storno_invoice_numbers": [entry['storno_invoice_number'] for entry in cancelled],
+        "invoices": cancelled,
+        "errors": errors
+    }), 200 if cancelled else 400
+
+@invoices_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_invoices():
+    """
+    Sucht nach Rechnungen basierend auf verschiedenen Kriterien
     
-    # Filtere nach Datumsbereich
-    if date_from:
-        try:
-            date_from = datetime.strptime(date_from, '%Y-%m-%d').date()
-            query = query.filter(Invoice.invoice_date >= date_from)
-        except ValueError:
-            pass
+    Mit invoice_number werden die Treffer nach Relevanz sortiert (Rechnungsnummern, die mit
+    dem Suchbegriff beginnen, zuerst) und auf limit begrenzt (Standard: 20, maximal 100).
+    Ohne invoice_number werden alle passenden Rechnungen zurückgegeben, sofern kein limit
+    angegeben ist.
+    """
+    invoice_number = request.args.get('invoice_number', '').strip()
+    limit = request.args.get('limit', type=int)
+    options = (selectinload(Invoice.items), selectinload(Invoice.customer))
     
-    if date_to:
-        try:
-            date_to = datetime.strptime(date_to, '%Y-%m-%d').date()
-            query = query.filter(Invoice.invoice_date <= date_to)
-        except ValueError:
-            pass
+    # Export als Stream
+    if wants_ndjson():
+        query = filter_invoices(Invoice.query.options(*options), request.args)
+        return stream_ndjson(query, invoice_schema)
     
-    # Führe die Abfrage aus
-    invoices = query.all()
+    if invoice_number:
+        # Übrige Kriterien als Basisabfrage, Rechnungsnummer über den Suchindex mit Sortierung
+        args = {key: value for key, value in request.args.items() if key != 'invoice_number'}
+        invoices = search(Invoice, invoice_number, get_limit(limit), query=filter_invoices(Invoice.query.options(*options), args))
+    else:
+        query = filter_invoices(Invoice.query.options(*options), request.args)
+        if limit is not None:
+            query = query.order_by(Invoice.invoice_id).limit(get_limit(limit))
+        invoices = query.all()
     
     return jsonify(invoices_schema.dump(invoices)), 200
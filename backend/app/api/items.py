@@ -1,6 +1,9 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app.models.item import Item
 from app.schemas.item_schema import item_schema, items_schema
+from app.api.streaming import wants_ndjson, stream_ndjson
+from app.services.search_service import search, get_limit
+from app.services.item_cache_service import lookup_items
 from app import db
 from flask_jwt_extended import jwt_required
 
@@ -11,7 +14,12 @@ items_bp = Blueprint('items', __name__)
 def get_items():
     """
     Gibt alle Artikel/Leistungen zurück
+    
+    Mit ?stream=ndjson werden die Datensätze als NDJSON-Stream exportiert
     """
+    if wants_ndjson():
+        return stream_ndjson(Item.query.order_by(Item.item_id), item_schema)
+    
     items = Item.query.all()
     return jsonify(items_schema.dump(items)), 200
 
@@ -99,14 +107,26 @@ def delete_item(id):
 def search_items():
     """
     Sucht nach Artikeln/Leistungen basierend auf Suchkriterien
+    
+    Standardmäßig werden aktive Artikel, deren Artikelnummer, Name oder ein Wort im Namen
+    mit dem Suchbegriff beginnt, aus dem Artikel-Cache ohne Datenbankabfrage zurückgegeben
+    (Autovervollständigung bei der Rechnungserfassung).
+    
+    Query-Parameter:
+        query: Suchbegriff
+        limit: Maximale Anzahl der Treffer (Standard: 20, maximal 100)
+        fulltext: true durchsucht auch Beschreibungen und inaktive Artikel über den Suchindex
+                  (Teilzeichenketten, Treffer am Anfang zuerst)
     """
     query = request.args.get('query', '')
+    limit = get_limit(request.args.get('limit', type=int))
+    fulltext = request.args.get('fulltext', 'false').lower() in ('true', '1', 't')
+    
+    # Präfixsuche im Artikel-Cache
+    if current_app.config.get('ITEM_CACHE_ENABLED') and not fulltext:
+        return jsonify(lookup_items(query, limit)), 200
     
-    # Suche in verschiedenen Feldern
-    items = Item.query.filter(
-        (Item.name.ilike(f'%{query}%')) |
-        (Item.item_number.ilike(f'%{query}%')) |
-        (Item.description.ilike(f'%{query}%'))
-    ).all()
+    # Suche über den Suchindex, sortiert nach Relevanz
+    items = search(Item, query, limit)
     
     return jsonify(items_schema.dump(items)), 200
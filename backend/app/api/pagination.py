@@ -0,0 +1,77 @@
+from flask import request
+from app.models.invoice import Invoice
+from app import db
+from datetime import datetime
+import base64
+import binascii
+
+# Standard- und Maximalgröße einer Seite
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+class CursorError(ValueError):
+    """
+    Wird ausgelöst, wenn ein Cursor nicht gelesen werden kann
+    """
+
+
+def get_page_size():
+    """
+    Liest die Seitengröße aus dem Parameter 'limit' und begrenzt sie auf MAX_PAGE_SIZE
+    """
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        limit = DEFAULT_PAGE_SIZE
+    
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def encode_invoice_cursor(invoice):
+    """
+    Erzeugt einen Cursor aus (invoice_date, invoice_id) der letzten Rechnung einer Seite
+    """
+    raw = f"{invoice.invoice_date.isoformat()}|{invoice.invoice_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_invoice_cursor(cursor):
+    """
+    Liest einen Cursor und gibt das Tupel (invoice_date, invoice_id) zurück
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        invoice_date, invoice_id = raw.split('|')
+        return datetime.strptime(invoice_date, '%Y-%m-%d').date(), int(invoice_id)
+    except (ValueError, UnicodeError, binascii.Error):
+        raise CursorError("Ungültiger Cursor")
+
+def paginate_invoices(query, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Keyset-Paginierung über (invoice_date, invoice_id), neueste Rechnungen zuerst
+    
+    Args:
+        query: Die Basisabfrage auf Invoice
+        cursor: Cursor der vorherigen Seite (optional)
+        limit: Anzahl der Rechnungen pro Seite
+    
+    Returns:
+        Ein Tupel (Rechnungen, Cursor der nächsten Seite oder None)
+    """
+    if cursor:
+        last_date, last_id = decode_invoice_cursor(cursor)
+        query = query.filter(
+            (Invoice.invoice_date < last_date) |
+            (db.and_(Invoice.invoice_date == last_date, Invoice.invoice_id < last_id))
+        )
+    
+    # Eine Zeile mehr laden, um zu erkennen, ob es eine weitere Seite gibt
+    invoices = query.order_by(
+        Invoice.invoice_date.desc(),
+        Invoice.invoice_id.desc()
+    ).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(invoices) > limit:
+        invoices = invoices[:limit]
+        next_cursor = encode_invoice_cursor(invoices[-1])
+    
+    return invoices, next_cursor
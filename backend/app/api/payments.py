@@ -0,0 +1,166 @@
+from flask import Blueprint, request, jsonify, current_app
+from app.models.payment import Payment
+from app.models.invoice import Invoice
+from app.schemas.payment_schema import payment_schema, payments_schema
+from app.services.payment_service import import_bank_statement
+from app.services.bank_statement_service import StatementError, STATEMENT_FORMATS
+from app.api.pagination import get_page_size
+from app.api.streaming import wants_ndjson, stream_ndjson
+from app import db
+from flask_jwt_extended import jwt_required
+from marshmallow import ValidationError
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import RequestEntityTooLarge
+from datetime import datetime
+
+payments_bp = Blueprint('payments', __name__)
+
+def filter_payments(query, args):
+    """
+    Wendet die Filter der Zahlungsliste an (Rechnung, nicht zugeordnet, Zeitraum)
+    """
+    invoice_id = args.get('invoice_id', type=int)
+    if invoice_id:
+        query = query.filter(Payment.invoice_id == invoice_id)
+    
+    if args.get('unassigned', '').lower() in ('true', '1', 't'):
+        query = query.filter(Payment.invoice_id.is_(None))
+    
+    for name, compare in (('date_from', Payment.payment_date.__ge__), ('date_to', Payment.payment_date.__le__)):
+        value = args.get(name)
+        if value:
+            try:
+                query = query.filter(compare(datetime.strptime(value, '%Y-%m-%d').date()))
+            except ValueError:
+                pass
+    
+    return query
+
+@payments_bp.route('', methods=['GET'])
+@jwt_required()
+def get_payments():
+    """
+    Gibt die Zahlungen zurück (neueste zuerst)
+    
+    Query-Parameter:
+        invoice_id: Nur Zahlungen einer Rechnung
+        unassigned: 'true' für Zahlungen ohne Rechnung (z.B. nicht zugeordnete Umsätze)
+        date_from, date_to: Zahlungsdatum im Format YYYY-MM-DD
+        limit: Anzahl der Zahlungen (maximal MAX_PAGE_SIZE)
+        stream: 'ndjson' für den Export aller passenden Zahlungen als Stream
+    """
+    query = filter_payments(Payment.query, request.args)
+    query = query.order_by(Payment.payment_date.desc(), Payment.payment_id.desc())
+    
+    if wants_ndjson():
+        return stream_ndjson(query, payment_schema)
+    
+    payments = query.limit(get_page_size()).all()
+    return jsonify(payments_schema.dump(payments)), 200
+
+@payments_bp.route('/<int:id>', methods=['GET'])
+@jwt_required()
+def get_payment(id):
+    """
+    Gibt eine Zahlung anhand ihrer ID zurück
+    """
+    payment = Payment.query.get_or_404(id)
+    return jsonify(payment_schema.dump(payment)), 200
+
+@payments_bp.route('', methods=['POST'])
+@jwt_required()
+def create_payment():
+    """
+    Erfasst eine Zahlung und aktualisiert den Zahlungsstatus der Rechnung
+    """
+    try:
+        data = payment_schema.load(request.get_json() or {})
+    except ValidationError as e:
+        return jsonify({"errors": e.messages}), 400
+    
+    if data.get('invoice_id') and not db.session.get(Invoice, data['invoice_id']):
+        return jsonify({"error": "Rechnung nicht gefunden"}), 404
+    
+    # paid_amount, open_amount und Zahlungsstatus der Rechnung werden beim Flush fortgeschrieben
+    payment = Payment(**data)
+    db.session.add(payment)
+    db.session.commit()
+    
+    return jsonify(payment_schema.dump(payment)), 201
+
+@payments_bp.route('/<int:id>', methods=['PUT'])
+@jwt_required()
+def update_payment(id):
+    """
+    Aktualisiert eine Zahlung, z.B. um einen nicht zugeordneten Umsatz einer Rechnung zuzuordnen
+    """
+    payment = Payment.query.get_or_404(id)
+    
+    try:
+        data = payment_schema.load(request.get_json() or {}, partial=True)
+    except ValidationError as e:
+        return jsonify({"errors": e.messages}), 400
+    
+    if data.get('invoice_id') and not db.session.get(Invoice, data['invoice_id']):
+        return jsonify({"error": "Rechnung nicht gefunden"}), 404
+    
+    # Bei geänderter Rechnung werden alte und neue Rechnung beim Flush neu berechnet
+    for key, value in data.items():
+        setattr(payment, key, value)
+    db.session.commit()
+    
+    return jsonify(payment_schema.dump(payment)), 200
+
+@payments_bp.route('/<int:id>', methods=['DELETE'])
+@jwt_required()
+def delete_payment(id):
+    """
+    Löscht eine Zahlung und aktualisiert den Zahlungsstatus der Rechnung
+    """
+    payment = Payment.query.get_or_404(id)
+    
+    db.session.delete(payment)
+    db.session.commit()
+    
+    return jsonify({"message": "Zahlung erfolgreich gelöscht"}), 200
+
+@payments_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_statement():
+    """
+    Importiert einen Kontoauszug (CAMT.053 oder MT940) und ordnet die Zahlungen den Rechnungen zu
+    
+    Erwartet die Datei als Multipart-Feld 'file' oder direkt als Anfragekörper. Das Format
+    wird erkannt oder mit ?format=camt053|mt940 vorgegeben. Alle Zahlungen und
+    Statusänderungen werden in einer Transaktion geschrieben; bereits importierte
+    Umsätze werden übersprungen.
+    
+    Anfragen über PAYMENT_IMPORT_MAX_BYTES werden mit 413 abgewiesen; ohne Content-Length
+    (chunked) bricht das Lesen des Datenstroms bei Erreichen der Grenze ab.
+    """
+    max_bytes = current_app.config['PAYMENT_IMPORT_MAX_BYTES']
+    too_large = {"error": f"Kontoauszug zu groß (maximal {max_bytes // (1024 * 1024)} MB)"}
+    if request.content_length and request.content_length > max_bytes:
+        return jsonify(too_large), 413
+    
+    statement_format = request.args.get('format')
+    if statement_format and statement_format not in STATEMENT_FORMATS:
+        return jsonify({"error": f"Unbekanntes Format (erlaubt: {', '.join(STATEMENT_FORMATS)})"}), 400
+    
+    try:
+        upload = request.files.get('file')
+        stream = upload.stream if upload else request.stream
+        
+        result = import_bank_statement(stream, statement_format)
+        db.session.commit()
+    except RequestEntityTooLarge:
+        db.session.rollback()
+        return jsonify(too_large), 413
+    except StatementError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Der Kontoauszug wird gerade von einem anderen Import verarbeitet"}), 409
+    
+    return jsonify(result), 200
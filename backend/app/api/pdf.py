@@ -1,55 +1,109 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, current_app
 from app.models.invoice import Invoice
 from app.schemas.invoice_schema import invoice_schema
 from app import db
 from flask_jwt_extended import jwt_required
-from app.services.pdf_service import generate_invoice_pdf
-import os
-import tempfile
+from app.models.company_data import CompanyData
+from app.api.invoices import filter_invoices
+from app.api.streaming import stream_zip, stream_merged_pdf, STREAM_CHUNK_SIZE
+from app.services.pdf_service import build_invoice_pdf_data
+from app.services.pdf_cache_service import get_pdf_cache_key, get_or_render_pdf, get_or_render_pdfs
+from sqlalchemy.orm import selectinload
+from collections import deque
+import io
 
 pdf_bp = Blueprint('pdf', __name__)
 
-@pdf_bp.route('/invoices/<int:id>/pdf', methods=['GET'])
-@jwt_required()
-def generate_invoice_pdf_endpoint(id):
+def send_invoice_pdf(id, as_attachment):
     """
-    Generiert eine PDF-Datei für eine Rechnung
+    Gibt das PDF einer Rechnung zurück (mit ETag, aus dem Cache falls vorhanden)
+    
+    Kennt der Client die aktuelle Version bereits (If-None-Match), wird ohne
+    Rendern mit 304 geantwortet.
     """
-    invoice = Invoice.query.get_or_404(id)
+    invoice = Invoice.query.options(selectinload(Invoice.items)).get_or_404(id)
     
-    # Temporäre Datei für die PDF erstellen
-    fd, path = tempfile.mkstemp(suffix='.pdf')
-    os.close(fd)
+    data = build_invoice_pdf_data(invoice)
+    etag = get_pdf_cache_key(data)
     
-    # PDF generieren
-    generate_invoice_pdf(invoice, path)
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    
+    pdf = get_or_render_pdf(data, etag)
     
-    # PDF als Datei zurückgeben
     return send_file(
-        path,
-        as_attachment=True,
+        io.BytesIO(pdf),
+        as_attachment=as_attachment,
         download_name=f"Rechnung_{invoice.invoice_number}.pdf",
-        mimetype='application/pdf'
+        mimetype='application/pdf',
+        etag=etag
     )
 
+@pdf_bp.route('/invoices/<int:id>/pdf', methods=['GET'])
+@jwt_required()
+def generate_invoice_pdf_endpoint(id):
+    """
+    Generiert eine PDF-Datei für eine Rechnung
+    """
+    # PDF als Datei zurückgeben
+    return send_invoice_pdf(id, as_attachment=True)
+
 @pdf_bp.route('/invoices/<int:id>/preview', methods=['GET'])
 @jwt_required()
 def preview_invoice_pdf(id):
     """
     Generiert eine Vorschau der PDF-Datei für eine Rechnung
     """
-    invoice = Invoice.query.get_or_404(id)
+    # PDF als Datei zurückgeben (nicht als Anhang)
+    return send_invoice_pdf(id, as_attachment=False)
+
+@pdf_bp.route('/invoices/export', methods=['GET'])
+@jwt_required()
+def export_invoice_pdfs():
+    """
+    Exportiert die PDFs aller Rechnungen, die den Suchkriterien entsprechen
     
-    # Temporäre Datei für die PDF erstellen
-    fd, path = tempfile.mkstemp(suffix='.pdf')
-    os.close(fd)
+    Die Filter entsprechen denen von /api/invoices/search. Die PDFs werden parallel
+    gerendert und bereits während des Renderns gesendet: mit format=zip (Standard)
+    als ZIP-Archiv, mit format=pdf zusammengeführt in ein gemeinsames PDF.
+    """
+    export_format = request.args.get('format', 'zip')
+    if export_format not in ('zip', 'pdf'):
+        return jsonify({"error": "Ungültiges Format, erlaubt sind 'zip' und 'pdf'"}), 400
     
-    # PDF generieren
-    generate_invoice_pdf(invoice, path)
+    company_data = CompanyData.query.first()
+    if not company_data:
+        return jsonify({"error": "Keine Unternehmensdaten gefunden"}), 400
     
-    # PDF als Datei zurückgeben (nicht als Anhang)
-    return send_file(
-        path,
-        as_attachment=False,
-        mimetype='application/pdf'
-    )
+    query = filter_invoices(Invoice.query.options(
+        selectinload(Invoice.items),
+        selectinload(Invoice.customer)
+    ), request.args).order_by(Invoice.invoice_date, Invoice.invoice_id)
+    
+    invoice_numbers = deque()
+    
+    def generate_pdf_data():
+        for invoice in query.yield_per(STREAM_CHUNK_SIZE):
+            invoice_numbers.append(invoice.invoice_number)
+            data = build_invoice_pdf_data(invoice, company_data)
+            
+            # Rechnung (inkl. Positionen) aus der Identity Map entfernen
+            db.session.expunge(invoice)
+            
+            yield data
+    
+    if export_format == 'pdf':
+        # Ein PDF ohne Seiten ist ungültig
+        if query.first() is None:
+            return jsonify({"error": "Keine Rechnungen gefunden"}), 404
+        
+        return stream_merged_pdf(get_or_render_pdfs(generate_pdf_data()), "Rechnungen.pdf")
+    
+    def generate_files():
+        # PDFs werden in Eingabereihenfolge geliefert, die Nummern liegen daher vor
+        for pdf in get_or_render_pdfs(generate_pdf_data()):
+            yield f"Rechnung_{invoice_numbers.popleft()}.pdf", pdf
+    
+    return stream_zip(generate_files(), "Rechnungen.zip")
@@ -5,10 +5,13 @@ from app.models.customer import Customer
 from app.models.item import Item
 from app.schemas.recurring_invoice_schema import recurring_invoice_schema, recurring_invoices_schema
 from app.schemas.invoice_schema import invoice_schema
+from app.services.invoice_number_service import next_invoice_number
+from app.services.recurring_invoice_service import (
+    check_and_generate_recurring_invoices, calculate_next_invoice_date, forecast_recurring_invoices
+)
 from app import db
 from flask_jwt_extended import jwt_required
 from datetime import datetime, timedelta
-import calendar
 
 recurring_invoices_bp = Blueprint('recurring_invoices', __name__)
 
@@ -162,19 +165,7 @@ def generate_invoice(id):
         return jsonify({"error": "Intervallrechnung ist abgelaufen"}), 400
     
     # Generiere Rechnungsnummer
-    today = datetime.now()
-    prefix = f"{today.year}-{today.month:02d}-"
-    last_invoice = Invoice.query.filter(
-        Invoice.invoice_number.like(f"{prefix}%")
-    ).order_by(Invoice.invoice_number.desc()).first()
-    
-    if last_invoice:
-        last_number = int(last_invoice.invoice_number.split('-')[-1])
-        new_number = last_number + 1
-    else:
-        new_number = 1
-    
-    invoice_number = f"{prefix}{new_number:04d}"
+    invoice_number = next_invoice_number()
     
     # Erstelle neue Rechnung
     new_invoice = Invoice(
@@ -194,8 +185,7 @@ def generate_invoice(id):
     
     # Kopiere Positionen
     for item in recurring_invoice.items:
-        invoice_item = InvoiceItem(
-            invoice_id=new_invoice.invoice_id,
+        new_invoice.items.append(InvoiceItem(
             item_id=item.item_id,
             position=item.position,
             quantity=item.quantity,
@@ -203,32 +193,16 @@ def generate_invoice(id):
             price_net=item.price_net,
             vat_rate=item.vat_rate,
             description=item.description
-        )
-        
-        # Berechne Gesamtbeträge
-        invoice_item.calculate_totals()
-        
-        db.session.add(invoice_item)
+        ))
     
-    # Berechne Gesamtbeträge der Rechnung
+    # Berechne Positionen und Gesamtbeträge der Rechnung in einem Durchgang
     new_invoice.calculate_totals()
     
     # Aktualisiere Intervallrechnung
     recurring_invoice.last_invoice_date = datetime.now().date()
     
     # Berechne nächstes Rechnungsdatum
-    if recurring_invoice.interval_type == 'monatlich':
-        next_date = add_months(recurring_invoice.next_invoice_date, recurring_invoice.interval_value)
-    elif recurring_invoice.interval_type == 'quartalsweise':
-        next_date = add_months(recurring_invoice.next_invoice_date, 3 * recurring_invoice.interval_value)
-    elif recurring_invoice.interval_type == 'halbjährlich':
-        next_date = add_months(recurring_invoice.next_invoice_date, 6 * recurring_invoice.interval_value)
-    elif recurring_invoice.interval_type == 'jährlich':
-        next_date = add_months(recurring_invoice.next_invoice_date, 12 * recurring_invoice.interval_value)
-    else:
-        next_date = recurring_invoice.next_invoice_date + timedelta(days=30 * recurring_invoice.interval_value)
-    
-    recurring_invoice.next_invoice_date = next_date
+    recurring_invoice.next_invoice_date = calculate_next_invoice_date(recurring_invoice)
     
     db.session.commit()
     
@@ -272,107 +246,51 @@ def update_status(id):
 def check_due_invoices():
     """
     Prüft, welche Intervallrechnungen fällig sind und generiert Rechnungen
+    
+    Query-Parameter:
+        catch_up: 1, um alle verpassten Zeiträume nachzuholen
+        dry_run: 1, um nur anzuzeigen, welche Rechnungen erstellt würden
     """
-    today = datetime.now().date()
-    
-    # Finde alle aktiven Intervallrechnungen, die fällig sind
-    due_recurring_invoices = RecurringInvoice.query.filter(
-        RecurringInvoice.status == 'aktiv',
-        RecurringInvoice.next_invoice_date <= today,
-        (RecurringInvoice.end_date.is_(None) | (RecurringInvoice.end_date >= today))
-    ).all()
-    
-    generated_invoices = []
-    
-    for recurring_invoice in due_recurring_invoices:
-        # Generiere Rechnungsnummer
-        prefix = f"{today.year}-{today.month:02d}-"
-        last_invoice = Invoice.query.filter(
-            Invoice.invoice_number.like(f"{prefix}%")
-        ).order_by(Invoice.invoice_number.desc()).first()
-        
-        if last_invoice:
-            last_number = int(last_invoice.invoice_number.split('-')[-1])
-            new_number = last_number + 1
-        else:
-            new_number = 1
-        
-        invoice_number = f"{prefix}{new_number:04d}"
-        
-        # Erstelle neue Rechnung
-        new_invoice = Invoice(
-            invoice_number=invoice_number,
-            customer_id=recurring_invoice.customer_id,
-            invoice_date=today,
-            due_date=today + timedelta(days=14),
-            delivery_date=today,
-            status='erstellt',
-            payment_status='offen',
-            notes=f"Automatisch generiert aus Intervallrechnung {recurring_invoice.recurring_id}",
-            is_recurring=True
-        )
-        
-        db.session.add(new_invoice)
-        db.session.flush()  # Um die invoice_id zu erhalten
-        
-        # Kopiere Positionen
-        for item in recurring_invoice.items:
-            invoice_item = InvoiceItem(
-                invoice_id=new_invoice.invoice_id,
-                item_id=item.item_id,
-                position=item.position,
-                quantity=item.quantity,
-                unit=item.unit,
-                price_net=item.price_net,
-                vat_rate=item.vat_rate,
-                description=item.description
-            )
-            
-            # Berechne Gesamtbeträge
-            invoice_item.calculate_totals()
-            
-            db.session.add(invoice_item)
-        
-        # Berechne Gesamtbeträge der Rechnung
-        new_invoice.calculate_totals()
-        
-        # Aktualisiere Intervallrechnung
-        recurring_invoice.last_invoice_date = today
-        
-        # Berechne nächstes Rechnungsdatum
-        if recurring_invoice.interval_type == 'monatlich':
-            next_date = add_months(recurring_invoice.next_invoice_date, recurring_invoice.interval_value)
-        elif recurring_invoice.interval_type == 'quartalsweise':
-            next_date = add_months(recurring_invoice.next_invoice_date, 3 * recurring_invoice.interval_value)
-        elif recurring_invoice.interval_type == 'halbjährlich':
-            next_date = add_months(recurring_invoice.next_invoice_date, 6 * recurring_invoice.interval_value)
-        elif recurring_invoice.interval_type == 'jährlich':
-            next_date = add_months(recurring_invoice.next_invoice_date, 12 * recurring_invoice.interval_value)
-        else:
-            next_date = recurring_invoice.next_invoice_date + timedelta(days=30 * recurring_invoice.interval_value)
-        
-        recurring_invoice.next_invoice_date = next_date
-        
-        generated_invoices.append({
-            "recurring_invoice_id": recurring_invoice.recurring_id,
-            "invoice_id": new_invoice.invoice_id,
-            "invoice_number": new_invoice.invoice_number,
-            "next_invoice_date": next_date.isoformat()
-        })
+    catch_up = request.args.get('catch_up')
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true')
     
-    db.session.commit()
+    generated_invoices = check_and_generate_recurring_invoices(
+        catch_up=catch_up.lower() in ('1', 'true') if catch_up is not None else None,
+        dry_run=dry_run
+    )
+    
+    if dry_run:
+        return jsonify({
+            "message": f"{len(generated_invoices)} Rechnungen würden generiert",
+            "planned_invoices": generated_invoices
+        }), 200
     
     return jsonify({
         "message": f"{len(generated_invoices)} Rechnungen generiert",
         "generated_invoices": generated_invoices
     }), 200
 
-def add_months(sourcedate, months):
+@recurring_invoices_bp.route('/forecast', methods=['GET'])
+@jwt_required()
+def forecast():
     """
-    Hilfsfunktion zum Hinzufügen von Monaten zu einem Datum
+    Prognostiziert Rechnungen und Umsatz aller Intervallrechnungen für die nächsten Monate (ohne zu schreiben)
+    
+    Query-Parameter:
+        months: Anzahl der Monate (Standard: 12, maximal 120)
+        catch_up: 1, wenn verpasste Zeiträume einzeln nachgeholt werden (Standard: RECURRING_CATCH_UP)
     """
-    month = sourcedate.month - 1 + months
-    year = sourcedate.year + month // 12
-    month = month % 12 + 1
-    day = min(sourcedate.day, calendar.monthrange(year, month)[1])
-    return datetime(year, month, day).date()
+    try:
+        months = int(request.args.get('months', 12))
+    except ValueError:
+        return jsonify({"error": "Ungültige Anzahl von Monaten"}), 400
+    
+    if months < 1 or months > 120:
+        return jsonify({"error": "Die Anzahl der Monate muss zwischen 1 und 120 liegen"}), 400
+    
+    catch_up = request.args.get('catch_up')
+    
+    return jsonify(forecast_recurring_invoices(
+        months,
+        catch_up=catch_up.lower() in ('1', 'true') if catch_up is not None else None
+    )), 200
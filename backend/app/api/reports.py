@@ -0,0 +1,139 @@
+from flask import Blueprint, request, jsonify
+from app.services.report_service import get_revenue_report, get_open_receivables, get_open_invoices, get_dashboard, ReportError
+from app.api.pagination import get_page_size
+from flask_jwt_extended import jwt_required
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+reports_bp = Blueprint('reports', __name__)
+
+def parse_date_arg(name):
+    """
+    Liest einen Datumsparameter im Format JJJJ-MM-TT (None, wenn nicht angegeben)
+    """
+    value = request.args.get(name)
+    if not value:
+        return None
+    
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ReportError(f"Ungültiges Datum für {name}, erwartet JJJJ-MM-TT")
+
+def parse_amount_arg(name):
+    """
+    Liest einen Betragsparameter (z.B. 100.50) als Decimal (None, wenn nicht angegeben)
+    """
+    value = request.args.get(name)
+    if not value:
+        return None
+    
+    try:
+        amount = Decimal(value.replace(',', '.'))
+    except InvalidOperation:
+        amount = None
+    
+    if amount is None or not amount.is_finite():
+        raise ReportError(f"Ungültiger Betrag für {name}")
+    return amount
+
+@reports_bp.route('/revenue', methods=['GET'])
+@jwt_required()
+def revenue_report():
+    """
+    Gibt Netto, Umsatzsteuer und Brutto aufgeschlüsselt zurück (in der Datenbank aggregiert)
+    
+    Stornorechnungen werden mit ihrer Originalrechnung verrechnet.
+    
+    Query-Parameter:
+        group_by: Kommagetrennt aus month, customer, vat_rate, status, payment_status
+                  (Standard: month; z.B. month,vat_rate für die Umsatzsteuer-Voranmeldung)
+        date_from: Erstes Rechnungsdatum (JJJJ-MM-TT)
+        date_to: Letztes Rechnungsdatum (JJJJ-MM-TT)
+        customer_id: Nur Rechnungen dieses Kunden
+    """
+    group_by = [dimension.strip() for dimension in request.args.get('group_by', 'month').split(',') if dimension.strip()]
+    
+    try:
+        report = get_revenue_report(
+            group_by=group_by,
+            date_from=parse_date_arg('date_from'),
+            date_to=parse_date_arg('date_to'),
+            customer_id=request.args.get('customer_id', type=int)
+        )
+    except ReportError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify(report), 200
+
+@reports_bp.route('/receivables', methods=['GET'])
+@jwt_required()
+def receivables_report():
+    """
+    Gibt die offenen Forderungen je Kunde mit Altersstruktur zurück (in der Datenbank aggregiert)
+    
+    Query-Parameter:
+        date: Stichtag für die Fälligkeit (JJJJ-MM-TT, Standard: heute)
+        customer_id: Nur Rechnungen dieses Kunden
+    """
+    try:
+        report = get_open_receivables(
+            today=parse_date_arg('date'),
+            customer_id=request.args.get('customer_id', type=int)
+        )
+    except ReportError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify(report), 200
+
+@reports_bp.route('/receivables/invoices', methods=['GET'])
+@jwt_required()
+def open_invoices_report():
+    """
+    Gibt die offenen Rechnungen mit gezahltem und offenem Betrag zurück (in der Datenbank gefiltert und sortiert)
+    
+    Query-Parameter:
+        date: Stichtag für die Fälligkeit (JJJJ-MM-TT, Standard: heute)
+        customer_id: Nur Rechnungen dieses Kunden
+        min_amount, max_amount: Grenzen für den offenen Betrag
+        overdue: 'true' für nur überfällige Rechnungen
+        sort: open_amount, due_date oder invoice_date, mit '-' absteigend (Standard: -open_amount)
+        limit: Anzahl der Rechnungen (maximal MAX_PAGE_SIZE)
+        offset: Anzahl der zu überspringenden Rechnungen
+    """
+    try:
+        report = get_open_invoices(
+            today=parse_date_arg('date'),
+            customer_id=request.args.get('customer_id', type=int),
+            min_amount=parse_amount_arg('min_amount'),
+            max_amount=parse_amount_arg('max_amount'),
+            overdue=request.args.get('overdue', '').lower() in ('true', '1', 't'),
+            sort=request.args.get('sort', '-open_amount'),
+            limit=get_page_size(),
+            offset=max(request.args.get('offset', 0, type=int), 0)
+        )
+    except ReportError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify(report), 200
+
+@reports_bp.route('/dashboard', methods=['GET'])
+@jwt_required()
+def dashboard():
+    """
+    Gibt die Kennzahlen des Dashboards aus den vorberechneten Rollup-Tabellen zurück
+    
+    Query-Parameter:
+        date: Stichtag (JJJJ-MM-TT, Standard: heute)
+        months: Anzahl der Monate des Umsatzverlaufs (Standard: 12, maximal 120)
+    """
+    months = request.args.get('months', 12, type=int)
+    if months < 1 or months > 120:
+        return jsonify({"error": "Die Anzahl der Monate muss zwischen 1 und 120 liegen"}), 400
+    
+    try:
+        today = parse_date_arg('date')
+    except ReportError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify(get_dashboard(today=today, months=months)), 200
@@ -0,0 +1,107 @@
+from flask import request, current_app, Response, stream_with_context
+from app import db
+from app.services.pdf_merge_service import iter_merged_pdf
+import zipfile
+
+# Anzahl der Zeilen, die pro Datenbank-Roundtrip vom Cursor geholt werden
+STREAM_CHUNK_SIZE = 1000
+
+def wants_ndjson():
+    """
+    Prüft, ob der Client den Streaming-Export mit ?stream=ndjson angefordert hat
+    """
+    return request.args.get('stream') == 'ndjson'
+
+def stream_ndjson(query, schema, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Gibt das Ergebnis einer Abfrage als NDJSON-Stream (eine JSON-Zeile pro Objekt) zurück
+    
+    Die Zeilen werden mit yield_per über einen serverseitigen Cursor gelesen. Nach jedem
+    Block wird die Session geleert (auch per selectinload oder lazy nachgeladene Objekte
+    wie Kunden), damit der Speicherbedarf unabhängig von der Anzahl der exportierten
+    Zeilen konstant bleibt.
+    
+    Args:
+        query: Die auszuführende Abfrage
+        schema: Marshmallow-Schema für ein einzelnes Objekt
+        chunk_size: Anzahl der Zeilen pro Block
+    """
+    def expunge_loaded():
+        # expunge_all würde die Identity Map ersetzen, die yield_per noch verwendet
+        for obj in list(db.session.identity_map.values()):
+            if obj in db.session:
+                db.session.expunge(obj)
+    
+    def generate():
+        for count, obj in enumerate(query.yield_per(chunk_size), 1):
+            yield current_app.json.dumps(schema.dump(obj)) + "\n"
+            
+            # Am Ende eines Blocks alle geladenen Objekte aus der Identity Map entfernen
+            if count % chunk_size == 0:
+                expunge_loaded()
+        
+        expunge_loaded()
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+class ZipChunkWriter:
+    """
+    Nicht-seekbares Schreibziel für zipfile, das die geschriebenen Bytes bis zum Abholen puffert
+    
+    zipfile erkennt das fehlende seek() und schreibt die Größen der Einträge in
+    Data-Deskriptoren, sodass das Archiv ohne Zurückspringen erzeugt werden kann.
+    """
+    def __init__(self):
+        self.chunks = []
+    
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        """
+        Gibt die seit dem letzten Aufruf geschriebenen Bytes zurück
+        """
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def stream_zip(files, download_name):
+    """
+    Gibt ein ZIP-Archiv als Stream zurück, während die Dateien noch erzeugt werden
+    
+    Jeder Eintrag wird sofort nach dem Komprimieren an den Client gesendet, sodass
+    das Archiv weder vollständig im Speicher noch auf der Festplatte liegt.
+    
+    Args:
+        files: Iterierbare Folge von Tupeln (Dateiname, Inhalt als Bytes)
+        download_name: Dateiname des Archivs
+    """
+    def generate():
+        writer = ZipChunkWriter()
+        with zipfile.ZipFile(writer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for filename, data in files:
+                archive.writestr(filename, data)
+                yield writer.drain()
+        
+        # Zentralverzeichnis am Ende des Archivs
+        yield writer.drain()
+    
+    response = Response(stream_with_context(generate()), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    return response
+
+def stream_merged_pdf(pdfs, download_name):
+    """
+    Gibt mehrere PDFs als ein gemeinsames PDF-Stream zurück, während sie noch erzeugt werden
+    
+    Args:
+        pdfs: Iterierbare Folge von PDFs als Bytes
+        download_name: Dateiname des PDFs
+    """
+    response = Response(stream_with_context(iter_merged_pdf(pdfs)), mimetype='application/pdf')
+    response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    return response
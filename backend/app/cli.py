@@ -0,0 +1,74 @@
+from flask import current_app
+from flask.cli import AppGroup
+from app.services.rollup_service import rebuild_rollups
+from app.services.search_service import rebuild_search_indexes
+from app.services.payment_service import check_paid_amounts
+from app.scheduler import create_scheduler
+from app import db
+import click
+
+rollups_cli = AppGroup('rollups', help="Vorberechnete Kennzahlen des Dashboards")
+
+@rollups_cli.command('rebuild')
+def rebuild_rollups_command():
+    """
+    Berechnet alle Rollup-Tabellen aus den Rechnungen neu (z.B. nach Datenimporten)
+    """
+    counts = rebuild_rollups()
+    db.session.commit()
+    
+    for table_name, count in counts.items():
+        click.echo(f"{table_name}: {count} Zeilen")
+
+search_cli = AppGroup('search', help="Suchindizes für Kunden, Artikel und Rechnungen")
+
+@search_cli.command('rebuild')
+def rebuild_search_command():
+    """
+    Legt fehlende Suchindizes an und baut sie aus den Tabellen neu auf
+    """
+    backend = rebuild_search_indexes()
+    db.session.commit()
+    
+    click.echo(f"Suchindizes neu aufgebaut ({backend})")
+
+payments_cli = AppGroup('payments', help="Zahlungen und gezahlte Beträge der Rechnungen")
+
+@payments_cli.command('check')
+@click.option('--batch-size', default=5000, show_default=True, help="Anzahl der Rechnungs-IDs je Transaktion")
+def check_paid_amounts_command(batch_size):
+    """
+    Prüft paid_amount und open_amount aller Rechnungen gegen die Zahlungen und korrigiert Abweichungen
+    """
+    corrected = check_paid_amounts(batch_size=batch_size)
+    
+    click.echo(f"{corrected} Rechnungen korrigiert")
+
+scheduler_cli = AppGroup('scheduler', help="Geplante Aufgaben")
+
+@scheduler_cli.command('run')
+def run_scheduler_command():
+    """
+    Führt die geplanten Aufgaben in diesem Prozess im Vordergrund aus (bis Strg+C)
+    """
+    if current_app.config['SCHEDULER_ENABLED']:
+        raise click.UsageError("SCHEDULER_ENABLED ist gesetzt, der Scheduler läuft bereits im Hintergrund")
+    
+    try:
+        create_scheduler(current_app._get_current_object(), blocking=True)
+    except (KeyboardInterrupt, SystemExit):
+        click.echo("Scheduler beendet")
+
+@scheduler_cli.command('run-job')
+@click.argument('job_id')
+def run_job_command(job_id):
+    """
+    Führt eine geplante Aufgabe einmal sofort aus (mit Sperre, z.B. send_invoice_emails)
+    """
+    scheduler = create_scheduler(current_app._get_current_object(), start=False)
+    job = scheduler.get_job(job_id)
+    if job is None:
+        raise click.BadParameter(f"Unbekannte Aufgabe (vorhanden: {', '.join(known.id for known in scheduler.get_jobs())})")
+    
+    job.func()
+    click.echo(f"Aufgabe {job_id} ausgeführt")
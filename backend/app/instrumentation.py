@@ -0,0 +1,212 @@
+from flask import g, request, has_app_context, current_app, Response
+from flask_jwt_extended import verify_jwt_in_request
+from marshmallow import Schema
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from contextlib import contextmanager
+from collections import defaultdict
+import functools
+import hmac
+import threading
+import time
+
+# Obergrenzen der Histogramm-Buckets für die Antwortzeit in Sekunden
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Gesammelte Kennzahlen dieses Prozesses: (Methode, Endpunkt) -> Werte
+_metrics = defaultdict(lambda: {
+    'requests': defaultdict(int),
+    'duration_buckets': [0] * len(DURATION_BUCKETS),
+    'duration_sum': 0.0,
+    'queries': 0,
+    'sql': 0.0,
+    'serialize': 0.0,
+    'render': 0.0
+})
+_metrics_lock = threading.Lock()
+_installed = False
+
+def init_instrumentation(app):
+    """
+    Aktiviert die Messung von Abfragen, SQL-Zeit, Serialisierung und PDF-Erstellung
+    
+    Die Messung ist nur aktiv, wenn INSTRUMENTATION_ENABLED gesetzt ist. Pro Anfrage
+    werden die Werte als Server-Timing-Header zurückgegeben und pro Endpunkt unter
+    /metrics im Prometheus-Textformat bereitgestellt (Werte je Prozess). /metrics
+    erfordert ein JWT oder das Token aus METRICS_TOKEN.
+    """
+    if not app.config.get('INSTRUMENTATION_ENABLED'):
+        return
+    
+    _install_hooks()
+    
+    @app.before_request
+    def start_request_timing():
+        g.instrumentation = {
+            'start': time.perf_counter(),
+            'queries': 0,
+            'sql': 0.0,
+            'serialize': 0.0,
+            'render': 0.0,
+            'dump_depth': 0
+        }
+    
+    @app.after_request
+    def finish_request_timing(response):
+        stats = g.pop('instrumentation', None)
+        if stats is None:
+            return response
+        
+        duration = time.perf_counter() - stats['start']
+        endpoint = request.url_rule.rule if request.url_rule else 'unbekannt'
+        _record_request(request.method, endpoint, response.status_code, duration, stats)
+        
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={stats["sql"] * 1000:.1f};desc="{stats["queries"]} queries"',
+            f'serialize;dur={stats["serialize"] * 1000:.1f}',
+            f'render;dur={stats["render"] * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}'
+        ])
+        return response
+    
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint)
+
+def _install_hooks():
+    """
+    Registriert die SQLAlchemy-Ereignisse und die Messung von Schema.dump (einmal pro Prozess)
+    """
+    global _installed
+    
+    if _installed:
+        return
+    _installed = True
+    
+    # Startzeit am Ausführungskontext der Anweisung, damit fehlgeschlagene Anweisungen
+    # (ohne after_cursor_execute) keine Werte an der Verbindung zurücklassen
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start_time = time.perf_counter()
+    
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_query_start_time', None)
+        stats = _get_request_stats()
+        if stats is not None and start is not None:
+            stats['queries'] += 1
+            stats['sql'] += time.perf_counter() - start
+    
+    original_dump = Schema.dump
+    
+    @functools.wraps(original_dump)
+    def timed_dump(self, obj, *args, **kwargs):
+        stats = _get_request_stats()
+        if stats is None or stats['dump_depth']:
+            # Verschachtelte Schemas werden mit dem äußeren Aufruf gemessen
+            return original_dump(self, obj, *args, **kwargs)
+        
+        stats['dump_depth'] += 1
+        start = time.perf_counter()
+        try:
+            return original_dump(self, obj, *args, **kwargs)
+        finally:
+            stats['serialize'] += time.perf_counter() - start
+            stats['dump_depth'] -= 1
+    
+    Schema.dump = timed_dump
+
+def _get_request_stats():
+    if not has_app_context():
+        return None
+    return g.get('instrumentation')
+
+@contextmanager
+def record_timing(name):
+    """
+    Misst die Dauer eines Blocks und addiert sie zum Wert 'name' der aktuellen Anfrage
+    
+    Außerhalb einer Anfrage oder bei deaktivierter Messung ohne Wirkung.
+    """
+    stats = _get_request_stats()
+    if stats is None:
+        yield
+        return
+    
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats[name] += time.perf_counter() - start
+
+def _record_request(method, endpoint, status, duration, stats):
+    with _metrics_lock:
+        metrics = _metrics[(method, endpoint)]
+        metrics['requests'][status] += 1
+        metrics['duration_sum'] += duration
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                metrics['duration_buckets'][index] += 1
+        metrics['queries'] += stats['queries']
+        metrics['sql'] += stats['sql']
+        metrics['serialize'] += stats['serialize']
+        metrics['render'] += stats['render']
+
+def render_metrics():
+    """
+    Gibt die gesammelten Kennzahlen im Prometheus-Textformat zurück
+    """
+    lines = [
+        '# HELP http_requests_total Anzahl der Anfragen',
+        '# TYPE http_requests_total counter'
+    ]
+    
+    with _metrics_lock:
+        snapshot = [
+            (method, endpoint, dict(metrics['requests']), list(metrics['duration_buckets']), dict(metrics))
+            for (method, endpoint), metrics in sorted(_metrics.items())
+        ]
+    
+    for method, endpoint, requests, buckets, metrics in snapshot:
+        for status, count in sorted(requests.items()):
+            lines.append(f'http_requests_total{{method="{method}",endpoint="{endpoint}",status="{status}"}} {count}')
+    
+    lines += [
+        '# HELP http_request_duration_seconds Antwortzeit der Anfragen',
+        '# TYPE http_request_duration_seconds histogram'
+    ]
+    for method, endpoint, requests, buckets, metrics in snapshot:
+        labels = f'method="{method}",endpoint="{endpoint}"'
+        for bound, count in zip(DURATION_BUCKETS, buckets):
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        total = sum(requests.values())
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {total}')
+        lines.append(f'http_request_duration_seconds_sum{{{labels}}} {metrics["duration_sum"]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{{{labels}}} {total}')
+    
+    counters = (
+        ('db_queries_total', 'queries', 'Anzahl der SQL-Abfragen'),
+        ('db_query_duration_seconds_total', 'sql', 'Gesamtdauer der SQL-Abfragen'),
+        ('serialization_duration_seconds_total', 'serialize', 'Gesamtdauer der Serialisierung (Schema.dump)'),
+        ('pdf_render_duration_seconds_total', 'render', 'Gesamtdauer der PDF-Erstellung')
+    )
+    for name, key, description in counters:
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+        for method, endpoint, requests, buckets, metrics in snapshot:
+            value = metrics[key]
+            formatted = str(value) if isinstance(value, int) else f'{value:.6f}'
+            lines.append(f'{name}{{method="{method}",endpoint="{endpoint}"}} {formatted}')
+    
+    return '\n'.join(lines) + '\n'
+
+def metrics_endpoint():
+    """
+    Gibt die Kennzahlen dieses Prozesses für Prometheus zurück
+    
+    Zugriff mit "Authorization: Bearer <METRICS_TOKEN>" (für den Scraper) oder einem JWT.
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    authorization = request.headers.get('Authorization', '')
+    if not (token and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())):
+        verify_jwt_in_request()
+    
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
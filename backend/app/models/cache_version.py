@@ -0,0 +1,16 @@
+from datetime import datetime
+from app import db
+
+class CacheVersion(db.Model):
+    """
+    Versionszähler eines prozessinternen Caches; jede Änderung der zugrunde liegenden
+    Daten erhöht ihn, damit alle Worker ihren Cache abgleichen
+    """
+    __tablename__ = 'cache_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CacheVersion {self.name} v{self.version}>'
@@ -0,0 +1,31 @@
+from datetime import datetime
+from app import db
+
+class EmailOutbox(db.Model):
+    """
+    Modell für ausstehende Rechnungs-E-Mails (Postausgang)
+    
+    Jede Zeile steht für eine zu versendende Rechnung. Zeilen eines Stapelversands
+    teilen sich eine job_id, über die der Fortschritt abgefragt werden kann.
+    """
+    __tablename__ = 'email_outbox'
+    
+    outbox_id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(36), nullable=False, index=True)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.invoice_id'), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'))
+    template_id = db.Column(db.Integer, db.ForeignKey('email_templates.template_id'))
+    recipient = db.Column(db.String(255))
+    subject = db.Column(db.String(255))  # bereits gerenderter Betreff (erneut eingeplanter Versand)
+    body = db.Column(db.Text)  # bereits gerenderter Text (erneut eingeplanter Versand)
+    status = db.Column(db.String(20), nullable=False, default='wartend', index=True)  # wartend, in_bearbeitung, gesendet, fehlgeschlagen
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, index=True)  # frühester Zeitpunkt des nächsten Versuchs
+    error_message = db.Column(db.Text)
+    email_log_id = db.Column(db.Integer, db.ForeignKey('email_logs.log_id'))
+    sent_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<EmailOutbox {self.outbox_id} for Invoice {self.invoice_id} ({self.status})>'
@@ -38,6 +38,15 @@ class EmailLog(db.Model):
     body = db.Column(db.Text, nullable=False)
     status = db.Column(db.String(20), default='gesendet')  # gesendet, fehlgeschlagen
     error_message = db.Column(db.Text)
+    is_permanent = db.Column(db.Boolean, default=False)  # Fehler, bei dem ein neuer Versuch nicht hilft
+    
+    __table_args__ = (
+        # Protokoll einer Rechnung bzw. eines Kunden, neueste zuerst, und Fehlversuche je Rechnung
+        db.Index('ix_email_logs_invoice_id_sent_date', 'invoice_id', 'sent_date'),
+        db.Index('ix_email_logs_customer_id_sent_date', 'customer_id', 'sent_date'),
+        # Gesamtes Protokoll, neueste zuerst
+        db.Index('ix_email_logs_sent_date', 'sent_date'),
+    )
     
     def __repr__(self):
         return f'<EmailLog {self.log_id} for Invoice {self.invoice_id}>'
@@ -1,5 +1,8 @@
 from datetime import datetime
 from app import db
+from app.money import calculate_line_totals, calculate_invoice_totals, to_decimal, ZERO
+# Zahlungen mit den Rechnungen registrieren (Beziehung Invoice.payments)
+from app.models.payment import Payment
 
 class Invoice(db.Model):
     """
@@ -19,6 +22,11 @@ class Invoice(db.Model):
     total_net = db.Column(db.Numeric(10, 2), default=0.0)
     total_vat = db.Column(db.Numeric(10, 2), default=0.0)
     total_gross = db.Column(db.Numeric(10, 2), default=0.0)
+    # Summe der Zahlungen und offener Betrag (total_gross - paid_amount, 0 bei stornierten
+    # Rechnungen und Stornorechnungen), bei jeder Zahlung in derselben Transaktion
+    # fortgeschrieben (siehe app.services.payment_service)
+    paid_amount = db.Column(db.Numeric(10, 2), nullable=False, default=0, server_default='0')
+    open_amount = db.Column(db.Numeric(10, 2), nullable=False, default=0, server_default='0')
     notes = db.Column(db.Text)
     terms = db.Column(db.Text)
     is_cancelled = db.Column(db.Boolean, default=False)
@@ -31,6 +39,33 @@ class Invoice(db.Model):
     email_sent = db.Column(db.Boolean, default=False)
     email_sent_date = db.Column(db.DateTime)
     
+    __table_args__ = (
+        # Rechnungen eines Kunden, optional in einem Datumsbereich (Suche, Berichte)
+        db.Index('ix_invoices_customer_id_invoice_date', 'customer_id', 'invoice_date'),
+        # Cursor-Paginierung (ORDER BY invoice_date DESC, invoice_id DESC) und Datumsbereiche
+        db.Index('ix_invoices_invoice_date_invoice_id', 'invoice_date', 'invoice_id'),
+        # Noch nicht per E-Mail versendete Rechnungen je Status (send_invoice_emails);
+        # die Bedingung muss in der Abfrage als Konstante stehen (email_sent == false())
+        db.Index(
+            'ix_invoices_status_unsent', 'status', 'invoice_id',
+            postgresql_where=db.text('email_sent = false'),
+            sqlite_where=db.text('email_sent = 0')
+        ),
+        # Stornorechnungen einer Originalrechnung (nur die wenigen Zeilen mit Verweis)
+        db.Index(
+            'ix_invoices_original_invoice_id', 'original_invoice_id',
+            postgresql_where=db.text('original_invoice_id IS NOT NULL'),
+            sqlite_where=db.text('original_invoice_id IS NOT NULL')
+        ),
+        # Offene Forderungen nach offenem Betrag (Filter und Sortierung); die Bedingung muss
+        # in der Abfrage als Konstante stehen (open_amount > literal_column('0'))
+        db.Index(
+            'ix_invoices_open_amount', 'open_amount', 'invoice_id',
+            postgresql_where=db.text('open_amount > 0'),
+            sqlite_where=db.text('open_amount > 0')
+        ),
+    )
+    
     # Beziehungen
     items = db.relationship('InvoiceItem', backref='invoice', lazy=True, cascade="all, delete-orphan")
     payments = db.relationship('Payment', backref='invoice', lazy=True)
@@ -41,28 +76,60 @@ class Invoice(db.Model):
     
     def calculate_totals(self):
         """
-        Berechnet die Gesamtbeträge der Rechnung
+        Berechnet die Positionen und Gesamtbeträge der Rechnung in einem Durchgang
+        
+        Die Umsatzsteuer wird je Steuersatz auf die Nettosumme berechnet (siehe app.money).
         """
-        self.total_net = sum(item.total_net for item in self.items)
-        self.total_vat = sum(item.total_vat for item in self.items)
-        self.total_gross = sum(item.total_gross for item in self.items)
+        items = list(self.items)
+        totals = calculate_invoice_totals((item.quantity, item.price_net, item.vat_rate) for item in items)
+        
+        for item, (total_net, total_vat, total_gross) in zip(items, totals['lines']):
+            item.total_net = total_net
+            item.total_vat = total_vat
+            item.total_gross = total_gross
+        
+        self.total_net = totals['total_net']
+        self.total_vat = totals['total_vat']
+        self.total_gross = totals['total_gross']
         
+        # Offener Betrag und Zahlungsstatus hängen vom neuen Bruttobetrag ab; ein von Hand
+        # gesetzter Status einer Rechnung ohne Zahlungen bleibt erhalten (wie bei check_paid_amounts)
+        self.update_open_amount()
+        if to_decimal(self.paid_amount) != ZERO:
+            self.update_payment_status()
+    
+    def is_receivable(self):
+        """
+        Prüft, ob die Rechnung eine Forderung ist (weder storniert noch selbst eine Stornorechnung)
+        """
+        return self.original_invoice_id is None and not self.is_cancelled and self.status != 'storniert'
+    
+    def update_open_amount(self):
+        """
+        Berechnet den offenen Betrag aus total_gross und paid_amount
+        
+        Stornierte Rechnungen und Stornorechnungen haben keinen offenen Betrag.
+        """
+        if self.is_receivable():
+            self.open_amount = to_decimal(self.total_gross) - to_decimal(self.paid_amount)
+        else:
+            self.open_amount = ZERO
+    
     def is_paid(self):
         """
-        Prüft, ob die Rechnung vollständig bezahlt ist
+        Prüft, ob die Rechnung vollständig bezahlt ist (anhand von paid_amount, ohne die Zahlungen zu laden)
         """
-        paid_amount = sum(payment.amount for payment in self.payments)
-        return paid_amount >= self.total_gross
+        return to_decimal(self.paid_amount) >= to_decimal(self.total_gross)
     
     def update_payment_status(self):
         """
-        Aktualisiert den Zahlungsstatus basierend auf den eingegangenen Zahlungen
+        Aktualisiert den Zahlungsstatus anhand der Summe der eingegangenen Zahlungen (paid_amount)
         """
-        paid_amount = sum(payment.amount for payment in self.payments)
+        paid_amount = to_decimal(self.paid_amount)
         
         if paid_amount <= 0:
             self.payment_status = 'offen'
-        elif paid_amount < self.total_gross:
+        elif paid_amount < to_decimal(self.total_gross):
             self.payment_status = 'teilweise bezahlt'
         else:
             self.payment_status = 'vollständig bezahlt'
@@ -75,8 +142,8 @@ class InvoiceItem(db.Model):
     __tablename__ = 'invoice_items'
     
     invoice_item_id = db.Column(db.Integer, primary_key=True)
-    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.invoice_id'), nullable=False)
-    item_id = db.Column(db.Integer, db.ForeignKey('items.item_id'))
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.invoice_id'), nullable=False, index=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('items.item_id'), index=True)
     position = db.Column(db.Integer, nullable=False)
     quantity = db.Column(db.Numeric(10, 2), nullable=False, default=1.0)
     unit = db.Column(db.String(50), default='Stück')
@@ -94,6 +161,7 @@ class InvoiceItem(db.Model):
         """
         Berechnet die Gesamtbeträge der Rechnungsposition
         """
-        self.total_net = float(self.quantity) * float(self.price_net)
-        self.total_vat = self.total_net * (float(self.vat_rate) / 100)
-        self.total_gross = self.total_net + self.total_vat
+        line_totals = calculate_line_totals(self.quantity, self.price_net, self.vat_rate)
+        self.total_net = line_totals['total_net']
+        self.total_vat = line_totals['total_vat']
+        self.total_gross = line_totals['total_gross']
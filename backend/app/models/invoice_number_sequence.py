@@ -0,0 +1,16 @@
+from datetime import datetime
+from app import db
+
+class InvoiceNumberSequence(db.Model):
+    """
+    Zählerzeile für die fortlaufenden Rechnungsnummern eines Präfixes (z.B. '2025-04-')
+    """
+    __tablename__ = 'invoice_number_sequences'
+    
+    prefix = db.Column(db.String(20), primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<InvoiceNumberSequence {self.prefix}{self.last_value}>'
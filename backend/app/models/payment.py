@@ -0,0 +1,28 @@
+from datetime import datetime
+from app import db
+
+class Payment(db.Model):
+    """
+    Modell für Zahlungseingänge
+    
+    Zahlungen aus Kontoauszügen, die keiner Rechnung zugeordnet werden konnten, werden
+    ohne invoice_id gespeichert und später von Hand zugeordnet. import_reference
+    verhindert, dass derselbe Umsatz bei erneutem Import doppelt gebucht wird.
+    """
+    __tablename__ = 'payments'
+    
+    payment_id = db.Column(db.Integer, primary_key=True)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.invoice_id'), index=True)
+    payment_date = db.Column(db.Date, nullable=False)
+    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    payment_method = db.Column(db.String(50))
+    reference = db.Column(db.Text)  # Verwendungszweck
+    notes = db.Column(db.Text)
+    counterparty_name = db.Column(db.String(255))
+    counterparty_iban = db.Column(db.String(34))
+    import_reference = db.Column(db.String(80), unique=True)  # Prüfsumme des Umsatzes beim Import
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Payment {self.payment_id} for Invoice {self.invoice_id}>'
@@ -1,5 +1,6 @@
 from datetime import datetime
 from app import db
+from app.money import calculate_line_totals
 
 class RecurringInvoice(db.Model):
     """
@@ -8,7 +9,7 @@ class RecurringInvoice(db.Model):
     __tablename__ = 'recurring_invoices'
     
     recurring_id = db.Column(db.Integer, primary_key=True)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=False, index=True)
     start_date = db.Column(db.Date, nullable=False)
     end_date = db.Column(db.Date)  # Optional, für unbefristete Intervalle leer
     interval_type = db.Column(db.String(20), nullable=False)  # monatlich, quartalsweise, halbjährlich, jährlich
@@ -20,6 +21,11 @@ class RecurringInvoice(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        # Fällige Intervallrechnungen (status = 'aktiv' AND next_invoice_date <= heute)
+        db.Index('ix_recurring_invoices_status_next_invoice_date', 'status', 'next_invoice_date'),
+    )
+    
     # Beziehungen
     items = db.relationship('RecurringInvoiceItem', backref='recurring_invoice', lazy=True, cascade="all, delete-orphan")
     
@@ -40,8 +46,8 @@ class RecurringInvoiceItem(db.Model):
     __tablename__ = 'recurring_invoice_items'
     
     recurring_item_id = db.Column(db.Integer, primary_key=True)
-    recurring_id = db.Column(db.Integer, db.ForeignKey('recurring_invoices.recurring_id'), nullable=False)
-    item_id = db.Column(db.Integer, db.ForeignKey('items.item_id'))
+    recurring_id = db.Column(db.Integer, db.ForeignKey('recurring_invoices.recurring_id'), nullable=False, index=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('items.item_id'), index=True)
     position = db.Column(db.Integer, nullable=False)
     quantity = db.Column(db.Numeric(10, 2), nullable=False, default=1.0)
     unit = db.Column(db.String(50), default='Stück')
@@ -56,12 +62,4 @@ class RecurringInvoiceItem(db.Model):
         """
         Berechnet die Gesamtbeträge der Position
         """
-        total_net = float(self.quantity) * float(self.price_net)
-        total_vat = total_net * (float(self.vat_rate) / 100)
-        total_gross = total_net + total_vat
-        
-        return {
-            'total_net': total_net,
-            'total_vat': total_vat,
-            'total_gross': total_gross
-        }
+        return calculate_line_totals(self.quantity, self.price_net, self.vat_rate)
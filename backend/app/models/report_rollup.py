@@ -0,0 +1,56 @@
+from datetime import datetime
+from app import db
+
+class MonthlyRevenueRollup(db.Model):
+    """
+    Laufend fortgeschriebener Umsatz je Monat (Grundlage des Dashboards)
+    
+    Stornorechnungen zählen im Monat ihrer Originalrechnung, sodass sich eine
+    stornierte Rechnung wie im Umsatzbericht zu 0 verrechnet.
+    """
+    __tablename__ = 'rollup_monthly_revenue'
+    
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    invoice_count = db.Column(db.Integer, nullable=False, default=0)
+    cancellation_count = db.Column(db.Integer, nullable=False, default=0)
+    total_net = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    total_vat = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    total_gross = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<MonthlyRevenueRollup {self.year}-{self.month:02d}>'
+
+
+class CustomerReceivableRollup(db.Model):
+    """
+    Laufend fortgeschriebene offene Forderungen je Kunde
+    """
+    __tablename__ = 'rollup_customer_receivables'
+    
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), primary_key=True)
+    open_count = db.Column(db.Integer, nullable=False, default=0)
+    open_amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CustomerReceivableRollup Customer {self.customer_id}>'
+
+
+class DueDateReceivableRollup(db.Model):
+    """
+    Laufend fortgeschriebene offene Forderungen je Fälligkeitsdatum
+    
+    Die überfälligen Beträge zu einem Stichtag ergeben sich aus der Summe aller
+    Zeilen mit einem früheren Fälligkeitsdatum.
+    """
+    __tablename__ = 'rollup_due_date_receivables'
+    
+    due_date = db.Column(db.Date, primary_key=True)
+    open_count = db.Column(db.Integer, nullable=False, default=0)
+    open_amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DueDateReceivableRollup {self.due_date}>'
@@ -0,0 +1,16 @@
+from datetime import datetime
+from app import db
+
+class SchedulerLock(db.Model):
+    """
+    Sperre (Lease) für geplante Aufgaben, damit jede Aufgabe nur auf einem Knoten läuft
+    """
+    __tablename__ = 'scheduler_locks'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(255), nullable=False)
+    locked_until = db.Column(db.DateTime, nullable=False)
+    acquired_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SchedulerLock {self.name} ({self.owner} bis {self.locked_until})>'
@@ -0,0 +1,113 @@
+from decimal import Decimal, Context, ROUND_HALF_UP, localcontext
+
+# Geldbeträge werden kaufmännisch auf ganze Cent gerundet
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+HUNDRED = Decimal(100)
+
+# Rechenkontext für Geldbeträge: quantize() ohne Rundungsargument ist deutlich schneller
+MONEY_CONTEXT = Context(rounding=ROUND_HALF_UP)
+
+# Betragsspalten von Rechnungen und Positionen
+AMOUNT_KEYS = ('total_net', 'total_vat', 'total_gross')
+
+def to_decimal(value):
+    """
+    Wandelt einen Betrag, eine Menge oder einen Steuersatz verlustfrei in Decimal um
+    
+    Floats werden über ihre Textdarstellung umgewandelt (0.1 -> Decimal('0.1')),
+    None ergibt 0.
+    """
+    if type(value) is Decimal:
+        return value
+    if value is None:
+        return ZERO
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    return Decimal(value)
+
+def round_money(value):
+    """
+    Rundet einen Betrag kaufmännisch auf Cent (0,005 wird aufgerundet, negative Beträge symmetrisch)
+    """
+    return to_decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+def calculate_line_totals(quantity, price_net, vat_rate):
+    """
+    Berechnet Netto, Umsatzsteuer und Brutto einer einzelnen Position
+    
+    Menge, Preis und Steuersatz werden wie in den Numeric-Spalten auf zwei Nachkommastellen
+    gerundet, damit die Beträge zu den gespeicherten Werten passen.
+    
+    Returns:
+        Ein Dictionary mit total_net, total_vat und total_gross (Decimal, auf Cent gerundet)
+    """
+    total_net = (round_money(quantity) * round_money(price_net)).quantize(CENT, rounding=ROUND_HALF_UP)
+    total_vat = (total_net * round_money(vat_rate) / HUNDRED).quantize(CENT, rounding=ROUND_HALF_UP)
+    
+    return {
+        'total_net': total_net,
+        'total_vat': total_vat,
+        'total_gross': total_net + total_vat
+    }
+
+def calculate_invoice_totals(lines):
+    """
+    Berechnet alle Positionen einer Rechnung und die Rechnungssummen in einem Durchgang
+    
+    Die Umsatzsteuer der Rechnung wird je Steuersatz aus der Summe der Nettobeträge
+    berechnet und erst dann gerundet (§ 14 Abs. 4 Nr. 8 UStG), nicht als Summe der
+    gerundeten Steuer je Position. Die Steuer je Position dient nur der Anzeige; ihre
+    Summe kann daher um einzelne Cent von total_vat abweichen.
+    
+    Werte, die nicht als Decimal vorliegen (z.B. aus JSON), werden wie in den Numeric-Spalten
+    auf zwei Nachkommastellen gerundet; Decimal-Werte aus der Datenbank haben diese bereits.
+    
+    Args:
+        lines: Iterierbare Folge von Tupeln (Menge, Nettopreis, Steuersatz in Prozent)
+    
+    Returns:
+        Ein Dictionary mit
+            lines: Liste der Positionsbeträge als Tupel (total_net, total_vat, total_gross)
+                   in Eingabereihenfolge
+            total_net, total_vat, total_gross: Rechnungssummen
+            vat_rates: Nettobetrag und Steuer je Steuersatz {Steuersatz: {'net': ..., 'vat': ...}}
+    """
+    line_totals = []
+    net_per_rate = {}
+    factors = {}
+    
+    with localcontext(MONEY_CONTEXT):
+        for quantity, price_net, vat_rate in lines:
+            if type(vat_rate) is not Decimal:
+                vat_rate = round_money(vat_rate)
+            factor = factors.get(vat_rate)
+            if factor is None:
+                factor = factors[vat_rate] = vat_rate / HUNDRED
+            if type(quantity) is not Decimal:
+                quantity = round_money(quantity)
+            if type(price_net) is not Decimal:
+                price_net = round_money(price_net)
+            
+            total_net = (quantity * price_net).quantize(CENT)
+            total_vat = (total_net * factor).quantize(CENT)
+            line_totals.append((total_net, total_vat, total_net + total_vat))
+            
+            net_per_rate[vat_rate] = net_per_rate.get(vat_rate, ZERO) + total_net
+        
+        vat_rates = {}
+        total_net = ZERO
+        total_vat = ZERO
+        for vat_rate, net in net_per_rate.items():
+            vat = (net * factors[vat_rate]).quantize(CENT)
+            vat_rates[vat_rate] = {'net': net, 'vat': vat}
+            total_net += net
+            total_vat += vat
+    
+    return {
+        'lines': line_totals,
+        'total_net': total_net,
+        'total_vat': total_vat,
+        'total_gross': total_net + total_vat,
+        'vat_rates': vat_rates
+    }
@@ -1,8 +1,16 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from app.services.recurring_invoice_service import check_and_generate_recurring_invoices
 from app.services.email_service import send_invoice_emails
+from app.services.email_outbox_service import retry_failed_emails
+from app.services.scheduler_lock_service import acquire_lock, release_lock
+from app.services.payment_service import check_paid_amounts
+from app import db
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+import functools
+import random
 import atexit
 import logging
 
@@ -10,16 +18,82 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_scheduler(app):
+# Gestarteter Scheduler dieses Prozesses; die Sperren unterscheiden nur Prozesse, zwei
+# Scheduler im selben Prozess könnten dieselbe Aufgabe gleichzeitig ausführen
+_scheduler = None
+
+def locked_job(app, name, func, lease_seconds, cooldown_seconds=0, sharded=False):
+    """
+    Erstellt eine geplante Aufgabe, die über eine Datenbanksperre nur auf einem Knoten läuft
+    
+    Jeder Prozess (z.B. jeder gunicorn-Worker) startet seinen eigenen Scheduler. Die
+    Aufgabe wird nur ausgeführt, wenn die Sperre erhalten wird. Bei verteilten
+    Aufgaben (sharded) wird die Arbeit nach customer_id % SCHEDULER_SHARDS aufgeteilt
+    und jeder Teil einzeln gesperrt, sodass sich mehrere Knoten die Arbeit teilen.
+    Die Aufgabe verlängert ihre Sperre zwischen zwei Blöcken mit renew_current_lock.
+    
+    Args:
+        app: Die Flask-Anwendung
+        name: Name der Aufgabe (Basis für die Namen der Sperren)
+        func: Die auszuführende Funktion (erhält bei sharded das Argument shard)
+        lease_seconds: Maximale Laufzeit, nach der eine Sperre als verwaist gilt
+        cooldown_seconds: Wie lange die Sperre nach Abschluss bestehen bleibt
+        sharded: Arbeit auf SCHEDULER_SHARDS Teile verteilen
+    """
+    def run_locked(lock_name, **kwargs):
+        if not acquire_lock(lock_name, lease_seconds):
+            logger.info(f"Aufgabe {lock_name} läuft bereits auf einem anderen Knoten")
+            return
+        
+        # Sperre für renew_current_lock merken; eine inzwischen fremde Sperre gibt
+        # release_lock nicht frei
+        g.scheduler_lock = (lock_name, lease_seconds)
+        try:
+            func(**kwargs)
+        except Exception as e:
+            logger.error(f"Fehler bei der Aufgabe {lock_name}: {str(e)}")
+            db.session.rollback()
+        finally:
+            g.pop('scheduler_lock', None)
+            release_lock(lock_name, cooldown_seconds)
+    
+    @functools.wraps(func)
+    def wrapper():
+        with app.app_context():
+            shard_count = app.config['SCHEDULER_SHARDS']
+            if not sharded or shard_count <= 1:
+                run_locked(name)
+                return
+            
+            # Mit einem zufälligen Teil beginnen, damit die Knoten sich gleichmäßig verteilen
+            offset = random.randrange(shard_count)
+            for step in range(shard_count):
+                shard_index = (offset + step) % shard_count
+                run_locked(f"{name}:{shard_index}", shard=(shard_index, shard_count))
+    
+    return wrapper
+
+def create_scheduler(app, blocking=False, start=True):
     """
     Erstellt und konfiguriert den Scheduler für wiederkehrende Aufgaben
+    
+    Args:
+        app: Die Flask-Anwendung
+        blocking: Im Vordergrund laufen (eigener Prozess, flask scheduler run) statt in
+                  einem Hintergrund-Thread des Web-Prozesses (SCHEDULER_ENABLED)
+        start: Den Scheduler sofort starten (blockiert bei blocking=True bis zum Beenden)
     """
+    global _scheduler
+    
     with app.app_context():
-        scheduler = BackgroundScheduler()
+        scheduler = BlockingScheduler() if blocking else BackgroundScheduler()
         
         # Aufgabe für die Generierung von Intervallrechnungen (täglich um 3 Uhr morgens)
         scheduler.add_job(
-            func=check_and_generate_recurring_invoices,
+            func=locked_job(
+                app, 'generate_recurring_invoices', check_and_generate_recurring_invoices,
+                lease_seconds=app.config['SCHEDULER_LOCK_LEASE_SECONDS'], cooldown_seconds=3600, sharded=True
+            ),
             trigger=CronTrigger(hour=3, minute=0),
             id='generate_recurring_invoices',
             name='Generiere fällige Intervallrechnungen',
@@ -28,18 +102,55 @@ def create_scheduler(app):
         
         # Aufgabe für den Versand von Rechnungen per E-Mail (täglich um 8 Uhr morgens)
         scheduler.add_job(
-            func=send_invoice_emails,
+            func=locked_job(
+                app, 'send_invoice_emails', send_invoice_emails,
+                lease_seconds=app.config['SCHEDULER_LOCK_LEASE_SECONDS'], cooldown_seconds=3600, sharded=True
+            ),
             trigger=CronTrigger(hour=8, minute=0),
             id='send_invoice_emails',
             name='Versende Rechnungen per E-Mail',
             replace_existing=True
         )
         
-        # Starte den Scheduler
-        scheduler.start()
-        logger.info("Scheduler gestartet mit Jobs: %s", scheduler.get_jobs())
-        
-        # Stelle sicher, dass der Scheduler beim Beenden der Anwendung gestoppt wird
-        atexit.register(lambda: scheduler.shutdown())
+        # Aufgabe für die Wiederholung fehlgeschlagener E-Mails (alle paar Minuten)
+        retry_interval = app.config['EMAIL_RETRY_INTERVAL_MINUTES'] * 60
+        scheduler.add_job(
+            func=locked_job(
+                app, 'retry_failed_emails', retry_failed_emails,
+                lease_seconds=retry_interval, cooldown_seconds=retry_interval // 2
+            ),
+            trigger=IntervalTrigger(seconds=retry_interval),
+            id='retry_failed_emails',
+            name='Wiederhole fehlgeschlagene E-Mails',
+            replace_existing=True
+        )
         
+        # Aufgabe für die Prüfung der gezahlten und offenen Beträge (täglich um 2 Uhr morgens)
+        scheduler.add_job(
+            func=locked_job(
+                app, 'check_paid_amounts', check_paid_amounts,
+                lease_seconds=app.config['SCHEDULER_LOCK_LEASE_SECONDS'], cooldown_seconds=3600
+            ),
+            trigger=CronTrigger(hour=2, minute=0),
+            id='check_paid_amounts',
+            name='Prüfe gezahlte und offene Beträge der Rechnungen',
+            replace_existing=True
+        )
+    
+    if not start:
         return scheduler
+    
+    if _scheduler is not None:
+        logger.warning("Scheduler läuft in diesem Prozess bereits")
+        return _scheduler
+    _scheduler = scheduler
+    
+    # Stelle sicher, dass ein Scheduler im Hintergrund beim Beenden der Anwendung gestoppt wird
+    if not blocking:
+        atexit.register(lambda: scheduler.shutdown())
+    
+    # Starte den Scheduler
+    logger.info("Starte Scheduler mit Jobs: %s", scheduler.get_jobs())
+    scheduler.start()
+    
+    return scheduler
@@ -32,12 +32,13 @@ class EmailLogSchema(Schema):
     body = fields.Str(required=True)
     status = fields.Str(dump_only=True)
     error_message = fields.Str(dump_only=True, allow_none=True)
+    is_permanent = fields.Bool(dump_only=True)
 
     class Meta:
         fields = (
             'log_id', 'invoice_id', 'customer_id', 'template_id',
             'sent_date', 'recipient', 'subject', 'body', 'status',
-            'error_message'
+            'error_message', 'is_permanent'
         )
 
 # Instanzen der Schemas erstellen
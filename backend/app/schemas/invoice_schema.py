@@ -40,6 +40,8 @@ class InvoiceSchema(Schema):
     total_net = fields.Decimal(dump_only=True, places=2)
     total_vat = fields.Decimal(dump_only=True, places=2)
     total_gross = fields.Decimal(dump_only=True, places=2)
+    paid_amount = fields.Decimal(dump_only=True, places=2)
+    open_amount = fields.Decimal(dump_only=True, places=2)
     notes = fields.Str(allow_none=True)
     terms = fields.Str(allow_none=True)
     is_cancelled = fields.Bool(default=False)
@@ -61,7 +63,7 @@ class InvoiceSchema(Schema):
             'invoice_id', 'invoice_number', 'customer_id', 'invoice_date',
             'due_date', 'delivery_date', 'status', 'payment_status',
             'payment_method', 'total_net', 'total_vat', 'total_gross',
-            'notes', 'terms', 'is_cancelled', 'cancellation_date',
+            'paid_amount', 'open_amount', 'notes', 'terms', 'is_cancelled', 'cancellation_date',
             'cancellation_reason', 'original_invoice_id', 'created_at',
             'updated_at', 'is_recurring', 'email_sent', 'email_sent_date',
             'items', 'customer'
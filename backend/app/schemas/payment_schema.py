@@ -0,0 +1,29 @@
+from marshmallow import Schema, fields, validate
+
+class PaymentSchema(Schema):
+    """
+    Schema für die Validierung und Serialisierung von Zahlungen
+    """
+    payment_id = fields.Int(dump_only=True)
+    invoice_id = fields.Int(allow_none=True)
+    payment_date = fields.Date(required=True)
+    amount = fields.Decimal(required=True, places=2)
+    payment_method = fields.Str(allow_none=True, validate=validate.Length(max=50))
+    reference = fields.Str(allow_none=True)
+    notes = fields.Str(allow_none=True)
+    counterparty_name = fields.Str(allow_none=True, validate=validate.Length(max=255))
+    counterparty_iban = fields.Str(allow_none=True, validate=validate.Length(max=34))
+    created_at = fields.DateTime(dump_only=True)
+    updated_at = fields.DateTime(dump_only=True)
+
+    class Meta:
+        # Felder, die immer geladen werden sollen
+        fields = (
+            'payment_id', 'invoice_id', 'payment_date', 'amount', 'payment_method',
+            'reference', 'notes', 'counterparty_name', 'counterparty_iban',
+            'created_at', 'updated_at'
+        )
+
+# Instanzen des Schemas erstellen
+payment_schema = PaymentSchema()
+payments_schema = PaymentSchema(many=True)
@@ -0,0 +1,429 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation
+import xml.etree.ElementTree as ET
+import re
+
+# Unterstützte Formate von Kontoauszügen
+STATEMENT_FORMATS = ('camt053', 'mt940')
+
+# Größe der Blöcke, in denen Kontoauszüge gelesen werden
+CHUNK_SIZE = 64 * 1024
+
+# MT940: Umsatzzeile (:61:) mit Valuta, optionalem Buchungsdatum, Soll/Haben, Betrag,
+# Buchungsschlüssel, Kundenreferenz und optionaler Bankreferenz nach //
+MT940_TRANSACTION = re.compile(
+    r'(?P<value_date>\d{6})(?P<booking_date>\d{4})?(?P<mark>RC|RD|C|D)[A-Z]?'
+    r'(?P<amount>\d+,\d{0,2})(?P<type>[NSF][A-Z0-9]{3})(?P<customer_reference>.*?)'
+    r'(?://(?P<bank_reference>.*))?$'
+)
+MT940_TAG = re.compile(r':(\d{2}[A-Z]?):')
+MT940_BALANCE = re.compile(r'[CD]\d{6}(?P<currency>[A-Z]{3})')
+MT940_SUBFIELD = re.compile(r'\?(\d{2})')
+
+# SEPA-Schlüsselwörter im Verwendungszweck (z.B. EREF+, SVWZ+)
+SEPA_KEYWORD = re.compile(r'(EREF|KREF|MREF|CRED|DEBT|COAM|OAMT|SVWZ|ABWA|ABWE|IBAN|BIC)\+')
+
+class StatementError(ValueError):
+    """
+    Fehler beim Lesen eines Kontoauszugs (unbekanntes Format, ungültiger Inhalt)
+    """
+
+def read_chunks(stream, first=b''):
+    """
+    Liest einen Datenstrom blockweise (first wird vorangestellt, z.B. nach der Formaterkennung)
+    """
+    if first:
+        yield first
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+def detect_format(head):
+    """
+    Erkennt das Format eines Kontoauszugs anhand der ersten Bytes
+    
+    Returns:
+        'camt053' für XML-Dateien, 'mt940' für SWIFT-Dateien
+    
+    Raises:
+        StatementError: Wenn das Format nicht erkannt wird
+    """
+    text = head.lstrip(b'\xef\xbb\xbf \t\r\n')
+    if text.startswith(b'<'):
+        return 'camt053'
+    if text.startswith((b':20:', b'{1:', b':940:')) or b'\n:20:' in text or b'\n:61:' in text:
+        return 'mt940'
+    raise StatementError("Unbekanntes Format des Kontoauszugs (erwartet CAMT.053 oder MT940)")
+
+def parse_statement(stream, statement_format=None):
+    """
+    Liest einen Kontoauszug als Datenstrom und gibt seine Umsätze nacheinander zurück
+    
+    Die Datei wird blockweise gelesen, sodass auch Auszüge mit sehr vielen Umsätzen
+    nicht vollständig im Speicher liegen.
+    
+    Args:
+        stream: Binärer Datenstrom (z.B. hochgeladene Datei)
+        statement_format: 'camt053', 'mt940' oder None (automatisch erkennen)
+    
+    Returns:
+        Ein Tupel (Format, Generator der Umsätze als Dictionaries)
+    """
+    head = stream.read(CHUNK_SIZE)
+    if statement_format is None:
+        statement_format = detect_format(head)
+    elif statement_format not in STATEMENT_FORMATS:
+        raise StatementError(f"Unbekanntes Format: {statement_format}")
+    
+    parser = parse_camt053 if statement_format == 'camt053' else parse_mt940
+    return statement_format, parser(read_chunks(stream, head))
+
+def _parse_amount(text, line):
+    """
+    Wandelt einen Betrag aus dem Kontoauszug (Dezimalpunkt oder -komma) in Decimal um
+    """
+    try:
+        amount = Decimal((text or '').strip().replace(',', '.'))
+    except InvalidOperation:
+        raise StatementError(f"Ungültiger Betrag '{text}' (Umsatz {line})")
+    if not amount.is_finite():
+        raise StatementError(f"Ungültiger Betrag '{text}' (Umsatz {line})")
+    return amount
+
+def _parse_iso_date(text, line):
+    """
+    Wandelt ein Datum (YYYY-MM-DD oder Zeitstempel) aus CAMT in ein date um
+    """
+    try:
+        return date.fromisoformat((text or '').strip()[:10])
+    except ValueError:
+        raise StatementError(f"Ungültiges Datum '{text}' (Umsatz {line})")
+
+def _new_line(line):
+    """
+    Gibt einen leeren Umsatz zurück
+    """
+    return {
+        'line': line,
+        'account': None,
+        'booking_date': None,
+        'value_date': None,
+        'amount': None,
+        'currency': None,
+        'is_credit': False,
+        'reference': '',
+        'end_to_end_id': None,
+        'bank_reference': None,
+        'counterparty_name': None,
+        'counterparty_iban': None
+    }
+
+# CAMT.053 (ISO 20022)
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+def _child(element, *path):
+    """
+    Sucht ein Kindelement über seine lokalen Namen (unabhängig von der Schemaversion)
+    """
+    for name in path:
+        if element is None:
+            return None
+        element = next((child for child in element if _local_name(child.tag) == name), None)
+    return element
+
+def _children(element, name):
+    return [child for child in element if _local_name(child.tag) == name] if element is not None else []
+
+def _text(element, *path):
+    found = _child(element, *path)
+    if found is None or found.text is None:
+        return None
+    return found.text.strip() or None
+
+def _camt_party(details, role):
+    """
+    Liest Name und IBAN des Zahlers bzw. Empfängers (Dbtr/Cdtr) eines Umsatzes
+    """
+    parties = _child(details, 'RltdPties')
+    party = _child(parties, role)
+    # Ab camt.053.001.08 steht der Name unter Pty
+    name = _text(party, 'Nm') or _text(party, 'Pty', 'Nm')
+    iban = _text(parties, f'{role}Acct', 'Id', 'IBAN')
+    return name, iban
+
+def _camt_lines(entry, account, currency, line):
+    """
+    Zerlegt einen Eintrag (Ntry) in Umsätze, bei Sammelbuchungen einen je TxDtls
+    """
+    amount_element = _child(entry, 'Amt')
+    status = _text(entry, 'Sts') or _text(entry, 'Sts', 'Cd')
+    if status and status != 'BOOK':
+        return []
+    
+    is_credit = _text(entry, 'CdtDbtInd') == 'CRDT' and (_text(entry, 'RvslInd') or 'false').lower() != 'true'
+    booking_date = _text(entry, 'BookgDt', 'Dt') or _text(entry, 'BookgDt', 'DtTm')
+    value_date = _text(entry, 'ValDt', 'Dt') or _text(entry, 'ValDt', 'DtTm')
+    entry_reference = _text(entry, 'AcctSvcrRef')
+    
+    transactions = [
+        details
+        for entry_details in _children(entry, 'NtryDtls')
+        for details in _children(entry_details, 'TxDtls')
+    ] or [None]
+    
+    lines = []
+    for position, details in enumerate(transactions):
+        transaction_amount = _child(details, 'AmtDtls', 'TxAmt', 'Amt')
+        if transaction_amount is None:
+            transaction_amount = _child(details, 'Amt')
+        if transaction_amount is None or len(transactions) == 1:
+            transaction_amount = amount_element
+        if transaction_amount is None:
+            raise StatementError(f"Umsatz ohne Betrag (Umsatz {line})")
+        
+        remittance = _child(details, 'RmtInf')
+        reference = ' '.join(
+            [element.text.strip() for element in _children(remittance, 'Ustrd') if element.text] +
+            [_text(structured, 'CdtrRefInf', 'Ref') or '' for structured in _children(remittance, 'Strd')]
+        ).strip() or _text(details, 'AddtlTxInf') or _text(entry, 'AddtlNtryInf') or ''
+        
+        name, iban = _camt_party(details, 'Dbtr' if is_credit else 'Cdtr')
+        bank_reference = _text(details, 'Refs', 'AcctSvcrRef') or entry_reference
+        if bank_reference and len(transactions) > 1:
+            bank_reference = f"{bank_reference}/{position}"
+        
+        statement_line = _new_line(line)
+        statement_line.update(
+            account=account,
+            booking_date=_parse_iso_date(booking_date, line) if booking_date else None,
+            value_date=_parse_iso_date(value_date, line) if value_date else None,
+            amount=_parse_amount(transaction_amount.text, line),
+            currency=transaction_amount.get('Ccy') or currency,
+            is_credit=is_credit,
+            reference=reference,
+            end_to_end_id=_text(details, 'Refs', 'EndToEndId'),
+            bank_reference=bank_reference,
+            counterparty_name=name,
+            counterparty_iban=iban
+        )
+        if statement_line['booking_date'] is None:
+            statement_line['booking_date'] = statement_line['value_date']
+        lines.append(statement_line)
+    
+    return lines
+
+def parse_camt053(chunks):
+    """
+    Liest Umsätze aus einem CAMT.053-Kontoauszug (XML, alle Schemaversionen)
+    
+    Die Datei wird mit einem Pull-Parser verarbeitet; jeder Eintrag (Ntry) wird nach dem
+    Auslesen aus dem Baum entfernt. Vorgemerkte Umsätze werden übersprungen.
+    Dokumenttyp-Deklarationen werden abgelehnt (Schutz vor Entity-Expansion).
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    stack = []
+    account = currency = None
+    started = False
+    line = 0
+    
+    try:
+        for chunk in chunks:
+            if not started and b'<!DOCTYPE' in chunk.upper():
+                raise StatementError("Kontoauszüge mit Dokumenttyp-Deklaration werden nicht unterstützt")
+            parser.feed(chunk)
+            
+            for event, element in parser.read_events():
+                started = True
+                if event == 'start':
+                    stack.append(element)
+                    continue
+                
+                stack.pop()
+                name = _local_name(element.tag)
+                if name == 'Acct' and stack and _local_name(stack[-1].tag) == 'Stmt':
+                    account = _text(element, 'Id', 'IBAN') or _text(element, 'Id', 'Othr', 'Id')
+                    currency = _text(element, 'Ccy')
+                elif name == 'Ntry':
+                    line += 1
+                    yield from _camt_lines(element, account, currency, line)
+                    if stack:
+                        stack[-1].remove(element)
+                elif name == 'Stmt':
+                    account = currency = None
+                    if stack:
+                        stack[-1].remove(element)
+        
+        parser.close()
+    except ET.ParseError as e:
+        raise StatementError(f"Ungültiges XML im Kontoauszug: {e}")
+    
+    if not started:
+        raise StatementError("Leerer Kontoauszug")
+
+# MT940 (SWIFT)
+
+def _decode(raw):
+    """
+    Dekodiert eine Zeile (UTF-8, sonst Windows-1252 wie bei vielen deutschen Banken)
+    """
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('cp1252', errors='replace')
+
+def _iter_lines(chunks):
+    """
+    Zerlegt einen blockweise gelesenen Datenstrom in dekodierte Zeilen
+    """
+    rest = b''
+    for chunk in chunks:
+        rest += chunk
+        lines = rest.split(b'\n')
+        rest = lines.pop()
+        for raw in lines:
+            yield _decode(raw.rstrip(b'\r'))
+    if rest:
+        yield _decode(rest.rstrip(b'\r'))
+
+def _iter_fields(chunks):
+    """
+    Fasst die Zeilen eines MT940-Auszugs zu Feldern (Tag, Inhalt, Zeilennummer) zusammen
+    
+    Folgezeilen eines Feldes werden ohne Trennzeichen angehängt (Zeilenumbruch nach 65 Zeichen).
+    Das Ende einer Nachricht ('-') wird als Feld '-' gemeldet.
+    """
+    tag = None
+    parts = []
+    start = 0
+    
+    for number, text in enumerate(_iter_lines(chunks), 1):
+        match = MT940_TAG.match(text)
+        if match or text.strip() == '-' or text.startswith('{'):
+            if tag:
+                yield tag, parts, start
+            tag, parts, start = None, [], number
+            if match:
+                tag, parts = match.group(1), [text[match.end():]]
+            elif text.strip() == '-':
+                yield '-', [], number
+        elif tag:
+            parts.append(text)
+    
+    if tag:
+        yield tag, parts, start
+
+def _mt940_date(text, line):
+    try:
+        return date(2000 + int(text[:2]), int(text[2:4]), int(text[4:6]))
+    except ValueError:
+        raise StatementError(f"Ungültiges Datum '{text}' (Zeile {line})")
+
+def _mt940_booking_date(value_date, text, line):
+    """
+    Ergänzt das Buchungsdatum (MMDD) um das Jahr der Valuta (auch über den Jahreswechsel)
+    """
+    try:
+        booking_date = date(value_date.year, int(text[:2]), int(text[2:]))
+    except ValueError:
+        raise StatementError(f"Ungültiges Buchungsdatum '{text}' (Zeile {line})")
+    
+    if booking_date.month == 12 and value_date.month == 1:
+        return booking_date.replace(year=value_date.year - 1)
+    if booking_date.month == 1 and value_date.month == 12:
+        return booking_date.replace(year=value_date.year + 1)
+    return booking_date
+
+def _parse_details(text):
+    """
+    Zerlegt das Mehrzweckfeld :86: in Verwendungszweck, Name, IBAN und Ende-zu-Ende-Referenz
+    
+    Strukturierte Felder (Geschäftsvorfallcode mit ?-Unterfeldern) werden nach dem
+    DFÜ-Abkommen gelesen; sonst gilt der ganze Text als Verwendungszweck.
+    """
+    details = {'reference': text.strip(), 'counterparty_name': None, 'counterparty_iban': None, 'end_to_end_id': None}
+    if not re.match(r'\d{3}\?', text):
+        return details
+    
+    subfields = {}
+    parts = MT940_SUBFIELD.split(text[3:])
+    for key, value in zip(parts[1::2], parts[2::2]):
+        subfields.setdefault(int(key), []).append(value)
+    
+    # ?20-?29 und ?60-?63: Verwendungszweck in Teilen zu 27 Zeichen
+    purpose = ''.join(
+        ''.join(values) for key, values in sorted(subfields.items())
+        if 20 <= key <= 29 or 60 <= key <= 63
+    )
+    
+    # SEPA-Schlüsselwörter: SVWZ+ ist der eigentliche Verwendungszweck
+    keywords = {}
+    matches = list(SEPA_KEYWORD.finditer(purpose))
+    for position, match in enumerate(matches):
+        end = matches[position + 1].start() if position + 1 < len(matches) else len(purpose)
+        keywords.setdefault(match.group(1), purpose[match.end():end].strip())
+    
+    details['reference'] = (keywords.get('SVWZ') or purpose).strip()
+    end_to_end_id = keywords.get('EREF')
+    details['end_to_end_id'] = end_to_end_id if end_to_end_id and end_to_end_id != 'NOTPROVIDED' else None
+    details['counterparty_name'] = ''.join(subfields.get(32, []) + subfields.get(33, [])).strip() or None
+    details['counterparty_iban'] = ''.join(subfields.get(31, [])).strip() or None
+    return details
+
+def parse_mt940(chunks):
+    """
+    Liest Umsätze aus einem MT940-Kontoauszug (SWIFT, wie von deutschen Banken geliefert)
+    
+    Jede Umsatzzeile (:61:) wird zusammen mit dem folgenden Mehrzweckfeld (:86:)
+    zurückgegeben. Die Währung stammt aus dem Anfangssaldo (:60F:/:60M:).
+    """
+    account = currency = None
+    pending = None
+    
+    for tag, parts, number in _iter_fields(chunks):
+        if pending is not None and tag != '86':
+            yield pending
+            pending = None
+        
+        if tag == '-':
+            account = currency = None
+        elif tag == '25':
+            account = parts[0].strip()
+        elif tag in ('60F', '60M'):
+            match = MT940_BALANCE.match(parts[0].strip())
+            currency = match.group('currency') if match else currency
+        elif tag == '61':
+            match = MT940_TRANSACTION.match(parts[0].strip())
+            if not match:
+                raise StatementError(f"Ungültige Umsatzzeile :61: (Zeile {number})")
+            
+            value_date = _mt940_date(match.group('value_date'), number)
+            customer_reference = match.group('customer_reference').strip()
+            
+            pending = _new_line(number)
+            pending.update(
+                account=account,
+                value_date=value_date,
+                booking_date=(
+                    _mt940_booking_date(value_date, match.group('booking_date'), number)
+                    if match.group('booking_date') else value_date
+                ),
+                amount=_parse_amount(match.group('amount'), number),
+                currency=currency,
+                is_credit=match.group('mark') == 'C',
+                bank_reference=(match.group('bank_reference') or '').strip() or None,
+                end_to_end_id=customer_reference if customer_reference not in ('', 'NONREF') else None
+            )
+        elif tag == '86' and pending is not None:
+            details = _parse_details(''.join(parts))
+            end_to_end_id = details.pop('end_to_end_id')
+            pending.update(details)
+            pending['end_to_end_id'] = end_to_end_id or pending['end_to_end_id']
+            yield pending
+            pending = None
+    
+    if pending is not None:
+        yield pending
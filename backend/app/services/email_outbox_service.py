@@ -0,0 +1,633 @@
+from flask import current_app
+from app.models.invoice import Invoice
+from app.models.email_template import EmailLog
+from app.models.email_outbox import EmailOutbox
+from app.models.company_data import CompanyData
+from app import db, mail
+from app.services.email_service import (
+    get_email_template,
+    render_invoice_email,
+    create_invoice_message,
+    log_sent_invoice_email,
+    is_permanent_email_error
+)
+from app.services.pdf_service import build_invoice_pdf_data
+from app.services.pdf_cache_service import get_or_render_pdfs
+from app.services.scheduler_lock_service import renew_current_lock
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import insert, update, func
+from sqlalchemy.orm import selectinload
+from datetime import datetime, timedelta
+import threading
+import smtplib
+import logging
+import random
+import queue
+import time
+import uuid
+
+# Konfiguriere Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Hintergrund-Thread, der die Aufträge des Postausgangs nacheinander abarbeitet
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+# Verbindungsabbrüche beim Senden, nach denen neu verbunden wird, und wie oft hintereinander
+SMTP_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError)
+SMTP_MAX_RECONNECTS = 3
+
+# Ratenbegrenzung je SMTP-Server: (Server, Port) -> RateLimiter
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+class RateLimiter:
+    """
+    Begrenzt die Anzahl der Aktionen pro Sekunde über alle Threads hinweg
+    """
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_time = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """
+        Wartet, bis die nächste Aktion erlaubt ist
+        """
+        if not self.interval:
+            return
+        
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        
+        if wait > 0:
+            time.sleep(wait)
+
+def get_rate_limiter():
+    """
+    Gibt die Ratenbegrenzung für den konfigurierten SMTP-Server zurück (EMAIL_RATE_LIMIT pro Sekunde)
+    """
+    key = (current_app.config.get('MAIL_SERVER'), current_app.config.get('MAIL_PORT'))
+    
+    with _rate_limiters_lock:
+        if key not in _rate_limiters:
+            _rate_limiters[key] = RateLimiter(current_app.config['EMAIL_RATE_LIMIT'])
+        return _rate_limiters[key]
+
+def _close_connection(connection):
+    """
+    Beendet eine SMTP-Verbindung; Fehler einer bereits getrennten Verbindung werden ignoriert
+    """
+    if not connection.host:
+        return
+    
+    try:
+        connection.host.quit()
+    except (smtplib.SMTPException, OSError):
+        connection.host.close()
+
+def send_messages(messages):
+    """
+    Versendet mehrere E-Mails parallel über dauerhaft geöffnete SMTP-Verbindungen
+    
+    Jeder der EMAIL_WORKERS Threads öffnet eine Verbindung mit mail.connect() und
+    versendet darüber nacheinander Nachrichten aus einer gemeinsamen Warteschlange.
+    Trennt der Server die Verbindung, baut der Thread sie neu auf (höchstens
+    SMTP_MAX_RECONNECTS Mal ohne erfolgreichen Versand dazwischen).
+    
+    Args:
+        messages: Liste von flask_mail.Message-Objekten
+    
+    Returns:
+        Eine Liste in Eingabereihenfolge mit None (gesendet) oder der aufgetretenen Ausnahme
+    """
+    if not messages:
+        return []
+    
+    app = current_app._get_current_object()
+    rate_limiter = get_rate_limiter()
+    pending = queue.Queue()
+    for index, msg in enumerate(messages):
+        pending.put((index, msg))
+    
+    results = [None] * len(messages)
+    not_sent = set(range(len(messages)))
+    connection_errors = []
+    
+    def worker():
+        with app.app_context():
+            item = None
+            reconnects = 0
+            while True:
+                try:
+                    connection = mail.connect()
+                    connection.__enter__()
+                except Exception as e:
+                    # Verbindung konnte nicht aufgebaut werden
+                    logger.error(f"SMTP-Verbindung fehlgeschlagen: {str(e)}")
+                    connection_errors.append(e)
+                    return
+                
+                try:
+                    while True:
+                        if item is None:
+                            try:
+                                item = pending.get_nowait()
+                            except queue.Empty:
+                                return
+                        
+                        index, msg = item
+                        rate_limiter.acquire()
+                        try:
+                            connection.send(msg)
+                            reconnects = 0
+                        except SMTP_CONNECTION_ERRORS:
+                            raise
+                        except Exception as e:
+                            results[index] = e
+                        not_sent.discard(index)
+                        item = None
+                except SMTP_CONNECTION_ERRORS as e:
+                    # Server hat die Verbindung getrennt (z.B. Leerlauf-Timeout oder Limit je
+                    # Verbindung): neu verbinden und die aktuelle Nachricht erneut senden
+                    reconnects += 1
+                    if reconnects > SMTP_MAX_RECONNECTS:
+                        logger.error(f"SMTP-Verbindung wiederholt abgebrochen: {str(e)}")
+                        connection_errors.append(e)
+                        return
+                    logger.warning(f"SMTP-Verbindung abgebrochen, neuer Verbindungsaufbau ({reconnects}/{SMTP_MAX_RECONNECTS})")
+                finally:
+                    _close_connection(connection)
+    
+    workers = min(current_app.config['EMAIL_WORKERS'], len(messages))
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    # Nachrichten, die wegen Verbindungsfehlern nicht versendet wurden
+    for index in not_sent:
+        results[index] = connection_errors[-1] if connection_errors else ConnectionError("Nachricht wurde nicht versendet")
+    
+    return results
+
+def enqueue_invoice_emails(invoice_ids, template_id=None):
+    """
+    Legt für mehrere Rechnungen Einträge im Postausgang an
+    
+    Rechnungen, die nicht existieren oder deren Kunde keine E-Mail-Adresse hat,
+    werden nicht übernommen.
+    
+    Args:
+        invoice_ids: Liste der Rechnungs-IDs
+        template_id: ID der E-Mail-Vorlage (optional, sonst Standardvorlage)
+    
+    Returns:
+        Ein Tupel (job_id, Anzahl der Einträge, Liste der abgelehnten Rechnungen)
+    """
+    job_id = str(uuid.uuid4())
+    
+    invoices = Invoice.query.options(
+        selectinload(Invoice.customer)
+    ).filter(Invoice.invoice_id.in_(invoice_ids)).all()
+    invoices_by_id = {invoice.invoice_id: invoice for invoice in invoices}
+    
+    rows = []
+    rejected = []
+    for invoice_id in invoice_ids:
+        invoice = invoices_by_id.get(invoice_id)
+        if not invoice:
+            rejected.append({
+                "invoice_id": invoice_id,
+                "success": False,
+                "error": "Rechnung nicht gefunden"
+            })
+            continue
+        
+        if not invoice.customer.email:
+            rejected.append({
+                "invoice_id": invoice_id,
+                "invoice_number": invoice.invoice_number,
+                "success": False,
+                "error": "Kunde hat keine E-Mail-Adresse"
+            })
+            continue
+        
+        rows.append({
+            'job_id': job_id,
+            'invoice_id': invoice.invoice_id,
+            'customer_id': invoice.customer_id,
+            'template_id': template_id,
+            'status': 'wartend'
+        })
+    
+    if rows:
+        db.session.execute(insert(EmailOutbox), rows)
+    db.session.commit()
+    
+    logger.info(f"E-Mail-Auftrag {job_id}: {len(rows)} Rechnungen im Postausgang, {len(rejected)} abgelehnt")
+    
+    return job_id, len(rows), rejected
+
+def _run_with_app_context(app, func, *args):
+    with app.app_context():
+        try:
+            return func(*args)
+        except Exception as e:
+            logger.error(f"Fehler bei der Verarbeitung des Postausgangs: {str(e)}")
+            db.session.rollback()
+            raise
+
+def start_outbox_job(job_id):
+    """
+    Startet die Verarbeitung eines Auftrags im Hintergrund und kehrt sofort zurück
+    """
+    global _dispatcher
+    
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='email-outbox')
+    
+    app = current_app._get_current_object()
+    return _dispatcher.submit(_run_with_app_context, app, process_outbox, job_id)
+
+def process_outbox(job_id=None):
+    """
+    Versendet alle wartenden E-Mails (eines Auftrags oder aller Aufträge) blockweise
+    
+    Jeder Block wird vor dem Versand auf 'in_bearbeitung' gesetzt, damit ihn kein
+    anderer Worker ebenfalls versendet. Einträge, deren nächster Versuch noch in der
+    Zukunft liegt, werden übersprungen.
+    
+    Args:
+        job_id: ID des Auftrags (optional)
+    
+    Returns:
+        Die Anzahl der verarbeiteten Einträge
+    """
+    chunk_size = current_app.config['EMAIL_OUTBOX_CHUNK_SIZE']
+    processed = 0
+    
+    # Unternehmensdaten und Vorlagen nur einmal pro Lauf laden
+    company_data = CompanyData.query.first()
+    templates = {}
+    
+    while True:
+        # Sperre einer geplanten Aufgabe vor jedem Block verlängern
+        renew_current_lock()
+        
+        # Nächsten Block wartender Einträge reservieren
+        now = datetime.utcnow()
+        query = db.session.query(EmailOutbox.outbox_id).filter(
+            EmailOutbox.status == 'wartend',
+            db.or_(EmailOutbox.next_attempt_at.is_(None), EmailOutbox.next_attempt_at <= now)
+        )
+        if job_id:
+            query = query.filter(EmailOutbox.job_id == job_id)
+        candidate_ids = query.order_by(EmailOutbox.outbox_id).limit(chunk_size).subquery()
+        
+        claimed_ids = db.session.scalars(
+            update(EmailOutbox)
+            .where(EmailOutbox.outbox_id.in_(db.select(candidate_ids.c.outbox_id)))
+            .where(EmailOutbox.status == 'wartend')
+            .values(
+                status='in_bearbeitung',
+                attempts=EmailOutbox.attempts + 1,
+                updated_at=now
+            )
+            .returning(EmailOutbox.outbox_id)
+        ).all()
+        db.session.commit()
+        
+        if not claimed_ids:
+            break
+        
+        _send_outbox_chunk(claimed_ids, company_data, templates)
+        processed += len(claimed_ids)
+    
+    return processed
+
+def _send_outbox_chunk(outbox_ids, company_data, templates):
+    """
+    Versendet einen reservierten Block des Postausgangs und protokolliert die Ergebnisse
+    
+    Args:
+        outbox_ids: IDs der reservierten Einträge
+        company_data: Die Unternehmensdaten
+        templates: Bereits geladene Vorlagen (template_id -> EmailTemplate), wird ergänzt
+    """
+    entries = EmailOutbox.query.filter(
+        EmailOutbox.outbox_id.in_(outbox_ids)
+    ).order_by(EmailOutbox.outbox_id).all()
+    
+    invoices = Invoice.query.options(
+        selectinload(Invoice.items),
+        selectinload(Invoice.customer)
+    ).filter(Invoice.invoice_id.in_([entry.invoice_id for entry in entries])).all()
+    invoices_by_id = {invoice.invoice_id: invoice for invoice in invoices}
+    
+    prepared = []
+    for entry in entries:
+        invoice = invoices_by_id.get(entry.invoice_id)
+        recipient = entry.recipient or (invoice.customer.email if invoice else None)
+        
+        if entry.template_id not in templates:
+            templates[entry.template_id] = get_email_template(entry.template_id)
+        template = templates[entry.template_id]
+        
+        if not company_data:
+            error = "Keine Unternehmensdaten gefunden"
+        elif not invoice:
+            error = "Rechnung nicht gefunden"
+        elif not recipient:
+            error = "Kein E-Mail-Empfänger gefunden"
+        elif not template and not (entry.subject and entry.body):
+            error = "Keine E-Mail-Vorlage gefunden"
+        else:
+            error = None
+        
+        if error:
+            _mark_failed(entry, invoice, template, recipient, None, None, error, permanent=True)
+            continue
+        
+        # Fehler einer Rechnung (z.B. in den Daten für das PDF) betreffen nur ihren Eintrag
+        try:
+            if entry.subject and entry.body:
+                # Erneuter Versuch: Betreff und Text wie beim fehlgeschlagenen Versand
+                subject, body = entry.subject, entry.body
+            else:
+                subject, body = render_invoice_email(invoice, company_data, template)
+            pdf_data = build_invoice_pdf_data(invoice, company_data)
+        except Exception as e:
+            _mark_failed(entry, invoice, template, recipient, None, None, f"E-Mail konnte nicht erstellt werden: {str(e)}")
+            continue
+        
+        prepared.append((entry, invoice, template, recipient, subject, body, pdf_data))
+    
+    # PDFs vorab (parallel im Prozesspool bzw. aus dem Cache) erzeugen
+    pdfs = get_or_render_pdfs([item[-1] for item in prepared], return_exceptions=True)
+    
+    ready = []
+    messages = []
+    for (entry, invoice, template, recipient, subject, body, pdf_data), pdf in zip(prepared, pdfs):
+        try:
+            if isinstance(pdf, Exception):
+                raise pdf
+            message = create_invoice_message(invoice, company_data, recipient, subject, body, pdf)
+        except Exception as e:
+            _mark_failed(entry, invoice, template, recipient, subject, body, f"PDF konnte nicht erstellt werden: {str(e)}")
+            continue
+        
+        ready.append((entry, invoice, template, recipient, subject, body))
+        messages.append(message)
+    
+    results = send_messages(messages)
+    
+    sent_at = datetime.utcnow()
+    for (entry, invoice, template, recipient, subject, body), error in zip(ready, results):
+        if error:
+            _mark_failed(
+                entry, invoice, template, recipient, subject, body, str(error),
+                permanent=is_permanent_email_error(error)
+            )
+            continue
+        
+        email_log = log_sent_invoice_email(invoice, template, recipient, subject, body)
+        db.session.flush()
+        
+        entry.status = 'gesendet'
+        entry.recipient = recipient
+        entry.email_log_id = email_log.log_id
+        entry.error_message = None
+        entry.next_attempt_at = None
+        entry.sent_at = sent_at
+    
+    db.session.commit()
+    
+    sent = sum(1 for entry in entries if entry.status == 'gesendet')
+    logger.info(f"Postausgang: {sent} von {len(entries)} E-Mails erfolgreich versendet")
+
+def _mark_failed(entry, invoice, template, recipient, subject, body, error, permanent=False):
+    """
+    Protokolliert einen fehlgeschlagenen Versuch und plant bei vorübergehenden Fehlern
+    einen neuen Versuch mit exponentiell wachsendem Abstand ein
+    """
+    retry = not permanent and entry.attempts < current_app.config['EMAIL_MAX_ATTEMPTS']
+    
+    if retry:
+        entry.status = 'wartend'
+        entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=get_retry_delay(entry.attempts))
+        logger.warning(
+            f"Fehler beim Senden der E-Mail für Rechnung {entry.invoice_id} (Versuch {entry.attempts}), "
+            f"neuer Versuch ab {entry.next_attempt_at:%H:%M:%S}: {error}"
+        )
+    else:
+        entry.status = 'fehlgeschlagen'
+        entry.next_attempt_at = None
+        logger.error(f"Fehler beim Senden der E-Mail für Rechnung {entry.invoice_id}: {error}")
+    
+    email_log = EmailLog(
+        invoice_id=entry.invoice_id,
+        customer_id=invoice.customer_id if invoice else entry.customer_id,
+        template_id=template.template_id if template else None,
+        recipient=recipient or "unbekannt",
+        subject=subject or "unbekannt",
+        body=body or "unbekannt",
+        status='fehlgeschlagen',
+        error_message=error,
+        is_permanent=permanent
+    )
+    db.session.add(email_log)
+    db.session.flush()
+    
+    entry.recipient = recipient
+    entry.email_log_id = email_log.log_id
+    entry.error_message = error
+
+def get_retry_delay(attempts):
+    """
+    Gibt die Wartezeit in Sekunden vor dem nächsten Versuch zurück
+    
+    Die Wartezeit verdoppelt sich mit jedem Versuch (EMAIL_RETRY_BASE_SECONDS,
+    höchstens EMAIL_RETRY_MAX_SECONDS) und wird zufällig zwischen 50 und 100 %
+    gestreut, damit nach einem Ausfall nicht alle Wiederholungen gleichzeitig starten.
+    """
+    base = current_app.config['EMAIL_RETRY_BASE_SECONDS']
+    maximum = current_app.config['EMAIL_RETRY_MAX_SECONDS']
+    delay = min(maximum, base * 2 ** max(attempts - 1, 0))
+    return random.uniform(delay / 2, delay)
+
+def requeue_failed_emails():
+    """
+    Stellt Rechnungen, deren Versand vorübergehend fehlgeschlagen ist, erneut in den Postausgang
+    
+    Berücksichtigt werden fehlgeschlagene EmailLog-Einträge von Rechnungen, die noch
+    nicht versendet wurden, keinen dauerhaften Fehler haben, nicht bereits im
+    Postausgang warten und EMAIL_MAX_ATTEMPTS noch nicht erreicht haben. Der nächste
+    Versuch wird abhängig von der Anzahl der bisherigen Fehlversuche verzögert.
+    
+    Vorlage, Empfänger, Betreff und Text werden aus dem letzten Fehlversuch übernommen,
+    damit z.B. ein abweichender Empfänger oder ein eigener Betreff erhalten bleibt.
+    
+    Returns:
+        Die Anzahl der neu eingeplanten Rechnungen
+    """
+    max_attempts = current_app.config['EMAIL_MAX_ATTEMPTS']
+    
+    active = db.select(EmailOutbox.invoice_id).where(EmailOutbox.status.in_(['wartend', 'in_bearbeitung']))
+    permanent = db.select(EmailLog.invoice_id).where(
+        EmailLog.status == 'fehlgeschlagen',
+        EmailLog.is_permanent.is_(True)
+    )
+    
+    failures = db.session.execute(
+        db.select(
+            EmailLog.invoice_id,
+            Invoice.customer_id,
+            func.count(EmailLog.log_id),
+            func.max(EmailLog.sent_date),
+            func.max(EmailLog.log_id)
+        )
+        .join(Invoice, Invoice.invoice_id == EmailLog.invoice_id)
+        .where(
+            EmailLog.status == 'fehlgeschlagen',
+            Invoice.email_sent.is_(False),
+            EmailLog.invoice_id.not_in(active),
+            EmailLog.invoice_id.not_in(permanent)
+        )
+        .group_by(EmailLog.invoice_id, Invoice.customer_id)
+        .having(func.count(EmailLog.log_id) < max_attempts)
+    ).all()
+    
+    if not failures:
+        return 0
+    
+    # Letzter Fehlversuch je Rechnung; "unbekannt" steht für nicht ermittelte Angaben
+    last_logs = {
+        log.log_id: log
+        for log in EmailLog.query.filter(EmailLog.log_id.in_([failure[4] for failure in failures]))
+    }
+    
+    def known(value):
+        return value if value and value != "unbekannt" else None
+    
+    job_id = str(uuid.uuid4())
+    rows = []
+    for invoice_id, customer_id, failed_attempts, last_failure, last_log_id in failures:
+        last_log = last_logs[last_log_id]
+        subject, body = known(last_log.subject), known(last_log.body)
+        rows.append({
+            'job_id': job_id,
+            'invoice_id': invoice_id,
+            'customer_id': customer_id,
+            'template_id': last_log.template_id,
+            'recipient': known(last_log.recipient),
+            'subject': subject if body else None,
+            'body': body if subject else None,
+            'status': 'wartend',
+            'attempts': failed_attempts,
+            'next_attempt_at': last_failure + timedelta(seconds=get_retry_delay(failed_attempts))
+        })
+    db.session.execute(insert(EmailOutbox), rows)
+    db.session.commit()
+    
+    logger.info(f"{len(rows)} fehlgeschlagene E-Mails erneut eingeplant (Auftrag {job_id})")
+    
+    return len(rows)
+
+def release_stale_outbox_entries():
+    """
+    Gibt Einträge frei, die nach einem Abbruch des Workers in 'in_bearbeitung' hängen geblieben sind
+    
+    Einträge, die EMAIL_MAX_ATTEMPTS bereits erreicht haben, werden nicht erneut
+    freigegeben, sondern als dauerhaft fehlgeschlagen protokolliert, damit ein
+    Eintrag, der den Worker jedes Mal abbrechen lässt, nicht endlos wiederholt wird.
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=current_app.config['EMAIL_OUTBOX_STALE_SECONDS'])
+    
+    exhausted = EmailOutbox.query.filter(
+        EmailOutbox.status == 'in_bearbeitung',
+        EmailOutbox.updated_at < stale_before,
+        EmailOutbox.attempts >= current_app.config['EMAIL_MAX_ATTEMPTS']
+    ).all()
+    for entry in exhausted:
+        _mark_failed(
+            entry, None, None, entry.recipient, None, None,
+            f"Versand nach {entry.attempts} Versuchen abgebrochen (Eintrag blieb in Bearbeitung hängen)",
+            permanent=True
+        )
+    
+    released = db.session.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.status == 'in_bearbeitung', EmailOutbox.updated_at < stale_before)
+        .values(status='wartend', next_attempt_at=None)
+    ).rowcount
+    db.session.commit()
+    
+    if released:
+        logger.warning(f"{released} hängende Einträge im Postausgang freigegeben")
+    if exhausted:
+        logger.error(f"{len(exhausted)} hängende Einträge im Postausgang als fehlgeschlagen markiert")
+    
+    return released
+
+def retry_failed_emails():
+    """
+    Geplante Aufgabe: plant fehlgeschlagene E-Mails neu ein und versendet alle fälligen Einträge
+    
+    Returns:
+        Ein Dictionary mit der Anzahl der freigegebenen, neu eingeplanten und versendeten Einträge
+    """
+    released = release_stale_outbox_entries()
+    requeued = requeue_failed_emails()
+    processed = process_outbox()
+    
+    return {
+        "released": released,
+        "requeued": requeued,
+        "processed": processed
+    }
+
+def get_outbox_job_progress(job_id):
+    """
+    Gibt den Fortschritt eines Auftrags zurück
+    
+    Returns:
+        Ein Dictionary mit der Anzahl der Einträge je Status und den Fehlern,
+        oder None, wenn der Auftrag nicht existiert
+    """
+    counts = dict(
+        db.session.query(EmailOutbox.status, func.count(EmailOutbox.outbox_id))
+        .filter(EmailOutbox.job_id == job_id)
+        .group_by(EmailOutbox.status)
+        .all()
+    )
+    
+    total = sum(counts.values())
+    if not total:
+        return None
+    
+    failed = EmailOutbox.query.filter_by(job_id=job_id, status='fehlgeschlagen').order_by(EmailOutbox.outbox_id).all()
+    done = counts.get('gesendet', 0) + counts.get('fehlgeschlagen', 0)
+    
+    return {
+        "job_id": job_id,
+        "total": total,
+        "pending": counts.get('wartend', 0),
+        "in_progress": counts.get('in_bearbeitung', 0),
+        "success": counts.get('gesendet', 0),
+        "failed": counts.get('fehlgeschlagen', 0),
+        "finished": done == total,
+        "details": [
+            {
+                "invoice_id": entry.invoice_id,
+                "success": False,
+                "error": entry.error_message
+            }
+            for entry in failed
+        ]
+    }
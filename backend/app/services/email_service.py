@@ -2,11 +2,13 @@ from flask import Flask, request, jsonify
 from app.models.invoice import Invoice
 from app.models.email_template import EmailTemplate, EmailLog
 from app.models.company_data import CompanyData
+from app.models.email_outbox import EmailOutbox
 from app import db, mail
 from flask_mail import Message
 import os
-import tempfile
-from app.services.pdf_service import generate_invoice_pdf
+from app.services.pdf_cache_service import get_invoice_pdf
+from app.services.email_template_service import compile_email_template, compile_text, get_invoice_placeholder_values
+import smtplib
 import logging
 from datetime import datetime
 
@@ -14,7 +16,113 @@ from datetime import datetime
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def send_invoice_email(invoice_id, template_id=None, custom_subject=None, custom_body=None, recipient=None):
+def get_email_template(template_id=None):
+    """
+    Gibt die angegebene E-Mail-Vorlage oder die Standardvorlage zurück (oder None)
+    """
+    if template_id:
+        return EmailTemplate.query.get(template_id)
+    return EmailTemplate.query.filter_by(is_default=True).first()
+
+def render_invoice_email(invoice, company_data, template=None, custom_subject=None, custom_body=None):
+    """
+    Bestimmt Betreff und Text einer Rechnungs-E-Mail und ersetzt die Platzhalter
+    
+    Vorlagen werden einmal kompiliert und anschließend in einem Durchgang gerendert.
+    
+    Returns:
+        Ein Tupel (Betreff, Text)
+    """
+    if template:
+        template_subject, template_body = compile_email_template(template)
+    
+    # Bestimme Betreff und Text
+    if custom_subject:
+        subject = compile_text(custom_subject)
+    elif template:
+        subject = template_subject
+    else:
+        subject = compile_text("Rechnung {invoice_number}")
+    
+    if custom_body:
+        body = compile_text(custom_body)
+    elif template:
+        body = template_body
+    else:
+        body = compile_text("Sehr geehrte Damen und Herren,\n\nim Anhang finden Sie Ihre Rechnung {invoice_number}.\n\nMit freundlichen Grüßen\n{company_name}")
+    
+    # Ersetze Platzhalter
+    values = get_invoice_placeholder_values(invoice, company_data)
+    
+    return subject.render(values), body.render(values)
+
+def create_invoice_message(invoice, company_data, recipient, subject, body, pdf):
+    """
+    Erstellt die E-Mail mit der Rechnung als PDF-Anhang
+    """
+    msg = Message(
+        subject=subject,
+        recipients=[recipient],
+        body=body,
+        sender=company_data.email or "noreply@example.com"
+    )
+    
+    # Füge PDF als Anhang hinzu
+    msg.attach(
+        filename=f"Rechnung_{invoice.invoice_number}.pdf",
+        content_type="application/pdf",
+        data=pdf
+    )
+    
+    return msg
+
+def log_sent_invoice_email(invoice, template, recipient, subject, body):
+    """
+    Protokolliert eine versendete Rechnungs-E-Mail und aktualisiert den Rechnungsstatus
+    
+    Die Änderungen werden nicht committet.
+    
+    Returns:
+        Den neuen EmailLog-Eintrag
+    """
+    email_log = EmailLog(
+        invoice_id=invoice.invoice_id,
+        customer_id=invoice.customer_id,
+        template_id=template.template_id if template else None,
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        status='gesendet'
+    )
+    
+    db.session.add(email_log)
+    
+    # Aktualisiere Rechnungsstatus
+    invoice.email_sent = True
+    invoice.email_sent_date = datetime.utcnow()
+    if invoice.status == 'erstellt':
+        invoice.status = 'versendet'
+    
+    return email_log
+
+def is_permanent_email_error(error):
+    """
+    Prüft, ob ein Versandfehler dauerhaft ist und ein neuer Versuch daher nicht hilft
+    
+    Dauerhaft sind abgelehnte Empfänger und SMTP-Antworten der Klasse 5xx, mit Ausnahme
+    von Authentifizierungsfehlern (530, 535), die nach einer Korrektur der
+    Konfiguration wieder verschwinden. Verbindungsabbrüche, Zeitüberschreitungen und
+    Antworten der Klasse 4xx gelten als vorübergehend.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, message in error.recipients.values())
+    
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500 and error.smtp_code not in (530, 535)
+    
+    return False
+
+def send_invoice_email(invoice_id, template_id=None, custom_subject=None, custom_body=None, recipient=None, pdf=None):
     """
     Sendet eine Rechnung per E-Mail
     
@@ -24,7 +132,8 @@ def send_invoice_email(invoice_id, template_id=None, custom_subject=None, custom
         custom_subject: Benutzerdefinierter Betreff (optional)
         custom_body: Benutzerdefinierter Text (optional)
         recipient: Benutzerdefinierter Empfänger (optional)
-        
+        pdf: Bereits gerenderte PDF-Datei als Bytes (optional)
+    
     Returns:
         Ein Dictionary mit Informationen über den Versand
     """
@@ -51,90 +160,24 @@ def send_invoice_email(invoice_id, template_id=None, custom_subject=None, custom
             return {"success": False, "error": "Kein E-Mail-Empfänger gefunden"}
         
         # Bestimme E-Mail-Vorlage
-        if template_id:
-            template = EmailTemplate.query.get(template_id)
-        else:
-            template = EmailTemplate.query.filter_by(is_default=True).first()
+        template = get_email_template(template_id)
         
         if not template and not (custom_subject and custom_body):
             logger.error("Keine E-Mail-Vorlage gefunden und keine benutzerdefinierten Inhalte angegeben")
             return {"success": False, "error": "Keine E-Mail-Vorlage gefunden und keine benutzerdefinierten Inhalte angegeben"}
         
-        # Bestimme Betreff und Text
-        if custom_subject:
-            subject = custom_subject
-        elif template:
-            subject = template.subject
-        else:
-            subject = f"Rechnung {invoice.invoice_number}"
-        
-        if custom_body:
-            body = custom_body
-        elif template:
-            body = template.body
-        else:
-            body = f"Sehr geehrte Damen und Herren,\n\nim Anhang finden Sie Ihre Rechnung {invoice.invoice_number}.\n\nMit freundlichen Grüßen\n{company_data.company_name}"
-        
-        # Ersetze Platzhalter
-        subject = subject.replace("{invoice_number}", invoice.invoice_number)
-        subject = subject.replace("{company_name}", company_data.company_name)
-        subject = subject.replace("{customer_name}", invoice.customer.full_name)
-        
-        body = body.replace("{invoice_number}", invoice.invoice_number)
-        body = body.replace("{invoice_date}", invoice.invoice_date.strftime("%d.%m.%Y"))
-        body = body.replace("{due_date}", invoice.due_date.strftime("%d.%m.%Y"))
-        body = body.replace("{total_amount}", f"{float(invoice.total_gross):.2f} €")
-        body = body.replace("{company_name}", company_data.company_name)
-        body = body.replace("{customer_name}", invoice.customer.full_name)
+        subject, body = render_invoice_email(invoice, company_data, template, custom_subject, custom_body)
         
-        # Generiere PDF
-        fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
-        os.close(fd)
-        generate_invoice_pdf(invoice, pdf_path)
+        # Hole PDF aus dem Cache oder generiere es (falls nicht bereits übergeben)
+        if pdf is None:
+            _, pdf = get_invoice_pdf(invoice, company_data)
         
-        # Erstelle E-Mail
-        msg = Message(
-            subject=subject,
-            recipients=[email_recipient],
-            body=body,
-            sender=company_data.email or "noreply@example.com"
-        )
-        
-        # Füge PDF als Anhang hinzu
-        with open(pdf_path, 'rb') as pdf:
-            msg.attach(
-                filename=f"Rechnung_{invoice.invoice_number}.pdf",
-                content_type="application/pdf",
-                data=pdf.read()
-            )
-        
-        # Sende E-Mail
+        # Erstelle und sende E-Mail
+        msg = create_invoice_message(invoice, company_data, email_recipient, subject, body, pdf)
         mail.send(msg)
         
-        # Lösche temporäre PDF-Datei
-        try:
-            os.remove(pdf_path)
-        except:
-            pass
-        
         # Protokolliere E-Mail
-        email_log = EmailLog(
-            invoice_id=invoice.invoice_id,
-            customer_id=invoice.customer_id,
-            template_id=template.template_id if template else None,
-            recipient=email_recipient,
-            subject=subject,
-            body=body,
-            status='gesendet'
-        )
-        
-        db.session.add(email_log)
-        
-        # Aktualisiere Rechnungsstatus
-        invoice.email_sent = True
-        invoice.email_sent_date = datetime.utcnow()
-        if invoice.status == 'erstellt':
-            invoice.status = 'versendet'
+        email_log = log_sent_invoice_email(invoice, template, email_recipient, subject, body)
         
         db.session.commit()
         
@@ -163,7 +206,8 @@ def send_invoice_email(invoice_id, template_id=None, custom_subject=None, custom
                 subject=subject if 'subject' in locals() else "unbekannt",
                 body=body if 'body' in locals() else "unbekannt",
                 status='fehlgeschlagen',
-                error_message=str(e)
+                error_message=str(e),
+                is_permanent=is_permanent_email_error(e)
             )
             
             db.session.add(email_log)
@@ -173,59 +217,61 @@ def send_invoice_email(invoice_id, template_id=None, custom_subject=None, custom
         
         return {"success": False, "error": str(e)}
 
-def send_invoice_emails(status='erstellt', limit=50):
+def send_invoice_emails(status='erstellt', limit=50, shard=None):
     """
     Sendet E-Mails für Rechnungen mit einem bestimmten Status
     
+    Die Rechnungen werden in den Postausgang gestellt und anschließend mit
+    dauerhaft geöffneten SMTP-Verbindungen parallel versendet.
+    
     Args:
         status: Status der Rechnungen (erstellt, versendet, bezahlt, storniert)
-        limit: Maximale Anzahl der zu versendenden E-Mails
-        
+        limit: Maximale Anzahl der zu versendenden E-Mails (über alle Teile zusammen)
+        shard: Tupel (Index, Anzahl); nur Rechnungen mit customer_id % Anzahl == Index
+    
     Returns:
         Ein Dictionary mit Informationen über den Versand
     """
+    from app.services.email_outbox_service import enqueue_invoice_emails, process_outbox, get_outbox_job_progress
+    
     logger.info(f"Starte Versand von E-Mails für Rechnungen mit Status '{status}'")
     
-    # Hole Rechnungen, die noch nicht per E-Mail versendet wurden
-    invoices = Invoice.query.filter_by(status=status, email_sent=False).limit(limit).all()
+    # Hole Rechnungen, die noch nicht per E-Mail versendet wurden und nicht bereits im Postausgang warten
+    # (email_sent als Konstante statt Parameter, damit der Teilindex ix_invoices_status_unsent greift)
+    queued = db.select(EmailOutbox.invoice_id).where(EmailOutbox.status.in_(['wartend', 'in_bearbeitung']))
+    invoice_query = (
+        db.select(Invoice.invoice_id)
+        .filter_by(status=status)
+        .where(Invoice.email_sent == db.false())
+        .where(Invoice.invoice_id.not_in(queued))
+    )
+    
+    # Nur den Teil dieses Knotens verarbeiten; das Limit gilt für alle Teile zusammen
+    if shard:
+        shard_index, shard_count = shard
+        invoice_query = invoice_query.where(Invoice.customer_id % shard_count == shard_index)
+        limit = limit // shard_count + (1 if shard_index < limit % shard_count else 0)
+    
+    invoice_ids = db.session.scalars(invoice_query.order_by(Invoice.invoice_id).limit(limit)).all()
+    
+    logger.info(f"Gefunden: {len(invoice_ids)} Rechnungen zum Versenden")
     
-    logger.info(f"Gefunden: {len(invoices)} Rechnungen zum Versenden")
+    job_id, queued_count, rejected = enqueue_invoice_emails(invoice_ids)
+    for entry in rejected:
+        logger.warning(f"Rechnung {entry['invoice_id']} wird nicht versendet: {entry['error']}")
+    
+    process_outbox(job_id)
+    progress = get_outbox_job_progress(job_id) or {"success": 0, "failed": 0, "pending": 0, "details": []}
     
     results = {
-        "total": len(invoices),
-        "success": 0,
-        "failed": 0,
-        "details": []
+        "job_id": job_id,
+        "total": len(invoice_ids),
+        "success": progress["success"],
+        "failed": progress["failed"] + len(rejected),
+        "pending": progress["pending"],
+        "details": rejected + progress["details"]
     }
     
-    for invoice in invoices:
-        # Prüfe, ob der Kunde eine E-Mail-Adresse hat
-        if not invoice.customer.email:
-            logger.warning(f"Kunde für Rechnung {invoice.invoice_number} hat keine E-Mail-Adresse")
-            results["details"].append({
-                "invoice_id": invoice.invoice_id,
-                "invoice_number": invoice.invoice_number,
-                "success": False,
-                "error": "Kunde hat keine E-Mail-Adresse"
-            })
-            results["failed"] += 1
-            continue
-        
-        # Sende E-Mail
-        result = send_invoice_email(invoice.invoice_id)
-        
-        if result["success"]:
-            results["success"] += 1
-        else:
-            results["failed"] += 1
-        
-        results["details"].append({
-            "invoice_id": invoice.invoice_id,
-            "invoice_number": invoice.invoice_number,
-            "success": result["success"],
-            "error": result.get("error")
-        })
-    
     logger.info(f"E-Mail-Versand abgeschlossen: {results['success']} erfolgreich, {results['failed']} fehlgeschlagen")
     
     return results
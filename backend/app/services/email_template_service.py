@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from functools import lru_cache
+import threading
+import re
+
+# Platzhalter in Vorlagen, z.B. {invoice_number}
+PLACEHOLDER_PATTERN = re.compile(r"\{(\w+)\}")
+
+# Platzhalter, die in Betreff und Text von Rechnungs-E-Mails ersetzt werden
+INVOICE_PLACEHOLDERS = (
+    'invoice_number', 'invoice_date', 'due_date', 'total_amount',
+    'company_name', 'customer_name'
+)
+
+# Kompilierte Vorlagen: template_id -> (updated_at, Betreff, Text), zuletzt verwendete am Ende
+_compiled_templates = OrderedDict()
+_compiled_templates_lock = threading.Lock()
+
+# Höchstzahl kompilierter Vorlagen im Zwischenspeicher (älteste werden verdrängt)
+COMPILED_TEMPLATES_MAX_SIZE = 128
+
+class CompiledTemplate:
+    """
+    Vorab zerlegter Vorlagentext, der in einem Durchgang gerendert wird
+    
+    Der Text wird einmal in feste Textteile und Platzhalter zerlegt. Beim Rendern
+    werden die Teile nur noch zusammengefügt; eingesetzte Werte werden dabei nicht
+    erneut nach Platzhaltern durchsucht.
+    """
+    def __init__(self, text, placeholders=INVOICE_PLACEHOLDERS):
+        self.parts = []
+        position = 0
+        
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            # Unbekannte Platzhalter bleiben als Text erhalten
+            if match.group(1) not in placeholders:
+                continue
+            if match.start() > position:
+                self.parts.append((False, text[position:match.start()]))
+            self.parts.append((True, match.group(1)))
+            position = match.end()
+        
+        if position < len(text):
+            self.parts.append((False, text[position:]))
+    
+    def render(self, values):
+        """
+        Setzt die Werte ein und gibt den fertigen Text zurück (None wird als leerer Text eingesetzt)
+        """
+        return ''.join(
+            (values[part] or '') if is_placeholder else part
+            for is_placeholder, part in self.parts
+        )
+
+@lru_cache(maxsize=256)
+def compile_text(text):
+    """
+    Kompiliert einen freien Text (z.B. benutzerdefinierten Betreff) und speichert ihn zwischen
+    """
+    return CompiledTemplate(text)
+
+def compile_email_template(template):
+    """
+    Gibt Betreff und Text einer E-Mail-Vorlage in kompilierter Form zurück
+    
+    Die kompilierte Vorlage wird zwischengespeichert und bei einer Änderung der
+    Vorlage (updated_at) neu erstellt. Der Zwischenspeicher hält höchstens
+    COMPILED_TEMPLATES_MAX_SIZE Vorlagen; die am längsten nicht verwendete wird verdrängt.
+    
+    Returns:
+        Ein Tupel (kompilierter Betreff, kompilierter Text)
+    """
+    with _compiled_templates_lock:
+        cached = _compiled_templates.get(template.template_id)
+        if cached and cached[0] == template.updated_at:
+            _compiled_templates.move_to_end(template.template_id)
+            return cached[1], cached[2]
+    
+    subject = CompiledTemplate(template.subject)
+    body = CompiledTemplate(template.body)
+    
+    with _compiled_templates_lock:
+        _compiled_templates[template.template_id] = (template.updated_at, subject, body)
+        _compiled_templates.move_to_end(template.template_id)
+        while len(_compiled_templates) > COMPILED_TEMPLATES_MAX_SIZE:
+            _compiled_templates.popitem(last=False)
+    
+    return subject, body
+
+def get_invoice_placeholder_values(invoice, company_data):
+    """
+    Gibt die Werte aller Platzhalter einer Rechnungs-E-Mail zurück
+    """
+    return {
+        'invoice_number': invoice.invoice_number,
+        'invoice_date': invoice.invoice_date.strftime("%d.%m.%Y"),
+        'due_date': invoice.due_date.strftime("%d.%m.%Y"),
+        'total_amount': f"{float(invoice.total_gross):.2f} €",
+        'company_name': company_data.company_name,
+        'customer_name': invoice.customer.full_name
+    }
@@ -0,0 +1,369 @@
+from app import db
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.customer import Customer
+from app.models.item import Item
+from app.schemas.invoice_schema import InvoiceItemSchema, invoice_schema
+from app.services.rollup_service import record_inserted_invoices, ID_CHUNK_SIZE
+from app.services.invoice_number_service import reserve_invoice_numbers
+from app.money import calculate_invoice_totals, AMOUNT_KEYS
+from marshmallow import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import selectinload
+from datetime import datetime, timedelta
+
+# Positionen beim Anlegen: Menge, Preis und Steuersatz können aus dem Artikel übernommen werden
+invoice_items_input_schema = InvoiceItemSchema(
+    many=True, partial=('invoice_id', 'position', 'quantity', 'price_net', 'vat_rate')
+)
+
+def bulk_insert_invoices(invoices):
+    """
+    Schreibt mehrere Rechnungen samt Positionen mit je einem Mehrfach-INSERT
+    
+    Die Gesamtbeträge der Positionen und Rechnungen werden vor dem Schreiben berechnet.
+    Die Funktion führt keinen Commit aus, damit der Aufrufer die Transaktion steuert.
+    
+    Args:
+        invoices: Liste von Dictionaries mit den Spalten der Rechnung und einer Liste
+                  'items' mit den Spalten der Positionen (ohne Gesamtbeträge)
+    
+    Returns:
+        Die IDs der angelegten Rechnungen in der Reihenfolge der Eingabe
+    """
+    if not invoices:
+        return []
+    
+    invoice_rows = []
+    item_rows_per_invoice = []
+    
+    for invoice_data in invoices:
+        invoice_row = {key: value for key, value in invoice_data.items() if key != 'items'}
+        item_rows = [dict(item_data) for item_data in invoice_data.get('items', [])]
+        
+        # Alle Positionen einer Rechnung in einem Aufruf berechnen (Steuer je Steuersatz)
+        totals = calculate_invoice_totals((item['quantity'], item['price_net'], item['vat_rate']) for item in item_rows)
+        for item_row, line_totals in zip(item_rows, totals['lines']):
+            item_row.update(zip(AMOUNT_KEYS, line_totals))
+        
+        invoice_row['total_net'] = totals['total_net']
+        invoice_row['total_vat'] = totals['total_vat']
+        invoice_row['total_gross'] = totals['total_gross']
+        # Neue Rechnungen haben noch keine Zahlungen; Stornorechnungen und stornierte
+        # Rechnungen haben keinen offenen Betrag (wie Invoice.update_open_amount)
+        is_receivable = (
+            not invoice_row.get('original_invoice_id')
+            and not invoice_row.get('is_cancelled')
+            and invoice_row.get('status') != 'storniert'
+        )
+        invoice_row['paid_amount'] = 0
+        invoice_row['open_amount'] = totals['total_gross'] if is_receivable else 0
+        
+        invoice_rows.append(invoice_row)
+        item_rows_per_invoice.append(item_rows)
+    
+    # Rechnungen mit einem executemany einfügen und die IDs über die eindeutigen
+    # Rechnungsnummern nachschlagen (RETURNING mit fester Reihenfolge würde unter
+    # SQLite zeilenweise ausgeführt)
+    db.session.execute(insert(Invoice.__table__), invoice_rows)
+    
+    invoice_numbers = [invoice_row['invoice_number'] for invoice_row in invoice_rows]
+    ids_by_number = {}
+    for start in range(0, len(invoice_numbers), ID_CHUNK_SIZE):
+        ids_by_number.update(db.session.execute(
+            select(Invoice.invoice_number, Invoice.invoice_id)
+            .where(Invoice.invoice_number.in_(invoice_numbers[start:start + ID_CHUNK_SIZE]))
+        ).all())
+    invoice_ids = [ids_by_number[invoice_number] for invoice_number in invoice_numbers]
+    
+    # Positionen mit einem executemany einfügen (Core-INSERT, damit Zeilen mit und ohne
+    # item_id nicht in getrennte Anweisungen aufgeteilt werden)
+    all_item_rows = []
+    for invoice_id, item_rows in zip(invoice_ids, item_rows_per_invoice):
+        for item_row in item_rows:
+            item_row['invoice_id'] = invoice_id
+            all_item_rows.append(item_row)
+    
+    if all_item_rows:
+        db.session.execute(insert(InvoiceItem.__table__), all_item_rows)
+    
+    # Die Session-Ereignisse sehen Core-INSERTs nicht, daher die Rollups direkt fortschreiben
+    record_inserted_invoices(invoice_ids)
+    
+    return invoice_ids
+
+def create_invoices(invoices_data, today=None):
+    """
+    Prüft viele Rechnungen in einem Durchgang und legt die gültigen gemeinsam an
+    
+    Die Rechnungen haben dasselbe Format wie bei POST /api/invoices. Kunden, Artikel,
+    Originalrechnungen und vorgegebene Rechnungsnummern werden für alle Rechnungen mit
+    je einer IN-Abfrage nachgeschlagen. Für Rechnungen ohne Nummer wird ein Block
+    Rechnungsnummern reserviert, anschließend werden alle mit bulk_insert_invoices
+    geschrieben. Die Funktion führt keinen Commit aus.
+    
+    Args:
+        invoices_data: Liste von Dictionaries mit den Rechnungsdaten und ihren Positionen
+        today: Stichtag für Standarddaten und Nummernkreis (Standard: heute)
+    
+    Returns:
+        Ein Tupel (angelegte Rechnungen, Fehler). Beide sind Listen von Dictionaries mit
+        dem Index der Rechnung in invoices_data.
+    """
+    today = today or datetime.now().date()
+    errors = []
+    candidates = []
+    
+    # Schritt 1: Alle Rechnungen ohne Datenbankzugriff prüfen
+    for index, data in enumerate(invoices_data):
+        if not isinstance(data, dict):
+            errors.append({"index": index, "errors": {"_schema": ["Rechnung muss ein Objekt sein"]}})
+            continue
+        
+        messages = {}
+        invoice_data = items_data = None
+        try:
+            invoice_data = invoice_schema.load(
+                {key: value for key, value in data.items() if key != 'items'},
+                partial=('invoice_number', 'invoice_date', 'due_date', 'delivery_date')
+            )
+        except ValidationError as e:
+            messages.update(e.messages)
+        
+        try:
+            items_data = invoice_items_input_schema.load(data.get('items') or [])
+        except ValidationError as e:
+            messages['items'] = e.messages
+        
+        if messages:
+            errors.append({"index": index, "errors": messages})
+        else:
+            candidates.append((index, invoice_data, items_data))
+    
+    # Schritt 2: Referenzen aller Rechnungen mit je einer Abfrage auflösen
+    customer_ids = _existing_ids(Customer.customer_id, {invoice_data['customer_id'] for _, invoice_data, _ in candidates})
+    original_invoice_ids = _existing_ids(Invoice.invoice_id, {
+        invoice_data['original_invoice_id'] for _, invoice_data, _ in candidates if invoice_data.get('original_invoice_id')
+    })
+    
+    items = get_referenced_items(item for _, _, items_data in candidates for item in items_data)
+    
+    requested_numbers = [invoice_data['invoice_number'] for _, invoice_data, _ in candidates if invoice_data.get('invoice_number')]
+    taken_numbers = set(db.session.scalars(
+        select(Invoice.invoice_number).where(Invoice.invoice_number.in_(requested_numbers))
+    )) if requested_numbers else set()
+    
+    # Schritt 3: Referenzen prüfen und die Zeilen für den Mehrfach-INSERT aufbauen
+    valid = []
+    for index, invoice_data, items_data in candidates:
+        messages = {}
+        
+        if invoice_data['customer_id'] not in customer_ids:
+            messages['customer_id'] = ["Kunde nicht gefunden"]
+        
+        if invoice_data.get('original_invoice_id') and invoice_data['original_invoice_id'] not in original_invoice_ids:
+            messages['original_invoice_id'] = ["Originalrechnung nicht gefunden"]
+        
+        invoice_number = invoice_data.get('invoice_number')
+        if invoice_number:
+            if invoice_number in taken_numbers:
+                messages['invoice_number'] = ["Rechnungsnummer ist bereits vergeben"]
+            taken_numbers.add(invoice_number)
+        
+        item_rows, item_messages = build_item_rows(items_data, items)
+        if item_messages:
+            messages['items'] = item_messages
+        
+        if messages:
+            errors.append({"index": index, "errors": messages})
+            continue
+        
+        valid.append((index, {
+            'invoice_number': invoice_number,
+            'customer_id': invoice_data['customer_id'],
+            'invoice_date': invoice_data.get('invoice_date', today),
+            'due_date': invoice_data.get('due_date', today + timedelta(days=14)),
+            'delivery_date': invoice_data.get('delivery_date', today),
+            'status': invoice_data.get('status', 'erstellt'),
+            'payment_status': invoice_data.get('payment_status', 'offen'),
+            'payment_method': invoice_data.get('payment_method'),
+            'notes': invoice_data.get('notes'),
+            'terms': invoice_data.get('terms'),
+            'is_recurring': invoice_data.get('is_recurring', False),
+            'original_invoice_id': invoice_data.get('original_invoice_id'),
+            'items': item_rows
+        }))
+    
+    # Schritt 4: Rechnungsnummern als Block reservieren und alle Rechnungen schreiben
+    invoice_numbers = iter(reserve_invoice_numbers(
+        sum(1 for _, invoice_row in valid if not invoice_row['invoice_number']), today
+    ))
+    for _, invoice_row in valid:
+        invoice_row['invoice_number'] = invoice_row['invoice_number'] or next(invoice_numbers)
+    
+    invoice_ids = bulk_insert_invoices([invoice_row for _, invoice_row in valid])
+    
+    created = [
+        {"index": index, "invoice_id": invoice_id, "invoice_number": invoice_row['invoice_number']}
+        for (index, invoice_row), invoice_id in zip(valid, invoice_ids)
+    ]
+    errors.sort(key=lambda error: error['index'])
+    
+    return created, errors
+
+def get_referenced_items(items_data):
+    """
+    Lädt alle in den Positionen angegebenen Artikel mit einer IN-Abfrage
+    
+    Returns:
+        Ein Dictionary item_id -> Item (nicht gefundene Artikel fehlen)
+    """
+    item_ids = {item_data['item_id'] for item_data in items_data if item_data.get('item_id')}
+    if not item_ids:
+        return {}
+    
+    return {item.item_id: item for item in Item.query.filter(Item.item_id.in_(list(item_ids)))}
+
+def build_item_rows(items_data, items):
+    """
+    Baut die Spalten der Positionen einer Rechnung auf; fehlende Angaben werden aus dem Artikel übernommen
+    
+    Args:
+        items_data: Die geprüften Positionen (invoice_items_input_schema)
+        items: Die referenzierten Artikel (siehe get_referenced_items)
+    
+    Returns:
+        Ein Tupel (Positionen, Fehler je Index nicht gefundener Artikel)
+    """
+    item_rows = []
+    item_messages = {}
+    for position, item_data in enumerate(items_data):
+        item = items.get(item_data.get('item_id'))
+        if item_data.get('item_id') and not item:
+            item_messages[position] = {"item_id": [f"Artikel mit ID {item_data['item_id']} nicht gefunden"]}
+            continue
+        
+        item_rows.append({
+            'item_id': item.item_id if item else None,
+            'position': position + 1,
+            'quantity': item_data.get('quantity', 1),
+            'unit': item_data.get('unit', item.unit if item else 'Stück'),
+            'price_net': item_data.get('price_net', item.price_net if item else 0),
+            'vat_rate': item_data.get('vat_rate', item.vat_rate if item else 19.0),
+            'description': item_data.get('description', item.description if item else '')
+        })
+    
+    return item_rows, item_messages
+
+def _existing_ids(column, ids):
+    """
+    Gibt die Teilmenge der IDs zurück, die in der Spalte vorhanden sind (eine Abfrage)
+    """
+    if not ids:
+        return set()
+    
+    return set(db.session.scalars(select(column).where(column.in_(list(ids)))))
+
+def cancel_invoices(invoice_ids, reason=None, today=None):
+    """
+    Storniert mehrere Rechnungen und legt die Stornorechnungen gemeinsam an
+    
+    Die Rechnungen werden samt Positionen mit zwei Abfragen geladen (selectinload) und
+    für die Dauer der Transaktion gesperrt. Die Originale werden über das ORM als
+    storniert markiert, die Stornorechnungen mit negierten Mengen per bulk_insert_invoices
+    geschrieben. Ungültige IDs, nicht gefundene oder bereits stornierte Rechnungen werden
+    übersprungen und gemeldet. Die Funktion führt keinen Commit aus.
+    
+    Args:
+        invoice_ids: IDs der zu stornierenden Rechnungen
+        reason: Stornogrund für alle Rechnungen
+        today: Storno- und Rechnungsdatum der Stornorechnungen (Standard: heute)
+    
+    Returns:
+        Ein Tupel (stornierte Rechnungen, Fehler) als Listen von Dictionaries
+    """
+    today = today or datetime.now().date()
+    reason = reason or 'Keine Angabe'
+    
+    # bool ist eine Unterklasse von int (True == 1) und wird vor dem Entfernen doppelter IDs aussortiert
+    errors = [
+        {"invoice_id": invoice_id, "error": "Ungültige Rechnungs-ID"}
+        for invoice_id in invoice_ids
+        if isinstance(invoice_id, bool) or not isinstance(invoice_id, int)
+    ]
+    
+    # Reihenfolge der Anfrage beibehalten, doppelte IDs nur einmal stornieren
+    invoice_ids = list(dict.fromkeys(
+        invoice_id for invoice_id in invoice_ids
+        if isinstance(invoice_id, int) and not isinstance(invoice_id, bool)
+    ))
+    invoices = {
+        invoice.invoice_id: invoice
+        for invoice in Invoice.query.options(selectinload(Invoice.items))
+        .filter(Invoice.invoice_id.in_(invoice_ids))
+        .with_for_update(of=Invoice)
+    }
+    
+    originals = []
+    for invoice_id in invoice_ids:
+        invoice = invoices.get(invoice_id)
+        if not invoice:
+            errors.append({"invoice_id": invoice_id, "error": "Rechnung nicht gefunden"})
+        elif invoice.is_cancelled:
+            errors.append({"invoice_id": invoice_id, "error": "Rechnung wurde bereits storniert"})
+        else:
+            originals.append(invoice)
+    
+    if not originals:
+        return [], errors
+    
+    storno_rows = []
+    for invoice in originals:
+        # Markiere die Originalrechnung als storniert
+        invoice.is_cancelled = True
+        invoice.cancellation_date = today
+        invoice.cancellation_reason = reason
+        invoice.status = 'storniert'
+        invoice.update_open_amount()
+        
+        storno_rows.append({
+            'invoice_number': f"STORNO-{invoice.invoice_number}",
+            'customer_id': invoice.customer_id,
+            'invoice_date': today,
+            'due_date': today,
+            'delivery_date': invoice.delivery_date,
+            'status': 'erstellt',
+            'payment_status': 'offen',
+            'payment_method': invoice.payment_method,
+            'notes': f"Stornorechnung zu Rechnung {invoice.invoice_number}",
+            'terms': invoice.terms,
+            'is_cancelled': False,
+            'original_invoice_id': invoice.invoice_id,
+            'items': [
+                {
+                    'item_id': item.item_id,
+                    'position': item.position,
+                    'quantity': -item.quantity,  # Negative Menge für Storno
+                    'unit': item.unit,
+                    'price_net': item.price_net,
+                    'vat_rate': item.vat_rate,
+                    'description': item.description
+                }
+                for item in invoice.items
+            ]
+        })
+    
+    # Originale zuerst schreiben, damit die Rollups den stornierten Stand sehen
+    db.session.flush()
+    storno_ids = bulk_insert_invoices(storno_rows)
+    
+    cancelled = [
+        {
+            "invoice_id": invoice.invoice_id,
+            "invoice_number": invoice.invoice_number,
+            "storno_invoice_id": storno_id,
+            "storno_invoice_number": storno_row['invoice_number']
+        }
+        for invoice, storno_id, storno_row in zip(originals, storno_ids, storno_rows)
+    ]
+    
+    return cancelled, errors
@@ -0,0 +1,98 @@
+from app import db
+from app.models.invoice import Invoice
+from app.models.invoice_number_sequence import InvoiceNumberSequence
+from sqlalchemy import update, func
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+import logging
+
+# Konfiguriere Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def get_invoice_number_prefix(on_date=None):
+    """
+    Gibt das Präfix der Rechnungsnummern für ein Datum zurück (Format: JAHR-MONAT-)
+    """
+    on_date = on_date or datetime.now().date()
+    return f"{on_date.year}-{on_date.month:02d}-"
+
+def reserve_invoice_numbers(count, on_date=None):
+    """
+    Reserviert einen Block fortlaufender Rechnungsnummern
+    
+    Der Zähler des Präfixes wird mit einem einzigen UPDATE ... RETURNING erhöht. Die
+    Zeilensperre bleibt bis zum Ende der Transaktion bestehen, sodass parallele Worker
+    nacheinander zuteilen. Da der Zähler in derselben Transaktion wie die Rechnungen
+    geschrieben wird, gibt ein Rollback die Nummern wieder frei und die Nummerierung
+    bleibt lückenlos (GoBD).
+    
+    Args:
+        count: Anzahl der benötigten Rechnungsnummern
+        on_date: Datum, aus dem das Präfix gebildet wird (Standard: heute)
+    
+    Returns:
+        Eine Liste mit den reservierten Rechnungsnummern in aufsteigender Reihenfolge
+    """
+    if count <= 0:
+        return []
+    
+    prefix = get_invoice_number_prefix(on_date)
+    
+    last_value = _increment_sequence(prefix, count)
+    if last_value is None:
+        _create_sequence(prefix)
+        last_value = _increment_sequence(prefix, count)
+    
+    first_value = last_value - count + 1
+    return [f"{prefix}{number:04d}" for number in range(first_value, last_value + 1)]
+
+def next_invoice_number(on_date=None):
+    """
+    Reserviert die nächste freie Rechnungsnummer
+    """
+    return reserve_invoice_numbers(1, on_date)[0]
+
+def _increment_sequence(prefix, count):
+    """
+    Erhöht den Zähler eines Präfixes und gibt den neuen Stand zurück (None, falls er fehlt)
+    """
+    statement = (
+        update(InvoiceNumberSequence)
+        .where(InvoiceNumberSequence.prefix == prefix)
+        .values(
+            last_value=InvoiceNumberSequence.last_value + count,
+            updated_at=datetime.utcnow()
+        )
+        .returning(InvoiceNumberSequence.last_value)
+        .execution_options(synchronize_session=False)
+    )
+    return db.session.execute(statement).scalar_one_or_none()
+
+def _create_sequence(prefix):
+    """
+    Legt den Zähler eines Präfixes an
+    
+    Der Startwert wird einmalig aus der höchsten bereits vergebenen Nummer des Präfixes
+    übernommen, damit bestehende Datenbestände ohne Lücke oder Dublette weiterlaufen.
+    """
+    last_number = 0
+    numbers = db.session.query(Invoice.invoice_number).filter(
+        Invoice.invoice_number.like(f"{prefix}%")
+    ).order_by(
+        func.length(Invoice.invoice_number).desc(),
+        Invoice.invoice_number.desc()
+    )
+    for (invoice_number,) in numbers:
+        suffix = invoice_number[len(prefix):]
+        if suffix.isdigit():
+            last_number = int(suffix)
+            break
+    
+    try:
+        # Savepoint, da ein paralleler Worker den Zähler gleichzeitig anlegen kann
+        with db.session.begin_nested():
+            db.session.add(InvoiceNumberSequence(prefix=prefix, last_value=last_number))
+        logger.info(f"Rechnungsnummernkreis {prefix} mit Startwert {last_number} angelegt")
+    except IntegrityError:
+        logger.info(f"Rechnungsnummernkreis {prefix} wurde bereits von einem anderen Prozess angelegt")
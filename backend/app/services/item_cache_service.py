@@ -0,0 +1,247 @@
+from flask import current_app
+from app import db
+from app.models.item import Item
+from app.models.cache_version import CacheVersion
+from app.schemas.item_schema import items_schema
+from sqlalchemy import event, select, insert, update, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from bisect import bisect_left
+from datetime import datetime, timedelta
+import logging
+import threading
+import time
+
+# Konfiguriere Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Name des Versionszählers in cache_versions
+ITEM_CACHE_NAME = 'items'
+
+# Beim Abgleich werden auch Artikel gelesen, die bis zu diesem Zeitraum vor der letzten
+# bekannten Änderung geändert wurden (Transaktionen, die später committet wurden)
+UPDATED_AT_OVERLAP = timedelta(minutes=5)
+
+# Ein Katalog je Datenbank, ausgetauscht wird immer der ganze Stand
+_catalogs = {}
+_refresh_lock = threading.Lock()
+_listeners_installed = False
+
+class ItemCatalog:
+    """
+    Unveränderlicher Stand der aktiven Artikel mit sortierten Präfix-Indizes
+    
+    Die Indizes sind sortierte Listen aus (Schlüssel, item_id), in denen ein Präfix per
+    Binärsuche gefunden wird. Treffer werden in der Reihenfolge Artikelnummer, Anfang des
+    Namens, Anfang eines weiteren Wortes im Namen zurückgegeben, jeweils alphabetisch.
+    """
+    
+    def __init__(self, items, version, last_updated):
+        self.items = items
+        self.version = version
+        self.last_updated = last_updated
+        self.checked_at = time.monotonic()
+        
+        numbers, names, words = [], [], []
+        for item_id, item in items.items():
+            item_keys = index_keys(item)
+            if item_keys[0]:
+                numbers.append((item_keys[0], item_id))
+            names.append((item_keys[1], item_id))
+            words.extend((word, item_id) for word in item_keys[2])
+        
+        numbers.sort()
+        names.sort()
+        words.sort()
+        self.indexes = (numbers, names, words)
+    
+    def lookup(self, prefix, limit):
+        """
+        Gibt bis zu limit serialisierte Artikel zurück, deren Artikelnummer, Name oder
+        ein Wort im Namen mit dem Präfix beginnt (ohne Beachtung der Groß-/Kleinschreibung)
+        """
+        prefix = (prefix or '').strip().casefold()
+        found = []
+        seen = set()
+        
+        # Ohne Präfix alphabetisch nach Namen
+        for index in (self.indexes if prefix else self.indexes[1:2]):
+            position = bisect_left(index, (prefix,))
+            while position < len(index) and len(found) < limit:
+                key, item_id = index[position]
+                if not key.startswith(prefix):
+                    break
+                if item_id not in seen:
+                    seen.add(item_id)
+                    found.append(self.items[item_id])
+                position += 1
+            
+            if len(found) >= limit:
+                break
+        
+        return found
+
+def index_keys(item):
+    """
+    Gibt die Suchschlüssel eines serialisierten Artikels zurück (Artikelnummer, Name, weitere Wörter)
+    """
+    name = (item['name'] or '').casefold()
+    words = set(name.split()[1:])
+    words.discard(name)
+    return (item['item_number'] or '').casefold(), name, sorted(words)
+
+def init_item_cache():
+    """
+    Registriert die Session-Ereignisse, die bei jeder Änderung an Artikeln den
+    Versionszähler erhöhen (einmal pro Prozess)
+    
+    Der Zähler wird in derselben Transaktion wie die Änderung geschrieben. Artikel, die
+    mit Core-Anweisungen am ORM vorbei geändert werden, müssen bump_item_cache_version
+    selbst aufrufen.
+    """
+    global _listeners_installed
+    
+    if _listeners_installed:
+        return
+    _listeners_installed = True
+    
+    event.listen(Session, 'after_flush', _bump_version_after_flush)
+    event.listen(Session, 'after_commit', _expire_local_catalog_after_commit)
+
+def _bump_version_after_flush(session, flush_context):
+    changed = any(isinstance(obj, Item) for obj in session.new) or any(isinstance(obj, Item) for obj in session.deleted)
+    changed = changed or any(
+        isinstance(obj, Item) and session.is_modified(obj, include_collections=False) for obj in session.dirty
+    )
+    
+    if changed:
+        bump_item_cache_version(session.connection())
+        session.info['item_cache_changed'] = True
+
+def _expire_local_catalog_after_commit(session):
+    # Der eigene Worker gleicht beim nächsten Zugriff sofort ab statt nach dem Prüfintervall
+    if session.info.pop('item_cache_changed', False):
+        for catalog in list(_catalogs.values()):
+            catalog.checked_at = 0
+
+def bump_item_cache_version(connection=None):
+    """
+    Erhöht den Versionszähler des Artikel-Caches, sodass alle Worker beim nächsten
+    Abgleich die geänderten Artikel nachladen. Die Funktion führt keinen Commit aus.
+    """
+    connection = connection or db.session.connection()
+    statement = (
+        update(CacheVersion)
+        .where(CacheVersion.name == ITEM_CACHE_NAME)
+        .values(version=CacheVersion.version + 1, updated_at=datetime.utcnow())
+    )
+    if connection.execute(statement).rowcount:
+        return
+    
+    try:
+        # Savepoint, da ein paralleler Worker den Zähler gleichzeitig anlegen kann
+        with connection.begin_nested():
+            connection.execute(insert(CacheVersion).values(name=ITEM_CACHE_NAME, version=1, updated_at=datetime.utcnow()))
+    except IntegrityError:
+        connection.execute(statement)
+
+def get_item_cache_version():
+    """
+    Gibt den aktuellen Stand des Versionszählers zurück (0, wenn noch nie geändert)
+    """
+    version = db.session.execute(
+        select(CacheVersion.version).where(CacheVersion.name == ITEM_CACHE_NAME)
+    ).scalar_one_or_none()
+    return version or 0
+
+def load_item_catalog():
+    """
+    Lädt alle aktiven Artikel und ersetzt den Katalog der aktuellen Datenbank
+    """
+    # Version vor den Daten lesen: Änderungen während des Ladens führen zum erneuten Abgleich
+    version = get_item_cache_version()
+    items = Item.query.filter(Item.is_active.is_(True)).all()
+    
+    catalog = ItemCatalog(
+        {item['item_id']: item for item in items_schema.dump(items)},
+        version,
+        max((item.updated_at for item in items if item.updated_at), default=None)
+    )
+    _catalogs[str(db.engine.url)] = catalog
+    logger.info(f"Artikel-Cache mit {len(catalog.items)} Artikeln geladen (Version {version})")
+    return catalog
+
+def refresh_item_catalog(catalog):
+    """
+    Gleicht einen Katalog mit der Datenbank ab und gibt den neuen Stand zurück
+    
+    Nachgeladen werden nur Artikel, deren updated_at nicht älter als die letzte bekannte
+    Änderung (abzüglich UPDATED_AT_OVERLAP) ist. Weicht danach die Anzahl der aktiven
+    Artikel ab (z.B. gelöschte Artikel), werden die IDs aller aktiven Artikel verglichen.
+    """
+    version = get_item_cache_version()
+    if version == catalog.version:
+        catalog.checked_at = time.monotonic()
+        return catalog
+    
+    query = Item.query
+    if catalog.last_updated is not None:
+        query = query.filter(Item.updated_at >= catalog.last_updated - UPDATED_AT_OVERLAP)
+    changed = query.all()
+    
+    items = dict(catalog.items)
+    last_updated = catalog.last_updated
+    for item, data in zip(changed, items_schema.dump(changed)):
+        if item.is_active:
+            items[item.item_id] = data
+        else:
+            items.pop(item.item_id, None)
+        if item.updated_at and (last_updated is None or item.updated_at > last_updated):
+            last_updated = item.updated_at
+    
+    active_count = db.session.query(func.count(Item.item_id)).filter(Item.is_active.is_(True)).scalar()
+    if active_count != len(items):
+        active_ids = set(db.session.execute(select(Item.item_id).where(Item.is_active.is_(True))).scalars())
+        for item_id in set(items) - active_ids:
+            del items[item_id]
+        missing_ids = active_ids - set(items)
+        if missing_ids:
+            missing = Item.query.filter(Item.item_id.in_(missing_ids)).all()
+            items.update((data['item_id'], data) for data in items_schema.dump(missing))
+    
+    catalog = ItemCatalog(items, version, last_updated)
+    _catalogs[str(db.engine.url)] = catalog
+    logger.info(f"Artikel-Cache abgeglichen: {len(changed)} geänderte Artikel (Version {version})")
+    return catalog
+
+def get_item_catalog():
+    """
+    Gibt den Artikel-Katalog der aktuellen Datenbank zurück
+    
+    Der Versionszähler wird höchstens alle ITEM_CACHE_CHECK_SECONDS Sekunden gelesen;
+    dazwischen beantwortet der Katalog Anfragen ohne Datenbankzugriff. Gleicht gerade
+    ein anderer Thread ab, wird der bisherige Stand verwendet.
+    """
+    catalog = _catalogs.get(str(db.engine.url))
+    
+    if catalog is None:
+        with _refresh_lock:
+            catalog = _catalogs.get(str(db.engine.url)) or load_item_catalog()
+        return catalog
+    
+    if time.monotonic() - catalog.checked_at < current_app.config['ITEM_CACHE_CHECK_SECONDS']:
+        return catalog
+    
+    if not _refresh_lock.acquire(blocking=False):
+        return catalog
+    try:
+        return refresh_item_catalog(catalog)
+    finally:
+        _refresh_lock.release()
+
+def lookup_items(prefix, limit):
+    """
+    Sucht aktive Artikel per Präfix im Cache und gibt sie serialisiert zurück
+    """
+    return get_item_catalog().lookup(prefix, limit)
@@ -0,0 +1,444 @@
+from app import db
+from app.models.invoice import Invoice
+from app.models.payment import Payment
+from app.services.bank_statement_service import parse_statement
+from app.services.rollup_service import get_rollup_rows, apply_rollup_changes, ID_CHUNK_SIZE
+from app.services.scheduler_lock_service import renew_current_lock
+from app.money import round_money, ZERO
+from sqlalchemy import event, select, insert, update, func, case
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+from collections import Counter
+from datetime import datetime
+import hashlib
+import logging
+import re
+
+# Konfiguriere Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Zahlungsmethode für Zahlungen aus Kontoauszügen
+BANK_TRANSFER = 'Überweisung'
+
+# Rechnungsnummern im Verwendungszweck: Wörter mit Bindestrichen/Schrägstrichen und das
+# Format des Nummernkreises (JJJJ-MM-NNNN), auch mit anderen oder ohne Trennzeichen
+REFERENCE_TOKEN = re.compile(r'[0-9A-Za-z]+(?:[-/][0-9A-Za-z]+)*')
+INVOICE_NUMBER_PATTERN = re.compile(r'(?<!\d)(\d{4})[-/ .]?(\d{2})[-/ .]?(\d{4,})(?!\d)')
+
+# Spalten der Rechnung, die update_paid_amounts am ORM vorbei schreibt
+PAID_AMOUNT_ATTRIBUTES = ('paid_amount', 'open_amount', 'payment_status', 'updated_at')
+
+_listeners_installed = False
+
+def init_payment_totals():
+    """
+    Registriert die Session-Ereignisse, die paid_amount und open_amount der Rechnungen fortschreiben (einmal pro Prozess)
+    
+    Nach jedem Flush, der Zahlungen anlegt, löscht oder deren Betrag bzw. Rechnung ändert,
+    werden die betroffenen Rechnungen in derselben Transaktion mit update_paid_amounts
+    neu berechnet. Muss nach init_rollups aufgerufen werden, damit die Rollups erst die
+    Änderungen an den Rechnungen und danach die der Zahlungen buchen. Zahlungen, die mit
+    Core-INSERTs am ORM vorbei geschrieben werden, müssen mit update_paid_amounts
+    nachgetragen werden.
+    """
+    global _listeners_installed
+    
+    if _listeners_installed:
+        return
+    _listeners_installed = True
+    
+    event.listen(Session, 'after_flush', _update_paid_amounts_after_flush)
+    event.listen(Session, 'after_flush_postexec', _expire_paid_amounts_after_flush)
+
+def _payment_invoice_ids(payment, changed_only):
+    """
+    Gibt die alte und neue Rechnung einer Zahlung zurück (leer, wenn sich nichts Relevantes geändert hat)
+    """
+    attrs = sa_inspect(payment).attrs
+    if changed_only and not any(attrs[key].history.has_changes() for key in ('amount', 'invoice_id', 'invoice')):
+        return set()
+    
+    invoice_ids = {payment.invoice_id}
+    invoice_ids.update(attrs.invoice_id.history.deleted)
+    invoice_ids.update(invoice.invoice_id for invoice in attrs.invoice.history.deleted if invoice is not None)
+    return invoice_ids
+
+def _update_paid_amounts_after_flush(session, flush_context):
+    invoice_ids = set()
+    for payment in session.new:
+        if isinstance(payment, Payment):
+            invoice_ids |= _payment_invoice_ids(payment, changed_only=False)
+    for payment in session.deleted:
+        if isinstance(payment, Payment):
+            invoice_ids |= _payment_invoice_ids(payment, changed_only=False)
+    for payment in session.dirty:
+        if isinstance(payment, Payment):
+            invoice_ids |= _payment_invoice_ids(payment, changed_only=True)
+    
+    invoice_ids.discard(None)
+    if invoice_ids:
+        update_paid_amounts(invoice_ids, session.connection())
+        session.info.setdefault('paid_amount_invoice_ids', set()).update(invoice_ids)
+
+def _expire_paid_amounts_after_flush(session, flush_context):
+    # Geladene Rechnungen lesen die neuen Beträge beim nächsten Zugriff aus der Datenbank
+    for invoice_id in session.info.pop('paid_amount_invoice_ids', ()):
+        invoice = session.identity_map.get(session.identity_key(Invoice, invoice_id))
+        if invoice is not None:
+            session.expire(invoice, PAID_AMOUNT_ATTRIBUTES)
+
+class OpenInvoiceIndex:
+    """
+    Offene Rechnungen für den Abgleich mit Zahlungen, indiziert nach Rechnungsnummer
+    und offenem Betrag
+    
+    Beide Indizes sind Dictionaries, sodass jeder Umsatz mit einer festen Anzahl von
+    Zugriffen zugeordnet wird und der Abgleich linear mit der Zahl der Umsätze wächst.
+    Zugeordnete Beträge werden sofort abgezogen; vollständig bezahlte Rechnungen
+    verschwinden aus beiden Indizes.
+    """
+    
+    def __init__(self, rows):
+        self.by_number = {}
+        self.by_amount = {}
+        self.paid = {}
+        
+        for invoice_id, invoice_number, total_gross, paid_amount in rows:
+            invoice = {
+                'invoice_id': invoice_id,
+                'invoice_number': invoice_number,
+                'total_gross': round_money(total_gross),
+                'paid_amount': round_money(paid_amount)
+            }
+            self.by_number[invoice_number.upper()] = invoice
+            self._add_amount(invoice)
+    
+    def open_amount(self, invoice):
+        return invoice['total_gross'] - invoice['paid_amount']
+    
+    def _add_amount(self, invoice):
+        if self.open_amount(invoice) > ZERO:
+            self.by_amount.setdefault(self.open_amount(invoice), {})[invoice['invoice_id']] = invoice
+    
+    def _remove_amount(self, invoice):
+        candidates = self.by_amount.get(self.open_amount(invoice))
+        if candidates:
+            candidates.pop(invoice['invoice_id'], None)
+            if not candidates:
+                del self.by_amount[self.open_amount(invoice)]
+    
+    def find_by_reference(self, *texts):
+        """
+        Gibt die offenen Rechnungen zurück, deren Nummer in einem der Texte vorkommt
+        (in der Reihenfolge des ersten Vorkommens)
+        """
+        found = {}
+        for text in texts:
+            if not text:
+                continue
+            candidates = [token.upper() for token in REFERENCE_TOKEN.findall(text)]
+            candidates.extend('-'.join(match) for match in INVOICE_NUMBER_PATTERN.findall(text))
+            for candidate in candidates:
+                invoice = self.by_number.get(candidate)
+                if invoice is not None:
+                    found.setdefault(invoice['invoice_id'], invoice)
+        return list(found.values())
+    
+    def find_by_amount(self, amount):
+        """
+        Gibt die offenen Rechnungen zurück, deren offener Betrag genau dem Betrag entspricht
+        """
+        return list(self.by_amount.get(amount, {}).values())
+    
+    def book(self, invoice, amount):
+        """
+        Bucht einen Betrag auf eine Rechnung und aktualisiert die Indizes
+        """
+        self._remove_amount(invoice)
+        invoice['paid_amount'] += amount
+        self.paid[invoice['invoice_id']] = invoice
+        
+        if self.open_amount(invoice) > ZERO:
+            self._add_amount(invoice)
+        else:
+            self.by_number.pop(invoice['invoice_number'].upper(), None)
+
+def load_open_invoices():
+    """
+    Lädt alle offenen Rechnungen mit den bereits gezahlten Beträgen in einen OpenInvoiceIndex
+    
+    Offen sind wie im Bericht der offenen Forderungen alle nicht stornierten
+    Rechnungen (ohne Stornorechnungen), die nicht vollständig bezahlt sind. Die
+    gezahlten Beträge stehen in Invoice.paid_amount, die Zahlungen werden nicht gelesen.
+    """
+    rows = db.session.execute(
+        select(Invoice.invoice_id, Invoice.invoice_number, Invoice.total_gross, Invoice.paid_amount)
+        .where(
+            Invoice.original_invoice_id.is_(None),
+            Invoice.is_cancelled.is_not(True),
+            func.coalesce(Invoice.status, '') != 'storniert',
+            func.coalesce(Invoice.payment_status, '') != 'vollständig bezahlt'
+        )
+    )
+    return OpenInvoiceIndex(rows)
+
+def match_payment(index, line):
+    """
+    Ordnet einen Umsatz offenen Rechnungen zu und bucht die Beträge im Index
+    
+    Zuerst wird nach Rechnungsnummern im Verwendungszweck und in der Ende-zu-Ende-Referenz
+    gesucht. Werden mehrere genannt, wird der Betrag der Reihe nach auf deren offene
+    Beträge verteilt (ein Rest geht auf die letzte Rechnung). Ohne Rechnungsnummer wird
+    nur zugeordnet, wenn genau eine Rechnung mit diesem offenen Betrag existiert.
+    
+    Returns:
+        Ein Tupel (Liste von (Rechnung, Betrag), Art der Zuordnung oder Grund für keine Zuordnung)
+    """
+    amount = round_money(line['amount'])
+    invoices = index.find_by_reference(line['reference'], line['end_to_end_id'])
+    method = 'Rechnungsnummer'
+    
+    if not invoices:
+        invoices = index.find_by_amount(amount)
+        if len(invoices) != 1:
+            return [], 'mehrere Rechnungen mit diesem Betrag' if invoices else 'keine passende Rechnung'
+        method = 'Betrag'
+    
+    allocations = []
+    remaining = amount
+    for position, invoice in enumerate(invoices):
+        share = remaining if position == len(invoices) - 1 else min(remaining, index.open_amount(invoice))
+        if share <= ZERO:
+            break
+        allocations.append((invoice, share))
+        remaining -= share
+    
+    for invoice, share in allocations:
+        index.book(invoice, share)
+    
+    return allocations, method
+
+def import_reference(line, occurrence):
+    """
+    Bildet die Prüfsumme eines Umsatzes, an der ein erneuter Import erkannt wird
+    
+    Gleiche Umsätze innerhalb eines Auszugs werden über ihre laufende Nummer unterschieden.
+    """
+    key = '|'.join(str(value or '') for value in (
+        line['account'], line['bank_reference'], line['booking_date'], line['value_date'],
+        round_money(line['amount']), line['end_to_end_id'], line['counterparty_iban'], line['reference'], occurrence
+    ))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def _existing_import_references(references):
+    """
+    Gibt die bereits importierten Prüfsummen zurück (je Umsatz die erste Zahlung, Suffix :0)
+    """
+    references = list(references)
+    existing = set()
+    for start in range(0, len(references), ID_CHUNK_SIZE):
+        existing.update(db.session.scalars(
+            select(Payment.import_reference)
+            .where(Payment.import_reference.in_([f"{reference}:0" for reference in references[start:start + ID_CHUNK_SIZE]]))
+        ))
+    return {reference.rsplit(':', 1)[0] for reference in existing}
+
+def _open_amount(invoices, paid_amount):
+    """
+    Gibt den offenen Betrag als SQL-Ausdruck zurück (wie Invoice.update_open_amount)
+    """
+    is_receivable = db.and_(
+        invoices.c.original_invoice_id.is_(None),
+        invoices.c.is_cancelled.is_not(True),
+        func.coalesce(invoices.c.status, '') != 'storniert'
+    )
+    return case((is_receivable, func.coalesce(invoices.c.total_gross, 0) - paid_amount), else_=0)
+
+def update_paid_amounts(invoice_ids, connection=None):
+    """
+    Setzt paid_amount, open_amount und Zahlungsstatus der Rechnungen anhand der Summe ihrer Zahlungen
+    
+    Die Rechnungen werden zuerst gesperrt (SELECT ... FOR UPDATE, unter SQLite ohne
+    Wirkung), dann wird je Block von ID_CHUNK_SIZE Rechnungen eine UPDATE-Anweisung
+    ausgeführt. Die Summe wird in der Datenbank gebildet; gleichzeitig gebuchte Zahlungen
+    auf dieselbe Rechnung warten auf die Sperre und überschreiben sich nicht. Die
+    Änderungen werden auf die Rollups gebucht. Die Funktion führt keinen Commit aus.
+    """
+    invoice_ids = sorted(set(invoice_ids))
+    if not invoice_ids:
+        return
+    
+    connection = connection or db.session.connection()
+    invoices = Invoice.__table__
+    
+    # Sperren in fester Reihenfolge, damit sich parallele Importe nicht gegenseitig blockieren
+    for start in range(0, len(invoice_ids), ID_CHUNK_SIZE):
+        connection.execute(
+            select(invoices.c.invoice_id)
+            .where(invoices.c.invoice_id.in_(invoice_ids[start:start + ID_CHUNK_SIZE]))
+            .order_by(invoices.c.invoice_id)
+            .with_for_update()
+        ).all()
+    
+    old_rows = get_rollup_rows(invoice_ids, connection)
+    
+    paid_amount = (
+        select(func.coalesce(func.sum(Payment.amount), 0))
+        .where(Payment.invoice_id == invoices.c.invoice_id)
+        .scalar_subquery()
+    )
+    status = case(
+        (paid_amount <= 0, 'offen'),
+        (paid_amount < invoices.c.total_gross, 'teilweise bezahlt'),
+        else_='vollständig bezahlt'
+    )
+    for start in range(0, len(invoice_ids), ID_CHUNK_SIZE):
+        connection.execute(
+            update(invoices)
+            .where(invoices.c.invoice_id.in_(invoice_ids[start:start + ID_CHUNK_SIZE]))
+            .values(
+                paid_amount=paid_amount,
+                open_amount=_open_amount(invoices, paid_amount),
+                payment_status=status,
+                updated_at=datetime.utcnow()
+            )
+        )
+    
+    apply_rollup_changes(old_rows, get_rollup_rows(invoice_ids, connection), connection)
+
+def check_paid_amounts(batch_size=5000):
+    """
+    Prüft paid_amount und open_amount aller Rechnungen gegen die Zahlungen und korrigiert Abweichungen
+    
+    Die Rechnungen werden in Bereichen von batch_size IDs gelesen; je Bereich ermittelt
+    eine Aggregatabfrage die abweichenden Rechnungen, die mit update_paid_amounts neu
+    berechnet werden. Nach jedem Bereich wird ein Commit ausgeführt, damit die Sperren
+    kurz bleiben. Den Zahlungsstatus setzt die Prüfung nur bei abweichenden Rechnungen neu,
+    von Hand gesetzte Status von Rechnungen ohne Zahlungen bleiben erhalten.
+    
+    Returns:
+        Die Anzahl der korrigierten Rechnungen
+    """
+    paid = (
+        select(Payment.invoice_id, func.sum(Payment.amount).label('paid_amount'))
+        .where(Payment.invoice_id.is_not(None))
+        .group_by(Payment.invoice_id)
+        .subquery()
+    )
+    actual_paid = func.coalesce(paid.c.paid_amount, 0)
+    
+    max_id = db.session.scalar(select(func.max(Invoice.invoice_id))) or 0
+    corrected = 0
+    for start in range(0, max_id, batch_size):
+        invoice_ids = list(db.session.scalars(
+            select(Invoice.invoice_id)
+            .outerjoin(paid, paid.c.invoice_id == Invoice.invoice_id)
+            .where(
+                Invoice.invoice_id > start,
+                Invoice.invoice_id <= start + batch_size,
+                db.or_(
+                    Invoice.paid_amount != actual_paid,
+                    Invoice.open_amount != _open_amount(Invoice.__table__, actual_paid)
+                )
+            )
+        ))
+        if invoice_ids:
+            update_paid_amounts(invoice_ids)
+            corrected += len(invoice_ids)
+        db.session.commit()
+        
+        # Sperre einer geplanten Aufgabe nach jedem Bereich verlängern
+        renew_current_lock()
+    
+    if corrected:
+        logger.warning(f"Gezahlte und offene Beträge von {corrected} Rechnungen korrigiert")
+    else:
+        logger.info("Gezahlte und offene Beträge aller Rechnungen stimmen mit den Zahlungen überein")
+    
+    return corrected
+
+def import_bank_statement(stream, statement_format=None):
+    """
+    Importiert einen Kontoauszug (CAMT.053 oder MT940) und ordnet die Zahlungseingänge zu
+    
+    Der Auszug wird als Datenstrom gelesen. Bereits importierte Umsätze werden anhand
+    ihrer Prüfsumme übersprungen, Lastschriften und Umsätze in Fremdwährung ignoriert.
+    Alle Zahlungen werden mit einem Mehrfach-INSERT geschrieben, nicht zugeordnete ohne
+    Rechnung. Anschließend werden gezahlter Betrag und Zahlungsstatus aller betroffenen
+    Rechnungen gesammelt aktualisiert. Die Funktion führt keinen Commit aus.
+    
+    Args:
+        stream: Binärer Datenstrom des Kontoauszugs
+        statement_format: 'camt053', 'mt940' oder None (automatisch erkennen)
+    
+    Returns:
+        Ein Dictionary mit Format und Anzahl der Umsätze je Ergebnis
+    
+    Raises:
+        StatementError: Wenn der Kontoauszug nicht gelesen werden kann
+    """
+    statement_format, statement_lines = parse_statement(stream, statement_format)
+    
+    # Schritt 1: Auszug vollständig lesen, Gutschriften in Euro mit Prüfsumme sammeln
+    result = {'format': statement_format, 'lines': 0, 'matched': 0, 'unmatched': 0, 'duplicates': 0, 'skipped': 0}
+    occurrences = Counter()
+    credits = []
+    for line in statement_lines:
+        result['lines'] += 1
+        if not line['is_credit'] or line['amount'] <= ZERO or (line['currency'] or 'EUR') != 'EUR':
+            result['skipped'] += 1
+            continue
+        
+        reference = import_reference(line, 0)
+        occurrences[reference] += 1
+        if occurrences[reference] > 1:
+            reference = import_reference(line, occurrences[reference] - 1)
+        credits.append((reference, line))
+    
+    # Schritt 2: Bereits importierte Umsätze verwerfen
+    existing = _existing_import_references(reference for reference, _ in credits)
+    result['duplicates'] = sum(1 for reference, _ in credits if reference in existing)
+    credits = [(reference, line) for reference, line in credits if reference not in existing]
+    
+    # Schritt 3: Offene Rechnungen einmal laden und jeden Umsatz über die Indizes zuordnen
+    index = load_open_invoices()
+    now = datetime.utcnow()
+    payment_rows = []
+    for reference, line in credits:
+        allocations, method = match_payment(index, line)
+        base = {
+            'payment_date': line['booking_date'] or line['value_date'] or now.date(),
+            'payment_method': BANK_TRANSFER,
+            'reference': line['reference'] or None,
+            'counterparty_name': line['counterparty_name'],
+            'counterparty_iban': line['counterparty_iban'],
+            'created_at': now,
+            'updated_at': now
+        }
+        
+        if not allocations:
+            result['unmatched'] += 1
+            payment_rows.append(dict(
+                base, invoice_id=None, amount=round_money(line['amount']), import_reference=f"{reference}:0",
+                notes=f"Kontoauszug-Import: nicht zugeordnet ({method})"
+            ))
+            continue
+        
+        result['matched'] += 1
+        for position, (invoice, amount) in enumerate(allocations):
+            payment_rows.append(dict(
+                base, invoice_id=invoice['invoice_id'], amount=amount, import_reference=f"{reference}:{position}",
+                notes=f"Kontoauszug-Import: zugeordnet über {method}"
+            ))
+    
+    # Schritt 4: Zahlungen und Zahlungsstatus in derselben Transaktion schreiben
+    if payment_rows:
+        db.session.execute(insert(Payment.__table__), payment_rows)
+    update_paid_amounts(index.paid.keys())
+    
+    logger.info(
+        f"Kontoauszug ({statement_format}) importiert: {result['matched']} zugeordnet, "
+        f"{result['unmatched']} nicht zugeordnet, {result['duplicates']} bereits importiert"
+    )
+    return result
@@ -0,0 +1,202 @@
+from flask import current_app
+from app.services.pdf_service import (
+    PDF_RENDER_VERSION,
+    build_invoice_pdf_data,
+    get_pdf_executor,
+    get_pdf_render_window,
+    render_invoice_pdf_bytes,
+    render_pdf_in_pool
+)
+from app.instrumentation import record_timing
+from collections import deque
+import threading
+import tempfile
+import hashlib
+import logging
+import json
+import os
+
+# Konfiguriere Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Verhindert, dass mehrere Threads gleichzeitig aufräumen
+_eviction_lock = threading.Lock()
+
+def get_pdf_cache_key(data):
+    """
+    Berechnet den Cache-Schlüssel (SHA-256) eines PDF-Datensatzes
+    
+    Der Schlüssel hängt vom gesamten Inhalt der Rechnung, der Positionen, des Kunden und
+    der Unternehmensdaten sowie von der Version des Layouts ab. Jede Änderung an diesen
+    Daten ergibt einen neuen Schlüssel, sodass veraltete Einträge nie ausgeliefert werden.
+    """
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{PDF_RENDER_VERSION}:{payload}".encode('utf-8')).hexdigest()
+
+def _get_cache_dir():
+    """
+    Gibt das Cache-Verzeichnis zurück und legt es bei Bedarf an
+    """
+    cache_dir = current_app.config['PDF_CACHE_DIR']
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def _get_cache_path(key):
+    return os.path.join(_get_cache_dir(), f"{key}.pdf")
+
+def get_cached_pdf(key):
+    """
+    Liest ein PDF aus dem Cache
+    
+    Bei einem Treffer wird die Änderungszeit der Datei aktualisiert, damit häufig
+    abgerufene PDFs bei der Verdrängung (LRU) zuletzt entfernt werden.
+    
+    Returns:
+        Den Inhalt des PDFs als Bytes oder None
+    """
+    path = _get_cache_path(key)
+    try:
+        with open(path, 'rb') as pdf_file:
+            pdf = pdf_file.read()
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    
+    return pdf
+
+def store_pdf(key, pdf):
+    """
+    Speichert ein PDF im Cache
+    
+    Die Datei wird zunächst unter einem temporären Namen geschrieben und dann atomar
+    umbenannt, sodass parallele Leser nie eine halb geschriebene Datei sehen.
+    """
+    cache_dir = _get_cache_dir()
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(pdf)
+        os.replace(tmp_path, _get_cache_path(key))
+    except OSError as e:
+        logger.warning(f"PDF konnte nicht im Cache gespeichert werden: {str(e)}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return
+    
+    evict_pdf_cache()
+
+def evict_pdf_cache(max_bytes=None):
+    """
+    Entfernt die am längsten nicht genutzten PDFs, bis der Cache unter PDF_CACHE_MAX_BYTES liegt
+    """
+    if max_bytes is None:
+        max_bytes = current_app.config['PDF_CACHE_MAX_BYTES']
+    
+    if not _eviction_lock.acquire(blocking=False):
+        # Ein anderer Thread räumt bereits auf
+        return
+    
+    try:
+        entries = []
+        total_size = 0
+        for entry in os.scandir(_get_cache_dir()):
+            if not entry.name.endswith('.pdf'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+        
+        if total_size <= max_bytes:
+            return
+        
+        # Älteste Zugriffe zuerst entfernen
+        entries.sort()
+        for mtime, size, path in entries:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            if total_size <= max_bytes:
+                break
+    finally:
+        _eviction_lock.release()
+
+def get_or_render_pdf(data, key=None):
+    """
+    Gibt das PDF eines Datensatzes aus dem Cache zurück oder rendert es im Prozesspool
+    
+    Args:
+        data: Datensatz aus build_invoice_pdf_data
+        key: Bereits berechneter Cache-Schlüssel (optional)
+    """
+    key = key or get_pdf_cache_key(data)
+    
+    pdf = get_cached_pdf(key)
+    if pdf is None:
+        pdf = render_pdf_in_pool(data)
+        store_pdf(key, pdf)
+    
+    return pdf
+
+def get_invoice_pdf(invoice, company_data=None):
+    """
+    Gibt das PDF einer Rechnung zurück (aus dem Cache oder neu gerendert)
+    
+    Returns:
+        Ein Tupel (Cache-Schlüssel, PDF als Bytes)
+    """
+    data = build_invoice_pdf_data(invoice, company_data)
+    key = get_pdf_cache_key(data)
+    return key, get_or_render_pdf(data, key)
+
+def get_or_render_pdfs(pdf_data, return_exceptions=False):
+    """
+    Gibt die PDFs mehrerer Datensätze in Eingabereihenfolge zurück
+    
+    Nur die PDFs, die nicht im Cache liegen, werden parallel im Prozesspool gerendert.
+    Die Eingabe wird schrittweise gelesen; es sind höchstens get_pdf_render_window()
+    PDFs gleichzeitig in Arbeit bzw. im Speicher.
+    
+    Args:
+        pdf_data: Iterierbare Folge von Datensätzen aus build_invoice_pdf_data
+        return_exceptions: Fehler beim Rendern eines PDFs an seiner Stelle zurückgeben,
+                           statt die übrigen PDFs abzubrechen
+    
+    Yields:
+        Den Inhalt der PDFs als Bytes (bzw. die Ausnahme bei return_exceptions)
+    """
+    executor = get_pdf_executor()
+    window = get_pdf_render_window()
+    pending = deque()
+    
+    def complete_oldest():
+        key, pdf, future = pending.popleft()
+        if future is not None:
+            try:
+                with record_timing('render'):
+                    pdf = future.result()
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+            store_pdf(key, pdf)
+        return pdf
+    
+    for data in pdf_data:
+        key = get_pdf_cache_key(data)
+        pdf = get_cached_pdf(key)
+        future = executor.submit(render_invoice_pdf_bytes, data) if pdf is None else None
+        pending.append((key, pdf, future))
+        
+        if len(pending) >= window:
+            yield complete_oldest()
+    
+    while pending:
+        yield complete_oldest()
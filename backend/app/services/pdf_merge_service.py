@@ -0,0 +1,155 @@
+"""
+Zusammenführen von Rechnungs-PDFs zu einem gemeinsamen PDF, während sie noch gerendert werden
+"""
+
+from collections import deque
+import re
+
+# Bausteine der von ReportLab erzeugten PDFs (klassische Querverweistabelle, keine Objekt-Streams)
+PDF_OBJECT_PATTERN = re.compile(rb'(\d+) 0 obj\s(.*?)\sendobj\s*$', re.S)
+PDF_REFERENCE_PATTERN = re.compile(rb'(\d+) 0 R\b')
+PDF_STREAM_PATTERN = re.compile(rb'\sstream\r?\n')
+PDF_KIDS_PATTERN = re.compile(rb'/Kids\s*\[(.*?)\]', re.S)
+PDF_PAGES_TYPE_PATTERN = re.compile(rb'/Type\s*/Pages\b')
+
+# Feste Objektnummern des zusammengeführten PDFs
+CATALOG_OBJECT = 1
+PAGES_OBJECT = 2
+
+def _reference(body, key):
+    """
+    Gibt die Objektnummer zurück, auf die ein Eintrag eines Dictionaries verweist
+    """
+    return int(re.search(re.escape(key) + rb'\s+(\d+) 0 R', body).group(1))
+
+def _split_stream(body):
+    """
+    Trennt ein Objekt in Dictionary und Stream (Objekte ohne Stream ergeben einen leeren Stream)
+    
+    Nur das Dictionary enthält Verweise, der Stream wird unverändert übernommen.
+    """
+    match = PDF_STREAM_PATTERN.search(body)
+    if match is None:
+        return body, b''
+    return body[:match.start()], body[match.start():]
+
+def read_pdf_objects(pdf):
+    """
+    Liest die Objekte eines PDFs über seine Querverweistabelle
+    
+    Args:
+        pdf: Inhalt des PDFs als Bytes
+    
+    Returns:
+        Tupel (Objekte als Dictionary Nummer -> Inhalt, Nummer des Katalogs)
+    """
+    xref_offset = int(pdf[pdf.rindex(b'startxref') + len(b'startxref'):].split()[0])
+    trailer_offset = pdf.index(b'trailer', xref_offset)
+    
+    # Unterabschnitte "erste Nummer, Anzahl" mit je drei Feldern pro Eintrag
+    offsets = {}
+    tokens = pdf[xref_offset + len(b'xref'):trailer_offset].split()
+    index = 0
+    while index < len(tokens):
+        first, count = int(tokens[index]), int(tokens[index + 1])
+        index += 2
+        for number in range(first, first + count):
+            if tokens[index + 2] == b'n':
+                offsets[number] = int(tokens[index])
+            index += 3
+    
+    # Die Objekte liegen lückenlos hintereinander vor der Querverweistabelle
+    objects = {}
+    ordered = sorted(offsets.items(), key=lambda entry: entry[1])
+    for position, (number, offset) in enumerate(ordered):
+        end = ordered[position + 1][1] if position + 1 < len(ordered) else xref_offset
+        objects[number] = PDF_OBJECT_PATTERN.match(pdf, offset, end).group(2)
+    
+    return objects, _reference(pdf[trailer_offset:], b'/Root')
+
+def _read_page_tree(objects, number, pages, nodes):
+    """
+    Sammelt die Seiten (in Lesereihenfolge) und die inneren Knoten eines Seitenbaums
+    """
+    body = objects[number]
+    if PDF_PAGES_TYPE_PATTERN.search(body) is None:
+        pages.append(number)
+        return
+    
+    nodes.append(number)
+    for kid in PDF_REFERENCE_PATTERN.findall(PDF_KIDS_PATTERN.search(body).group(1)):
+        _read_page_tree(objects, int(kid), pages, nodes)
+
+def iter_merged_pdf(pdfs):
+    """
+    Führt mehrere PDFs zu einem gemeinsamen PDF zusammen und liefert es stückweise
+    
+    Sobald ein PDF vorliegt, werden seine Seiten mit allen davon erreichbaren Objekten
+    (Inhalte, Schriften, Bilder) unter neuen Objektnummern geschrieben. Seitenbaum,
+    Katalog und Querverweistabelle folgen am Ende, bis dahin werden nur die Positionen
+    der Objekte gehalten.
+    
+    Args:
+        pdfs: Iterierbare Folge von PDFs als Bytes (von render_invoice_pdf_bytes)
+    
+    Yields:
+        Teile des zusammengeführten PDFs als Bytes
+    """
+    offsets = {}
+    kids = []
+    position = 0
+    next_number = PAGES_OBJECT + 1
+    
+    def write_object(number, body):
+        nonlocal position
+        offsets[number] = position
+        chunk = b'%d 0 obj\n%s\nendobj\n' % (number, body)
+        position += len(chunk)
+        return chunk
+    
+    header = b'%PDF-1.4\n%\x93\x8c\x8b\x9e\n'
+    position = len(header)
+    yield header
+    
+    for pdf in pdfs:
+        objects, catalog = read_pdf_objects(pdf)
+        pages, nodes = [], []
+        _read_page_tree(objects, _reference(objects[catalog], b'/Pages'), pages, nodes)
+        
+        # Verweise auf den alten Seitenbaum (/Parent) zeigen auf den gemeinsamen Seitenbaum
+        mapping = dict.fromkeys(nodes, PAGES_OBJECT)
+        
+        # Von den Seiten erreichbare Objekte neu nummerieren
+        order = []
+        pending = deque(pages)
+        while pending:
+            number = pending.popleft()
+            if number in mapping:
+                continue
+            mapping[number] = next_number
+            next_number += 1
+            order.append(number)
+            pending.extend(int(reference) for reference in PDF_REFERENCE_PATTERN.findall(_split_stream(objects[number])[0]))
+        
+        def renumber(match):
+            return b'%d 0 R' % mapping[int(match.group(1))]
+        
+        chunks = []
+        for number in order:
+            body, stream = _split_stream(objects[number])
+            chunks.append(write_object(mapping[number], PDF_REFERENCE_PATTERN.sub(renumber, body) + stream))
+        kids.extend(mapping[page] for page in pages)
+        
+        yield b''.join(chunks)
+    
+    yield write_object(PAGES_OBJECT, b'<<\n/Count %d /Kids [ %s ] /Type /Pages\n>>' % (
+        len(kids), b' '.join(b'%d 0 R' % kid for kid in kids)
+    ))
+    yield write_object(CATALOG_OBJECT, b'<<\n/Pages %d 0 R /Type /Catalog\n>>' % PAGES_OBJECT)
+    
+    # Querverweistabelle mit Einträgen fester Länge (20 Bytes)
+    xref = [b'xref\n0 %d\n' % next_number, b'0000000000 65535 f \n']
+    xref.extend(b'%010d 00000 n \n' % offsets[number] for number in range(1, next_number))
+    yield b''.join(xref) + b'trailer\n<<\n/Root %d 0 R /Size %d\n>>\nstartxref\n%d\n%%%%EOF\n' % (
+        CATALOG_OBJECT, next_number, position
+    )
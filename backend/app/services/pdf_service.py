@@ -5,33 +5,87 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from app.models.invoice import Invoice
 from app.models.company_data import CompanyData
+from app.instrumentation import record_timing
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from types import SimpleNamespace
+from functools import lru_cache
+from flask import current_app
 from datetime import datetime
+import multiprocessing
+import threading
+import atexit
+import io
 import os
 
-def generate_invoice_pdf(invoice, output_path):
+# Version des Layouts; bei Änderungen am Aufbau des PDFs erhöhen, damit der Cache ungültig wird
+PDF_RENDER_VERSION = 1
+
+# Tabellenstile werden einmal pro Prozess erstellt und für jede Rechnung wiederverwendet
+SENDER_TABLE_STYLE = TableStyle([
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 0.5*cm),
+])
+
+RECIPIENT_TABLE_STYLE = TableStyle([
+    ('TOPPADDING', (0, 0), (-1, -1), 0.1*cm),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 0.1*cm),
+])
+
+INVOICE_INFO_TABLE_STYLE = TableStyle([
+    ('TOPPADDING', (0, 0), (-1, -1), 0.1*cm),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 0.1*cm),
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+])
+
+POSITION_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('ALIGN', (0, 1), (0, -1), 'CENTER'),  # Pos.
+    ('ALIGN', (2, 1), (2, -1), 'RIGHT'),   # Menge
+    ('ALIGN', (3, 1), (3, -1), 'CENTER'),  # Einheit
+    ('ALIGN', (4, 1), (6, -1), 'RIGHT'),   # Preise und MwSt.
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+SUMMARY_TABLE_STYLE = TableStyle([
+    ('TOPPADDING', (0, 0), (-1, -1), 0.1*cm),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 0.1*cm),
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('FONTNAME', (0, 2), (1, 2), 'Helvetica-Bold'),  # Gesamtbetrag fett
+    ('LINEABOVE', (0, 2), (1, 2), 1, colors.black),  # Linie über Gesamtbetrag
+])
+
+FOOTER_TABLE_STYLE = TableStyle([
+    ('TOPPADDING', (0, 0), (-1, -1), 0.1*cm),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 0.1*cm),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('LINEABOVE', (0, 0), (-1, 0), 1, colors.black),
+])
+
+# Zwischenspeicher für das Firmenlogo: (Pfad, Änderungszeit) -> Bilddaten
+_logo_cache = {}
+
+# Prozesspool für das Rendern (wird beim ersten Zugriff erstellt)
+_executor = None
+_executor_workers = None
+_executor_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+def get_styles():
     """
-    Generiert eine PDF-Datei für eine Rechnung
-    
-    Args:
-        invoice: Das Invoice-Objekt
-        output_path: Der Pfad, unter dem die PDF-Datei gespeichert werden soll
+    Gibt das Stylesheet für Rechnungen zurück (wird einmal pro Prozess erstellt)
     """
-    # Hole Unternehmensdaten
-    company_data = CompanyData.query.first()
-    if not company_data:
-        raise ValueError("Keine Unternehmensdaten gefunden")
-    
-    # Erstelle PDF-Dokument
-    doc = SimpleDocTemplate(
-        output_path,
-        pagesize=A4,
-        rightMargin=2*cm,
-        leftMargin=2*cm,
-        topMargin=2*cm,
-        bottomMargin=2*cm
-    )
-    
-    # Styles für Text
     styles = getSampleStyleSheet()
     styles.add(ParagraphStyle(
         name='RightAlign',
@@ -49,18 +103,190 @@ def generate_invoice_pdf(invoice, output_path):
         fontName='Helvetica-Bold'
     ))
     styles.add(ParagraphStyle(
-        name='Title',
+        name='InvoiceTitle',
         parent=styles['Heading1'],
         fontSize=16,
         alignment=1
     ))
     
+    return styles
+
+def _load_logo(logo_path, logo_mtime):
+    """
+    Gibt die Bilddaten des Firmenlogos zurück und liest die Datei nur bei Änderungen neu ein
+    """
+    if not logo_path or logo_mtime is None:
+        return None
+    
+    key = (logo_path, logo_mtime)
+    if key not in _logo_cache:
+        try:
+            with open(logo_path, 'rb') as logo_file:
+                data = logo_file.read()
+        except OSError:
+            return None
+        
+        # Veraltete Versionen des Logos verwerfen
+        _logo_cache.clear()
+        _logo_cache[key] = data
+    
+    return _logo_cache[key]
+
+def build_invoice_pdf_data(invoice, company_data=None):
+    """
+    Erstellt einen vom ORM unabhängigen Datensatz mit allen Angaben, die das PDF benötigt
+    
+    Der Datensatz kann an andere Prozesse übergeben werden und enthält nur einfache Werte.
+    
+    Args:
+        invoice: Das Invoice-Objekt
+        company_data: Die Unternehmensdaten (optional, werden sonst abgefragt)
+    """
+    if company_data is None:
+        company_data = CompanyData.query.first()
+    if not company_data:
+        raise ValueError("Keine Unternehmensdaten gefunden")
+    
+    logo_mtime = None
+    if company_data.logo_path and os.path.exists(company_data.logo_path):
+        logo_mtime = os.path.getmtime(company_data.logo_path)
+    
+    customer = invoice.customer
+    original_invoice = invoice.original_invoice if invoice.original_invoice_id else None
+    
+    return {
+        'invoice': {
+            'invoice_number': invoice.invoice_number,
+            'invoice_date': invoice.invoice_date,
+            'delivery_date': invoice.delivery_date,
+            'due_date': invoice.due_date,
+            'is_cancelled': invoice.is_cancelled,
+            'cancellation_date': invoice.cancellation_date,
+            'original_invoice_id': invoice.original_invoice_id,
+            'original_invoice_number': original_invoice.invoice_number if original_invoice else None,
+            'payment_method': invoice.payment_method,
+            'terms': invoice.terms,
+            'notes': invoice.notes,
+            'total_net': invoice.total_net,
+            'total_vat': invoice.total_vat,
+            'total_gross': invoice.total_gross
+        },
+        'customer': {
+            'full_name': customer.full_name,
+            'street': customer.street,
+            'house_number': customer.house_number,
+            'postal_code': customer.postal_code,
+            'city': customer.city,
+            'country': customer.country
+        },
+        'items': [
+            {
+                'position': item.position,
+                'description': item.description,
+                'quantity': item.quantity,
+                'unit': item.unit,
+                'price_net': item.price_net,
+                'vat_rate': item.vat_rate,
+                'total_net': item.total_net
+            }
+            for item in invoice.items
+        ],
+        'company': {
+            'company_name': company_data.company_name,
+            'street': company_data.street,
+            'house_number': company_data.house_number,
+            'postal_code': company_data.postal_code,
+            'city': company_data.city,
+            'tax_id': company_data.tax_id,
+            'vat_id': company_data.vat_id,
+            'email': company_data.email,
+            'phone': company_data.phone,
+            'bank_name': company_data.bank_name,
+            'iban': company_data.iban,
+            'bic': company_data.bic,
+            'logo_path': company_data.logo_path,
+            'logo_mtime': logo_mtime
+        }
+    }
+
+def generate_invoice_pdf(invoice, output=None, company_data=None):
+    """
+    Generiert eine PDF-Datei für eine Rechnung
+    
+    Ohne Ziel wird das PDF im Speicher erzeugt und als Bytes zurückgegeben, sodass
+    keine temporären Dateien entstehen.
+    
+    Args:
+        invoice: Das Invoice-Objekt
+        output: Pfad oder dateiähnliches Objekt (z.B. BytesIO), in das das PDF
+                geschrieben werden soll (optional)
+        company_data: Die Unternehmensdaten (optional, werden sonst abgefragt)
+    
+    Returns:
+        Das Ziel bzw. ohne Ziel den Inhalt des PDFs als Bytes
+    """
+    data = build_invoice_pdf_data(invoice, company_data)
+    
+    with record_timing('render'):
+        if output is None:
+            return render_invoice_pdf_bytes(data)
+        
+        return render_invoice_pdf(data, output)
+
+def create_pdf_document(output):
+    """
+    Erstellt das PDF-Dokument (A4, 2 cm Rand) für das angegebene Ziel
+    """
+    return SimpleDocTemplate(
+        output,
+        pagesize=A4,
+        rightMargin=2*cm,
+        leftMargin=2*cm,
+        topMargin=2*cm,
+        bottomMargin=2*cm
+    )
+
+def render_invoice_pdf(data, output):
+    """
+    Rendert das PDF einer Rechnung aus einem Datensatz von build_invoice_pdf_data
+    
+    Die Funktion greift nicht auf die Datenbank zu und kann daher in einem
+    Worker-Prozess ausgeführt werden.
+    
+    Args:
+        data: Der Datensatz der Rechnung
+        output: Pfad oder dateiähnliches Objekt, in das das PDF geschrieben wird
+    """
+    # Erstelle PDF-Dokument
+    doc = create_pdf_document(output)
+    
+    # PDF erstellen
+    doc.build(build_invoice_elements(data))
+    
+    return output
+
+def build_invoice_elements(data):
+    """
+    Erstellt die Elemente (Flowables) des PDFs einer Rechnung
+    
+    Args:
+        data: Der Datensatz der Rechnung aus build_invoice_pdf_data
+    """
+    invoice = SimpleNamespace(**data['invoice'])
+    invoice.customer = SimpleNamespace(**data['customer'])
+    invoice.items = [SimpleNamespace(**item) for item in data['items']]
+    company_data = SimpleNamespace(**data['company'])
+    
+    # Styles für Text
+    styles = get_styles()
+    
     # Elemente für das PDF
     elements = []
     
     # Firmenlogo (falls vorhanden)
-    if company_data.logo_path and os.path.exists(company_data.logo_path):
-        img = Image(company_data.logo_path, width=5*cm, height=2*cm)
+    logo = _load_logo(company_data.logo_path, company_data.logo_mtime)
+    if logo:
+        img = Image(io.BytesIO(logo), width=5*cm, height=2*cm)
         elements.append(img)
     
     # Absender und Empfänger
@@ -68,9 +294,7 @@ def generate_invoice_pdf(invoice, output_path):
         [Paragraph(f"<font size='8'>{company_data.company_name} · {company_data.street} {company_data.house_number} · {company_data.postal_code} {company_data.city}</font>", styles['Normal'])],
     ]
     sender_table = Table(sender_data, colWidths=[10*cm])
-    sender_table.setStyle(TableStyle([
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 0.5*cm),
-    ]))
+    sender_table.setStyle(SENDER_TABLE_STYLE)
     elements.append(sender_table)
     
     # Empfängerdaten
@@ -81,18 +305,15 @@ def generate_invoice_pdf(invoice, output_path):
         [Paragraph(f"{invoice.customer.country}", styles['Normal'])],
     ]
     recipient_table = Table(recipient_data, colWidths=[10*cm])
-    recipient_table.setStyle(TableStyle([
-        ('TOPPADDING', (0, 0), (-1, -1), 0.1*cm),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 0.1*cm),
-    ]))
+    recipient_table.setStyle(RECIPIENT_TABLE_STYLE)
     elements.append(recipient_table)
     elements.append(Spacer(1, 1*cm))
     
     # Rechnungsinformationen
     if invoice.is_cancelled:
-        elements.append(Paragraph("STORNORECHNUNG", styles['Title']))
+        elements.append(Paragraph("STORNORECHNUNG", styles['InvoiceTitle']))
     else:
-        elements.append(Paragraph("RECHNUNG", styles['Title']))
+        elements.append(Paragraph("RECHNUNG", styles['InvoiceTitle']))
     elements.append(Spacer(1, 0.5*cm))
     
     invoice_info_data = [
@@ -105,20 +326,15 @@ def generate_invoice_pdf(invoice, output_path):
     # Wenn es eine Stornorechnung ist, füge Referenz zur Originalrechnung hinzu
     if invoice.is_cancelled:
         invoice_info_data.append(["Storniert am:", invoice.cancellation_date.strftime("%d.%m.%Y")])
-        if invoice.original_invoice:
-            invoice_info_data.append(["Original-Rechnungsnummer:", invoice.original_invoice.invoice_number])
+        if invoice.original_invoice_number:
+            invoice_info_data.append(["Original-Rechnungsnummer:", invoice.original_invoice_number])
     
     # Wenn es eine Rechnung zu einer Stornorechnung ist, füge Referenz zur Stornorechnung hinzu
     if invoice.original_invoice_id:
-        invoice_info_data.append(["Bezieht sich auf Rechnung:", invoice.original_invoice.invoice_number])
+        invoice_info_data.append(["Bezieht sich auf Rechnung:", invoice.original_invoice_number])
     
     invoice_info_table = Table(invoice_info_data, colWidths=[5*cm, 10*cm])
-    invoice_info_table.setStyle(TableStyle([
-        ('TOPPADDING', (0, 0), (-1, -1), 0.1*cm),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 0.1*cm),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-    ]))
+    invoice_info_table.setStyle(INVOICE_INFO_TABLE_STYLE)
     elements.append(invoice_info_table)
     elements.append(Spacer(1, 1*cm))
     
@@ -143,23 +359,7 @@ def generate_invoice_pdf(invoice, output_path):
         
         # Tabelle erstellen
         position_table = Table(position_data, colWidths=[1*cm, 7*cm, 1.5*cm, 1.5*cm, 3*cm, 1.5*cm, 3*cm])
-        position_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('ALIGN', (0, 1), (0, -1), 'CENTER'),  # Pos.
-            ('ALIGN', (2, 1), (2, -1), 'RIGHT'),   # Menge
-            ('ALIGN', (3, 1), (3, -1), 'CENTER'),  # Einheit
-            ('ALIGN', (4, 1), (6, -1), 'RIGHT'),   # Preise und MwSt.
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
+        position_table.setStyle(POSITION_TABLE_STYLE)
         elements.append(position_table)
         elements.append(Spacer(1, 0.5*cm))
     
@@ -171,14 +371,7 @@ def generate_invoice_pdf(invoice, output_path):
     ]
     
     summary_table = Table(summary_data, colWidths=[15*cm, 3*cm])
-    summary_table.setStyle(TableStyle([
-        ('TOPPADDING', (0, 0), (-1, -1), 0.1*cm),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 0.1*cm),
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 2), (1, 2), 'Helvetica-Bold'),  # Gesamtbetrag fett
-        ('LINEABOVE', (0, 2), (1, 2), 1, colors.black),  # Linie über Gesamtbetrag
-    ]))
+    summary_table.setStyle(SUMMARY_TABLE_STYLE)
     elements.append(summary_table)
     elements.append(Spacer(1, 1*cm))
     
@@ -230,16 +423,81 @@ def generate_invoice_pdf(invoice, output_path):
     ]
     
     footer_table = Table(footer_data, colWidths=[6*cm, 6*cm, 6*cm])
-    footer_table.setStyle(TableStyle([
-        ('TOPPADDING', (0, 0), (-1, -1), 0.1*cm),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 0.1*cm),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('LINEABOVE', (0, 0), (-1, 0), 1, colors.black),
-    ]))
+    footer_table.setStyle(FOOTER_TABLE_STYLE)
     elements.append(footer_table)
     
-    # PDF erstellen
-    doc.build(elements)
+    return elements
+
+def render_invoice_pdf_bytes(data):
+    """
+    Rendert das PDF einer Rechnung im Speicher und gibt den Inhalt als Bytes zurück
+    """
+    buffer = io.BytesIO()
+    render_invoice_pdf(data, buffer)
+    return buffer.getvalue()
+
+def get_pdf_executor():
+    """
+    Gibt den Prozesspool für das Rendern von PDFs zurück
+    
+    Die Anzahl der Worker wird über PDF_RENDER_WORKERS festgelegt (Standard: Anzahl der
+    CPU-Kerne). Jeder Worker hält seine eigenen Styles und das Logo im Speicher.
+    
+    Die Worker werden mit 'spawn' gestartet: ein fork aus dem laufenden Server würde
+    dessen Threads (Scheduler, Postausgang), Sperren und Datenbankverbindungen in
+    einem unbestimmten Zustand mitkopieren.
+    """
+    global _executor, _executor_workers
+    
+    with _executor_lock:
+        if _executor is None:
+            _executor_workers = current_app.config.get('PDF_RENDER_WORKERS') or os.cpu_count() or 1
+            _executor = ProcessPoolExecutor(
+                max_workers=_executor_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            atexit.register(_executor.shutdown)
+    
+    return _executor
+
+def get_pdf_render_window():
+    """
+    Gibt die maximale Anzahl gleichzeitig laufender Render-Aufträge zurück (doppelte Anzahl der Worker)
+    """
+    get_pdf_executor()
+    return 2 * _executor_workers
+
+def render_pdf_in_pool(data):
+    """
+    Rendert ein einzelnes PDF im Prozesspool und wartet auf das Ergebnis
+    
+    Der aufrufende Thread gibt dabei das GIL frei, sodass andere Anfragen weiterlaufen.
+    """
+    with record_timing('render'):
+        return get_pdf_executor().submit(render_invoice_pdf_bytes, data).result()
+
+def render_pdfs_in_pool(pdf_data):
+    """
+    Rendert mehrere PDFs parallel im Prozesspool
+    
+    Die Ergebnisse werden in der Reihenfolge der Eingabe geliefert. Es sind höchstens
+    get_pdf_render_window() Aufträge gleichzeitig unterwegs, damit auch bei sehr
+    vielen Rechnungen nicht alle PDFs gleichzeitig im Speicher liegen.
+    
+    Args:
+        pdf_data: Iterierbare Folge von Datensätzen aus build_invoice_pdf_data
+    
+    Yields:
+        Den Inhalt der PDFs als Bytes
+    """
+    executor = get_pdf_executor()
+    window = get_pdf_render_window()
+    pending = deque()
+    
+    for data in pdf_data:
+        pending.append(executor.submit(render_invoice_pdf_bytes, data))
+        if len(pending) >= window:
+            yield pending.popleft().result()
     
-    return output_path
+    while pending:
+        yield pending.popleft().result()
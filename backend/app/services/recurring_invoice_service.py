@@ -1,6 +1,11 @@
+from flask import current_app
 from app import db
 from app.models.recurring_invoice import RecurringInvoice
-from app.models.invoice import Invoice, InvoiceItem
+from app.services.invoice_number_service import reserve_invoice_numbers
+from app.services.invoice_bulk_service import bulk_insert_invoices
+from app.services.scheduler_lock_service import renew_current_lock
+from app.money import calculate_invoice_totals, AMOUNT_KEYS, ZERO
+from sqlalchemy.orm import selectinload
 from datetime import datetime, timedelta
 import calendar
 import logging
@@ -9,111 +14,360 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def check_and_generate_recurring_invoices():
+# Länge der Intervalle in Monaten (pro interval_value)
+INTERVAL_MONTHS = {
+    'monatlich': 1,
+    'quartalsweise': 3,
+    'halbjährlich': 6,
+    'jährlich': 12
+}
+
+def check_and_generate_recurring_invoices(today=None, batch_size=None, catch_up=None, dry_run=False, shard=None):
     """
     Überprüft, welche Intervallrechnungen fällig sind und generiert entsprechende Rechnungen
+    
+    Die fälligen Intervallrechnungen werden blockweise verarbeitet: Pro Block werden die
+    Vorlagen samt Positionen mit zwei Abfragen geladen, die Rechnungsnummern als Block
+    reserviert und Rechnungen sowie Positionen per Mehrfach-INSERT geschrieben. Jeder
+    Block wird einzeln committet. Schlägt ein Block fehl, werden seine Vorlagen einzeln
+    wiederholt, sodass nur die fehlerhafte Vorlage ausgelassen wird.
+    
+    Im Nachholmodus (catch_up) wird für jeden seit next_invoice_date verpassten Zeitraum
+    eine eigene Rechnung erstellt, statt nur eine Rechnung pro Lauf.
+    
+    Args:
+        today: Stichtag (Standard: heute)
+        batch_size: Anzahl der Intervallrechnungen pro Block (Standard: RECURRING_BATCH_SIZE)
+        catch_up: Verpasste Zeiträume nachholen (Standard: RECURRING_CATCH_UP)
+        dry_run: Nur ermitteln, welche Rechnungen erstellt würden, ohne zu schreiben
+        shard: Tupel (Index, Anzahl); nur Intervallrechnungen mit customer_id % Anzahl == Index
+    
+    Returns:
+        Eine Liste mit Informationen über die generierten (bzw. geplanten) Rechnungen
     """
     logger.info("Starte Überprüfung der fälligen Intervallrechnungen")
-    today = datetime.now().date()
+    today = today or datetime.now().date()
+    batch_size = batch_size or current_app.config.get('RECURRING_BATCH_SIZE', 500)
+    if catch_up is None:
+        catch_up = current_app.config.get('RECURRING_CATCH_UP', False)
     
     # Finde alle aktiven Intervallrechnungen, die fällig sind
-    due_recurring_invoices = RecurringInvoice.query.filter(
-        RecurringInvoice.status == 'aktiv',
-        RecurringInvoice.next_invoice_date <= today,
-        (RecurringInvoice.end_date.is_(None) | (RecurringInvoice.end_date >= today))
-    ).all()
+    due_query = db.session.query(
+        RecurringInvoice.recurring_id
+    ).filter(
+        *get_due_filters(today, catch_up)
+    )
+    
+    # Nur den Teil dieses Knotens verarbeiten
+    if shard:
+        shard_index, shard_count = shard
+        due_query = due_query.filter(RecurringInvoice.customer_id % shard_count == shard_index)
     
-    logger.info(f"Gefunden: {len(due_recurring_invoices)} fällige Intervallrechnungen")
+    due_recurring_ids = [recurring_id for (recurring_id,) in due_query.order_by(RecurringInvoice.recurring_id)]
+    
+    logger.info(f"Gefunden: {len(due_recurring_ids)} fällige Intervallrechnungen")
     
     generated_invoices = []
     
-    for recurring_invoice in due_recurring_invoices:
+    for start in range(0, len(due_recurring_ids), batch_size):
+        chunk = due_recurring_ids[start:start + batch_size]
+        
+        if dry_run:
+            generated_invoices.extend(_generate_invoices_for_chunk(chunk, today, catch_up, dry_run=True))
+            continue
+        
+        # Sperre einer geplanten Aufgabe vor jedem Block verlängern
+        renew_current_lock()
+        
         try:
-            # Generiere Rechnungsnummer
-            prefix = f"{today.year}-{today.month:02d}-"
-            last_invoice = Invoice.query.filter(
-                Invoice.invoice_number.like(f"{prefix}%")
-            ).order_by(Invoice.invoice_number.desc()).first()
-            
-            if last_invoice:
-                last_number = int(last_invoice.invoice_number.split('-')[-1])
-                new_number = last_number + 1
-            else:
-                new_number = 1
-            
-            invoice_number = f"{prefix}{new_number:04d}"
-            
-            # Erstelle neue Rechnung
-            new_invoice = Invoice(
-                invoice_number=invoice_number,
-                customer_id=recurring_invoice.customer_id,
-                invoice_date=today,
-                due_date=today + timedelta(days=14),
-                delivery_date=today,
-                status='erstellt',
-                payment_status='offen',
-                notes=f"Automatisch generiert aus Intervallrechnung {recurring_invoice.recurring_id}",
-                is_recurring=True
-            )
-            
-            db.session.add(new_invoice)
-            db.session.flush()  # Um die invoice_id zu erhalten
-            
-            # Kopiere Positionen
-            for item in recurring_invoice.items:
-                invoice_item = InvoiceItem(
-                    invoice_id=new_invoice.invoice_id,
-                    item_id=item.item_id,
-                    position=item.position,
-                    quantity=item.quantity,
-                    unit=item.unit,
-                    price_net=item.price_net,
-                    vat_rate=item.vat_rate,
-                    description=item.description
-                )
-                
-                # Berechne Gesamtbeträge
-                invoice_item.calculate_totals()
-                
-                db.session.add(invoice_item)
-            
-            # Berechne Gesamtbeträge der Rechnung
-            new_invoice.calculate_totals()
-            
-            # Aktualisiere Intervallrechnung
-            recurring_invoice.last_invoice_date = today
-            
-            # Berechne nächstes Rechnungsdatum
-            if recurring_invoice.interval_type == 'monatlich':
-                next_date = add_months(recurring_invoice.next_invoice_date, recurring_invoice.interval_value)
-            elif recurring_invoice.interval_type == 'quartalsweise':
-                next_date = add_months(recurring_invoice.next_invoice_date, 3 * recurring_invoice.interval_value)
-            elif recurring_invoice.interval_type == 'halbjährlich':
-                next_date = add_months(recurring_invoice.next_invoice_date, 6 * recurring_invoice.interval_value)
-            elif recurring_invoice.interval_type == 'jährlich':
-                next_date = add_months(recurring_invoice.next_invoice_date, 12 * recurring_invoice.interval_value)
-            else:
-                next_date = recurring_invoice.next_invoice_date + timedelta(days=30 * recurring_invoice.interval_value)
-            
-            recurring_invoice.next_invoice_date = next_date
+            results = _generate_invoices_for_chunk(chunk, today, catch_up)
+            db.session.commit()
+            generated_invoices.extend(results)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Fehler bei der Generierung des Blocks ab Intervallrechnung {chunk[0]}: {str(e)}")
             
-            generated_invoices.append({
+            # Block einzeln wiederholen, um die fehlerhafte Vorlage zu isolieren
+            for recurring_id in chunk:
+                try:
+                    results = _generate_invoices_for_chunk([recurring_id], today, catch_up)
+                    db.session.commit()
+                    generated_invoices.extend(results)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Fehler bei der Generierung der Rechnung für Intervallrechnung {recurring_id}: {str(e)}")
+    
+    if dry_run:
+        # Sicherstellen, dass im Probelauf nichts geschrieben wird
+        db.session.rollback()
+        logger.info(f"Probelauf: {len(generated_invoices)} Rechnungen würden generiert")
+    else:
+        logger.info(f"Insgesamt {len(generated_invoices)} Rechnungen generiert")
+    
+    return generated_invoices
+
+def get_end_date_filter(today, catch_up=False):
+    """
+    Gibt die Bedingung für das Enddatum abzurechnender Intervallrechnungen zurück
+    
+    Im Nachholmodus werden auch Intervallrechnungen berücksichtigt, deren Enddatum
+    inzwischen überschritten ist, die aber noch offene Zeiträume davor haben.
+    """
+    if catch_up:
+        return RecurringInvoice.end_date.is_(None) | (RecurringInvoice.end_date >= RecurringInvoice.next_invoice_date)
+    return RecurringInvoice.end_date.is_(None) | (RecurringInvoice.end_date >= today)
+
+def get_due_filters(today, catch_up=False):
+    """
+    Gibt die Bedingungen für fällige Intervallrechnungen zurück
+    """
+    return (
+        RecurringInvoice.status == 'aktiv',
+        RecurringInvoice.next_invoice_date <= today,
+        get_end_date_filter(today, catch_up)
+    )
+
+def _generate_invoices_for_chunk(recurring_ids, today, catch_up=False, dry_run=False):
+    """
+    Generiert die Rechnungen für einen Block von Intervallrechnungen (ohne Commit)
+    
+    Die Fälligkeit wird beim Laden erneut geprüft und die Vorlagen werden bis zum Commit
+    gesperrt (sofern die Datenbank FOR UPDATE unterstützt), damit inzwischen pausierte
+    oder von einem anderen Lauf bereits abgerechnete Vorlagen nicht erneut abgerechnet werden.
+    """
+    query = RecurringInvoice.query.options(
+        selectinload(RecurringInvoice.items)
+    ).filter(
+        RecurringInvoice.recurring_id.in_(recurring_ids),
+        *get_due_filters(today, catch_up)
+    ).order_by(RecurringInvoice.recurring_id)
+    
+    if not dry_run:
+        query = query.with_for_update()
+    
+    recurring_invoices = query.all()
+    
+    # Abzurechnende Zeiträume je Intervallrechnung bestimmen
+    planned = []
+    for recurring_invoice in recurring_invoices:
+        if catch_up:
+            period_dates = get_scheduled_invoice_dates(recurring_invoice, today)
+            next_date = get_scheduled_invoice_date(recurring_invoice, len(period_dates))
+        else:
+            period_dates = [None]
+            next_date = calculate_next_invoice_date(recurring_invoice)
+        
+        planned.append((recurring_invoice, period_dates, next_date))
+    
+    invoice_count = sum(len(period_dates) for _, period_dates, _ in planned)
+    if invoice_count == 0:
+        return []
+    
+    if dry_run:
+        return [
+            {
+                "recurring_invoice_id": recurring_invoice.recurring_id,
+                "customer_id": recurring_invoice.customer_id,
+                "period_date": (period_date or today).isoformat(),
+                "total_gross": float(calculate_recurring_totals(recurring_invoice)['total_gross']),
+                "next_invoice_date": next_date.isoformat()
+            }
+            for recurring_invoice, period_dates, next_date in planned
+            for period_date in period_dates
+        ]
+    
+    invoice_numbers = reserve_invoice_numbers(invoice_count, today)
+    
+    invoices = []
+    for recurring_invoice, period_dates, _ in planned:
+        for period_date in period_dates:
+            invoices.append(build_invoice_from_recurring(
+                recurring_invoice, invoice_numbers[len(invoices)], today, period_date
+            ))
+    
+    invoice_ids = bulk_insert_invoices(invoices)
+    
+    results = []
+    position = 0
+    for recurring_invoice, period_dates, next_date in planned:
+        # Aktualisiere Intervallrechnung (wird beim Commit gesammelt geschrieben)
+        recurring_invoice.last_invoice_date = today
+        recurring_invoice.next_invoice_date = next_date
+        
+        for _ in period_dates:
+            results.append({
                 "recurring_invoice_id": recurring_invoice.recurring_id,
-                "invoice_id": new_invoice.invoice_id,
-                "invoice_number": new_invoice.invoice_number,
+                "invoice_id": invoice_ids[position],
+                "invoice_number": invoice_numbers[position],
                 "next_invoice_date": next_date.isoformat()
             })
-            
-            logger.info(f"Rechnung {invoice_number} für Intervallrechnung {recurring_invoice.recurring_id} erstellt")
+            position += 1
+    
+    return results
+
+def build_invoice_from_recurring(recurring_invoice, invoice_number, today, period_date=None):
+    """
+    Erstellt die Spaltenwerte einer Rechnung samt Positionen aus einer Intervallrechnung
+    
+    Bei nachgeholten Zeiträumen (period_date) wird der Zeitraum als Lieferdatum gesetzt.
+    """
+    notes = f"Automatisch generiert aus Intervallrechnung {recurring_invoice.recurring_id}"
+    if period_date:
+        notes += f" (Zeitraum ab {period_date.strftime('%d.%m.%Y')})"
+    
+    return {
+        'invoice_number': invoice_number,
+        'customer_id': recurring_invoice.customer_id,
+        'invoice_date': today,
+        'due_date': today + timedelta(days=14),
+        'delivery_date': period_date or today,
+        'status': 'erstellt',
+        'payment_status': 'offen',
+        'notes': notes,
+        'is_recurring': True,
+        'items': [
+            {
+                'item_id': item.item_id,
+                'position': item.position,
+                'quantity': item.quantity,
+                'unit': item.unit,
+                'price_net': item.price_net,
+                'vat_rate': item.vat_rate,
+                'description': item.description
+            }
+            for item in recurring_invoice.items
+        ]
+    }
+
+def calculate_recurring_totals(recurring_invoice):
+    """
+    Berechnet die Gesamtbeträge einer aus der Intervallrechnung erzeugten Rechnung
+    """
+    totals = calculate_invoice_totals(
+        (item.quantity, item.price_net, item.vat_rate) for item in recurring_invoice.items
+    )
+    
+    return {key: totals[key] for key in AMOUNT_KEYS}
+
+def calculate_next_invoice_date(recurring_invoice):
+    """
+    Berechnet das nächste Rechnungsdatum einer Intervallrechnung
+    """
+    return get_scheduled_invoice_date(recurring_invoice, 1)
+
+def get_scheduled_invoice_date(recurring_invoice, periods):
+    """
+    Gibt das Rechnungsdatum zurück, das 'periods' Intervalle nach next_invoice_date liegt
+    
+    Das Datum wird immer direkt von next_invoice_date aus berechnet, damit sich gekürzte
+    Monatsenden (z.B. 31.01. -> 28.02.) nicht auf die folgenden Zeiträume übertragen.
+    """
+    interval_value = recurring_invoice.interval_value or 1
+    months = INTERVAL_MONTHS.get(recurring_invoice.interval_type)
+    
+    if months:
+        return add_months(recurring_invoice.next_invoice_date, periods * months * interval_value)
+    
+    return recurring_invoice.next_invoice_date + timedelta(days=periods * 30 * interval_value)
+
+def get_scheduled_invoice_dates(recurring_invoice, until):
+    """
+    Gibt alle Rechnungsdaten ab next_invoice_date bis einschließlich 'until' zurück
+    
+    Die Anzahl der Zeiträume wird direkt aus dem Abstand der Daten berechnet, sodass alle
+    Daten in einem Durchlauf ohne schrittweises Weiterzählen entstehen. Das Enddatum der
+    Intervallrechnung begrenzt den Zeitraum.
+    """
+    start = recurring_invoice.next_invoice_date
+    last = min(until, recurring_invoice.end_date) if recurring_invoice.end_date else until
+    if start > last:
+        return []
+    
+    interval_value = recurring_invoice.interval_value or 1
+    months = INTERVAL_MONTHS.get(recurring_invoice.interval_type)
+    
+    if months:
+        step = months * interval_value
+        count = ((last.year - start.year) * 12 + last.month - start.month) // step + 1
+    else:
+        count = (last - start).days // (30 * interval_value) + 1
+    
+    dates = [get_scheduled_invoice_date(recurring_invoice, period) for period in range(count)]
+    return [date for date in dates if date <= last]
+
+def forecast_recurring_invoices(months=12, today=None, batch_size=500, catch_up=None):
+    """
+    Prognostiziert Anzahl und Umsatz der Intervallrechnungen für die nächsten Monate
+    
+    Es wird nichts geschrieben. Bereits fällige Zeiträume werden dem aktuellen Monat
+    zugeordnet, da sie beim nächsten Lauf abgerechnet werden. Wie bei der Generierung
+    werden sie nur im Nachholmodus einzeln gezählt, sonst als eine Rechnung; Vorlagen
+    mit überschrittenem Enddatum zählen dann nicht mehr.
+    
+    Args:
+        months: Anzahl der Kalendermonate ab dem aktuellen Monat
+        today: Stichtag (Standard: heute)
+        batch_size: Anzahl der Intervallrechnungen, die pro Abfrage geladen werden
+        catch_up: Verpasste Zeiträume nachholen (Standard: RECURRING_CATCH_UP)
+    
+    Returns:
+        Ein Dictionary mit der Prognose je Monat und der Gesamtsumme
+    """
+    today = today or datetime.now().date()
+    until = add_months(today.replace(day=1), months) - timedelta(days=1)
+    if catch_up is None:
+        catch_up = current_app.config.get('RECURRING_CATCH_UP', False)
+    
+    forecast = {}
+    for offset in range(months):
+        month = add_months(today.replace(day=1), offset)
+        forecast[f"{month.year}-{month.month:02d}"] = {
+            'invoice_count': 0, 'total_net': ZERO, 'total_vat': ZERO, 'total_gross': ZERO
+        }
+    
+    recurring_invoices = RecurringInvoice.query.options(
+        selectinload(RecurringInvoice.items)
+    ).filter(
+        RecurringInvoice.status == 'aktiv',
+        RecurringInvoice.next_invoice_date <= until,
+        get_end_date_filter(today, catch_up)
+    ).order_by(RecurringInvoice.recurring_id)
+    
+    subscriptions = 0
+    for recurring_invoice in recurring_invoices.yield_per(batch_size):
+        invoice_dates = get_scheduled_invoice_dates(recurring_invoice, until)
+        if not invoice_dates:
+            continue
         
-        except Exception as e:
-            logger.error(f"Fehler bei der Generierung der Rechnung für Intervallrechnung {recurring_invoice.recurring_id}: {str(e)}")
-            db.session.rollback()
+        # Ohne Nachholmodus wird pro Lauf nur eine Rechnung für die fälligen Zeiträume erstellt
+        if not catch_up and invoice_dates[0] <= today:
+            invoice_dates = [today] + [invoice_date for invoice_date in invoice_dates if invoice_date > today]
+        
+        subscriptions += 1
+        totals = calculate_recurring_totals(recurring_invoice)
+        
+        for invoice_date in invoice_dates:
+            invoice_date = max(invoice_date, today)
+            month = forecast[f"{invoice_date.year}-{invoice_date.month:02d}"]
+            month['invoice_count'] += 1
+            for key, value in totals.items():
+                month[key] += value
     
-    db.session.commit()
-    logger.info(f"Insgesamt {len(generated_invoices)} Rechnungen generiert")
+    total = {'invoice_count': 0, 'total_net': ZERO, 'total_vat': ZERO, 'total_gross': ZERO}
+    for month in forecast.values():
+        for key in total:
+            total[key] += month[key]
+        for key in AMOUNT_KEYS:
+            month[key] = float(month[key])
     
-    return generated_invoices
+    for key in AMOUNT_KEYS:
+        total[key] = float(total[key])
+    
+    return {
+        'months': [dict(month=key, **values) for key, values in forecast.items()],
+        'total': total,
+        'subscriptions': subscriptions
+    }
 
 def add_months(sourcedate, months):
     """
@@ -136,7 +390,7 @@ def create_recurring_invoice(customer_id, start_date, interval_type, interval_va
         interval_value: Wert des Intervalls (z.B. 1 für jeden Monat, 3 für alle 3 Monate)
         end_date: Enddatum (optional)
         items: Liste der Rechnungspositionen
-        
+    
     Returns:
         Die erstellte Intervallrechnung
     """
@@ -184,7 +438,7 @@ def update_recurring_invoice_status(recurring_id, status):
     Args:
         recurring_id: ID der Intervallrechnung
         status: Neuer Status (aktiv, pausiert, beendet)
-        
+    
     Returns:
         Die aktualisierte Intervallrechnung oder None, wenn nicht gefunden
     """
@@ -0,0 +1,369 @@
+from app import db
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.customer import Customer
+from app.models.report_rollup import MonthlyRevenueRollup, CustomerReceivableRollup, DueDateReceivableRollup
+from sqlalchemy import case, extract, func, select, literal_column
+from sqlalchemy.orm import aliased
+from datetime import datetime, timedelta
+
+# Mögliche Aufschlüsselungen der Umsatzberichte
+REVENUE_DIMENSIONS = ('month', 'customer', 'vat_rate', 'status', 'payment_status')
+
+# Altersklassen offener Forderungen: (Name, Tage überfällig von, bis)
+RECEIVABLE_AGE_BUCKETS = (
+    ('not_due', None, 0),
+    ('overdue_1_30', 1, 30),
+    ('overdue_31_60', 31, 60),
+    ('overdue_61_90', 61, 90),
+    ('overdue_over_90', 91, None)
+)
+
+AMOUNT_KEYS = ('total_net', 'total_vat', 'total_gross')
+
+# Sortierungen der Liste offener Rechnungen (Präfix '-' für absteigend)
+OPEN_INVOICE_SORTS = {
+    'open_amount': Invoice.open_amount,
+    'due_date': Invoice.due_date,
+    'invoice_date': Invoice.invoice_date
+}
+
+class ReportError(ValueError):
+    """
+    Ungültige Parameter eines Berichts
+    """
+
+def get_revenue_report(group_by=('month',), date_from=None, date_to=None, customer_id=None):
+    """
+    Summiert Netto, Umsatzsteuer und Brutto der Rechnungen in der Datenbank (GROUP BY)
+    
+    Stornorechnungen werden über original_invoice_id mit ihrer Originalrechnung
+    verrechnet: Sie zählen mit Rechnungsdatum, Status und Zahlungsstatus der
+    Originalrechnung. Eine stornierte Rechnung ergibt so in jeder Aufschlüsselung
+    zusammen mit ihrer Stornorechnung den Betrag 0.
+    
+    Bei der Aufschlüsselung nach vat_rate wird über die Rechnungspositionen summiert.
+    
+    Args:
+        group_by: Folge von Aufschlüsselungen aus REVENUE_DIMENSIONS (leer = nur Summe)
+        date_from: Erstes Rechnungsdatum (einschließlich)
+        date_to: Letztes Rechnungsdatum (einschließlich)
+        customer_id: Nur Rechnungen dieses Kunden
+    
+    Returns:
+        Ein Dictionary mit den Zeilen je Gruppe und der Gesamtsumme
+    """
+    group_by = list(dict.fromkeys(group_by))
+    unknown = [dimension for dimension in group_by if dimension not in REVENUE_DIMENSIONS]
+    if unknown:
+        raise ReportError(f"Unbekannte Aufschlüsselung: {', '.join(unknown)}")
+    
+    rows = [_format_row(row) for row in db.session.execute(
+        _build_revenue_query(group_by, date_from, date_to, customer_id)
+    ).mappings()]
+    
+    if 'customer' in group_by:
+        _add_customer_names(rows)
+    
+    total = db.session.execute(_build_revenue_query([], date_from, date_to, customer_id)).mappings().one()
+    
+    return {
+        'group_by': group_by,
+        'rows': rows,
+        'total': _format_row(total)
+    }
+
+def _build_revenue_query(group_by, date_from, date_to, customer_id):
+    """
+    Erstellt die Aggregatabfrage für get_revenue_report
+    """
+    original = aliased(Invoice)
+    
+    # Stornorechnungen übernehmen die Werte der Originalrechnung
+    invoice_date = func.coalesce(original.invoice_date, Invoice.invoice_date)
+    status = func.coalesce(original.status, Invoice.status)
+    payment_status = func.coalesce(original.payment_status, Invoice.payment_status)
+    
+    dimension_columns = {
+        'month': [extract('year', invoice_date).label('year'), extract('month', invoice_date).label('month')],
+        'customer': [Invoice.customer_id.label('customer_id')],
+        'vat_rate': [InvoiceItem.vat_rate.label('vat_rate')],
+        'status': [status.label('status')],
+        'payment_status': [payment_status.label('payment_status')]
+    }
+    group_columns = [column for dimension in group_by for column in dimension_columns[dimension]]
+    
+    # Auf Positionsebene summieren, wenn nach Steuersatz aufgeschlüsselt wird
+    source = InvoiceItem if 'vat_rate' in group_by else Invoice
+    is_original = Invoice.original_invoice_id.is_(None)
+    
+    query = select(
+        *group_columns,
+        func.count(func.distinct(case((is_original, Invoice.invoice_id)))).label('invoice_count'),
+        func.count(func.distinct(case((~is_original, Invoice.invoice_id)))).label('cancellation_count'),
+        func.coalesce(func.sum(source.total_net), 0).label('total_net'),
+        func.coalesce(func.sum(source.total_vat), 0).label('total_vat'),
+        func.coalesce(func.sum(source.total_gross), 0).label('total_gross')
+    ).select_from(Invoice).outerjoin(original, Invoice.original_invoice_id == original.invoice_id)
+    
+    if source is InvoiceItem:
+        query = query.join(InvoiceItem, InvoiceItem.invoice_id == Invoice.invoice_id)
+    
+    if date_from:
+        query = query.where(invoice_date >= date_from)
+    if date_to:
+        query = query.where(invoice_date <= date_to)
+    if customer_id:
+        query = query.where(Invoice.customer_id == customer_id)
+    
+    if group_columns:
+        query = query.group_by(*group_columns).order_by(*group_columns)
+    
+    return query
+
+def get_open_receivables(today=None, customer_id=None):
+    """
+    Summiert die offenen Forderungen je Kunde in der Datenbank (GROUP BY)
+    
+    Offen sind alle nicht stornierten Rechnungen, die nicht vollständig bezahlt sind.
+    Stornorechnungen selbst zählen nicht. Teilweise bezahlte Rechnungen gehen mit
+    ihrem offenen Betrag (open_amount) ein. Die Beträge werden zusätzlich nach Tagen seit
+    Fälligkeit aufgeteilt (RECEIVABLE_AGE_BUCKETS).
+    
+    Args:
+        today: Stichtag für die Fälligkeit (Standard: heute)
+        customer_id: Nur Rechnungen dieses Kunden
+    
+    Returns:
+        Ein Dictionary mit den Zeilen je Kunde und der Gesamtsumme
+    """
+    today = today or datetime.now().date()
+    
+    age_columns = []
+    for name, min_days, max_days in RECEIVABLE_AGE_BUCKETS:
+        # Vergleich mit festen Stichtagen statt Datumsarithmetik in SQL (datenbankunabhängig)
+        conditions = []
+        if min_days is not None:
+            conditions.append(Invoice.due_date <= today - timedelta(days=min_days))
+        if max_days is not None:
+            conditions.append(Invoice.due_date >= today - timedelta(days=max_days))
+        age_columns.append(func.coalesce(func.sum(case((db.and_(*conditions), Invoice.open_amount), else_=0)), 0).label(name))
+    
+    query = select(
+        Invoice.customer_id,
+        func.count(Invoice.invoice_id).label('invoice_count'),
+        func.count(case((Invoice.due_date < today, Invoice.invoice_id))).label('overdue_count'),
+        func.min(Invoice.due_date).label('oldest_due_date'),
+        func.coalesce(func.sum(Invoice.open_amount), 0).label('open_amount'),
+        func.coalesce(func.sum(case((Invoice.due_date < today, Invoice.open_amount), else_=0)), 0).label('overdue_amount'),
+        *age_columns
+    ).where(
+        Invoice.original_invoice_id.is_(None),
+        Invoice.is_cancelled.is_not(True),
+        Invoice.status != 'storniert',
+        Invoice.payment_status != 'vollständig bezahlt'
+    ).group_by(Invoice.customer_id).order_by(Invoice.customer_id)
+    
+    if customer_id:
+        query = query.where(Invoice.customer_id == customer_id)
+    
+    amount_keys = ['open_amount', 'overdue_amount'] + [name for name, min_days, max_days in RECEIVABLE_AGE_BUCKETS]
+    rows = [_format_row(row, amount_keys) for row in db.session.execute(query).mappings()]
+    _add_customer_names(rows)
+    
+    total = {key: 0 for key in ['invoice_count', 'overdue_count'] + amount_keys}
+    for row in rows:
+        for key in total:
+            total[key] += row[key]
+    for key in amount_keys:
+        total[key] = round(total[key], 2)
+    
+    return {
+        'date': today.isoformat(),
+        'rows': rows,
+        'total': total
+    }
+
+def get_open_invoices(today=None, customer_id=None, min_amount=None, max_amount=None,
+                      overdue=False, sort='-open_amount', limit=50, offset=0):
+    """
+    Gibt die offenen Rechnungen mit ihrem offenen Betrag zurück, in der Datenbank gefiltert und sortiert
+    
+    Offen sind wie in get_open_receivables alle nicht stornierten, nicht vollständig
+    bezahlten Rechnungen, zusätzlich muss ein Betrag offen sein. Die Bedingung
+    open_amount > 0 steht als Konstante in der Abfrage, damit der Teilindex
+    ix_invoices_open_amount verwendet wird.
+    
+    Args:
+        today: Stichtag für die Fälligkeit (Standard: heute)
+        customer_id: Nur Rechnungen dieses Kunden
+        min_amount, max_amount: Grenzen für den offenen Betrag (Decimal)
+        overdue: Nur Rechnungen, deren Fälligkeit vor dem Stichtag liegt
+        sort: Schlüssel aus OPEN_INVOICE_SORTS, mit '-' für absteigend
+        limit, offset: Ausschnitt der Liste
+    
+    Returns:
+        Ein Dictionary mit den Rechnungen und der Gesamtzahl der passenden Rechnungen
+    
+    Raises:
+        ReportError: Bei einer unbekannten Sortierung
+    """
+    today = today or datetime.now().date()
+    
+    sort_column = OPEN_INVOICE_SORTS.get(sort.lstrip('-'))
+    if sort_column is None:
+        raise ReportError(f"Unbekannte Sortierung: {sort} (erlaubt: {', '.join(OPEN_INVOICE_SORTS)}, mit '-' absteigend)")
+    descending = sort.startswith('-')
+    
+    conditions = [
+        Invoice.open_amount > literal_column('0'),
+        Invoice.original_invoice_id.is_(None),
+        Invoice.is_cancelled.is_not(True),
+        Invoice.status != 'storniert',
+        Invoice.payment_status != 'vollständig bezahlt'
+    ]
+    if customer_id:
+        conditions.append(Invoice.customer_id == customer_id)
+    if min_amount is not None:
+        conditions.append(Invoice.open_amount >= min_amount)
+    if max_amount is not None:
+        conditions.append(Invoice.open_amount <= max_amount)
+    if overdue:
+        conditions.append(Invoice.due_date < today)
+    
+    total_count = db.session.scalar(select(func.count(Invoice.invoice_id)).where(*conditions))
+    
+    query = select(
+        Invoice.invoice_id,
+        Invoice.invoice_number,
+        Invoice.customer_id,
+        Invoice.invoice_date,
+        Invoice.due_date,
+        Invoice.payment_status,
+        Invoice.total_gross,
+        Invoice.paid_amount,
+        Invoice.open_amount
+    ).where(*conditions).order_by(
+        sort_column.desc() if descending else sort_column,
+        Invoice.invoice_id.desc() if descending else Invoice.invoice_id
+    ).limit(limit).offset(offset)
+    
+    rows = []
+    for row in db.session.execute(query).mappings():
+        row = _format_row(row, ('total_gross', 'paid_amount', 'open_amount'))
+        row['invoice_date'] = row['invoice_date'].isoformat()
+        row['days_overdue'] = max((today - row['due_date']).days, 0)
+        row['due_date'] = row['due_date'].isoformat()
+        rows.append(row)
+    _add_customer_names(rows)
+    
+    return {
+        'date': today.isoformat(),
+        'rows': rows,
+        'total_count': total_count
+    }
+
+def get_dashboard(today=None, months=12, top_customers=10):
+    """
+    Gibt die Kennzahlen des Dashboards aus den Rollup-Tabellen zurück
+    
+    Die Rechnungstabelle wird nicht gelesen; der Aufwand hängt nur von der Anzahl
+    der Monate, der Kunden mit offenen Forderungen und der offenen Fälligkeitstage ab,
+    nicht von der Anzahl der Rechnungen.
+    
+    Args:
+        today: Stichtag (Standard: heute)
+        months: Anzahl der Monate bis einschließlich des aktuellen Monats
+        top_customers: Anzahl der Kunden mit den höchsten offenen Forderungen
+    """
+    today = today or datetime.now().date()
+    
+    # Monate als fortlaufender Index (Jahr * 12 + Monat - 1)
+    last_index = today.year * 12 + today.month - 1
+    first_index = last_index - months + 1
+    month_index = MonthlyRevenueRollup.year * 12 + MonthlyRevenueRollup.month - 1
+    
+    revenue = {
+        (rollup.year, rollup.month): rollup
+        for rollup in MonthlyRevenueRollup.query.filter(month_index >= first_index, month_index <= last_index)
+    }
+    
+    revenue_months = []
+    for index in range(first_index, last_index + 1):
+        year, month = divmod(index, 12)
+        rollup = revenue.get((year, month + 1))
+        revenue_months.append({
+            'month': f"{year}-{month + 1:02d}",
+            'invoice_count': rollup.invoice_count if rollup else 0,
+            'cancellation_count': rollup.cancellation_count if rollup else 0,
+            **{key: round(float(getattr(rollup, key)), 2) if rollup else 0.0 for key in AMOUNT_KEYS}
+        })
+    
+    open_count, open_amount = db.session.execute(select(
+        func.coalesce(func.sum(CustomerReceivableRollup.open_count), 0),
+        func.coalesce(func.sum(CustomerReceivableRollup.open_amount), 0)
+    )).one()
+    overdue_count, overdue_amount = db.session.execute(select(
+        func.coalesce(func.sum(DueDateReceivableRollup.open_count), 0),
+        func.coalesce(func.sum(DueDateReceivableRollup.open_amount), 0)
+    ).where(DueDateReceivableRollup.due_date < today)).one()
+    
+    top_rows = [
+        {
+            'customer_id': rollup.customer_id,
+            'open_count': rollup.open_count,
+            'open_amount': round(float(rollup.open_amount), 2)
+        }
+        for rollup in CustomerReceivableRollup.query.order_by(
+            CustomerReceivableRollup.open_amount.desc(), CustomerReceivableRollup.customer_id
+        ).limit(top_customers)
+    ]
+    _add_customer_names(top_rows)
+    
+    return {
+        'date': today.isoformat(),
+        'revenue': {
+            'current_month': revenue_months[-1] if revenue_months else None,
+            'months': revenue_months
+        },
+        'receivables': {
+            'open_count': int(open_count),
+            'open_amount': round(float(open_amount), 2),
+            'overdue_count': int(overdue_count),
+            'overdue_amount': round(float(overdue_amount), 2),
+            'top_customers': top_rows
+        }
+    }
+
+def _format_row(row, amount_keys=AMOUNT_KEYS):
+    """
+    Wandelt eine Ergebniszeile in ein JSON-fähiges Dictionary um
+    """
+    result = dict(row)
+    
+    if 'year' in result:
+        result['month'] = f"{int(result.pop('year'))}-{int(result['month']):02d}"
+    if result.get('vat_rate') is not None:
+        result['vat_rate'] = float(result['vat_rate'])
+    if result.get('oldest_due_date') is not None and not isinstance(result['oldest_due_date'], str):
+        result['oldest_due_date'] = result['oldest_due_date'].isoformat()
+    
+    for key in amount_keys:
+        result[key] = round(float(result[key] or 0), 2)
+    
+    return result
+
+def _add_customer_names(rows):
+    """
+    Ergänzt die Kundennamen mit einer einzigen Abfrage
+    """
+    customer_ids = {row['customer_id'] for row in rows}
+    if not customer_ids:
+        return
+    
+    customers = {
+        customer.customer_id: customer
+        for customer in Customer.query.filter(Customer.customer_id.in_(customer_ids))
+    }
+    for row in rows:
+        customer = customers.get(row['customer_id'])
+        row['customer_name'] = customer.full_name if customer else None
@@ -0,0 +1,306 @@
+from app import db
+from app.models.invoice import Invoice
+from app.models.report_rollup import MonthlyRevenueRollup, CustomerReceivableRollup, DueDateReceivableRollup
+from app.money import round_money, AMOUNT_KEYS
+from sqlalchemy import event, select, insert, update, delete, func, case, cast, extract, literal, and_, Integer
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session, aliased
+from collections import defaultdict
+from datetime import datetime
+import logging
+
+# Konfiguriere Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Maximale Anzahl IDs pro IN-Abfrage
+ID_CHUNK_SIZE = 500
+
+# Rollup-Tabellen mit ihren Schlüsselspalten
+ROLLUP_KEYS = {
+    MonthlyRevenueRollup: ('year', 'month'),
+    CustomerReceivableRollup: ('customer_id',),
+    DueDateReceivableRollup: ('due_date',)
+}
+
+_listeners_installed = False
+
+def init_rollups():
+    """
+    Registriert die Session-Ereignisse, die die Rollup-Tabellen fortschreiben (einmal pro Prozess)
+    
+    Vor jedem Flush wird der gespeicherte Stand der geänderten oder gelöschten
+    Rechnungen gelesen, nach dem Flush der neue Stand. Die Differenz wird in derselben
+    Transaktion auf die Rollup-Tabellen gebucht. Rechnungen, die mit Core-INSERTs am ORM
+    vorbei geschrieben werden, müssen mit record_inserted_invoices bzw.
+    apply_rollup_changes nachgetragen werden.
+    """
+    global _listeners_installed
+    
+    if _listeners_installed:
+        return
+    _listeners_installed = True
+    
+    event.listen(Session, 'before_flush', _capture_rollup_rows_before_flush)
+    event.listen(Session, 'after_flush', _apply_rollup_changes_after_flush)
+
+def _capture_rollup_rows_before_flush(session, flush_context, instances):
+    changed_ids = set()
+    deleted_ids = set()
+    
+    for obj in session.dirty:
+        if isinstance(obj, Invoice) and session.is_modified(obj, include_collections=False):
+            identity = sa_inspect(obj).identity
+            if identity:
+                changed_ids.add(identity[0])
+    
+    for obj in session.deleted:
+        if isinstance(obj, Invoice):
+            identity = sa_inspect(obj).identity
+            if identity:
+                deleted_ids.add(identity[0])
+    
+    old_ids = changed_ids | deleted_ids
+    session.info['rollup_old_rows'] = get_rollup_rows(old_ids, session.connection()) if old_ids else []
+    session.info['rollup_changed_ids'] = changed_ids
+
+def _apply_rollup_changes_after_flush(session, flush_context):
+    old_rows = session.info.pop('rollup_old_rows', [])
+    invoice_ids = session.info.pop('rollup_changed_ids', set())
+    
+    for obj in session.new:
+        if isinstance(obj, Invoice) and obj.invoice_id is not None:
+            invoice_ids.add(obj.invoice_id)
+    
+    if not old_rows and not invoice_ids:
+        return
+    
+    connection = session.connection()
+    apply_rollup_changes(old_rows, get_rollup_rows(invoice_ids, connection), connection)
+
+def get_rollup_rows(invoice_ids, connection=None):
+    """
+    Liest die für die Rollups relevanten Spalten der angegebenen Rechnungen
+    
+    Für Stornorechnungen wird als revenue_date das Datum der Originalrechnung gelesen.
+    
+    Returns:
+        Eine Liste von Dictionaries (eine Zeile pro gefundener Rechnung)
+    """
+    connection = connection or db.session.connection()
+    invoice_ids = list(invoice_ids)
+    original = aliased(Invoice)
+    rows = []
+    
+    for start in range(0, len(invoice_ids), ID_CHUNK_SIZE):
+        query = select(
+            Invoice.invoice_id,
+            Invoice.customer_id,
+            Invoice.original_invoice_id,
+            func.coalesce(original.invoice_date, Invoice.invoice_date).label('revenue_date'),
+            Invoice.due_date,
+            Invoice.status,
+            Invoice.payment_status,
+            Invoice.is_cancelled,
+            Invoice.total_net,
+            Invoice.total_vat,
+            Invoice.total_gross,
+            Invoice.open_amount
+        ).outerjoin(
+            original, Invoice.original_invoice_id == original.invoice_id
+        ).where(Invoice.invoice_id.in_(invoice_ids[start:start + ID_CHUNK_SIZE]))
+        
+        rows.extend(dict(row) for row in connection.execute(query).mappings())
+    
+    return rows
+
+def record_inserted_invoices(invoice_ids, connection=None):
+    """
+    Bucht Rechnungen, die per Core-INSERT (z.B. bulk_insert_invoices) angelegt wurden, auf die Rollups
+    """
+    connection = connection or db.session.connection()
+    apply_rollup_changes([], get_rollup_rows(invoice_ids, connection), connection)
+
+def is_open_receivable(row):
+    """
+    Prüft, ob eine Rechnung als offene Forderung zählt (wie im Bericht der offenen Forderungen)
+    """
+    return (
+        row['original_invoice_id'] is None
+        and not row['is_cancelled']
+        and row['status'] != 'storniert'
+        and row['payment_status'] != 'vollständig bezahlt'
+    )
+
+def _add_contributions(changes, row, sign):
+    """
+    Addiert den Beitrag einer Rechnung (sign = 1) bzw. zieht ihn ab (sign = -1)
+    """
+    amounts = {key: round_money(row[key]) * sign for key in AMOUNT_KEYS}
+    
+    if row['revenue_date'] is not None:
+        is_original = row['original_invoice_id'] is None
+        deltas = changes[MonthlyRevenueRollup][(row['revenue_date'].year, row['revenue_date'].month)]
+        deltas['invoice_count'] += sign if is_original else 0
+        deltas['cancellation_count'] += 0 if is_original else sign
+        for key, amount in amounts.items():
+            deltas[key] += amount
+    
+    if is_open_receivable(row):
+        keys = [(CustomerReceivableRollup, (row['customer_id'],))]
+        if row['due_date'] is not None:
+            keys.append((DueDateReceivableRollup, (row['due_date'],)))
+        
+        for model, key in keys:
+            deltas = changes[model][key]
+            deltas['open_count'] += sign
+            deltas['open_amount'] += round_money(row['open_amount']) * sign
+
+def apply_rollup_changes(old_rows, new_rows, connection=None):
+    """
+    Bucht die Differenz zwischen altem und neuem Stand von Rechnungen auf die Rollup-Tabellen
+    
+    Für Massenänderungen am ORM vorbei: vorher und nachher get_rollup_rows für die
+    betroffenen Rechnungen lesen und beide Listen übergeben. Die Änderungen werden
+    je Tabelle mit einem einzigen Upsert (ON CONFLICT DO UPDATE) geschrieben.
+    
+    Args:
+        old_rows: Zeilen aus get_rollup_rows vor der Änderung (leer bei neuen Rechnungen)
+        new_rows: Zeilen aus get_rollup_rows nach der Änderung (leer bei gelöschten Rechnungen)
+    """
+    connection = connection or db.session.connection()
+    changes = {model: defaultdict(lambda: defaultdict(int)) for model in ROLLUP_KEYS}
+    
+    for row in old_rows:
+        _add_contributions(changes, row, -1)
+    for row in new_rows:
+        _add_contributions(changes, row, 1)
+    
+    for model, model_changes in changes.items():
+        rows = []
+        for key, deltas in model_changes.items():
+            if any(deltas.values()):
+                rows.append(dict(zip(ROLLUP_KEYS[model], key), **deltas))
+        
+        if rows:
+            _upsert_deltas(connection, model, rows)
+
+def _upsert_deltas(connection, model, rows):
+    """
+    Addiert Deltas auf die Zeilen einer Rollup-Tabelle und legt fehlende Zeilen an
+    """
+    table = model.__table__
+    key_columns = ROLLUP_KEYS[model]
+    value_columns = [column.name for column in table.columns if column.name not in key_columns and column.name != 'updated_at']
+    now = datetime.utcnow()
+    rows = [dict({column: row.get(column, 0) for column in value_columns}, updated_at=now, **{
+        column: row[column] for column in key_columns
+    }) for row in rows]
+    
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        
+        statement = dialect_insert(table).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_=dict(
+                {column: table.c[column] + statement.excluded[column] for column in value_columns},
+                updated_at=statement.excluded.updated_at
+            )
+        )
+        connection.execute(statement)
+    else:
+        # Andere Datenbanken: erst aktualisieren, fehlende Zeilen anschließend anlegen
+        for row in rows:
+            result = connection.execute(
+                update(table)
+                .where(*[table.c[column] == row[column] for column in key_columns])
+                .values({column: table.c[column] + row[column] for column in value_columns}, updated_at=now)
+            )
+            if result.rowcount == 0:
+                connection.execute(insert(table).values(row))
+    
+    # Offene Forderungen ohne Rechnungen entfernen, damit die Tabellen klein bleiben
+    if 'open_count' in value_columns:
+        key_column = table.c[key_columns[0]]
+        connection.execute(delete(table).where(
+            key_column.in_([row[key_columns[0]] for row in rows]),
+            table.c.open_count == 0
+        ))
+
+def rebuild_rollups():
+    """
+    Berechnet alle Rollup-Tabellen mit je einer Aggregatabfrage aus den Rechnungen neu
+    
+    Unter PostgreSQL werden die Rollup-Tabellen für die Dauer der Transaktion gesperrt;
+    gleichzeitige Änderungen an Rechnungen warten und werden danach auf den neu
+    berechneten Stand gebucht. Die Funktion führt keinen Commit aus.
+    
+    Returns:
+        Ein Dictionary mit der Anzahl der Zeilen je Rollup-Tabelle
+    """
+    connection = db.session.connection()
+    
+    if connection.dialect.name == 'postgresql':
+        table_names = ', '.join(model.__tablename__ for model in ROLLUP_KEYS)
+        connection.execute(db.text(f"LOCK TABLE {table_names} IN EXCLUSIVE MODE"))
+    
+    for model in ROLLUP_KEYS:
+        connection.execute(delete(model.__table__))
+    
+    now = literal(datetime.utcnow())
+    original = aliased(Invoice)
+    revenue_date = func.coalesce(original.invoice_date, Invoice.invoice_date)
+    year = cast(extract('year', revenue_date), Integer)
+    month = cast(extract('month', revenue_date), Integer)
+    is_original = Invoice.original_invoice_id.is_(None)
+    
+    connection.execute(insert(MonthlyRevenueRollup.__table__).from_select(
+        ['year', 'month', 'invoice_count', 'cancellation_count', 'total_net', 'total_vat', 'total_gross', 'updated_at'],
+        select(
+            year,
+            month,
+            func.count(case((is_original, 1))),
+            func.count(case((~is_original, 1))),
+            func.coalesce(func.sum(Invoice.total_net), 0),
+            func.coalesce(func.sum(Invoice.total_vat), 0),
+            func.coalesce(func.sum(Invoice.total_gross), 0),
+            now
+        ).select_from(Invoice).outerjoin(
+            original, Invoice.original_invoice_id == original.invoice_id
+        ).where(revenue_date.is_not(None)).group_by(year, month)
+    ))
+    
+    # Gleiche Bedingung wie is_open_receivable
+    is_open = and_(
+        is_original,
+        Invoice.is_cancelled.is_not(True),
+        func.coalesce(Invoice.status, '') != 'storniert',
+        func.coalesce(Invoice.payment_status, '') != 'vollständig bezahlt'
+    )
+    
+    for model, key_column in (
+        (CustomerReceivableRollup, Invoice.customer_id),
+        (DueDateReceivableRollup, Invoice.due_date)
+    ):
+        connection.execute(insert(model.__table__).from_select(
+            [ROLLUP_KEYS[model][0], 'open_count', 'open_amount', 'updated_at'],
+            select(
+                key_column,
+                func.count(Invoice.invoice_id),
+                func.coalesce(func.sum(Invoice.open_amount), 0),
+                now
+            ).where(is_open, key_column.is_not(None)).group_by(key_column)
+        ))
+    
+    counts = {
+        model.__tablename__: connection.execute(select(func.count()).select_from(model.__table__)).scalar()
+        for model in ROLLUP_KEYS
+    }
+    logger.info(f"Rollup-Tabellen neu berechnet: {counts}")
+    
+    return counts
@@ -0,0 +1,113 @@
+from flask import g
+from app import db
+from app.models.scheduler_lock import SchedulerLock
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+import logging
+import socket
+import os
+
+# Konfiguriere Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class LockLostError(Exception):
+    """
+    Die Sperre einer laufenden Aufgabe ist abgelaufen und gehört inzwischen einem anderen Prozess
+    """
+    pass
+
+def get_lock_owner():
+    """
+    Gibt die Kennung dieses Prozesses zurück (Rechnername und Prozess-ID)
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def acquire_lock(name, lease_seconds):
+    """
+    Versucht, eine Sperre für die angegebene Dauer zu erhalten
+    
+    Die Sperre wird mit einem einzigen UPDATE übernommen, wenn sie abgelaufen ist oder
+    bereits diesem Prozess gehört. Existiert sie noch nicht, wird sie angelegt; legen
+    zwei Prozesse sie gleichzeitig an, gewinnt nur einer.
+    
+    Args:
+        name: Name der Sperre (z.B. Name der Aufgabe)
+        lease_seconds: Gültigkeitsdauer der Sperre in Sekunden
+    
+    Returns:
+        True, wenn dieser Prozess die Sperre hält
+    """
+    owner = get_lock_owner()
+    now = datetime.utcnow()
+    locked_until = now + timedelta(seconds=lease_seconds)
+    
+    acquired = db.session.execute(
+        update(SchedulerLock)
+        .where(
+            SchedulerLock.name == name,
+            (SchedulerLock.locked_until < now) | (SchedulerLock.owner == owner)
+        )
+        .values(owner=owner, locked_until=locked_until, acquired_at=now)
+    ).rowcount == 1
+    
+    if not acquired and db.session.get(SchedulerLock, name) is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(SchedulerLock(name=name, owner=owner, locked_until=locked_until, acquired_at=now))
+            acquired = True
+        except IntegrityError:
+            # Ein anderer Prozess hat die Sperre gerade angelegt
+            acquired = False
+    
+    db.session.commit()
+    return acquired
+
+def release_lock(name, cooldown_seconds=0):
+    """
+    Gibt eine Sperre dieses Prozesses frei
+    
+    Mit cooldown_seconds bleibt die Sperre nach Abschluss noch eine Weile bestehen,
+    damit ein anderer Knoten denselben Lauf nicht direkt im Anschluss wiederholt.
+    """
+    db.session.execute(
+        update(SchedulerLock)
+        .where(SchedulerLock.name == name, SchedulerLock.owner == get_lock_owner())
+        .values(locked_until=datetime.utcnow() + timedelta(seconds=cooldown_seconds))
+    )
+    db.session.commit()
+
+def renew_lock(name, lease_seconds):
+    """
+    Verlängert eine Sperre dieses Prozesses um lease_seconds ab jetzt
+    
+    Returns:
+        True, wenn dieser Prozess die Sperre noch hält
+    """
+    renewed = db.session.execute(
+        update(SchedulerLock)
+        .where(SchedulerLock.name == name, SchedulerLock.owner == get_lock_owner())
+        .values(locked_until=datetime.utcnow() + timedelta(seconds=lease_seconds))
+    ).rowcount == 1
+    db.session.commit()
+    return renewed
+
+def renew_current_lock():
+    """
+    Verlängert die Sperre der laufenden geplanten Aufgabe (siehe app.scheduler.locked_job)
+    
+    Lang laufende Aufgaben rufen die Funktion zwischen zwei Blöcken auf, nachdem der
+    vorherige Block committet wurde. Außerhalb einer geplanten Aufgabe (z.B. bei einem
+    Aufruf über die API) hat sie keine Wirkung.
+    
+    Raises:
+        LockLostError: Wenn die Sperre inzwischen einem anderen Prozess gehört
+    """
+    lock = g.get('scheduler_lock')
+    if lock is None:
+        return
+    
+    name, lease_seconds = lock
+    if not renew_lock(name, lease_seconds):
+        raise LockLostError(f"Sperre {name} ist abgelaufen und wurde von einem anderen Prozess übernommen")
@@ -0,0 +1,269 @@
+from app import db
+from app.models.customer import Customer
+from app.models.item import Item
+from app.models.invoice import Invoice
+from sqlalchemy import DDL, Column, Index, Integer, MetaData, Table, case, event, func, or_, select
+from sqlalchemy.exc import DBAPIError
+import logging
+
+# Konfiguriere Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Durchsuchte Spalten je Modell; die erste Spalte bestimmt die Sortierung bei gleichem Rang
+SEARCH_COLUMNS = {
+    Customer: ('company_name', 'last_name', 'first_name', 'email'),
+    Item: ('name', 'item_number', 'description'),
+    Invoice: ('invoice_number',)
+}
+
+# Anzahl der Treffer, wenn kein Limit angegeben ist, und höchstes erlaubtes Limit
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Trigramm-Indizes finden erst Suchbegriffe ab drei Zeichen; kürzere werden ohne Index als
+# Teilzeichenkette gesucht (Durchlauf der Tabelle, Treffer am Anfang zuerst)
+MIN_TRIGRAM_LENGTH = 3
+
+# Verwendetes Suchverfahren je Datenbank (postgresql, sqlite oder like)
+_backends = {}
+
+# PostgreSQL: GIN-Trigramm-Index je durchsuchter Spalte. ILIKE '%...%' nutzt diese Indizes
+# direkt, mehrere mit OR verknüpfte Spalten werden per BitmapOr kombiniert.
+event.listen(db.metadata, 'before_create', DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect='postgresql'))
+
+TRIGRAM_INDEXES = [
+    Index(
+        f"ix_{model.__tablename__}_{column_name}_trgm",
+        model.__table__.c[column_name],
+        postgresql_using='gin',
+        postgresql_ops={column_name: 'gin_trgm_ops'}
+    ).ddl_if(dialect='postgresql')
+    for model, column_names in SEARCH_COLUMNS.items()
+    for column_name in column_names
+]
+
+# SQLite: FTS5-Tabelle mit Trigramm-Tokenizer je Modell, deren Inhalt aus der Basistabelle
+# stammt (external content). Trigger halten sie auch bei Core-INSERTs am ORM vorbei aktuell.
+_fts_metadata = MetaData()
+
+def _fts_table(model):
+    """
+    Gibt die FTS5-Tabelle eines Modells als Table-Objekt zurück (nur für Abfragen)
+    """
+    name = f"{model.__tablename__}_search"
+    if name not in _fts_metadata.tables:
+        Table(name, _fts_metadata, Column('rowid', Integer), Column('rank'), Column(name))
+    return _fts_metadata.tables[name]
+
+def _fts_ddl(model):
+    """
+    Gibt die Anweisungen zum Anlegen der FTS5-Tabelle und ihrer Trigger zurück
+    """
+    table = model.__tablename__
+    fts = f"{table}_search"
+    key = model.__mapper__.primary_key[0].name
+    columns = SEARCH_COLUMNS[model]
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f"new.{column}" for column in columns)
+    old_values = ', '.join(f"old.{column}" for column in columns)
+    
+    insert_new = f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.{key}, {new_values});"
+    delete_old = f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.{key}, {old_values});"
+    
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column_list}, "
+        f"content='{table}', content_rowid='{key}', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column_list} ON {table} BEGIN {delete_old} {insert_new} END"
+    ]
+
+def _sqlite_supports_trigram(connection):
+    """
+    Prüft, ob SQLite mit FTS5 und Trigramm-Tokenizer (ab 3.34) übersetzt wurde
+    """
+    try:
+        with connection.begin_nested():
+            connection.exec_driver_sql("CREATE VIRTUAL TABLE temp.search_probe USING fts5(probe, tokenize='trigram')")
+            connection.exec_driver_sql("DROP TABLE temp.search_probe")
+        return True
+    except DBAPIError:
+        return False
+
+def ensure_search_indexes(connection=None):
+    """
+    Legt fehlende Suchindizes an und gibt das verwendete Suchverfahren zurück
+    
+    Für neue Datenbanken legt db.create_all die PostgreSQL-Indizes bereits an; die Funktion
+    ergänzt sie in bestehenden Datenbanken und richtet unter SQLite die FTS5-Tabellen samt
+    Triggern ein. Neu angelegte FTS5-Tabellen werden aus den vorhandenen Daten befüllt.
+    Mehrfaches Aufrufen ist unschädlich. Die Funktion führt keinen Commit aus.
+    
+    Returns:
+        'postgresql', 'sqlite' oder 'like' (ohne Index, z.B. fehlendes pg_trgm)
+    """
+    connection = connection or db.session.connection()
+    dialect = connection.dialect.name
+    backend = 'like'
+    
+    if dialect == 'postgresql':
+        try:
+            with connection.begin_nested():
+                connection.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                for index in TRIGRAM_INDEXES:
+                    index.create(connection, checkfirst=True)
+            backend = 'postgresql'
+        except DBAPIError as e:
+            logger.warning(f"Trigramm-Indizes konnten nicht angelegt werden, Suche ohne Index: {e}")
+    
+    elif dialect == 'sqlite':
+        if _sqlite_supports_trigram(connection):
+            for model in SEARCH_COLUMNS:
+                fts = _fts_table(model).name
+                exists = connection.exec_driver_sql(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)
+                ).first()
+                for statement in _fts_ddl(model):
+                    connection.exec_driver_sql(statement)
+                if not exists:
+                    connection.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+                    logger.info(f"Suchindex {fts} angelegt")
+            backend = 'sqlite'
+        else:
+            logger.warning("SQLite ohne FTS5-Trigramm-Tokenizer, Suche ohne Index")
+    
+    _backends[str(connection.engine.url)] = backend
+    return backend
+
+def rebuild_search_indexes(connection=None):
+    """
+    Baut die Suchindizes aus den Tabellen neu auf (z.B. nach Änderungen am Datenbestand
+    am ORM und an den Triggern vorbei). Die Funktion führt keinen Commit aus.
+    """
+    connection = connection or db.session.connection()
+    backend = ensure_search_indexes(connection)
+    
+    if backend == 'sqlite':
+        for model in SEARCH_COLUMNS:
+            fts = _fts_table(model).name
+            connection.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    elif backend == 'postgresql':
+        for index in TRIGRAM_INDEXES:
+            connection.exec_driver_sql(f"REINDEX INDEX {index.name}")
+    
+    return backend
+
+def get_search_backend():
+    """
+    Gibt das Suchverfahren der aktuellen Datenbank zurück (ohne Indizes anzulegen)
+    """
+    key = str(db.engine.url)
+    if key not in _backends:
+        connection = db.session.connection()
+        if connection.dialect.name == 'postgresql':
+            installed = connection.exec_driver_sql("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'").first()
+            _backends[key] = 'postgresql' if installed else 'like'
+        elif connection.dialect.name == 'sqlite':
+            exists = connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (_fts_table(Invoice).name,)
+            ).first()
+            _backends[key] = 'sqlite' if exists else 'like'
+        else:
+            _backends[key] = 'like'
+    
+    return _backends[key]
+
+def get_limit(value):
+    """
+    Begrenzt die angeforderte Trefferzahl auf 1 bis MAX_LIMIT (Standard: DEFAULT_LIMIT)
+    """
+    if value is None:
+        return DEFAULT_LIMIT
+    return max(1, min(value, MAX_LIMIT))
+
+def _like_pattern(text, prefix=False):
+    """
+    Maskiert Platzhalter im Suchbegriff und bildet das Muster für LIKE
+    """
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"{escaped}%" if prefix else f"%{escaped}%"
+
+def _fts_phrase(text):
+    """
+    Bildet aus dem Suchbegriff eine FTS5-Phrase (Teilzeichenkette dank Trigramm-Tokenizer)
+    """
+    return '"' + text.replace('"', '""') + '"'
+
+def _match_condition(model, text):
+    """
+    Gibt die Suchbedingung für das Suchverfahren der Datenbank zurück
+    
+    Returns:
+        Ein Tupel (Bedingung, FTS5-Unterabfrage oder None)
+    """
+    columns = [getattr(model, name) for name in SEARCH_COLUMNS[model]]
+    
+    if len(text) < MIN_TRIGRAM_LENGTH:
+        pattern = _like_pattern(text)
+        return or_(*[column.ilike(pattern, escape='\\') for column in columns]), None
+    
+    if get_search_backend() == 'sqlite':
+        fts = _fts_table(model)
+        matches = select(fts.c.rowid, fts.c.rank).where(fts.c[fts.name].op('MATCH')(_fts_phrase(text))).subquery()
+        return model.__mapper__.primary_key[0] == matches.c.rowid, matches
+    
+    # PostgreSQL nutzt hierfür die Trigramm-Indizes, andere Datenbanken durchsuchen die Tabelle
+    pattern = _like_pattern(text)
+    return or_(*[column.ilike(pattern, escape='\\') for column in columns]), None
+
+def filter_by_text(query, model, text):
+    """
+    Schränkt eine Abfrage auf Datensätze ein, die den Suchbegriff enthalten (ohne Sortierung)
+    """
+    text = (text or '').strip()
+    if not text:
+        return query
+    
+    condition, matches = _match_condition(model, text)
+    if matches is not None:
+        return query.filter(model.__mapper__.primary_key[0].in_(select(matches.c.rowid)))
+    
+    return query.filter(condition)
+
+def search(model, text, limit=DEFAULT_LIMIT, query=None):
+    """
+    Sucht Datensätze eines Modells und gibt die besten Treffer zurück
+    
+    Treffer, bei denen eine Spalte mit dem Suchbegriff beginnt, stehen vorn; danach wird
+    nach Relevanz sortiert (PostgreSQL: Trigramm-Ähnlichkeit, SQLite: BM25).
+    
+    Args:
+        model: Customer, Item oder Invoice
+        text: Suchbegriff (Groß-/Kleinschreibung wird ignoriert)
+        limit: Maximale Anzahl der Treffer
+        query: Optionale Basisabfrage mit weiteren Filtern (Standard: model.query)
+    
+    Returns:
+        Eine Liste der gefundenen Datensätze
+    """
+    query = query if query is not None else model.query
+    columns = [getattr(model, name) for name in SEARCH_COLUMNS[model]]
+    text = (text or '').strip()
+    
+    if not text:
+        return query.order_by(columns[0]).limit(limit).all()
+    
+    condition, matches = _match_condition(model, text)
+    prefix_pattern = _like_pattern(text, prefix=True)
+    is_prefix = case((or_(*[column.ilike(prefix_pattern, escape='\\') for column in columns]), 0), else_=1)
+    
+    if matches is not None:
+        query = query.join(matches, condition).order_by(is_prefix, matches.c.rank)
+    elif get_search_backend() == 'postgresql' and len(text) >= MIN_TRIGRAM_LENGTH:
+        similarity = func.greatest(*[func.similarity(func.coalesce(column, ''), text) for column in columns])
+        query = query.filter(condition).order_by(is_prefix, similarity.desc())
+    else:
+        query = query.filter(condition).order_by(is_prefix)
+    
+    return query.order_by(columns[0]).limit(limit).all()
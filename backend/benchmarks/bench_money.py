@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Vergleicht die Berechnung der Rechnungsbeträge mit app.money gegen die frühere Float-Berechnung
+
+Zwei Messungen auf denselben Positionen (Decimal-Werte wie aus Numeric-Spalten):
+
+- invoice: Rechnungen als ORM-Objekte. Früher wurde jede Position einzeln über float
+  berechnet und die Rechnung summierte die Positionen anschließend dreimal;
+  Invoice.calculate_totals berechnet jetzt alle Positionen in einem Aufruf.
+- arithmetic: nur die Rechenschritte ohne ORM (Float gegen exakte Decimal-Rechnung).
+
+Zusätzlich wird gezählt, bei wie vielen Rechnungen die Float-Berechnung eine andere
+Umsatzsteuer ergibt als die Berechnung je Steuersatz. Es wird keine Datenbank benötigt.
+
+Aufruf:
+    python benchmarks/bench_money.py --invoices 20000 --repeat 5
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.money import calculate_invoice_totals
+from generate_data import DEFAULT_SEED, MIN_ITEMS_PER_INVOICE, MAX_ITEMS_PER_INVOICE, VAT_RATES
+
+def generate_lines(count, seed):
+    """
+    Erzeugt je Rechnung eine Liste von Positionen (Menge, Nettopreis, Steuersatz)
+    """
+    rng = random.Random(seed)
+    
+    return [
+        [
+            (Decimal(rng.randint(1, 20)).quantize(Decimal('0.01')),
+             Decimal(f"{rng.uniform(5, 500):.2f}"),
+             Decimal(rng.choice(VAT_RATES)).quantize(Decimal('0.01')))
+            for _ in range(rng.randint(MIN_ITEMS_PER_INVOICE, MAX_ITEMS_PER_INVOICE))
+        ]
+        for _ in range(count)
+    ]
+
+def build_invoices(invoice_lines):
+    """
+    Erzeugt nicht gespeicherte Rechnungen samt Positionen als ORM-Objekte
+    """
+    from app.models import customer, item, recurring_invoice  # noqa: F401 (Mapper der Beziehungen)
+    from app.models.invoice import Invoice, InvoiceItem
+    
+    invoices = []
+    for lines in invoice_lines:
+        invoice = Invoice()
+        for position, (quantity, price_net, vat_rate) in enumerate(lines, start=1):
+            invoice.items.append(InvoiceItem(position=position, quantity=quantity, price_net=price_net, vat_rate=vat_rate))
+        invoices.append(invoice)
+    
+    return invoices
+
+def float_invoice_totals(invoice):
+    """
+    Frühere Berechnung: InvoiceItem.calculate_totals je Position, danach Invoice.calculate_totals
+    """
+    for invoice_item in invoice.items:
+        invoice_item.total_net = float(invoice_item.quantity) * float(invoice_item.price_net)
+        invoice_item.total_vat = invoice_item.total_net * (float(invoice_item.vat_rate) / 100)
+        invoice_item.total_gross = invoice_item.total_net + invoice_item.total_vat
+    
+    invoice.total_net = sum(invoice_item.total_net for invoice_item in invoice.items)
+    invoice.total_vat = sum(invoice_item.total_vat for invoice_item in invoice.items)
+    invoice.total_gross = sum(invoice_item.total_gross for invoice_item in invoice.items)
+
+def money_invoice_totals(invoice):
+    invoice.calculate_totals()
+
+def float_totals(lines):
+    """
+    Frühere Rechenschritte ohne ORM: je Position über float, Summen ungerundet
+    """
+    line_totals = []
+    for quantity, price_net, vat_rate in lines:
+        total_net = float(quantity) * float(price_net)
+        total_vat = total_net * (float(vat_rate) / 100)
+        line_totals.append((total_net, total_vat, total_net + total_vat))
+    
+    return {
+        'lines': line_totals,
+        'total_net': sum(line[0] for line in line_totals),
+        'total_vat': sum(line[1] for line in line_totals),
+        'total_gross': sum(line[2] for line in line_totals)
+    }
+
+def measure(function, invoices, repeat):
+    """
+    Gibt die beste Laufzeit über alle Wiederholungen in Sekunden zurück
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for invoice in invoices:
+            function(invoice)
+        duration = time.perf_counter() - started
+        best = duration if best is None else min(best, duration)
+    
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Vergleicht app.money mit der früheren Float-Berechnung")
+    parser.add_argument('--invoices', type=int, default=20000, help="Anzahl der Rechnungen")
+    parser.add_argument('--repeat', type=int, default=5, help="Anzahl der Wiederholungen (beste zählt)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="Startwert des Zufallsgenerators")
+    args = parser.parse_args()
+    
+    invoice_lines = generate_lines(args.invoices, args.seed)
+    line_count = sum(len(lines) for lines in invoice_lines)
+    invoices = build_invoices(invoice_lines)
+    
+    print(f"{args.invoices} Rechnungen, {line_count} Positionen")
+    for scenario, variants, data in (
+        ('invoice', (('float', float_invoice_totals), ('money', money_invoice_totals)), invoices),
+        ('arithmetic', (('float', float_totals), ('money', calculate_invoice_totals)), invoice_lines)
+    ):
+        for name, function in variants:
+            duration = measure(function, data, args.repeat)
+            print(f"{scenario:<11} {name:<6} {duration * 1000:9.1f} ms  {line_count / duration:12,.0f} Positionen/s")
+    
+    # Abweichungen der Float-Berechnung von der Umsatzsteuer je Steuersatz zählen
+    deviations = sum(
+        1 for lines in invoice_lines
+        if Decimal(str(round(float_totals(lines)['total_vat'], 2))) != calculate_invoice_totals(lines)['total_vat']
+    )
+    print(f"Rechnungen mit abweichender Umsatzsteuer bei Float-Berechnung: {deviations}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Zeigt die Abfragepläne und Laufzeiten der häufigsten Filter ohne und mit den Indizes
+
+Die Abfragen entsprechen denen der Anwendung (Rechnungsliste mit Cursor, Suche nach Kunde
+und Datum, PDF-Export nach Datum, E-Mail-Versand, fällige Intervallrechnungen, Positionen
+und E-Mail-Protokoll einer Rechnung, Stornorechnungen). Für den Vergleich werden die
+Indizes der Migration 52af69f6293d entfernt, die Abfragen gemessen, die Indizes wieder
+angelegt und erneut gemessen. Pläne gibt es für SQLite (EXPLAIN QUERY PLAN) und
+PostgreSQL (EXPLAIN).
+
+Achtung: Ohne --skip-generate wird die Zieldatenbank vollständig geleert.
+
+Aufruf:
+    python benchmarks/bench_query_plans.py --database-url sqlite:///$(pwd)/instance/benchmark.db --scale 0.1
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from generate_data import DEFAULT_SEED, REFERENCE_DATE, generate_dataset
+
+# Konfiguriere Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tabellen, deren Indizes für den Vergleich entfernt und wieder angelegt werden
+INDEXED_TABLES = ('invoices', 'invoice_items', 'recurring_invoices', 'recurring_invoice_items', 'email_logs')
+
+def get_indexes():
+    """
+    Gibt die Indizes der verglichenen Tabellen zurück (ohne Unique- und Suchindizes)
+    """
+    from app import db
+    from app.services.search_service import TRIGRAM_INDEXES
+    
+    search_indexes = {index.name for index in TRIGRAM_INDEXES}
+    return [
+        index
+        for table_name in INDEXED_TABLES
+        for index in sorted(db.metadata.tables[table_name].indexes, key=lambda index: index.name)
+        if not index.unique and index.name not in search_indexes
+    ]
+
+def get_samples():
+    """
+    Wählt die Parameter der Abfragen aus dem Datenbestand (Rechnung in der Mitte der Liste)
+    """
+    from app import db
+    from app.models.invoice import Invoice
+    
+    invoice_count = db.session.scalar(db.select(db.func.count(Invoice.invoice_id)))
+    invoice = db.session.scalars(
+        db.select(Invoice).order_by(Invoice.invoice_id).offset(invoice_count // 2).limit(1)
+    ).one()
+    
+    return {
+        'invoice_id': invoice.invoice_id,
+        'invoice_ids': list(range(invoice.invoice_id, invoice.invoice_id + 100)),
+        'customer_id': invoice.customer_id,
+        'invoice_date': invoice.invoice_date,
+        'date_from': invoice.invoice_date.replace(day=1),
+        'date_to': invoice.invoice_date,
+        'today': REFERENCE_DATE
+    }
+
+def get_queries(samples):
+    """
+    Gibt die gemessenen Abfragen als Liste von (Name, Beschreibung, Select) zurück
+    """
+    from app import db
+    from app.models.invoice import Invoice, InvoiceItem
+    from app.models.recurring_invoice import RecurringInvoice
+    from app.models.email_template import EmailLog
+    
+    return [
+        ('list_page', "Rechnungsliste, Seite nach einem Cursor", db.select(Invoice).where(
+            (Invoice.invoice_date < samples['invoice_date']) |
+            db.and_(Invoice.invoice_date == samples['invoice_date'], Invoice.invoice_id < samples['invoice_id'])
+        ).order_by(Invoice.invoice_date.desc(), Invoice.invoice_id.desc()).limit(101)),
+        ('customer_dates', "Suche nach Kunde und Datumsbereich", db.select(Invoice).where(
+            Invoice.customer_id == samples['customer_id'],
+            Invoice.invoice_date >= samples['date_from'],
+            Invoice.invoice_date <= samples['date_to']
+        )),
+        ('date_range', "PDF-Export eines Datumsbereichs", db.select(Invoice).where(
+            Invoice.invoice_date >= samples['date_from'],
+            Invoice.invoice_date <= samples['date_to']
+        ).order_by(Invoice.invoice_date, Invoice.invoice_id)),
+        ('unsent', "E-Mail-Versand: unversendete Rechnungen eines Status", db.select(Invoice.invoice_id).where(
+            Invoice.status == 'erstellt',
+            Invoice.email_sent == db.false()
+        ).order_by(Invoice.invoice_id).limit(50)),
+        ('due_recurring', "Fällige Intervallrechnungen", db.select(RecurringInvoice.recurring_id).where(
+            RecurringInvoice.status == 'aktiv',
+            RecurringInvoice.next_invoice_date <= samples['today']
+        ).order_by(RecurringInvoice.recurring_id)),
+        ('invoice_items', "Positionen von 100 Rechnungen (selectinload)", db.select(InvoiceItem).where(
+            InvoiceItem.invoice_id.in_(samples['invoice_ids'])
+        )),
+        ('email_log', "E-Mail-Protokoll einer Rechnung", db.select(EmailLog).where(
+            EmailLog.invoice_id == samples['invoice_id']
+        ).order_by(EmailLog.sent_date.desc())),
+        ('cancellations', "Stornorechnungen einer Rechnung", db.select(Invoice).where(
+            Invoice.original_invoice_id == samples['invoice_id']
+        ))
+    ]
+
+def explain(connection, sql):
+    """
+    Gibt den Abfrageplan als Liste von Zeilen zurück (leer, wenn die Datenbank nicht unterstützt wird)
+    """
+    if connection.dialect.name == 'sqlite':
+        return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+    if connection.dialect.name == 'postgresql':
+        return [row[0] for row in connection.exec_driver_sql(f"EXPLAIN {sql}")]
+    return []
+
+def measure(connection, queries, repeat):
+    """
+    Ermittelt Plan, Trefferzahl und beste Laufzeit jeder Abfrage
+    
+    Die Parameter werden als Literale eingesetzt, damit Plan und Messung dieselbe Anweisung
+    betreffen und Teilindizes erkannt werden.
+    """
+    results = {}
+    for name, description, statement in queries:
+        sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+        
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = connection.exec_driver_sql(sql).fetchall()
+            duration = time.perf_counter() - started
+            best = duration if best is None else min(best, duration)
+        
+        results[name] = {'plan': explain(connection, sql), 'rows': len(rows), 'seconds': best}
+    
+    return results
+
+def run(args):
+    """
+    Misst alle Abfragen ohne und mit Indizes und gibt beide Ergebnisse zurück
+    """
+    from app import db
+    
+    if not args.skip_generate:
+        start = time.perf_counter()
+        generate_dataset(args.scale, args.seed)
+        logger.info(f"Datenbestand erzeugt in {time.perf_counter() - start:.1f} s")
+    
+    queries = get_queries(get_samples())
+    indexes = get_indexes()
+    db.session.commit()
+    
+    results = {}
+    with db.engine.connect() as connection:
+        for phase in ('ohne', 'mit'):
+            for index in indexes:
+                if phase == 'ohne':
+                    index.drop(connection, checkfirst=True)
+                else:
+                    index.create(connection, checkfirst=True)
+            connection.exec_driver_sql("ANALYZE")
+            connection.commit()
+            
+            results[phase] = measure(connection, queries, args.repeat)
+            connection.commit()
+    
+    return queries, indexes, results
+
+def main():
+    parser = argparse.ArgumentParser(description="Abfragepläne ohne und mit den Indizes für häufige Filter")
+    parser.add_argument('--database-url', required=True, help="Benchmark-Datenbank (wird ohne --skip-generate geleert)")
+    parser.add_argument('--scale', type=float, default=0.1, help="Maßstab der Datenmenge (1.0 = 1 Mio. Rechnungen)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--repeat', type=int, default=5, help="Wiederholungen je Abfrage (beste zählt)")
+    parser.add_argument('--skip-generate', action='store_true', help="Vorhandenen Datenbestand verwenden")
+    args = parser.parse_args()
+    
+    os.environ['DATABASE_URL'] = args.database_url
+    from app import create_app
+    
+    app = create_app()
+    with app.app_context():
+        queries, indexes, results = run(args)
+    
+    print(f"Verglichene Indizes: {', '.join(index.name for index in indexes)}\n")
+    for name, description, statement in queries:
+        before, after = results['ohne'][name], results['mit'][name]
+        speedup = before['seconds'] / after['seconds'] if after['seconds'] else float('inf')
+        print(f"{name} – {description} ({after['rows']} Zeilen)")
+        print(f"  ohne Indizes {before['seconds'] * 1000:9.2f} ms")
+        for line in before['plan']:
+            print(f"      {line}")
+        print(f"  mit Indizes  {after['seconds'] * 1000:9.2f} ms  ({speedup:.1f}x)")
+        for line in after['plan']:
+            print(f"      {line}")
+        print()
+
+if __name__ == '__main__':
+    main()
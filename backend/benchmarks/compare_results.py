@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Vergleicht zwei Ergebnisdateien von run_benchmarks.py
+
+Aufruf:
+    python benchmarks/compare_results.py results/abc1234-sqlite-scale0.01.json results/def5678-sqlite-scale0.01.json
+"""
+
+import argparse
+import json
+
+# Verglichene Kennzahlen: (Schlüssel, Bezeichnung, größer ist besser)
+METRICS = (
+    ('throughput_per_second', 'Durchsatz/s', True),
+    ('p50_ms', 'p50 ms', False),
+    ('p99_ms', 'p99 ms', False)
+)
+
+def load_result(path):
+    with open(path, encoding='utf-8') as result_file:
+        return json.load(result_file)
+
+def format_change(old, new, higher_is_better):
+    """
+    Gibt die relative Änderung aus und markiert Verschlechterungen mit '!'
+    """
+    if not old or new is None:
+        return '-'
+    
+    change = (new - old) / old * 100
+    worse = change < 0 if higher_is_better else change > 0
+    return f"{change:+.1f}%{' !' if worse and abs(change) >= 5 else ''}"
+
+def compare(baseline, candidate):
+    """
+    Gibt die Kennzahlen beider Läufe als Tabellenzeilen zurück
+    """
+    lines = [f"{'Benchmark':<12} {'Kennzahl':<12} {baseline['git_revision']:>12} {candidate['git_revision']:>12} {'Änderung':>10}"]
+    
+    for name in baseline['benchmarks']:
+        if name not in candidate['benchmarks']:
+            continue
+        
+        if 'error' in baseline['benchmarks'][name] or 'error' in candidate['benchmarks'][name]:
+            lines.append(f"{name:<12} Fehler in mindestens einem Lauf")
+            continue
+        
+        for key, label, higher_is_better in METRICS:
+            old = baseline['benchmarks'][name][key]
+            new = candidate['benchmarks'][name][key]
+            lines.append(
+                f"{name:<12} {label:<12} {old if old is not None else '-':>12} {new if new is not None else '-':>12} "
+                f"{format_change(old, new, higher_is_better):>10}"
+            )
+    
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description="Vergleicht zwei Benchmark-Ergebnisse")
+    parser.add_argument('baseline', help="Ergebnis des Vergleichsstands (z.B. main)")
+    parser.add_argument('candidate', help="Ergebnis des neuen Stands")
+    args = parser.parse_args()
+    
+    baseline = load_result(args.baseline)
+    candidate = load_result(args.candidate)
+    
+    for key in ('database', 'scale', 'seed'):
+        if baseline.get(key) != candidate.get(key):
+            print(f"Warnung: {key} unterscheidet sich ({baseline.get(key)} / {candidate.get(key)})")
+    
+    print('\n'.join(compare(baseline, candidate)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Deterministischer Generator für Benchmark-Daten
+
+Erzeugt bei Maßstab 1.0 10.000 Kunden, 1.000.000 Rechnungen und rund 5.000.000
+Rechnungspositionen. Mit --scale lässt sich die Datenmenge verkleinern (z.B. 0.01).
+Gleicher Seed und gleicher Maßstab ergeben immer denselben Datenbestand.
+
+Achtung: Die Zieldatenbank wird vollständig geleert.
+
+Aufruf:
+    python benchmarks/generate_data.py --database-url sqlite:///benchmark.db --scale 0.01
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Konfiguriere Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Standard-Seed des Generators
+DEFAULT_SEED = 42
+
+# Stichtag der Daten; alle Rechnungen liegen in den 24 Monaten davor
+REFERENCE_DATE = date(2025, 1, 1)
+
+# Datenmenge bei Maßstab 1.0
+FULL_SCALE = {
+    'customers': 10000,
+    'invoices': 1000000,
+    'articles': 1000
+}
+
+# Positionen pro Rechnung (gleichverteilt, im Mittel 5)
+MIN_ITEMS_PER_INVOICE = 1
+MAX_ITEMS_PER_INVOICE = 9
+
+# Anteil der Kunden mit einer Intervallrechnung
+RECURRING_SHARE = 0.1
+
+# Status der Rechnungen mit ihrer Häufigkeit
+INVOICE_STATUSES = (('erstellt', 10), ('versendet', 30), ('bezahlt', 60))
+
+# Anzahl der Rechnungen pro INSERT-Block
+CHUNK_SIZE = 10000
+
+CITIES = ('Berlin', 'Hamburg', 'München', 'Köln', 'Frankfurt', 'Stuttgart', 'Düsseldorf', 'Leipzig')
+STREETS = ('Hauptstraße', 'Bahnhofstraße', 'Gartenweg', 'Schulstraße', 'Lindenallee', 'Bergstraße')
+FIRST_NAMES = ('Anna', 'Ben', 'Clara', 'David', 'Emma', 'Felix', 'Greta', 'Hannes', 'Ida', 'Jonas')
+LAST_NAMES = ('Müller', 'Schmidt', 'Schneider', 'Fischer', 'Weber', 'Meyer', 'Wagner', 'Becker')
+LEGAL_FORMS = ('GmbH', 'AG', 'KG', 'UG', 'e.K.')
+ARTICLE_NAMES = ('Beratung', 'Wartung', 'Lizenz', 'Schulung', 'Hosting', 'Support', 'Entwicklung', 'Hardware')
+UNITS = ('Stück', 'Stunde', 'Monat', 'Pauschal')
+VAT_RATES = (19.0, 19.0, 19.0, 7.0)
+
+def get_scaled_counts(scale):
+    """
+    Gibt die Anzahl der Kunden, Rechnungen und Artikel für einen Maßstab zurück
+    """
+    return {name: max(1, int(count * scale)) for name, count in FULL_SCALE.items()}
+
+def generate_dataset(scale=1.0, seed=DEFAULT_SEED, chunk_size=CHUNK_SIZE):
+    """
+    Leert die Datenbank und füllt sie mit dem Benchmark-Datenbestand
+    
+    Die Zeilen werden blockweise mit Mehrfach-INSERTs geschrieben. Alle IDs werden
+    explizit vergeben, damit die Daten unabhängig von der Datenbank identisch sind.
+    Muss innerhalb eines App-Kontexts aufgerufen werden.
+    
+    Returns:
+        Ein Dictionary mit der Anzahl der erzeugten Zeilen je Tabelle
+    """
+    from app import db, import_models
+    from app.services.search_service import rebuild_search_indexes
+    
+    rng = random.Random(seed)
+    counts = get_scaled_counts(scale)
+    
+    # Alle Modelle importieren, damit drop_all/create_all alle Tabellen kennt
+    import_models()
+    
+    db.drop_all()
+    db.create_all()
+    
+    _insert_static_data()
+    _insert_rows('customers', _generate_customers(rng, counts['customers']), chunk_size)
+    articles = _generate_articles(rng, counts['articles'])
+    _insert_rows('items', articles, chunk_size)
+    
+    invoice_count, item_count, sequences = _insert_invoices(rng, counts, articles, chunk_size)
+    _insert_rows('invoice_number_sequences', [
+        {'prefix': prefix, 'last_value': last_value} for prefix, last_value in sorted(sequences.items())
+    ], chunk_size)
+    
+    recurring_rows, recurring_item_rows = _generate_recurring_invoices(rng, counts['customers'], articles)
+    _insert_rows('recurring_invoices', recurring_rows, chunk_size)
+    _insert_rows('recurring_invoice_items', recurring_item_rows, chunk_size)
+    
+    _reset_sequences()
+    
+    # Suchindizes einmal aus den fertigen Tabellen aufbauen statt zeilenweise per Trigger
+    rebuild_search_indexes()
+    db.session.commit()
+    
+    return {
+        'customers': counts['customers'],
+        'items': counts['articles'],
+        'invoices': invoice_count,
+        'invoice_items': item_count,
+        'recurring_invoices': len(recurring_rows)
+    }
+
+def _insert_rows(table_name, rows, chunk_size):
+    """
+    Schreibt Zeilen blockweise mit einem executemany in eine Tabelle
+    """
+    from app import db
+    
+    table = db.metadata.tables[table_name]
+    rows = list(rows)
+    for start in range(0, len(rows), chunk_size):
+        db.session.execute(table.insert(), rows[start:start + chunk_size])
+
+def _insert_static_data():
+    """
+    Legt die Unternehmensdaten und die Standard-E-Mail-Vorlage an
+    """
+    from app import db
+    from app.models.company_data import CompanyData
+    from app.models.email_template import EmailTemplate
+    
+    db.session.add(CompanyData(
+        company_name="Benchmark GmbH",
+        legal_form="GmbH",
+        street="Messweg",
+        house_number="1",
+        postal_code="10115",
+        city="Berlin",
+        country="Deutschland",
+        tax_id="12/345/67890",
+        vat_id="DE123456789",
+        email="rechnung@benchmark.example",
+        bank_name="Benchmark Bank",
+        iban="DE89370400440532013000",
+        bic="COBADEFFXXX"
+    ))
+    db.session.add(EmailTemplate(
+        name="Standard",
+        subject="Rechnung {invoice_number} von {company_name}",
+        body="Sehr geehrte/r {customer_name},\n\nanbei erhalten Sie die Rechnung {invoice_number} "
+             "vom {invoice_date} über {total_amount}, fällig am {due_date}.\n\nMit freundlichen Grüßen\n{company_name}",
+        is_default=True
+    ))
+    db.session.flush()
+
+def _generate_customers(rng, count):
+    for customer_id in range(1, count + 1):
+        is_company = customer_id % 3 != 0
+        last_name = rng.choice(LAST_NAMES)
+        yield {
+            'customer_id': customer_id,
+            'company_name': f"{last_name} {rng.choice(ARTICLE_NAMES)} {rng.choice(LEGAL_FORMS)}" if is_company else None,
+            'first_name': None if is_company else rng.choice(FIRST_NAMES),
+            'last_name': None if is_company else last_name,
+            'street': rng.choice(STREETS),
+            'house_number': str(rng.randint(1, 200)),
+            'postal_code': f"{rng.randint(10000, 99999)}",
+            'city': rng.choice(CITIES),
+            'country': 'Deutschland',
+            'vat_id': f"DE{rng.randint(100000000, 999999999)}" if is_company else None,
+            'email': f"kunde{customer_id}@benchmark.example",
+            'is_active': True
+        }
+
+def _generate_articles(rng, count):
+    articles = []
+    for item_id in range(1, count + 1):
+        articles.append({
+            'item_id': item_id,
+            'item_number': f"ART-{item_id:05d}",
+            'name': f"{rng.choice(ARTICLE_NAMES)} {item_id}",
+            'description': f"Leistung {item_id}",
+            'unit': rng.choice(UNITS),
+            'price_net': round(rng.uniform(5, 500), 2),
+            'vat_rate': rng.choice(VAT_RATES),
+            'is_active': True
+        })
+    return articles
+
+def _insert_invoices(rng, counts, articles, chunk_size):
+    """
+    Erzeugt die Rechnungen samt Positionen und schreibt sie blockweise
+    
+    Returns:
+        Ein Tupel (Anzahl Rechnungen, Anzahl Positionen, letzte Nummer je Präfix)
+    """
+    from app.money import calculate_invoice_totals, AMOUNT_KEYS
+    from app.services.invoice_number_service import get_invoice_number_prefix
+    
+    statuses = [status for status, weight in INVOICE_STATUSES for _ in range(weight)]
+    sequences = {}
+    invoice_item_id = 0
+    invoice_rows = []
+    item_rows = []
+    
+    for invoice_id in range(1, counts['invoices'] + 1):
+        invoice_date = REFERENCE_DATE - timedelta(days=rng.randint(1, 730))
+        prefix = get_invoice_number_prefix(invoice_date)
+        sequences[prefix] = sequences.get(prefix, 0) + 1
+        status = rng.choice(statuses)
+        
+        lines = [
+            (rng.choice(articles), rng.randint(1, 20))
+            for _ in range(rng.randint(MIN_ITEMS_PER_INVOICE, MAX_ITEMS_PER_INVOICE))
+        ]
+        totals = calculate_invoice_totals(
+            (quantity, article['price_net'], article['vat_rate']) for article, quantity in lines
+        )
+        
+        for position, ((article, quantity), line_totals) in enumerate(zip(lines, totals['lines']), start=1):
+            invoice_item_id += 1
+            item_rows.append(dict(
+                zip(AMOUNT_KEYS, line_totals),
+                invoice_item_id=invoice_item_id,
+                invoice_id=invoice_id,
+                item_id=article['item_id'],
+                position=position,
+                quantity=quantity,
+                unit=article['unit'],
+                price_net=article['price_net'],
+                vat_rate=article['vat_rate'],
+                description=article['description']
+            ))
+        
+        invoice_rows.append({
+            'invoice_id': invoice_id,
+            'invoice_number': f"{prefix}{sequences[prefix]:04d}",
+            'customer_id': rng.randint(1, counts['customers']),
+            'invoice_date': invoice_date,
+            'due_date': invoice_date + timedelta(days=14),
+            'delivery_date': invoice_date,
+            'status': status,
+            'payment_status': 'vollständig bezahlt' if status == 'bezahlt' else 'offen',
+            'payment_method': 'Überweisung',
+            'total_net': totals['total_net'],
+            'total_vat': totals['total_vat'],
+            'total_gross': totals['total_gross'],
+            'paid_amount': 0,
+            'open_amount': totals['total_gross'],
+            'is_cancelled': False,
+            'is_recurring': False,
+            'email_sent': status != 'erstellt'
+        })
+        
+        if len(invoice_rows) >= chunk_size:
+            _flush_invoices(invoice_rows, item_rows, chunk_size)
+            logger.info(f"{invoice_id} von {counts['invoices']} Rechnungen geschrieben")
+    
+    _flush_invoices(invoice_rows, item_rows, chunk_size)
+    
+    return counts['invoices'], invoice_item_id, sequences
+
+def _flush_invoices(invoice_rows, item_rows, chunk_size):
+    from app import db
+    
+    _insert_rows('invoices', invoice_rows, chunk_size)
+    _insert_rows('invoice_items', item_rows, chunk_size * MAX_ITEMS_PER_INVOICE)
+    db.session.commit()
+    
+    invoice_rows.clear()
+    item_rows.clear()
+
+def _generate_recurring_invoices(rng, customer_count, articles):
+    """
+    Erzeugt monatliche Intervallrechnungen, die am Stichtag fällig sind
+    """
+    recurring_rows = []
+    item_rows = []
+    
+    for customer_id in range(1, customer_count + 1):
+        if rng.random() >= RECURRING_SHARE:
+            continue
+        
+        recurring_id = len(recurring_rows) + 1
+        recurring_rows.append({
+            'recurring_id': recurring_id,
+            'customer_id': customer_id,
+            'start_date': REFERENCE_DATE - timedelta(days=365),
+            'interval_type': 'monatlich',
+            'interval_value': 1,
+            'next_invoice_date': REFERENCE_DATE,
+            'status': 'aktiv'
+        })
+        
+        for position in range(1, rng.randint(1, 3) + 1):
+            article = rng.choice(articles)
+            item_rows.append({
+                'recurring_item_id': len(item_rows) + 1,
+                'recurring_id': recurring_id,
+                'item_id': article['item_id'],
+                'position': position,
+                'quantity': rng.randint(1, 5),
+                'unit': article['unit'],
+                'price_net': article['price_net'],
+                'vat_rate': article['vat_rate'],
+                'description': article['description']
+            })
+    
+    return recurring_rows, item_rows
+
+def _reset_sequences():
+    """
+    Setzt unter PostgreSQL die ID-Sequenzen hinter die explizit vergebenen IDs
+    """
+    from app import db
+    
+    if db.engine.dialect.name != 'postgresql':
+        return
+    
+    for table_name, column in (
+        ('customers', 'customer_id'),
+        ('items', 'item_id'),
+        ('invoices', 'invoice_id'),
+        ('invoice_items', 'invoice_item_id'),
+        ('recurring_invoices', 'recurring_id'),
+        ('recurring_invoice_items', 'recurring_item_id')
+    ):
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('{table_name}', '{column}'), "
+            f"COALESCE((SELECT MAX({column}) FROM {table_name}), 1))"
+        ))
+
+def main():
+    parser = argparse.ArgumentParser(description="Erzeugt den Datenbestand für die Benchmarks")
+    parser.add_argument('--database-url', required=True, help="Zieldatenbank (wird geleert)")
+    parser.add_argument('--scale', type=float, default=1.0, help="Maßstab der Datenmenge (1.0 = 1 Mio. Rechnungen)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    args = parser.parse_args()
+    
+    os.environ['DATABASE_URL'] = args.database_url
+    from app import create_app
+    
+    app = create_app()
+    with app.app_context():
+        start = time.perf_counter()
+        counts = generate_dataset(args.scale, args.seed)
+        logger.info(f"Datenbestand erzeugt in {time.perf_counter() - start:.1f} s: {counts}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Benchmarks für die wichtigsten Endpunkte und Hintergrundaufgaben
+
+Misst Rechnungsliste, Suche, Anlegen einer Rechnung mit vielen Positionen, Storno,
+PDF-Erstellung, Stapelversand von E-Mails (gegen einen lokalen SMTP-Server) und die
+Generierung der Intervallrechnungen. Pro Benchmark werden Durchsatz sowie p50 und
+p99 der Laufzeit ermittelt und als JSON unter benchmarks/results/ gespeichert, damit
+sich Läufe verschiedener Commits vergleichen lassen (siehe compare_results.py).
+
+Achtung: Ohne --skip-generate wird die Zieldatenbank geleert und neu befüllt.
+
+Aufruf:
+    python benchmarks/run_benchmarks.py --database-url sqlite:///benchmark.db --scale 0.01
+    python benchmarks/run_benchmarks.py --database-url postgresql://localhost/benchmark --scale 1
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from generate_data import DEFAULT_SEED, REFERENCE_DATE, generate_dataset
+from smtp_stub import SmtpStub
+
+# Konfiguriere Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Seitengröße beim Blättern durch die Rechnungsliste
+LIST_PAGE_SIZE = 100
+
+# Anzahl der Positionen beim Anlegen einer Rechnung
+CREATE_ITEM_COUNT = 100
+
+# Anzahl der E-Mails pro Stapelversand
+EMAIL_BATCH_SIZE = 50
+
+def percentile(values, percent):
+    """
+    Gibt das Perzentil einer Liste nach dem Nearest-Rank-Verfahren zurück
+    """
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+def summarize(durations, units):
+    """
+    Fasst die Laufzeiten eines Benchmarks zusammen
+    
+    Args:
+        durations: Laufzeit jeder Wiederholung in Sekunden
+        units: Anzahl der verarbeiteten Einheiten (Anfragen, Rechnungen, E-Mails)
+    """
+    total = sum(durations)
+    return {
+        'iterations': len(durations),
+        'units': units,
+        'total_seconds': round(total, 6),
+        'throughput_per_second': round(units / total, 3) if total else None,
+        'mean_ms': round(total / len(durations) * 1000, 3),
+        'p50_ms': round(percentile(durations, 50) * 1000, 3),
+        'p99_ms': round(percentile(durations, 99) * 1000, 3)
+    }
+
+def measure(func, iterations, warmup=0):
+    """
+    Führt func(i) wiederholt aus und misst jede Ausführung
+    
+    func gibt die Anzahl der verarbeiteten Einheiten zurück. Die ersten warmup
+    Ausführungen werden nicht gewertet.
+    """
+    durations = []
+    units = 0
+    
+    for i in range(warmup + iterations):
+        start = time.perf_counter()
+        processed = func(i)
+        duration = time.perf_counter() - start
+        
+        if i >= warmup:
+            durations.append(duration)
+            units += processed
+    
+    return summarize(durations, units)
+
+class BenchmarkContext:
+    """
+    Gemeinsamer Zustand der Benchmarks (App, Testclient, Zufallsgenerator)
+    """
+    def __init__(self, app, seed, iterations, batch_runs, warmup):
+        from flask_jwt_extended import create_access_token
+        
+        self.app = app
+        self.client = app.test_client()
+        self.rng = random.Random(seed)
+        self.iterations = iterations
+        self.batch_runs = batch_runs
+        self.warmup = warmup
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity="benchmark")}'}
+    
+    def request(self, method, url, expected_status, **kwargs):
+        response = self.client.open(url, method=method, headers=self.headers, **kwargs)
+        if response.status_code != expected_status:
+            raise RuntimeError(f"{method} {url}: Status {response.status_code} statt {expected_status}: {response.get_data(as_text=True)[:500]}")
+        return response
+    
+    def get_ids(self, column, *criteria):
+        """
+        Gibt alle IDs zurück, die den Kriterien entsprechen (sortiert)
+        """
+        from app import db
+        
+        return db.session.scalars(db.select(column).where(*criteria).order_by(column)).all()
+    
+    def sample_ids(self, column, count, *criteria):
+        """
+        Wählt zufällig count verschiedene IDs aus, die den Kriterien entsprechen
+        """
+        ids = self.get_ids(column, *criteria)
+        if len(ids) < count:
+            raise RuntimeError(f"Zu wenige Datensätze für den Benchmark ({len(ids)} statt {count})")
+        return self.rng.sample(ids, count)
+
+def bench_list(context):
+    """
+    Blättert mit dem Cursor durch die Rechnungsliste
+    """
+    state = {'cursor': None}
+    
+    def fetch_page(i):
+        url = f'/api/invoices?limit={LIST_PAGE_SIZE}'
+        if state['cursor']:
+            url += f"&cursor={state['cursor']}"
+        
+        response = context.request('GET', url, 200)
+        state['cursor'] = response.headers.get('X-Next-Cursor')
+        return len(response.get_json())
+    
+    return measure(fetch_page, context.iterations, context.warmup)
+
+def bench_search(context):
+    """
+    Sucht abwechselnd nach Rechnungsnummer, Kunde und Status sowie Datumsbereich
+    """
+    from app.models.invoice import Invoice
+    from app import db
+    
+    invoice_ids = context.sample_ids(Invoice.invoice_id, context.iterations + context.warmup)
+    invoices = {
+        invoice.invoice_id: invoice
+        for invoice in db.session.scalars(db.select(Invoice).where(Invoice.invoice_id.in_(invoice_ids)))
+    }
+    
+    def search(i):
+        invoice = invoices[invoice_ids[i]]
+        if i % 3 == 0:
+            query = f'invoice_number={invoice.invoice_number}'
+        elif i % 3 == 1:
+            query = f'customer_id={invoice.customer_id}&status={invoice.status}'
+        else:
+            query = f'date_from={invoice.invoice_date.isoformat()}&date_to={invoice.invoice_date.isoformat()}'
+        
+        return len(context.request('GET', f'/api/invoices/search?{query}', 200).get_json())
+    
+    return measure(search, context.iterations, context.warmup)
+
+def bench_create(context):
+    """
+    Legt Rechnungen mit jeweils CREATE_ITEM_COUNT Positionen an
+    """
+    from app.models.customer import Customer
+    from app.models.item import Item
+    
+    customer_ids = context.rng.choices(context.get_ids(Customer.customer_id), k=context.iterations + context.warmup)
+    item_ids = context.rng.choices(context.get_ids(Item.item_id, Item.is_active.is_(True)), k=CREATE_ITEM_COUNT)
+    
+    def create(i):
+        payload = {
+            'customer_id': customer_ids[i],
+            'items': [{'item_id': item_id, 'quantity': 1 + position % 5} for position, item_id in enumerate(item_ids)]
+        }
+        context.request('POST', '/api/invoices', 201, json=payload)
+        return 1
+    
+    return measure(create, context.iterations, context.warmup)
+
+def bench_cancel(context):
+    """
+    Storniert jeweils eine versendete Rechnung
+    """
+    from app.models.invoice import Invoice
+    
+    invoice_ids = context.sample_ids(
+        Invoice.invoice_id, context.iterations + context.warmup,
+        Invoice.status == 'versendet', Invoice.is_cancelled.is_(False)
+    )
+    
+    def cancel(i):
+        context.request('POST', f'/api/invoices/{invoice_ids[i]}/cancel', 200, json={'reason': 'Benchmark'})
+        return 1
+    
+    return measure(cancel, context.iterations, context.warmup)
+
+def bench_pdf_render(context):
+    """
+    Erstellt das PDF einzelner Rechnungen (ohne Cache, im eigenen Prozess)
+    
+    Gemessen wird nur die Erstellung; Rechnung und Unternehmensdaten werden vorher geladen.
+    """
+    from app.models.invoice import Invoice
+    from app.models.company_data import CompanyData
+    from app.services.pdf_service import generate_invoice_pdf
+    from app import db
+    from sqlalchemy.orm import selectinload
+    
+    invoice_ids = context.sample_ids(Invoice.invoice_id, context.iterations + context.warmup)
+    company_data = CompanyData.query.first()
+    
+    # Laden der Rechnung gehört nicht zur Messung
+    durations = []
+    for i in range(context.warmup + context.iterations):
+        invoice = db.session.scalars(
+            db.select(Invoice)
+            .options(selectinload(Invoice.items), selectinload(Invoice.customer))
+            .where(Invoice.invoice_id == invoice_ids[i])
+        ).one()
+        
+        start = time.perf_counter()
+        generate_invoice_pdf(invoice, company_data=company_data)
+        if i >= context.warmup:
+            durations.append(time.perf_counter() - start)
+    
+    return summarize(durations, len(durations))
+
+def bench_batch_email(context):
+    """
+    Versendet Stapel von EMAIL_BATCH_SIZE Rechnungen über den Postausgang an den SMTP-Stub
+    """
+    from app.services.email_service import send_invoice_emails
+    
+    def send_batch(i):
+        results = send_invoice_emails(status='erstellt', limit=EMAIL_BATCH_SIZE)
+        if results['failed']:
+            raise RuntimeError(f"{results['failed']} E-Mails konnten nicht versendet werden")
+        return results['success']
+    
+    return measure(send_batch, context.batch_runs)
+
+def bench_recurring(context):
+    """
+    Generiert die fälligen Intervallrechnungen für aufeinanderfolgende Monate
+    """
+    from app.services.recurring_invoice_service import add_months, check_and_generate_recurring_invoices
+    
+    def generate(i):
+        return len(check_and_generate_recurring_invoices(today=add_months(REFERENCE_DATE, i)))
+    
+    return measure(generate, context.batch_runs)
+
+# Reihenfolge der Ausführung: lesende Benchmarks vor den schreibenden
+BENCHMARKS = {
+    'list': bench_list,
+    'search': bench_search,
+    'pdf_render': bench_pdf_render,
+    'create': bench_create,
+    'cancel': bench_cancel,
+    'batch_email': bench_batch_email,
+    'recurring': bench_recurring
+}
+
+def get_git_revision():
+    """
+    Gibt den aktuellen Commit und an, ob es ungespeicherte Änderungen gibt
+    """
+    try:
+        revision = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+        dirty = bool(subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], text=True).strip())
+    except (OSError, subprocess.CalledProcessError):
+        return 'unbekannt', False
+    
+    return revision, dirty
+
+def count_rows():
+    """
+    Gibt die Anzahl der Zeilen der wichtigsten Tabellen zurück
+    """
+    from app import db
+    
+    return {
+        table_name: db.session.execute(db.select(db.func.count()).select_from(db.metadata.tables[table_name])).scalar()
+        for table_name in ('customers', 'items', 'invoices', 'invoice_items', 'recurring_invoices')
+    }
+
+def create_benchmark_app(database_url, smtp):
+    """
+    Erstellt die App für die Benchmarks (lokaler SMTP-Server, eigenes PDF-Cache-Verzeichnis)
+    """
+    os.environ.update({
+        'DATABASE_URL': database_url,
+        'MAIL_SERVER': smtp.host,
+        'MAIL_PORT': str(smtp.port),
+        'MAIL_USE_TLS': 'False',
+        'MAIL_DEFAULT_SENDER': 'rechnung@benchmark.example',
+        'EMAIL_RATE_LIMIT': '0',
+        'PDF_CACHE_DIR': tempfile.mkdtemp(prefix='benchmark-pdf-cache-'),
+        'RECURRING_CATCH_UP': 'False',
+        'INSTRUMENTATION_ENABLED': 'False'
+    })
+    os.environ.pop('MAIL_USERNAME', None)
+    os.environ.pop('MAIL_PASSWORD', None)
+    
+    from app import create_app, db
+    app = create_app()
+    
+    # SQLite legt nur die Datei an, nicht ihr Verzeichnis (z.B. instance/ in einem frischen Checkout)
+    with app.app_context():
+        database = db.engine.url.database if db.engine.dialect.name == 'sqlite' else None
+    if database and os.path.dirname(database):
+        os.makedirs(os.path.dirname(database), exist_ok=True)
+    
+    return app
+
+def run(args):
+    """
+    Führt die Benchmarks aus und gibt das Ergebnis als Dictionary zurück
+    """
+    from app import db
+    
+    selected = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"Unbekannte Benchmarks: {', '.join(unknown)}")
+    
+    with SmtpStub() as smtp:
+        app = create_benchmark_app(args.database_url, smtp)
+        
+        with app.app_context():
+            if not args.skip_generate:
+                start = time.perf_counter()
+                generate_dataset(args.scale, args.seed)
+                logger.info(f"Datenbestand erzeugt in {time.perf_counter() - start:.1f} s")
+            
+            revision, dirty = get_git_revision()
+            result = {
+                'git_revision': revision,
+                'git_dirty': dirty,
+                'created_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+                'database': db.engine.dialect.name,
+                'scale': args.scale,
+                'seed': args.seed,
+                'dataset': count_rows(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'benchmarks': {}
+            }
+            
+            context = BenchmarkContext(app, args.seed, args.iterations, args.batch_runs, args.warmup)
+            for name in BENCHMARKS:
+                if name not in selected:
+                    continue
+                
+                logger.info(f"Starte Benchmark {name}")
+                try:
+                    result['benchmarks'][name] = BENCHMARKS[name](context)
+                except Exception as e:
+                    # Ein fehlgeschlagener Benchmark bricht den Lauf nicht ab
+                    logger.error(f"Fehler beim Benchmark {name}: {str(e)}")
+                    result['benchmarks'][name] = {'error': str(e)}
+                    db.session.rollback()
+                db.session.remove()
+                logger.info(f"{name}: {result['benchmarks'][name]}")
+            
+            result['smtp_messages'] = smtp.message_count
+    
+    return result
+
+def save_result(result, output_dir=RESULTS_DIR):
+    """
+    Speichert das Ergebnis als JSON (Dateiname aus Commit, Datenbank und Maßstab)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    suffix = '-dirty' if result['git_dirty'] else ''
+    filename = f"{result['git_revision']}{suffix}-{result['database']}-scale{result['scale']}.json"
+    path = os.path.join(output_dir, filename)
+    
+    with open(path, 'w', encoding='utf-8') as result_file:
+        json.dump(result, result_file, indent=2, ensure_ascii=False)
+        result_file.write('\n')
+    
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks für die Buchhaltungssoftware")
+    parser.add_argument('--database-url', required=True, help="Benchmark-Datenbank (wird ohne --skip-generate geleert)")
+    parser.add_argument('--scale', type=float, default=0.01, help="Maßstab der Datenmenge (1.0 = 1 Mio. Rechnungen)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--iterations', type=int, default=50, help="Wiederholungen der Anfrage-Benchmarks")
+    parser.add_argument('--warmup', type=int, default=3, help="Nicht gewertete Wiederholungen zu Beginn")
+    parser.add_argument('--batch-runs', type=int, default=5, help="Läufe von Stapelversand und Intervallrechnungen")
+    parser.add_argument('--only', help="Kommagetrennte Auswahl: " + ', '.join(BENCHMARKS))
+    parser.add_argument('--skip-generate', action='store_true', help="Vorhandenen Datenbestand verwenden")
+    parser.add_argument('--output-dir', default=RESULTS_DIR)
+    args = parser.parse_args()
+    
+    result = run(args)
+    path = save_result(result, args.output_dir)
+    
+    print(f"\nErgebnisse ({result['database']}, Maßstab {result['scale']}, Commit {result['git_revision']}):")
+    for name, summary in result['benchmarks'].items():
+        if 'error' in summary:
+            print(f"  {name:<12} Fehler: {summary['error'][:100]}")
+            continue
+        print(f"  {name:<12} {summary['throughput_per_second']:>10} /s   "
+              f"p50 {summary['p50_ms']:>9.2f} ms   p99 {summary['p99_ms']:>9.2f} ms")
+    print(f"\nGespeichert unter {path}")
+    
+    # Fehlgeschlagene Benchmarks sind gespeichert, der Lauf gilt aber als fehlgeschlagen
+    if any('error' in summary for summary in result['benchmarks'].values()):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Lokaler SMTP-Server für die Benchmarks
+
+Nimmt Nachrichten ohne TLS und Anmeldung entgegen und verwirft sie. Es werden nur
+die Befehle unterstützt, die Flask-Mail beim Versand verwendet.
+"""
+
+import socketserver
+import threading
+
+class SmtpStubHandler(socketserver.StreamRequestHandler):
+    """
+    Bearbeitet eine SMTP-Verbindung (mehrere Nachrichten pro Verbindung möglich)
+    """
+    def handle(self):
+        self._reply('220 smtp-stub ESMTP')
+        
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            
+            command = line.decode('ascii', errors='replace').strip().upper()
+            
+            if command.startswith('EHLO'):
+                self._reply('250-smtp-stub', '250-8BITMIME', '250 SIZE 52428800')
+            elif command.startswith('HELO'):
+                self._reply('250 smtp-stub')
+            elif command.startswith('DATA'):
+                self._reply('354 Ende mit <CRLF>.<CRLF>')
+                self._read_data()
+                self.server.count_message()
+                self._reply('250 OK')
+            elif command.startswith('QUIT'):
+                self._reply('221 Bye')
+                return
+            else:
+                # MAIL FROM, RCPT TO, RSET, NOOP
+                self._reply('250 OK')
+    
+    def _read_data(self):
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b'.\r\n', b'.\n'):
+                return
+    
+    def _reply(self, *lines):
+        self.wfile.write(''.join(f'{line}\r\n' for line in lines).encode('ascii'))
+
+class SmtpStub(socketserver.ThreadingTCPServer):
+    """
+    SMTP-Server in einem Hintergrund-Thread
+    
+    Verwendung:
+        with SmtpStub() as smtp:
+            ... MAIL_SERVER = smtp.host, MAIL_PORT = smtp.port ...
+            print(smtp.message_count)
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), SmtpStubHandler)
+        self.host, self.port = self.server_address
+        self.message_count = 0
+        self._count_lock = threading.Lock()
+        self._thread = None
+    
+    def count_message(self):
+        with self._count_lock:
+            self.message_count += 1
+    
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
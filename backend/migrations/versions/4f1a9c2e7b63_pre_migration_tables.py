@@ -0,0 +1,131 @@
+"""Tabellen und Spalten, die vor Einführung der Migrationen per db.create_all ergänzt wurden
+
+Datenbanken, die mit `flask db stamp 2e5ff05d348a` übernommen werden, stammen aus
+unterschiedlichen Versionen der Anwendung. Die Migration legt nur an, was noch fehlt.
+Neu angelegte Rollup-Tabellen sind leer; danach sollte flask rollups rebuild laufen.
+
+Revision ID: 4f1a9c2e7b63
+Revises: 2e5ff05d348a
+Create Date: 2026-10-18 21:05:37.402918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f1a9c2e7b63'
+down_revision = '2e5ff05d348a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if 'cache_versions' not in tables:
+        op.create_table('cache_versions',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+        )
+
+    if 'invoice_number_sequences' not in tables:
+        op.create_table('invoice_number_sequences',
+        sa.Column('prefix', sa.String(length=20), nullable=False),
+        sa.Column('last_value', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('prefix')
+        )
+
+    if 'scheduler_locks' not in tables:
+        op.create_table('scheduler_locks',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('owner', sa.String(length=255), nullable=False),
+        sa.Column('locked_until', sa.DateTime(), nullable=False),
+        sa.Column('acquired_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+        )
+
+    if 'rollup_monthly_revenue' not in tables:
+        op.create_table('rollup_monthly_revenue',
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Integer(), nullable=False),
+        sa.Column('invoice_count', sa.Integer(), nullable=False),
+        sa.Column('cancellation_count', sa.Integer(), nullable=False),
+        sa.Column('total_net', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column('total_vat', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column('total_gross', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('year', 'month')
+        )
+
+    if 'rollup_due_date_receivables' not in tables:
+        op.create_table('rollup_due_date_receivables',
+        sa.Column('due_date', sa.Date(), nullable=False),
+        sa.Column('open_count', sa.Integer(), nullable=False),
+        sa.Column('open_amount', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('due_date')
+        )
+
+    if 'rollup_customer_receivables' not in tables:
+        op.create_table('rollup_customer_receivables',
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('open_count', sa.Integer(), nullable=False),
+        sa.Column('open_amount', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.customer_id'], ),
+        sa.PrimaryKeyConstraint('customer_id')
+        )
+
+    if 'email_outbox' not in tables:
+        op.create_table('email_outbox',
+        sa.Column('outbox_id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.String(length=36), nullable=False),
+        sa.Column('invoice_id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=True),
+        sa.Column('template_id', sa.Integer(), nullable=True),
+        sa.Column('recipient', sa.String(length=255), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('email_log_id', sa.Integer(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.customer_id'], ),
+        sa.ForeignKeyConstraint(['email_log_id'], ['email_logs.log_id'], ),
+        sa.ForeignKeyConstraint(['invoice_id'], ['invoices.invoice_id'], ),
+        sa.ForeignKeyConstraint(['template_id'], ['email_templates.template_id'], ),
+        sa.PrimaryKeyConstraint('outbox_id')
+        )
+        with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_email_outbox_job_id'), ['job_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_email_outbox_next_attempt_at'), ['next_attempt_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_email_outbox_status'), ['status'], unique=False)
+
+    if 'is_permanent' not in {column['name'] for column in inspector.get_columns('email_logs')}:
+        op.add_column('email_logs', sa.Column('is_permanent', sa.Boolean(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('email_logs', schema=None) as batch_op:
+        batch_op.drop_column('is_permanent')
+
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_email_outbox_status'))
+        batch_op.drop_index(batch_op.f('ix_email_outbox_next_attempt_at'))
+        batch_op.drop_index(batch_op.f('ix_email_outbox_job_id'))
+
+    op.drop_table('email_outbox')
+    op.drop_table('rollup_customer_receivables')
+    op.drop_table('rollup_due_date_receivables')
+    op.drop_table('rollup_monthly_revenue')
+    op.drop_table('scheduler_locks')
+    op.drop_table('invoice_number_sequences')
+    op.drop_table('cache_versions')
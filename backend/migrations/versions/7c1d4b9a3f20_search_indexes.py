@@ -0,0 +1,93 @@
+"""Suchindizes für Kunden, Artikel und Rechnungen
+
+PostgreSQL: Erweiterung pg_trgm und ein GIN-Trigramm-Index je durchsuchter Spalte.
+SQLite: FTS5-Tabellen mit Trigramm-Tokenizer (external content) samt Triggern, die sie
+bei INSERT, UPDATE und DELETE auf den Basistabellen aktuell halten.
+
+Ohne pg_trgm-Rechte bzw. ohne FTS5-Trigramm-Tokenizer (SQLite < 3.34) wird die Migration
+übersprungen; die Suche arbeitet dann ohne Index (siehe app.services.search_service).
+
+Revision ID: 7c1d4b9a3f20
+Revises: 4f1a9c2e7b63
+Create Date: 2026-10-18 17:20:03.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import logging
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1d4b9a3f20'
+down_revision = '4f1a9c2e7b63'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# Stand der durchsuchten Spalten zum Zeitpunkt der Migration: Tabelle -> (Primärschlüssel, Spalten)
+SEARCH_COLUMNS = {
+    'customers': ('customer_id', ('company_name', 'last_name', 'first_name', 'email')),
+    'items': ('item_id', ('name', 'item_number', 'description')),
+    'invoices': ('invoice_id', ('invoice_number',))
+}
+
+
+def _sqlite_supports_trigram(bind):
+    try:
+        bind.exec_driver_sql("CREATE VIRTUAL TABLE temp.search_probe USING fts5(probe, tokenize='trigram')")
+        bind.exec_driver_sql("DROP TABLE temp.search_probe")
+        return True
+    except sa.exc.DBAPIError:
+        return False
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if bind.dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for table, (key, columns) in SEARCH_COLUMNS.items():
+            for column in columns:
+                op.create_index(
+                    f'ix_{table}_{column}_trgm', table, [column],
+                    postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'}
+                )
+
+    elif bind.dialect.name == 'sqlite':
+        if not _sqlite_supports_trigram(bind):
+            logger.warning("SQLite ohne FTS5-Trigramm-Tokenizer, Suchindizes werden nicht angelegt")
+            return
+
+        for table, (key, columns) in SEARCH_COLUMNS.items():
+            fts = f'{table}_search'
+            column_list = ', '.join(columns)
+            new_values = ', '.join(f'new.{column}' for column in columns)
+            old_values = ', '.join(f'old.{column}' for column in columns)
+            insert_new = f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.{key}, {new_values});"
+            delete_old = f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.{key}, {old_values});"
+
+            op.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column_list}, "
+                f"content='{table}', content_rowid='{key}', tokenize='trigram')"
+            )
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert_new} END")
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete_old} END")
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column_list} ON {table} BEGIN {delete_old} {insert_new} END")
+            op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    if bind.dialect.name == 'postgresql':
+        for table, (key, columns) in SEARCH_COLUMNS.items():
+            for column in columns:
+                op.execute(f'DROP INDEX IF EXISTS ix_{table}_{column}_trgm')
+
+    elif bind.dialect.name == 'sqlite':
+        for table in SEARCH_COLUMNS:
+            fts = f'{table}_search'
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {fts}')
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Tests für das Lesen von Kontoauszügen (CAMT.053, MT940) und die Zuordnung der Zahlungen
+"""
+
+import unittest
+import os
+import sys
+import io
+from datetime import date
+from decimal import Decimal
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.bank_statement_service import parse_statement, detect_format, StatementError
+from app.services.payment_service import OpenInvoiceIndex, match_payment, import_reference
+
+CAMT_STATEMENT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02">
+  <BkToCstmrStmt>
+    <Stmt>
+      <Id>2025-02-03</Id>
+      <Acct><Id><IBAN>DE89370400440532013000</IBAN></Id><Ccy>EUR</Ccy></Acct>
+      <Ntry>
+        <Amt Ccy="EUR">119.00</Amt>
+        <CdtDbtInd>CRDT</CdtDbtInd>
+        <Sts>BOOK</Sts>
+        <BookgDt><Dt>2025-02-03</Dt></BookgDt>
+        <ValDt><Dt>2025-02-04</Dt></ValDt>
+        <AcctSvcrRef>REF-1</AcctSvcrRef>
+        <NtryDtls>
+          <TxDtls>
+            <Refs><EndToEndId>E2E-1</EndToEndId></Refs>
+            <RltdPties>
+              <Dbtr><Nm>Muster GmbH</Nm></Dbtr>
+              <DbtrAcct><Id><IBAN>DE02120300000000202051</IBAN></Id></DbtrAcct>
+            </RltdPties>
+            <RmtInf><Ustrd>Rechnung 2025-01-0001</Ustrd></RmtInf>
+          </TxDtls>
+        </NtryDtls>
+      </Ntry>
+      <Ntry>
+        <Amt Ccy="EUR">50.00</Amt>
+        <CdtDbtInd>DBIT</CdtDbtInd>
+        <Sts>BOOK</Sts>
+        <BookgDt><Dt>2025-02-03</Dt></BookgDt>
+      </Ntry>
+      <Ntry>
+        <Amt Ccy="EUR">300.00</Amt>
+        <CdtDbtInd>CRDT</CdtDbtInd>
+        <Sts>BOOK</Sts>
+        <BookgDt><Dt>2025-02-05</Dt></BookgDt>
+        <AcctSvcrRef>REF-3</AcctSvcrRef>
+        <NtryDtls>
+          <TxDtls>
+            <AmtDtls><TxAmt><Amt Ccy="EUR">100.00</Amt></TxAmt></AmtDtls>
+            <RmtInf><Ustrd>2025-01-0002</Ustrd></RmtInf>
+          </TxDtls>
+          <TxDtls>
+            <AmtDtls><TxAmt><Amt Ccy="EUR">200.00</Amt></TxAmt></AmtDtls>
+            <RmtInf><Strd><CdtrRefInf><Ref>2025-01-0003</Ref></CdtrRefInf></Strd></RmtInf>
+          </TxDtls>
+        </NtryDtls>
+      </Ntry>
+    </Stmt>
+  </BkToCstmrStmt>
+</Document>
+"""
+
+MT940_STATEMENT = (
+    ":20:STARTUMSE\r\n"
+    ":25:37040044/0532013000\r\n"
+    ":28C:00001/001\r\n"
+    ":60F:C250131EUR1000,00\r\n"
+    ":61:2502030203CR119,00NTRFNONREF//BANKREF1\r\n"
+    ":86:166?00GUTSCHRIFT?109075?20EREF+E2E-1?21SVWZ+RE 2025-01-000?221 Danke?30COBADEFFXXX\r\n"
+    "?31DE02120300000000202051?32Müller GmbH\r\n"
+    ":61:2501021231DR20,00NDDTNONREF\r\n"
+    ":86:Lastschrift Strom\r\n"
+    ":62F:C250203EUR1099,00\r\n"
+    "-\r\n"
+).encode('cp1252')
+
+class BankStatementImportTests(unittest.TestCase):
+    """Testklasse für das Lesen von Kontoauszügen und die Zuordnung der Zahlungen"""
+    
+    def _parse(self, data, statement_format=None):
+        statement_format, lines = parse_statement(io.BytesIO(data), statement_format)
+        return statement_format, list(lines)
+    
+    def test_detect_format(self):
+        """Test: Format wird anhand des Dateianfangs erkannt"""
+        self.assertEqual(detect_format(CAMT_STATEMENT[:100]), 'camt053')
+        self.assertEqual(detect_format(MT940_STATEMENT[:100]), 'mt940')
+        with self.assertRaises(StatementError):
+            detect_format(b'Kontoauszug')
+    
+    def test_parse_camt053(self):
+        """Test: CAMT.053 mit Einzel- und Sammelbuchung"""
+        statement_format, lines = self._parse(CAMT_STATEMENT)
+        
+        self.assertEqual(statement_format, 'camt053')
+        self.assertEqual(len(lines), 4)
+        
+        first = lines[0]
+        self.assertTrue(first['is_credit'])
+        self.assertEqual(first['amount'], Decimal('119.00'))
+        self.assertEqual(first['currency'], 'EUR')
+        self.assertEqual(first['account'], 'DE89370400440532013000')
+        self.assertEqual(first['booking_date'], date(2025, 2, 3))
+        self.assertEqual(first['value_date'], date(2025, 2, 4))
+        self.assertEqual(first['reference'], 'Rechnung 2025-01-0001')
+        self.assertEqual(first['end_to_end_id'], 'E2E-1')
+        self.assertEqual(first['counterparty_name'], 'Muster GmbH')
+        self.assertEqual(first['counterparty_iban'], 'DE02120300000000202051')
+        
+        # Lastschrift
+        self.assertFalse(lines[1]['is_credit'])
+        
+        # Sammelbuchung: ein Umsatz je TxDtls mit eigenem Betrag und eigener Referenz
+        self.assertEqual([line['amount'] for line in lines[2:]], [Decimal('100.00'), Decimal('200.00')])
+        self.assertEqual([line['reference'] for line in lines[2:]], ['2025-01-0002', '2025-01-0003'])
+        self.assertEqual([line['bank_reference'] for line in lines[2:]], ['REF-3/0', 'REF-3/1'])
+    
+    def test_parse_camt053_rejects_doctype(self):
+        """Test: Dokumenttyp-Deklarationen und ungültiges XML werden abgelehnt"""
+        with self.assertRaises(StatementError):
+            self._parse(b'<?xml version="1.0"?><!DOCTYPE x [<!ENTITY a "b">]><x>&a;</x>')
+        with self.assertRaises(StatementError):
+            self._parse(b'<Document><Stmt></Document>')
+    
+    def test_parse_mt940(self):
+        """Test: MT940 mit strukturiertem Mehrzweckfeld und Jahreswechsel"""
+        statement_format, lines = self._parse(MT940_STATEMENT)
+        
+        self.assertEqual(statement_format, 'mt940')
+        self.assertEqual(len(lines), 2)
+        
+        first = lines[0]
+        self.assertTrue(first['is_credit'])
+        self.assertEqual(first['amount'], Decimal('119.00'))
+        self.assertEqual(first['currency'], 'EUR')
+        self.assertEqual(first['account'], '37040044/0532013000')
+        self.assertEqual(first['booking_date'], date(2025, 2, 3))
+        self.assertEqual(first['bank_reference'], 'BANKREF1')
+        self.assertEqual(first['end_to_end_id'], 'E2E-1')
+        # Teile des Verwendungszwecks werden ohne Trennzeichen zusammengesetzt
+        self.assertEqual(first['reference'], 'RE 2025-01-0001 Danke')
+        self.assertEqual(first['counterparty_name'], 'Müller GmbH')
+        self.assertEqual(first['counterparty_iban'], 'DE02120300000000202051')
+        
+        # Buchung am 31.12. mit Valuta im Januar
+        second = lines[1]
+        self.assertFalse(second['is_credit'])
+        self.assertEqual(second['value_date'], date(2025, 1, 2))
+        self.assertEqual(second['booking_date'], date(2024, 12, 31))
+        self.assertEqual(second['reference'], 'Lastschrift Strom')
+    
+    def test_parse_mt940_invalid_transaction(self):
+        """Test: Ungültige Umsatzzeile führt zu einem Fehler mit Zeilennummer"""
+        with self.assertRaises(StatementError) as context:
+            self._parse(b":20:X\n:25:1/2\n:61:kein Umsatz\n", 'mt940')
+        self.assertIn('Zeile 3', str(context.exception))
+    
+    def test_match_payments(self):
+        """Test: Zuordnung über Rechnungsnummer, Betrag und Verteilung auf mehrere Rechnungen"""
+        index = OpenInvoiceIndex([
+            (1, '2025-01-0001', Decimal('119.00'), Decimal('0')),
+            (2, '2025-01-0002', Decimal('238.00'), Decimal('38.00')),
+            (3, '2025-01-0003', Decimal('357.00'), Decimal('0')),
+            (4, '2025-01-0004', Decimal('50.00'), Decimal('0')),
+            (5, '2025-01-0005', Decimal('50.00'), Decimal('0'))
+        ])
+        
+        def line(amount, reference, end_to_end_id=None):
+            return {'amount': Decimal(amount), 'reference': reference, 'end_to_end_id': end_to_end_id}
+        
+        # Rechnungsnummer mit anderen Trennzeichen im Verwendungszweck
+        allocations, method = match_payment(index, line('119.00', 'RE 2025/01/0001'))
+        self.assertEqual(method, 'Rechnungsnummer')
+        self.assertEqual([(invoice['invoice_id'], amount) for invoice, amount in allocations], [(1, Decimal('119.00'))])
+        
+        # Vollständig bezahlte Rechnungen werden nicht erneut zugeordnet
+        allocations, method = match_payment(index, line('119.00', 'Rechnung 2025-01-0001'))
+        self.assertEqual(allocations, [])
+        
+        # Offener Betrag (238,00 - 38,00) ohne Rechnungsnummer
+        allocations, method = match_payment(index, line('200.00', 'Danke'))
+        self.assertEqual(method, 'Betrag')
+        self.assertEqual(allocations[0][0]['invoice_id'], 2)
+        
+        # Mehrere Rechnungen mit demselben offenen Betrag
+        allocations, method = match_payment(index, line('50.00', 'Danke'))
+        self.assertEqual(allocations, [])
+        
+        # Mehrere Rechnungsnummern: Betrag wird der Reihe nach verteilt
+        allocations, method = match_payment(index, line('400.00', '2025-01-0004', '2025-01-0003'))
+        self.assertEqual(
+            [(invoice['invoice_id'], amount) for invoice, amount in allocations],
+            [(4, Decimal('50.00')), (3, Decimal('350.00'))]
+        )
+        self.assertEqual(index.open_amount(index.paid[3]), Decimal('7.00'))
+    
+    def test_import_reference(self):
+        """Test: Gleiche Umsätze in einem Auszug erhalten unterschiedliche Prüfsummen"""
+        _, lines = self._parse(CAMT_STATEMENT)
+        self.assertEqual(import_reference(lines[0], 0), import_reference(dict(lines[0]), 0))
+        self.assertNotEqual(import_reference(lines[0], 0), import_reference(lines[0], 1))
+        self.assertNotEqual(import_reference(lines[2], 0), import_reference(lines[3], 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Tests für die Benchmarks (Lauf auf einem sehr kleinen Datenbestand)
+"""
+
+import unittest
+import os
+import sys
+import argparse
+import tempfile
+from unittest import mock
+
+# Füge das Backend- und das Benchmark-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from run_benchmarks import BENCHMARKS, run
+from generate_data import DEFAULT_SEED
+
+class BenchmarkTests(unittest.TestCase):
+    """Testklasse für die Benchmarks"""
+    
+    def test_all_benchmarks_run(self):
+        """Test: Alle Benchmarks laufen gegen den aktuellen Stand ohne Fehler durch"""
+        with tempfile.TemporaryDirectory() as directory, mock.patch.dict(os.environ):
+            args = argparse.Namespace(
+                database_url=f"sqlite:///{os.path.join(directory, 'daten', 'benchmark.db')}",
+                scale=0.001, seed=DEFAULT_SEED, iterations=2, warmup=0, batch_runs=1, only=None, skip_generate=False
+            )
+            result = run(args)
+        
+        self.assertEqual(list(result['benchmarks']), list(BENCHMARKS))
+        for name, summary in result['benchmarks'].items():
+            self.assertNotIn('error', summary, name)
+            self.assertGreater(summary['units'], 0, name)
+        self.assertGreater(result['smtp_messages'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
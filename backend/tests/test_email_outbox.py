@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Tests für den Postausgang (Stapelversand von Rechnungs-E-Mails)
+"""
+
+import unittest
+import os
+import sys
+import smtplib
+from datetime import datetime, timedelta
+from unittest import mock
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from flask_jwt_extended import create_access_token
+from app.models.customer import Customer
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.company_data import CompanyData
+from app.models.email_template import EmailTemplate, EmailLog
+from app.models.email_outbox import EmailOutbox
+from app.services import email_outbox_service
+from app.services.email_service import send_invoice_email
+from app.services.email_outbox_service import (
+    enqueue_invoice_emails,
+    process_outbox,
+    release_stale_outbox_entries,
+    requeue_failed_emails,
+    get_retry_delay,
+    get_outbox_job_progress
+)
+
+class EmailOutboxTests(unittest.TestCase):
+    """Testklasse für den Postausgang"""
+    
+    def setUp(self):
+        """Testumgebung einrichten"""
+        self.app = create_app('testing')
+        self.app.config['EMAIL_RETRY_BASE_SECONDS'] = 3600
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        
+        # E-Mails nicht wirklich versenden
+        self.app.extensions['mail'].suppress = True
+        
+        db.create_all()
+        
+        db.session.add(CompanyData(
+            company_name="Muster GmbH", street="Musterstraße", house_number="123", postal_code="12345",
+            city="Musterstadt", tax_id="123/456/78901", vat_id="DE123456789", email="info@muster-gmbh.de",
+            bank_name="Musterbank", iban="DE12345678901234567890", bic="MUBADE123"
+        ))
+        customer = Customer(
+            company_name="Kunde GmbH", street="Kundenstraße", house_number="456", postal_code="54321",
+            city="Kundenstadt", country="Deutschland", email="info@kunde-gmbh.de"
+        )
+        db.session.add(customer)
+        db.session.add(EmailTemplate(
+            name="Standard", subject="Ihre Rechnung {invoice_number}", body="Rechnung {invoice_number}", is_default=True
+        ))
+        db.session.flush()
+        
+        self.invoice_ids = []
+        for i in range(3):
+            invoice = Invoice(
+                invoice_number=f"2025-01-{i + 1:04d}", customer_id=customer.customer_id,
+                invoice_date=datetime(2025, 1, 1).date(), due_date=datetime(2025, 1, 15).date(),
+                delivery_date=datetime(2025, 1, 1).date()
+            )
+            invoice.items.append(InvoiceItem(position=1, quantity=1, price_net=100, vat_rate=19, description="Leistung"))
+            invoice.calculate_totals()
+            db.session.add(invoice)
+            db.session.flush()
+            self.invoice_ids.append(invoice.invoice_id)
+        
+        db.session.commit()
+    
+    def tearDown(self):
+        """Testumgebung aufräumen"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def test_failing_invoice_does_not_abort_chunk(self):
+        """Test: Ein Fehler beim Erstellen einer E-Mail betrifft nur deren Eintrag"""
+        broken_id = self.invoice_ids[1]
+        build_pdf_data = email_outbox_service.build_invoice_pdf_data
+        
+        def build_or_fail(invoice, company_data=None):
+            if invoice.invoice_id == broken_id:
+                raise ValueError("Logo fehlt")
+            return build_pdf_data(invoice, company_data)
+        
+        job_id, queued, rejected = enqueue_invoice_emails(self.invoice_ids)
+        with mock.patch.object(email_outbox_service, 'build_invoice_pdf_data', build_or_fail):
+            process_outbox(job_id)
+        
+        progress = get_outbox_job_progress(job_id)
+        self.assertEqual(progress['success'], 2)
+        self.assertEqual(progress['in_progress'], 0)
+        
+        # Der fehlerhafte Eintrag wartet auf einen neuen Versuch und ist protokolliert
+        entry = EmailOutbox.query.filter_by(invoice_id=broken_id).one()
+        self.assertEqual(entry.status, 'wartend')
+        self.assertIn("Logo fehlt", entry.error_message)
+        self.assertEqual(EmailLog.query.filter_by(invoice_id=broken_id, status='fehlgeschlagen').count(), 1)
+        self.assertEqual(EmailLog.query.filter_by(status='gesendet').count(), 2)
+    
+    def test_stale_entries_stop_at_max_attempts(self):
+        """Test: Hängende Einträge werden nur bis EMAIL_MAX_ATTEMPTS erneut freigegeben"""
+        enqueue_invoice_emails(self.invoice_ids[:2])
+        stale = datetime.utcnow() - timedelta(days=1)
+        first, second = EmailOutbox.query.order_by(EmailOutbox.outbox_id).all()
+        
+        db.session.execute(db.update(EmailOutbox).where(EmailOutbox.outbox_id == first.outbox_id).values(
+            status='in_bearbeitung', attempts=1, updated_at=stale
+        ))
+        db.session.execute(db.update(EmailOutbox).where(EmailOutbox.outbox_id == second.outbox_id).values(
+            status='in_bearbeitung', attempts=self.app.config['EMAIL_MAX_ATTEMPTS'], updated_at=stale
+        ))
+        db.session.commit()
+        
+        self.assertEqual(release_stale_outbox_entries(), 1)
+        db.session.expire_all()
+        
+        self.assertEqual(db.session.get(EmailOutbox, first.outbox_id).status, 'wartend')
+        self.assertEqual(db.session.get(EmailOutbox, second.outbox_id).status, 'fehlgeschlagen')
+        log = EmailLog.query.filter_by(invoice_id=second.invoice_id).one()
+        self.assertTrue(log.is_permanent)
+    
+    def test_batch_send_endpoint(self):
+        """Test: Stapelversand über die API mit Auftrags-ID und Prüfung der Rechnungs-IDs"""
+        headers = {'Authorization': f'Bearer {create_access_token(identity="test")}'}
+        
+        for invoice_ids in ("1,2", [], [True], None):
+            response = self.client.post('/api/email/batch-send', json={'invoice_ids': invoice_ids}, headers=headers)
+            self.assertEqual(response.status_code, 400)
+        
+        # Ohne Hintergrund-Thread, damit der Test die Verarbeitung selbst steuert
+        with mock.patch('app.api.email.start_outbox_job') as start_outbox_job:
+            response = self.client.post('/api/email/batch-send', json={'invoice_ids': self.invoice_ids + [9999]}, headers=headers)
+        
+        self.assertEqual(response.status_code, 202)
+        data = response.get_json()
+        self.assertEqual(data['queued'], 3)
+        self.assertEqual(data['failed'], 1)
+        start_outbox_job.assert_called_once_with(data['job_id'])
+        
+        # Verarbeitung wie im Hintergrund-Thread, danach Fortschritt über die API
+        process_outbox(data['job_id'])
+        response = self.client.get(f"/api/email/jobs/{data['job_id']}", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['success'], 3)
+        self.assertTrue(response.get_json()['finished'])
+    
+    def _log_failure(self, invoice_id, permanent=False, sent_date=None):
+        db.session.add(EmailLog(
+            invoice_id=invoice_id, customer_id=1, recipient="info@kunde-gmbh.de", subject="unbekannt", body="unbekannt",
+            status='fehlgeschlagen', error_message="Verbindung abgebrochen", is_permanent=permanent,
+            sent_date=sent_date or datetime.utcnow()
+        ))
+    
+    def test_retry_delay_bounds(self):
+        """Test: Die Wartezeit verdoppelt sich je Versuch bis EMAIL_RETRY_MAX_SECONDS und wird auf 50-100 % gestreut"""
+        self.app.config['EMAIL_RETRY_BASE_SECONDS'] = 60
+        self.app.config['EMAIL_RETRY_MAX_SECONDS'] = 600
+        
+        with mock.patch.object(email_outbox_service.random, 'uniform', side_effect=lambda low, high: (low, high)):
+            self.assertEqual(
+                [get_retry_delay(attempts) for attempts in (0, 1, 2, 3, 4, 5, 20)],
+                [(30, 60), (30, 60), (60, 120), (120, 240), (240, 480), (300, 600), (300, 600)]
+            )
+        
+        for attempts in range(1, 8):
+            maximum = min(600, 60 * 2 ** (attempts - 1))
+            for _ in range(50):
+                self.assertTrue(maximum / 2 <= get_retry_delay(attempts) <= maximum)
+    
+    def test_requeue_skips_permanent_and_exhausted(self):
+        """Test: Dauerhafte Fehler und Rechnungen mit EMAIL_MAX_ATTEMPTS Fehlversuchen werden nicht erneut eingeplant"""
+        self.app.config['EMAIL_RETRY_MAX_SECONDS'] = 86400
+        retried_id, permanent_id, exhausted_id = self.invoice_ids
+        last_failure = datetime.utcnow() - timedelta(minutes=5)
+        
+        self._log_failure(retried_id, sent_date=last_failure - timedelta(minutes=10))
+        self._log_failure(retried_id, sent_date=last_failure)
+        self._log_failure(permanent_id)
+        self._log_failure(permanent_id, permanent=True)
+        for _ in range(self.app.config['EMAIL_MAX_ATTEMPTS']):
+            self._log_failure(exhausted_id)
+        db.session.commit()
+        
+        self.assertEqual(requeue_failed_emails(), 1)
+        entry = EmailOutbox.query.one()
+        self.assertEqual((entry.invoice_id, entry.status, entry.attempts), (retried_id, 'wartend', 2))
+        
+        # Wartezeit nach dem zweiten Fehlversuch: EMAIL_RETRY_BASE_SECONDS bis zum Doppelten
+        delay = (entry.next_attempt_at - last_failure).total_seconds()
+        self.assertTrue(3600 <= delay <= 7200)
+        
+        # Bereits wartende Rechnungen werden nicht doppelt eingeplant
+        self.assertEqual(requeue_failed_emails(), 0)
+    
+    def test_requeue_keeps_template_recipient_and_content(self):
+        """Test: Ein erneuter Versuch verwendet Vorlage, Empfänger, Betreff und Text des fehlgeschlagenen Versands"""
+        reminder = EmailTemplate(name="Erinnerung", subject="Erinnerung {invoice_number}", body="Bitte beachten Sie Rechnung {invoice_number}")
+        db.session.add(reminder)
+        db.session.commit()
+        template_id, custom_id = self.invoice_ids[:2]
+        
+        with mock.patch.object(email_outbox_service.mail, 'send', side_effect=smtplib.SMTPServerDisconnected("Verbindung abgebrochen")):
+            send_invoice_email(template_id, template_id=reminder.template_id, recipient="buchhaltung@kunde-gmbh.de")
+            send_invoice_email(custom_id, custom_subject="Eilt: {invoice_number}", custom_body="Bitte bis {due_date} zahlen")
+        
+        self.assertEqual(requeue_failed_emails(), 2)
+        db.session.execute(db.update(EmailOutbox).values(next_attempt_at=None))
+        db.session.commit()
+        process_outbox()
+        
+        sent = {log.invoice_id: log for log in EmailLog.query.filter_by(status='gesendet')}
+        self.assertEqual(
+            (sent[template_id].template_id, sent[template_id].recipient, sent[template_id].subject),
+            (reminder.template_id, "buchhaltung@kunde-gmbh.de", "Erinnerung 2025-01-0001")
+        )
+        self.assertEqual(
+            (sent[custom_id].recipient, sent[custom_id].subject, sent[custom_id].body),
+            ("info@kunde-gmbh.de", "Eilt: 2025-01-0002", "Bitte bis 15.01.2025 zahlen")
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests für das Kompilieren und Rendern der E-Mail-Vorlagen
+"""
+
+import unittest
+import os
+import sys
+from datetime import datetime, timedelta
+from unittest import mock
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models.customer import Customer
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.company_data import CompanyData
+from app.models.email_template import EmailTemplate
+from app.services import email_template_service
+from app.services.email_template_service import CompiledTemplate, compile_email_template
+from app.services.email_service import render_invoice_email
+
+class EmailTemplateTests(unittest.TestCase):
+    """Testklasse für die E-Mail-Vorlagen"""
+    
+    def setUp(self):
+        """Testumgebung einrichten"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        
+        db.create_all()
+        email_template_service._compiled_templates.clear()
+        
+        self.company_data = CompanyData(
+            company_name="Muster GmbH", street="Musterstraße", house_number="123", postal_code="12345",
+            city="Musterstadt", tax_id="123/456/78901", vat_id="DE123456789", email="info@muster-gmbh.de",
+            bank_name="Musterbank", iban="DE12345678901234567890", bic="MUBADE123"
+        )
+        customer = Customer(
+            company_name="Kunde GmbH", street="Kundenstraße", house_number="456", postal_code="54321",
+            city="Kundenstadt", country="Deutschland", email="info@kunde-gmbh.de"
+        )
+        db.session.add_all([self.company_data, customer])
+        db.session.flush()
+        
+        self.invoice = Invoice(
+            invoice_number="2025-03-0001", customer_id=customer.customer_id,
+            invoice_date=datetime(2025, 3, 1).date(), due_date=datetime(2025, 3, 15).date(),
+            delivery_date=datetime(2025, 3, 1).date()
+        )
+        self.invoice.items.append(InvoiceItem(position=1, quantity=1, price_net=100, vat_rate=19, description="Leistung"))
+        self.invoice.calculate_totals()
+        db.session.add(self.invoice)
+        db.session.commit()
+    
+    def tearDown(self):
+        """Testumgebung aufräumen"""
+        email_template_service._compiled_templates.clear()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def _template(self, subject, body="Text"):
+        template = EmailTemplate(name="Vorlage", subject=subject, body=body)
+        db.session.add(template)
+        db.session.commit()
+        return template
+    
+    def test_render(self):
+        """Test: Platzhalter werden in einem Durchgang ersetzt, unbekannte bleiben stehen, None wird leer"""
+        compiled = CompiledTemplate("Rechnung {invoice_number} an {customer_name} {unbekannt}")
+        
+        self.assertEqual(
+            compiled.render({'invoice_number': "{customer_name}", 'customer_name': "Kunde GmbH"}),
+            "Rechnung {customer_name} an Kunde GmbH {unbekannt}"
+        )
+        self.assertEqual(compiled.render({'invoice_number': "2025-0001", 'customer_name': None}), "Rechnung 2025-0001 an  {unbekannt}")
+        self.assertEqual(CompiledTemplate("{invoice_number}").render({'invoice_number': "2025-0001"}), "2025-0001")
+        self.assertEqual(CompiledTemplate("").render({}), "")
+    
+    def test_subject_replaces_all_placeholders(self):
+        """Test: Der Betreff ersetzt wie der Text auch Datum und Betrag (früher nur Nummer, Firma und Kunde)"""
+        template = self._template(
+            "Rechnung {invoice_number} vom {invoice_date} über {total_amount}, fällig am {due_date}",
+            "{customer_name}: {company_name}"
+        )
+        
+        subject, body = render_invoice_email(self.invoice, self.company_data, template)
+        self.assertEqual(subject, "Rechnung 2025-03-0001 vom 01.03.2025 über 119.00 €, fällig am 15.03.2025")
+        self.assertEqual(body, "Kunde GmbH: Muster GmbH")
+        
+        subject, body = render_invoice_email(self.invoice, self.company_data, template, custom_subject="Eilt: {total_amount}")
+        self.assertEqual(subject, "Eilt: 119.00 €")
+    
+    def test_recompiled_after_update_and_bounded(self):
+        """Test: Geänderte Vorlagen werden neu kompiliert, der Zwischenspeicher verdrängt die älteste Vorlage"""
+        template = self._template("Rechnung {invoice_number}")
+        subject, body = compile_email_template(template)
+        self.assertIs(compile_email_template(template)[0], subject)
+        
+        template.subject = "Ihre Rechnung {invoice_number}"
+        template.updated_at = template.updated_at + timedelta(seconds=1)
+        db.session.commit()
+        
+        changed_subject, _ = compile_email_template(template)
+        self.assertIsNot(changed_subject, subject)
+        self.assertEqual(changed_subject.render({'invoice_number': "2025-0001"}), "Ihre Rechnung 2025-0001")
+        
+        others = [self._template(f"Vorlage {i}") for i in range(2)]
+        with mock.patch.object(email_template_service, 'COMPILED_TEMPLATES_MAX_SIZE', 2):
+            compile_email_template(others[0])
+            compile_email_template(template)
+            compile_email_template(others[1])
+        
+        # others[0] wurde am längsten nicht verwendet
+        self.assertEqual(list(email_template_service._compiled_templates), [template.template_id, others[1].template_id])
+
+if __name__ == '__main__':
+    unittest.main()
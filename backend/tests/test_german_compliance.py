@@ -288,6 +288,23 @@ class GermanComplianceTests(unittest.TestCase):
         pattern = r'\d{4}-\d{2}-[A-Z0-9]+'
         self.assertTrue(re.match(pattern, invoice.invoice_number) is not None)
     
+    def test_invoice_number_sequence(self):
+        """Test: Fortlaufende und lückenlose Vergabe der Rechnungsnummern"""
+        from app.services.invoice_number_service import reserve_invoice_numbers, next_invoice_number
+        
+        invoice_date = datetime(2025, 4, 15).date()
+        
+        # Blockreservierung liefert aufeinanderfolgende Nummern
+        numbers = reserve_invoice_numbers(3, invoice_date)
+        self.assertEqual(numbers, ["2025-04-0001", "2025-04-0002", "2025-04-0003"])
+        db.session.commit()
+        
+        # Ein Rollback gibt die reservierte Nummer wieder frei
+        self.assertEqual(next_invoice_number(invoice_date), "2025-04-0004")
+        db.session.rollback()
+        self.assertEqual(next_invoice_number(invoice_date), "2025-04-0004")
+        db.session.commit()
+    
     def test_vat_calculation(self):
         """Test: Korrekte Berechnung der Mehrwertsteuer"""
         invoice = self._create_test_invoice()
@@ -300,6 +317,46 @@ class GermanComplianceTests(unittest.TestCase):
         self.assertEqual(float(invoice.total_net), expected_net)
         self.assertEqual(float(invoice.total_vat), expected_vat)
         self.assertEqual(float(invoice.total_gross), expected_gross)
+    
+    def test_vat_rounded_per_rate(self):
+        """Test: Umsatzsteuer wird je Steuersatz auf die Nettosumme berechnet und kaufmännisch gerundet"""
+        from decimal import Decimal
+        from app.money import calculate_invoice_totals
+        
+        # 10 Positionen à 0,02 € (19 %) und eine Position à 10,05 € (7 %)
+        lines = [(1, '0.02', 19)] * 10 + [(1, '10.05', 7)]
+        totals = calculate_invoice_totals(lines)
+        
+        # Je Position gerundet wären es 0,00 € bei 19 %; auf die Summe von 0,20 € sind es 0,04 €
+        self.assertEqual(totals['lines'][0], (Decimal('0.02'), Decimal('0.00'), Decimal('0.02')))
+        self.assertEqual(totals['vat_rates'][Decimal(19)], {'net': Decimal('0.20'), 'vat': Decimal('0.04')})
+        # 10,05 € * 7 % = 0,7035 € -> 0,70 €
+        self.assertEqual(totals['vat_rates'][Decimal(7)], {'net': Decimal('10.05'), 'vat': Decimal('0.70')})
+        self.assertEqual(totals['total_net'], Decimal('10.25'))
+        self.assertEqual(totals['total_vat'], Decimal('0.74'))
+        self.assertEqual(totals['total_gross'], Decimal('10.99'))
+        
+        # Eine Stornorechnung ergibt exakt die negativen Beträge
+        storno_totals = calculate_invoice_totals((-quantity, price, rate) for quantity, price, rate in lines)
+        for key in ('total_net', 'total_vat', 'total_gross'):
+            self.assertEqual(storno_totals[key], -totals[key])
+    
+    def test_line_vat_for_display_only(self):
+        """Test: Die Steuer je Position dient nur der Anzeige und ergibt summiert nicht die Steuer der Rechnung"""
+        from decimal import Decimal
+        
+        invoice = Invoice(customer_id=1, invoice_date=datetime(2025, 3, 1).date(), due_date=datetime(2025, 3, 15).date())
+        for position in range(1, 4):
+            invoice.items.append(InvoiceItem(position=position, quantity=1, price_net=Decimal('10.03'), vat_rate=Decimal(19)))
+        invoice.calculate_totals()
+        
+        # Je Position 10,03 € * 19 % = 1,9057 € -> 1,91 €; auf die Summe 30,09 € * 19 % = 5,7171 € -> 5,72 €
+        self.assertEqual([item.total_vat for item in invoice.items], [Decimal('1.91')] * 3)
+        self.assertEqual(sum(item.total_vat for item in invoice.items), Decimal('5.73'))
+        self.assertEqual(invoice.total_vat, Decimal('5.72'))
+        self.assertEqual(sum(item.total_gross for item in invoice.items), Decimal('35.82'))
+        self.assertEqual(invoice.total_gross, Decimal('35.81'))
+        self.assertEqual(sum(item.total_net for item in invoice.items), invoice.total_net)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests für die optionale Messung der Anfragen (Server-Timing-Header und /metrics)
+"""
+
+import unittest
+import os
+import re
+import sys
+from datetime import datetime
+from unittest import mock
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from app.models.customer import Customer
+from app.models.invoice import Invoice, InvoiceItem
+
+class InstrumentationTests(unittest.TestCase):
+    """Testklasse für die Messung der Anfragen"""
+    
+    def setUp(self):
+        """Testumgebung einrichten"""
+        with mock.patch.dict(os.environ, {'INSTRUMENTATION_ENABLED': 'True', 'METRICS_TOKEN': 'scrape-token'}):
+            self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        
+        db.create_all()
+        
+        customer = Customer(
+            company_name="Kunde GmbH", street="Kundenstraße", house_number="456", postal_code="54321",
+            city="Kundenstadt", country="Deutschland", email="info@kunde-gmbh.de"
+        )
+        db.session.add(customer)
+        db.session.flush()
+        for i in range(3):
+            invoice = Invoice(
+                invoice_number=f"2025-03-{i + 1:04d}", customer_id=customer.customer_id,
+                invoice_date=datetime(2025, 3, i + 1).date(), due_date=datetime(2025, 3, 15).date(),
+                delivery_date=datetime(2025, 3, 1).date()
+            )
+            invoice.items.append(InvoiceItem(position=1, quantity=1, price_net=100, vat_rate=19, description="Leistung"))
+            invoice.calculate_totals()
+            db.session.add(invoice)
+        
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity="test")}'}
+    
+    def tearDown(self):
+        """Testumgebung aufräumen"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def _server_timing(self, response):
+        return {
+            match.group(1): (float(match.group(2)), match.group(3))
+            for match in re.finditer(r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?', response.headers['Server-Timing'])
+        }
+    
+    def test_disabled_by_default(self):
+        """Test: Ohne INSTRUMENTATION_ENABLED werden weder Hooks noch /metrics registriert"""
+        with mock.patch.dict(os.environ, {'INSTRUMENTATION_ENABLED': 'False'}), \
+                mock.patch('app.instrumentation._install_hooks') as install_hooks:
+            app = create_app('testing')
+        
+        install_hooks.assert_not_called()
+        client = app.test_client()
+        response = client.get('/api/invoices?limit=2', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response.headers)
+        self.assertEqual(client.get('/metrics', headers=self.headers).status_code, 404)
+    
+    def test_server_timing_counts_queries(self):
+        """Test: Der Server-Timing-Header enthält die Anzahl der Abfragen und die Zeiten der Anfrage"""
+        statements = []
+        
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+        try:
+            response = self.client.get('/api/invoices?limit=2', headers=self.headers)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count_statement)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()), 2)
+        
+        # Rechnungen der Seite, ihre Positionen und ihre Kunden (selectinload)
+        timing = self._server_timing(response)
+        self.assertEqual(len(statements), 3)
+        self.assertEqual(timing['db'][1], "3 queries")
+        self.assertEqual(set(timing), {'db', 'serialize', 'render', 'total'})
+        self.assertGreater(timing['serialize'][0], 0)
+        self.assertEqual(timing['render'][0], 0)
+        self.assertLessEqual(timing['db'][0] + timing['serialize'][0], timing['total'][0] + 0.2)
+    
+    def test_failed_statement_does_not_shift_timing(self):
+        """Test: Eine fehlgeschlagene Anweisung hinterlässt keine Startzeit an der Verbindung"""
+        with self.assertRaises(OperationalError):
+            db.session.execute(text("SELECT * FROM gibt_es_nicht"))
+        db.session.rollback()
+        
+        connection = db.session.connection()
+        self.assertNotIn('query_start_time', connection.info)
+        
+        response = self.client.get('/api/invoices?limit=2', headers=self.headers)
+        self.assertEqual(self._server_timing(response)['db'][1], "3 queries")
+    
+    def test_metrics_require_authorization(self):
+        """Test: /metrics ist nur mit JWT oder dem Scrape-Token abrufbar"""
+        self.client.get('/api/invoices?limit=2', headers=self.headers)
+        
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer falsch'}).status_code, 422)
+        
+        for headers in (self.headers, {'Authorization': 'Bearer scrape-token'}):
+            response = self.client.get('/metrics', headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('db_queries_total{method="GET",endpoint="/api/invoices"}', response.get_data(as_text=True))
+
+if __name__ == '__main__':
+    unittest.main()
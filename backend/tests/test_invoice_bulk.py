@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Tests für das Anlegen und Stornieren von Rechnungen über die API (einzeln und als Stapel)
+"""
+
+import unittest
+import os
+import sys
+from decimal import Decimal
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from flask_jwt_extended import create_access_token
+from app.models.customer import Customer
+from app.models.item import Item
+from app.models.invoice import Invoice
+from app.services.invoice_bulk_service import cancel_invoices
+
+class InvoiceBulkTests(unittest.TestCase):
+    """Testklasse für das Anlegen und Stornieren von Rechnungen"""
+    
+    def setUp(self):
+        """Testumgebung einrichten"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        
+        db.create_all()
+        
+        customer = Customer(
+            company_name="Kunde GmbH", street="Kundenstraße", house_number="456", postal_code="54321",
+            city="Kundenstadt", country="Deutschland", email="info@kunde-gmbh.de"
+        )
+        item = Item(name="Beratung", description="Beratung pro Stunde", unit="Stunde", price_net=100, vat_rate=19)
+        db.session.add_all([customer, item])
+        db.session.commit()
+        
+        self.customer_id = customer.customer_id
+        self.item_id = item.item_id
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity="test")}'}
+    
+    def tearDown(self):
+        """Testumgebung aufräumen"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def _invoice_data(self, **values):
+        return {
+            'customer_id': self.customer_id,
+            'items': [
+                {'item_id': self.item_id, 'quantity': '2.5'},
+                {'description': "Reisekosten", 'quantity': 1, 'price_net': '80.00', 'vat_rate': 7}
+            ],
+            **values
+        }
+    
+    def test_single_and_bulk_create_accept_same_format(self):
+        """Test: POST /api/invoices und /api/invoices/bulk nehmen dieselben Rechnungen mit Positionen an"""
+        response = self.client.post('/api/invoices', json=self._invoice_data(invoice_date='2025-03-01'), headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        single = db.session.get(Invoice, response.get_json()['invoice_id'])
+        
+        response = self.client.post('/api/invoices/bulk', json={'invoices': [self._invoice_data(invoice_date='2025-03-01')]}, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        bulk = db.session.get(Invoice, response.get_json()['invoices'][0]['invoice_id'])
+        
+        for invoice in (single, bulk):
+            self.assertEqual(str(invoice.invoice_date), '2025-03-01')
+            self.assertEqual([item.unit for item in invoice.items], ['Stunde', 'Stück'])
+            self.assertEqual(
+                (invoice.total_net, invoice.total_vat, invoice.total_gross),
+                (Decimal('330.00'), Decimal('53.10'), Decimal('383.10'))
+            )
+        self.assertNotEqual(single.invoice_number, bulk.invoice_number)
+    
+    def test_create_rejects_invalid_items(self):
+        """Test: Fehlerhafte Rechnungen und Positionen werden abgewiesen, Positionen wie beim Stapel mit ihrem Index"""
+        response = self.client.post('/api/invoices', json=self._invoice_data(items=[{'quantity': 'viel'}]), headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('quantity', response.get_json()['errors']['items']['0'])
+        
+        response = self.client.post('/api/invoices', json={'items': []}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('customer_id', response.get_json()['errors'])
+        
+        # JSON null wird wie ein leerer Body geprüft, Listen werden abgewiesen
+        response = self.client.post('/api/invoices', data='null', content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('customer_id', response.get_json()['errors'])
+        response = self.client.post('/api/invoices', json=[self._invoice_data()], headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {"error": "Rechnung muss ein Objekt sein"})
+        
+        response = self.client.post('/api/invoices', json=self._invoice_data(items=[{'item_id': 9999}]), headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.get_json(), {"error": "Artikel mit ID 9999 nicht gefunden"})
+        self.assertEqual(Invoice.query.count(), 0)
+    
+    def test_bulk_create_reports_invalid_invoices_by_index(self):
+        """Test: Ungültige Rechnungen im Stapel werden mit Index gemeldet, die gültigen angelegt"""
+        self.app.config['INVOICE_BULK_MAX_SIZE'] = 8
+        invoices = [
+            self._invoice_data(invoice_number="2025-03-0100"),
+            self._invoice_data(customer_id=True),
+            self._invoice_data(customer_id=9999),
+            self._invoice_data(items=[{'item_id': True}]),
+            self._invoice_data(items=[{'item_id': 9999}]),
+            self._invoice_data(invoice_number="2025-03-0100"),
+            "keine Rechnung",
+            self._invoice_data()
+        ]
+        response = self.client.post('/api/invoices/bulk', json={'invoices': invoices}, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        data = response.get_json()
+        
+        self.assertEqual((data['total'], data['created'], data['failed']), (8, 2, 6))
+        self.assertEqual([invoice['index'] for invoice in data['invoices']], [0, 7])
+        self.assertEqual(data['invoices'][0]['invoice_number'], "2025-03-0100")
+        errors = {error['index']: error['errors'] for error in data['errors']}
+        self.assertEqual(sorted(errors), [1, 2, 3, 4, 5, 6])
+        self.assertIn('customer_id', errors[1])
+        self.assertEqual(errors[2], {'customer_id': ["Kunde nicht gefunden"]})
+        self.assertIn('item_id', errors[3]['items']['0'])
+        self.assertIn('item_id', errors[4]['items']['0'])
+        self.assertEqual(errors[5], {'invoice_number': ["Rechnungsnummer ist bereits vergeben"]})
+        self.assertEqual(Invoice.query.count(), 2)
+        
+        # Leere und zu große Stapel werden abgewiesen
+        for invoices in ([], [self._invoice_data()] * 9, None):
+            response = self.client.post('/api/invoices/bulk', json={'invoices': invoices}, headers=self.headers)
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(Invoice.query.count(), 2)
+    
+    def test_bulk_cancel(self):
+        """Test: Massenstorno legt Stornorechnungen mit negierten Positionen an und weist bool-IDs ab"""
+        response = self.client.post('/api/invoices/bulk', json={'invoices': [self._invoice_data() for _ in range(3)]}, headers=self.headers)
+        first, second, third = [invoice['invoice_id'] for invoice in response.get_json()['invoices']]
+        
+        # True ist in Python eine ganze Zahl und würde sonst Rechnung 1 stornieren
+        for invoice_ids in ([first, True], [str(first)], [], None):
+            response = self.client.post('/api/invoices/cancel', json={'invoice_ids': invoice_ids}, headers=self.headers)
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(Invoice.query.filter_by(is_cancelled=True).count(), 0)
+        
+        response = self.client.post('/api/invoices/cancel', json={
+            'invoice_ids': [first, second, first, 9999], 'reason': "Doppelt berechnet"
+        }, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual((data['cancelled'], data['failed']), (2, 1))
+        self.assertEqual(data['errors'], [{'invoice_id': 9999, 'error': "Rechnung nicht gefunden"}])
+        
+        for entry in data['invoices']:
+            original = db.session.get(Invoice, entry['invoice_id'])
+            storno = db.session.get(Invoice, entry['storno_invoice_id'])
+            self.assertEqual((original.status, original.cancellation_reason), ('storniert', "Doppelt berechnet"))
+            self.assertEqual(storno.invoice_number, f"STORNO-{original.invoice_number}")
+            self.assertEqual(storno.original_invoice_id, original.invoice_id)
+            self.assertEqual([item.quantity for item in storno.items], [-item.quantity for item in original.items])
+            self.assertEqual(storno.total_gross, -original.total_gross)
+        
+        # Auch beim direkten Aufruf des Dienstes werden bool-IDs nicht als ID 1 behandelt
+        cancelled, errors = cancel_invoices([True, third, second])
+        db.session.commit()
+        self.assertEqual([entry['invoice_id'] for entry in cancelled], [third])
+        self.assertEqual(errors, [
+            {'invoice_id': True, 'error': "Ungültige Rechnungs-ID"},
+            {'invoice_id': second, 'error': "Rechnung wurde bereits storniert"}
+        ])
+        self.assertEqual(Invoice.query.filter_by(is_cancelled=True).count(), 3)
+
+if __name__ == '__main__':
+    unittest.main()
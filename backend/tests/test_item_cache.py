@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests für den Artikel-Cache der Autovervollständigung
+"""
+
+import unittest
+import os
+import sys
+from datetime import datetime
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, update
+from app.models.item import Item
+from app.services.item_cache_service import bump_item_cache_version, get_item_cache_version, load_item_catalog
+
+class ItemCacheTests(unittest.TestCase):
+    """Testklasse für den Artikel-Cache"""
+    
+    def setUp(self):
+        """Testumgebung einrichten"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        
+        db.create_all()
+        
+        db.session.add_all([
+            Item(item_number="B-100", name="Beratung", unit="Stunde", price_net=100, vat_rate=19),
+            Item(item_number="M-200", name="Montage", price_net=250, vat_rate=19),
+            Item(item_number="V-300", name="Vor-Ort Beratung", unit="Stunde", price_net=120, vat_rate=19),
+            Item(item_number="A-400", name="Anfahrt", price_net=50, vat_rate=19, is_active=False)
+        ])
+        db.session.commit()
+        
+        # Katalog früherer Tests (gleiche Datenbank-URL) ersetzen
+        load_item_catalog()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity="test")}'}
+    
+    def tearDown(self):
+        """Testumgebung aufräumen"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def _lookup(self, query, limit=None):
+        url = f'/api/items/search?query={query}' + (f'&limit={limit}' if limit else '')
+        response = self.client.get(url, headers=self.headers)
+        self.assertEqual(response.status_code, 200, response.get_json())
+        return [item['name'] for item in response.get_json()]
+    
+    def test_prefix_lookup_without_queries(self):
+        """Test: Artikelnummer, Namensanfang und weitere Wörter werden ohne Datenbankabfrage gefunden"""
+        self.app.config['ITEM_CACHE_CHECK_SECONDS'] = 60
+        statements = []
+        
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+        try:
+            self.assertEqual(self._lookup('b'), ["Beratung", "Vor-Ort Beratung"])
+            self.assertEqual(self._lookup('BERA', limit=1), ["Beratung"])
+            self.assertEqual(self._lookup('m-2'), ["Montage"])
+            self.assertEqual(self._lookup('anf'), [])
+            self.assertEqual(self._lookup(''), ["Beratung", "Montage", "Vor-Ort Beratung"])
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count_statement)
+        
+        self.assertEqual(statements, [])
+    
+    def test_changes_invalidate_cache(self):
+        """Test: Anlegen, Ändern und Deaktivieren erhöhen den Versionszähler und sind sofort sichtbar"""
+        version = get_item_cache_version()
+        
+        response = self.client.post('/api/items', json={'item_number': "S-500", 'name': "Schulung", 'price_net': 80, 'vat_rate': 19}, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        item_id = response.get_json()['item_id']
+        self.assertEqual(get_item_cache_version(), version + 1)
+        self.assertEqual(self._lookup('sch'), ["Schulung"])
+        
+        response = self.client.put(f'/api/items/{item_id}', json={
+            'item_number': "S-500", 'name': "Online-Schulung", 'price_net': 80, 'vat_rate': 19
+        }, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_item_cache_version(), version + 2)
+        self.assertEqual(self._lookup('sch'), [])
+        self.assertEqual(self._lookup('onl'), ["Online-Schulung"])
+        
+        response = self.client.delete(f'/api/items/{item_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_item_cache_version(), version + 3)
+        self.assertEqual(self._lookup('onl'), [])
+        self.assertEqual(self._lookup('s-5'), [])
+    
+    def test_version_bump_refreshes_other_workers(self):
+        """Test: Änderungen am ORM vorbei werden nach Erhöhen des Versionszählers nachgeladen"""
+        self.app.config['ITEM_CACHE_CHECK_SECONDS'] = 0
+        
+        # Wie ein anderer Worker: Core-Anweisungen, deren Commit den eigenen Katalog nicht verwirft
+        db.session.execute(
+            update(Item).where(Item.item_number == "A-400").values(is_active=True, updated_at=datetime.utcnow())
+        )
+        db.session.commit()
+        self.assertEqual(self._lookup('anf'), [])
+        
+        bump_item_cache_version()
+        db.session.commit()
+        self.assertEqual(self._lookup('anf'), ["Anfahrt"])
+        
+        # Ohne geänderte updated_at fällt der Abgleich auf die Anzahl der aktiven Artikel zurück
+        db.session.execute(update(Item).where(Item.item_number == "M-200").values(is_active=False))
+        bump_item_cache_version()
+        db.session.commit()
+        self.assertEqual(self._lookup('mon'), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests für die seitenweise Abfrage der Rechnungen (Keyset-Paginierung)
+"""
+
+import unittest
+import os
+import sys
+import base64
+from datetime import datetime
+from unittest import mock
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from flask_jwt_extended import create_access_token
+from app.models.customer import Customer
+from app.models.invoice import Invoice
+
+class PaginationTests(unittest.TestCase):
+    """Testklasse für die Paginierung der Rechnungen"""
+    
+    def setUp(self):
+        """Testumgebung einrichten"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        
+        db.create_all()
+        
+        customer = Customer(
+            company_name="Kunde GmbH", street="Kundenstraße", house_number="456", postal_code="54321",
+            city="Kundenstadt", country="Deutschland", email="info@kunde-gmbh.de"
+        )
+        db.session.add(customer)
+        db.session.flush()
+        
+        # Zwölf Rechnungen an drei Tagen, sodass Seitengrenzen innerhalb eines Datums liegen
+        for i in range(12):
+            db.session.add(Invoice(
+                invoice_number=f"2025-03-{i + 1:04d}", customer_id=customer.customer_id,
+                invoice_date=datetime(2025, 3, 1 + i % 3).date(), due_date=datetime(2025, 3, 15).date(),
+                delivery_date=datetime(2025, 3, 1).date()
+            ))
+        
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity="test")}'}
+    
+    def tearDown(self):
+        """Testumgebung aufräumen"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def test_pages_without_duplicates_or_gaps(self):
+        """Test: Alle Seiten zusammen enthalten jede Rechnung genau einmal, neueste zuerst"""
+        pages = []
+        url = '/api/invoices?limit=5'
+        while url:
+            response = self.client.get(url, headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            pages.append([(invoice['invoice_date'], invoice['invoice_id']) for invoice in response.get_json()])
+            cursor = response.headers.get('X-Next-Cursor')
+            url = f'/api/invoices?limit=5&cursor={cursor}' if cursor else None
+        
+        # Die letzte Seite hat keinen Cursor
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        
+        rows = [row for page in pages for row in page]
+        expected = sorted(
+            ((invoice.invoice_date.isoformat(), invoice.invoice_id) for invoice in Invoice.query.all()),
+            reverse=True
+        )
+        self.assertEqual(rows, expected)
+    
+    def test_limit_and_invalid_cursor(self):
+        """Test: limit wird begrenzt, ungültige Cursor werden mit 400 abgewiesen"""
+        with mock.patch('app.api.pagination.MAX_PAGE_SIZE', 4):
+            response = self.client.get('/api/invoices?limit=1000', headers=self.headers)
+        self.assertEqual(len(response.get_json()), 4)
+        self.assertIn('X-Next-Cursor', response.headers)
+        
+        response = self.client.get('/api/invoices?limit=0', headers=self.headers)
+        self.assertEqual(len(response.get_json()), 1)
+        
+        # Ohne limit höchstens DEFAULT_PAGE_SIZE Rechnungen (50), nicht mehr alle
+        with mock.patch('app.api.pagination.DEFAULT_PAGE_SIZE', 10):
+            response = self.client.get('/api/invoices', headers=self.headers)
+        self.assertEqual(len(response.get_json()), 10)
+        self.assertIn('X-Next-Cursor', response.headers)
+        
+        for cursor in ('kein-cursor', base64.urlsafe_b64encode(b'2025-03-01|x').decode(), base64.urlsafe_b64encode(b'2025-03-01').decode()):
+            response = self.client.get(f'/api/invoices?cursor={cursor}', headers=self.headers)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.get_json(), {"error": "Ungültiger Cursor"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Tests für die gezahlten und offenen Beträge der Rechnungen (paid_amount, open_amount)
+"""
+
+import unittest
+import os
+import sys
+import io
+from datetime import datetime
+from decimal import Decimal
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from flask_jwt_extended import create_access_token
+from app.models.customer import Customer
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.payment import Payment
+from app.services.payment_service import check_paid_amounts
+
+CAMT_STATEMENT = """<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02">
+  <BkToCstmrStmt>
+    <Stmt>
+      <Id>2025-02-03</Id>
+      <Acct><Id><IBAN>DE89370400440532013000</IBAN></Id><Ccy>EUR</Ccy></Acct>
+      <Ntry>
+        <Amt Ccy="EUR">119.00</Amt>
+        <CdtDbtInd>CRDT</CdtDbtInd>
+        <Sts>BOOK</Sts>
+        <BookgDt><Dt>2025-02-03</Dt></BookgDt>
+        <AcctSvcrRef>REF-1</AcctSvcrRef>
+        <NtryDtls><TxDtls><RmtInf><Ustrd>Rechnung 2025-01-0001</Ustrd></RmtInf></TxDtls></NtryDtls>
+      </Ntry>
+      <Ntry>
+        <Amt Ccy="EUR">50.00</Amt>
+        <CdtDbtInd>CRDT</CdtDbtInd>
+        <Sts>BOOK</Sts>
+        <BookgDt><Dt>2025-02-03</Dt></BookgDt>
+        <AcctSvcrRef>REF-2</AcctSvcrRef>
+        <NtryDtls><TxDtls><RmtInf><Ustrd>Teilzahlung 2025-01-0002</Ustrd></RmtInf></TxDtls></NtryDtls>
+      </Ntry>
+    </Stmt>
+  </BkToCstmrStmt>
+</Document>
+"""
+
+class PaymentTotalsTests(unittest.TestCase):
+    """Testklasse für die Fortschreibung von paid_amount und open_amount"""
+    
+    def setUp(self):
+        """Testumgebung einrichten"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        
+        db.create_all()
+        
+        customer = Customer(
+            company_name="Kunde GmbH", street="Kundenstraße", house_number="456", postal_code="54321",
+            city="Kundenstadt", country="Deutschland", email="info@kunde-gmbh.de"
+        )
+        db.session.add(customer)
+        db.session.flush()
+        
+        # Drei Rechnungen über je 119,00 € brutto
+        self.invoice_ids = []
+        for i in range(3):
+            invoice = Invoice(
+                invoice_number=f"2025-01-{i + 1:04d}", customer_id=customer.customer_id,
+                invoice_date=datetime(2025, 1, 1).date(), due_date=datetime(2025, 1, 15).date(),
+                delivery_date=datetime(2025, 1, 1).date(), status='versendet'
+            )
+            invoice.items.append(InvoiceItem(position=1, quantity=1, price_net=100, vat_rate=19, description="Leistung"))
+            invoice.calculate_totals()
+            db.session.add(invoice)
+            db.session.flush()
+            self.invoice_ids.append(invoice.invoice_id)
+        
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity="test")}'}
+    
+    def tearDown(self):
+        """Testumgebung aufräumen"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def _amounts(self, invoice_id):
+        db.session.expire_all()
+        invoice = db.session.get(Invoice, invoice_id)
+        return invoice.paid_amount, invoice.open_amount, invoice.payment_status
+    
+    def _add_payment(self, invoice_id, amount):
+        response = self.client.post('/api/payments', json={
+            'invoice_id': invoice_id, 'payment_date': '2025-02-01', 'amount': amount, 'payment_method': 'Überweisung'
+        }, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()['payment_id']
+    
+    def test_create_move_and_delete_payment(self):
+        """Test: Erfassen, Umbuchen und Löschen einer Zahlung"""
+        first, second = self.invoice_ids[:2]
+        self.assertEqual(self._amounts(first), (Decimal('0.00'), Decimal('119.00'), 'offen'))
+        
+        payment_id = self._add_payment(first, '50.00')
+        self.assertEqual(self._amounts(first), (Decimal('50.00'), Decimal('69.00'), 'teilweise bezahlt'))
+        
+        # Umbuchen auf eine andere Rechnung schreibt beide Rechnungen fort
+        response = self.client.put(f'/api/payments/{payment_id}', json={'invoice_id': second, 'amount': '119.00'}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._amounts(first), (Decimal('0.00'), Decimal('119.00'), 'offen'))
+        self.assertEqual(self._amounts(second), (Decimal('119.00'), Decimal('0.00'), 'vollständig bezahlt'))
+        
+        response = self.client.delete(f'/api/payments/{payment_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._amounts(second), (Decimal('0.00'), Decimal('119.00'), 'offen'))
+        self.assertEqual(check_paid_amounts(), 0)
+    
+    def test_overpayment(self):
+        """Test: Überzahlung ergibt einen negativen offenen Betrag und fällt aus dem Filter offener Rechnungen"""
+        invoice_id = self.invoice_ids[0]
+        self._add_payment(invoice_id, '100.00')
+        self._add_payment(invoice_id, '30.00')
+        self.assertEqual(self._amounts(invoice_id), (Decimal('130.00'), Decimal('-11.00'), 'vollständig bezahlt'))
+        
+        response = self.client.get('/api/invoices?open_amount_min=0.01', headers=self.headers)
+        self.assertEqual(sorted(invoice['invoice_id'] for invoice in response.get_json()), self.invoice_ids[1:])
+    
+    def test_bank_statement_import(self):
+        """Test: Der Import eines Kontoauszugs schreibt die Beträge aller zugeordneten Rechnungen fort"""
+        response = self.client.post('/api/payments/import', data=CAMT_STATEMENT.encode('utf-8'), headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['matched'], 2)
+        
+        first, second, third = self.invoice_ids
+        self.assertEqual(self._amounts(first), (Decimal('119.00'), Decimal('0.00'), 'vollständig bezahlt'))
+        self.assertEqual(self._amounts(second), (Decimal('50.00'), Decimal('69.00'), 'teilweise bezahlt'))
+        self.assertEqual(self._amounts(third), (Decimal('0.00'), Decimal('119.00'), 'offen'))
+        self.assertEqual(check_paid_amounts(), 0)
+    
+    def test_bank_statement_import_size_limit(self):
+        """Test: Kontoauszüge über PAYMENT_IMPORT_MAX_BYTES werden auch ohne Content-Length mit 413 abgewiesen"""
+        data = CAMT_STATEMENT.encode('utf-8')
+        self.assertEqual(self.app.config['MAX_CONTENT_LENGTH'], self.app.config['PAYMENT_IMPORT_MAX_BYTES'])
+        self.app.config['PAYMENT_IMPORT_MAX_BYTES'] = self.app.config['MAX_CONTENT_LENGTH'] = len(data) - 1
+        chunked = {**self.headers, 'Transfer-Encoding': 'chunked'}
+        # Wie gunicorn bei Transfer-Encoding: chunked (Ende des Datenstroms wird vom Server erkannt)
+        terminated = {'wsgi.input_terminated': True}
+        
+        for response in (
+            self.client.post('/api/payments/import', data=data, headers=self.headers),
+            self.client.post('/api/payments/import', data={'file': (io.BytesIO(data), 'auszug.xml')}, headers=self.headers),
+            self.client.post('/api/payments/import', input_stream=io.BytesIO(data), headers=chunked, environ_overrides=terminated)
+        ):
+            self.assertEqual(response.status_code, 413)
+            self.assertEqual(response.get_json(), {"error": "Kontoauszug zu groß (maximal 0 MB)"})
+        self.assertEqual(Payment.query.count(), 0)
+        
+        self.app.config['PAYMENT_IMPORT_MAX_BYTES'] = self.app.config['MAX_CONTENT_LENGTH'] = len(data) + 1
+        response = self.client.post('/api/payments/import', input_stream=io.BytesIO(data), headers=chunked, environ_overrides=terminated)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['matched'], 2)
+    
+    def test_edit_and_cancel_invoice(self):
+        """Test: Geänderte Positionen berechnen den offenen Betrag neu, stornierte Rechnungen sind nicht mehr offen"""
+        invoice_id = self.invoice_ids[0]
+        self._add_payment(invoice_id, '119.00')
+        
+        # Höherer Rechnungsbetrag: wieder teilweise offen
+        invoice = db.session.get(Invoice, invoice_id)
+        invoice.items[0].quantity = 2
+        invoice.calculate_totals()
+        self.assertEqual(invoice.open_amount, Decimal('119.00'))
+        db.session.commit()
+        self.assertEqual(self._amounts(invoice_id), (Decimal('119.00'), Decimal('119.00'), 'teilweise bezahlt'))
+        
+        # Einzel- und Massenstorno
+        self.assertEqual(self.client.post(f'/api/invoices/{invoice_id}/cancel', json={}, headers=self.headers).status_code, 200)
+        response = self.client.post('/api/invoices/cancel', json={'invoice_ids': [self.invoice_ids[1]]}, headers=self.headers)
+        self.assertEqual(response.get_json()['cancelled'], 1)
+        
+        self.assertEqual(self._amounts(invoice_id)[1], Decimal('0.00'))
+        self.assertEqual(self._amounts(self.invoice_ids[1])[1], Decimal('0.00'))
+        storno_amounts = db.session.scalars(db.select(Invoice.open_amount).where(Invoice.original_invoice_id.is_not(None))).all()
+        self.assertEqual(storno_amounts, [Decimal('0.00'), Decimal('0.00')])
+        
+        response = self.client.get('/api/invoices/search?open_amount_min=0.01', headers=self.headers)
+        self.assertEqual([invoice['invoice_id'] for invoice in response.get_json()], [self.invoice_ids[2]])
+        self.assertEqual(check_paid_amounts(), 0)
+        self.assertEqual(Payment.query.count(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
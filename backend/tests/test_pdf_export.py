@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests für den Export mehrerer Rechnungs-PDFs (ZIP-Archiv und gemeinsames PDF)
+"""
+
+import unittest
+import os
+import sys
+import io
+import zipfile
+from datetime import datetime
+
+from PyPDF2 import PdfReader
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from flask_jwt_extended import create_access_token
+from app.models.customer import Customer
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.company_data import CompanyData
+
+class PdfExportTests(unittest.TestCase):
+    """Testklasse für den PDF-Export"""
+    
+    def setUp(self):
+        """Testumgebung einrichten"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        
+        db.create_all()
+        
+        db.session.add(CompanyData(
+            company_name="Muster GmbH", street="Musterstraße", house_number="123", postal_code="12345",
+            city="Musterstadt", tax_id="123/456/78901", vat_id="DE123456789", email="info@muster-gmbh.de",
+            bank_name="Musterbank", iban="DE12345678901234567890", bic="MUBADE123"
+        ))
+        customer = Customer(
+            company_name="Kunde GmbH", street="Kundenstraße", house_number="456", postal_code="54321",
+            city="Kundenstadt", country="Deutschland", email="info@kunde-gmbh.de"
+        )
+        db.session.add(customer)
+        db.session.flush()
+        
+        # Vier Rechnungen im März, die dritte mit so vielen Positionen, dass sie zwei Seiten hat
+        for i in range(4):
+            invoice = Invoice(
+                invoice_number=f"2025-03-{i + 1:04d}", customer_id=customer.customer_id,
+                invoice_date=datetime(2025, 3, i + 1).date(), due_date=datetime(2025, 3, 15).date(),
+                delivery_date=datetime(2025, 3, 1).date()
+            )
+            for position in range(40 if i == 2 else 1):
+                invoice.items.append(InvoiceItem(
+                    position=position + 1, quantity=1, price_net=100, vat_rate=19, description=f"Leistung {position + 1}"
+                ))
+            invoice.calculate_totals()
+            db.session.add(invoice)
+        
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity="test")}'}
+    
+    def tearDown(self):
+        """Testumgebung aufräumen"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def test_export_zip_and_merged_pdf(self):
+        """Test: ZIP-Archiv und gemeinsames PDF enthalten dieselben Seiten in derselben Reihenfolge"""
+        response = self.client.get('/api/invoices/export?date_from=2025-03-02', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        
+        archive = zipfile.ZipFile(io.BytesIO(response.get_data()))
+        self.assertEqual(archive.namelist(), [f"Rechnung_2025-03-000{i}.pdf" for i in (2, 3, 4)])
+        zip_pages = [
+            page.extract_text()
+            for name in archive.namelist()
+            for page in PdfReader(io.BytesIO(archive.read(name))).pages
+        ]
+        self.assertEqual(len(zip_pages), 4)
+        
+        response = self.client.get('/api/invoices/export?format=pdf&date_from=2025-03-02', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'application/pdf')
+        
+        merged = PdfReader(io.BytesIO(response.get_data()), strict=True)
+        self.assertEqual([page.extract_text() for page in merged.pages], zip_pages)
+        
+        # Ohne passende Rechnungen kein leeres PDF
+        response = self.client.get('/api/invoices/export?format=pdf&date_from=2026-01-01', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+    
+    def test_invoice_pdf_etag(self):
+        """Test: Das PDF einer Rechnung wird bei unveränderter Version mit 304 beantwortet"""
+        response = self.client.get('/api/invoices/1/pdf', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(PdfReader(io.BytesIO(response.get_data())).pages), 1)
+        
+        response = self.client.get('/api/invoices/1/preview', headers={**self.headers, 'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests für das Rendern der Rechnungs-PDFs im Prozesspool und die Zwischenspeicher je Prozess
+"""
+
+import unittest
+import os
+import sys
+import io
+import tempfile
+from datetime import datetime
+from unittest import mock
+
+from PyPDF2 import PdfReader
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models.customer import Customer
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.company_data import CompanyData
+from app.services import pdf_service
+from app.services.pdf_service import (
+    build_invoice_pdf_data,
+    render_invoice_pdf_bytes,
+    render_pdfs_in_pool,
+    get_pdf_executor,
+    get_styles,
+    _load_logo
+)
+
+class PdfRenderingTests(unittest.TestCase):
+    """Testklasse für das Rendern der PDFs"""
+    
+    def setUp(self):
+        """Testumgebung einrichten"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        
+        db.create_all()
+        
+        company_data = CompanyData(
+            company_name="Muster GmbH", street="Musterstraße", house_number="123", postal_code="12345",
+            city="Musterstadt", tax_id="123/456/78901", vat_id="DE123456789", email="info@muster-gmbh.de",
+            bank_name="Musterbank", iban="DE12345678901234567890", bic="MUBADE123"
+        )
+        customer = Customer(
+            company_name="Kunde GmbH", street="Kundenstraße", house_number="456", postal_code="54321",
+            city="Kundenstadt", country="Deutschland", email="info@kunde-gmbh.de"
+        )
+        db.session.add_all([company_data, customer])
+        db.session.flush()
+        
+        # Drei Rechnungen, die zweite mit zwei Seiten
+        self.pdf_data = []
+        for i in range(3):
+            invoice = Invoice(
+                invoice_number=f"2025-03-{i + 1:04d}", customer_id=customer.customer_id,
+                invoice_date=datetime(2025, 3, i + 1).date(), due_date=datetime(2025, 3, 15).date(),
+                delivery_date=datetime(2025, 3, 1).date()
+            )
+            for position in range(40 if i == 1 else 2):
+                invoice.items.append(InvoiceItem(
+                    position=position + 1, quantity=position + 1, price_net='12.34', vat_rate=7 if position % 2 else 19,
+                    description=f"Leistung {position + 1}"
+                ))
+            invoice.calculate_totals()
+            db.session.add(invoice)
+            db.session.flush()
+            self.pdf_data.append(build_invoice_pdf_data(invoice, company_data))
+        
+        db.session.commit()
+    
+    def tearDown(self):
+        """Testumgebung aufräumen"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def _pages(self, pdf):
+        return [page.extract_text() for page in PdfReader(io.BytesIO(pdf)).pages]
+    
+    def test_pool_matches_in_process_rendering(self):
+        """Test: Der Prozesspool (Start per spawn) liefert dieselben PDFs in Eingabereihenfolge"""
+        self.assertEqual(get_pdf_executor()._mp_context.get_start_method(), 'spawn')
+        
+        pooled = list(render_pdfs_in_pool(self.pdf_data))
+        in_process = [render_invoice_pdf_bytes(data) for data in self.pdf_data]
+        
+        self.assertEqual([self._pages(pdf) for pdf in pooled], [self._pages(pdf) for pdf in in_process])
+        self.assertEqual([len(self._pages(pdf)) for pdf in pooled], [1, 2, 1])
+        self.assertIn("2025-03-0002", self._pages(pooled[1])[0])
+    
+    def test_styles_created_once(self):
+        """Test: Das Stylesheet wird einmal pro Prozess erstellt und wiederverwendet"""
+        styles = get_styles()
+        with mock.patch.object(pdf_service, 'getSampleStyleSheet') as sample_style_sheet:
+            self.assertIs(get_styles(), styles)
+            render_invoice_pdf_bytes(self.pdf_data[0])
+        sample_style_sheet.assert_not_called()
+        self.assertIn('InvoiceTitle', styles.byName)
+    
+    def test_logo_read_only_after_change(self):
+        """Test: Das Logo wird nur bei geänderter Änderungszeit neu gelesen, veraltete Versionen werden verworfen"""
+        with tempfile.TemporaryDirectory() as directory:
+            logo_path = os.path.join(directory, 'logo.png')
+            with open(logo_path, 'wb') as logo_file:
+                logo_file.write(b'alt')
+            
+            self.assertEqual(_load_logo(logo_path, 1.0), b'alt')
+            with open(logo_path, 'wb') as logo_file:
+                logo_file.write(b'neu')
+            
+            # Gleiche Änderungszeit: Inhalt aus dem Zwischenspeicher
+            self.assertEqual(_load_logo(logo_path, 1.0), b'alt')
+            self.assertEqual(_load_logo(logo_path, 2.0), b'neu')
+            self.assertEqual(list(pdf_service._logo_cache), [(logo_path, 2.0)])
+            
+            self.assertIsNone(_load_logo(os.path.join(directory, 'fehlt.png'), 3.0))
+            self.assertIsNone(_load_logo(None, 1.0))
+            self.assertIsNone(_load_logo(logo_path, None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Tests für die Generierung und Prognose der Intervallrechnungen
+"""
+
+import unittest
+import os
+import sys
+from datetime import date
+from unittest import mock
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from flask_jwt_extended import create_access_token
+from sqlalchemy import update
+from app.models.customer import Customer
+from app.models.invoice import Invoice
+from app.models.recurring_invoice import RecurringInvoice, RecurringInvoiceItem
+from app.services import recurring_invoice_service
+from app.services.recurring_invoice_service import (
+    check_and_generate_recurring_invoices, get_scheduled_invoice_dates, forecast_recurring_invoices
+)
+
+class RecurringInvoiceTests(unittest.TestCase):
+    """Testklasse für die Intervallrechnungen"""
+    
+    def setUp(self):
+        """Testumgebung einrichten"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        
+        db.create_all()
+        
+        customer = Customer(
+            company_name="Kunde GmbH", street="Kundenstraße", house_number="456", postal_code="54321",
+            city="Kundenstadt", country="Deutschland", email="info@kunde-gmbh.de"
+        )
+        db.session.add(customer)
+        db.session.commit()
+        self.customer_id = customer.customer_id
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity="test")}'}
+    
+    def tearDown(self):
+        """Testumgebung aufräumen"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def _recurring(self, next_invoice_date, interval_type='monatlich', end_date=None, price_net=100):
+        recurring_invoice = RecurringInvoice(
+            customer_id=self.customer_id, start_date=next_invoice_date, end_date=end_date,
+            interval_type=interval_type, interval_value=1, next_invoice_date=next_invoice_date, status='aktiv'
+        )
+        recurring_invoice.items.append(RecurringInvoiceItem(
+            position=1, quantity=1, price_net=price_net, vat_rate=19, description="Wartungsvertrag"
+        ))
+        db.session.add(recurring_invoice)
+        db.session.commit()
+        return recurring_invoice.recurring_id
+    
+    def test_chunks_isolate_failing_template(self):
+        """Test: Blöcke werden einzeln wiederholt, sodass nur die fehlerhafte Vorlage ausgelassen wird"""
+        today = date(2025, 3, 10)
+        recurring_ids = [self._recurring(date(2025, 3, 1)) for _ in range(5)]
+        failing_id = recurring_ids[2]
+        build_invoice = recurring_invoice_service.build_invoice_from_recurring
+        
+        def build_or_fail(recurring_invoice, *args):
+            if recurring_invoice.recurring_id == failing_id:
+                raise ValueError("Vorlage fehlerhaft")
+            return build_invoice(recurring_invoice, *args)
+        
+        with mock.patch.object(recurring_invoice_service, 'build_invoice_from_recurring', side_effect=build_or_fail):
+            generated = check_and_generate_recurring_invoices(today=today, batch_size=2)
+        
+        self.assertEqual(
+            [result['recurring_invoice_id'] for result in generated],
+            [recurring_id for recurring_id in recurring_ids if recurring_id != failing_id]
+        )
+        
+        # Der fehlgeschlagene Block hinterlässt keine Lücke in den Rechnungsnummern
+        self.assertEqual(
+            sorted(invoice.invoice_number for invoice in Invoice.query.all()),
+            ["2025-03-0001", "2025-03-0002", "2025-03-0003", "2025-03-0004"]
+        )
+        for recurring_id in recurring_ids:
+            expected = date(2025, 3, 1) if recurring_id == failing_id else date(2025, 4, 1)
+            self.assertEqual(db.session.get(RecurringInvoice, recurring_id).next_invoice_date, expected)
+    
+    def test_chunk_rechecks_due_templates(self):
+        """Test: Zwischen Suche und Block pausierte oder abgerechnete Vorlagen werden nicht abgerechnet"""
+        today = date(2025, 3, 10)
+        paused_id, advanced_id, due_id = [self._recurring(date(2025, 3, 1)) for _ in range(3)]
+        
+        def change_templates():
+            # Wie ein paralleler Zugriff zwischen der Suche der fälligen IDs und dem Block
+            db.session.execute(update(RecurringInvoice).where(RecurringInvoice.recurring_id == paused_id).values(status='pausiert'))
+            db.session.execute(update(RecurringInvoice).where(RecurringInvoice.recurring_id == advanced_id).values(next_invoice_date=date(2025, 4, 1)))
+        
+        with mock.patch.object(recurring_invoice_service, 'renew_current_lock', side_effect=change_templates):
+            generated = check_and_generate_recurring_invoices(today=today, batch_size=10)
+        
+        self.assertEqual([result['recurring_invoice_id'] for result in generated], [due_id])
+        self.assertEqual(Invoice.query.count(), 1)
+        self.assertEqual(db.session.get(RecurringInvoice, advanced_id).next_invoice_date, date(2025, 4, 1))
+        self.assertIsNone(db.session.get(RecurringInvoice, paused_id).last_invoice_date)
+    
+    def test_catch_up_across_month_ends(self):
+        """Test: Nachgeholte Zeiträume ab dem 31. fallen auf das jeweilige Monatsende"""
+        recurring_id = self._recurring(date(2025, 1, 31))
+        recurring_invoice = db.session.get(RecurringInvoice, recurring_id)
+        self.assertEqual(get_scheduled_invoice_dates(recurring_invoice, date(2025, 5, 15)), [
+            date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)
+        ])
+        
+        generated = check_and_generate_recurring_invoices(today=date(2025, 5, 15), catch_up=True)
+        self.assertEqual([result['next_invoice_date'] for result in generated], ['2025-05-31'] * 4)
+        self.assertEqual(
+            sorted(invoice.delivery_date for invoice in Invoice.query.all()),
+            [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)]
+        )
+        
+        # Das nächste Rechnungsdatum wird vom 31.01. aus berechnet, nicht vom 28.02.
+        recurring_invoice = db.session.get(RecurringInvoice, recurring_id)
+        self.assertEqual(recurring_invoice.next_invoice_date, date(2025, 5, 31))
+        self.assertEqual(recurring_invoice.last_invoice_date, date(2025, 5, 15))
+    
+    def test_check_due_dry_run_writes_nothing(self):
+        """Test: Der Probelauf zeigt die geplanten Rechnungen, ohne etwas zu schreiben"""
+        recurring_id = self._recurring(date(2025, 1, 31))
+        
+        with mock.patch.object(recurring_invoice_service, 'datetime', wraps=recurring_invoice_service.datetime) as clock:
+            clock.now.return_value.date.return_value = date(2025, 5, 15)
+            response = self.client.get('/api/recurring-invoices/check-due?dry_run=1&catch_up=1', headers=self.headers)
+        
+        self.assertEqual(response.status_code, 200)
+        planned = response.get_json()['planned_invoices']
+        self.assertEqual([invoice['period_date'] for invoice in planned], ['2025-01-31', '2025-02-28', '2025-03-31', '2025-04-30'])
+        self.assertEqual({invoice['total_gross'] for invoice in planned}, {119.0})
+        
+        db.session.expire_all()
+        self.assertEqual(Invoice.query.count(), 0)
+        recurring_invoice = db.session.get(RecurringInvoice, recurring_id)
+        self.assertEqual(recurring_invoice.next_invoice_date, date(2025, 1, 31))
+        self.assertIsNone(recurring_invoice.last_invoice_date)
+    
+    def test_forecast_per_month(self):
+        """Test: Die Prognose zählt überfällige Zeiträume nur im Nachholmodus einzeln"""
+        self._recurring(date(2025, 1, 31))
+        self._recurring(date(2025, 6, 10), interval_type='quartalsweise', price_net=50)
+        self._recurring(date(2025, 1, 31), end_date=date(2025, 4, 30), price_net=1000)
+        
+        forecast = forecast_recurring_invoices(3, today=date(2025, 5, 15), catch_up=True)
+        self.assertEqual([(month['month'], month['invoice_count'], month['total_net']) for month in forecast['months']], [
+            ('2025-05', 9, 4500.0), ('2025-06', 2, 150.0), ('2025-07', 1, 100.0)
+        ])
+        self.assertEqual(forecast['total']['total_gross'], 5652.5)
+        self.assertEqual(forecast['subscriptions'], 3)
+        
+        # Ohne Nachholmodus eine Rechnung für die überfälligen Zeiträume, beendete Vorlagen entfallen
+        forecast = forecast_recurring_invoices(3, today=date(2025, 5, 15), catch_up=False)
+        self.assertEqual([(month['month'], month['invoice_count'], month['total_net']) for month in forecast['months']], [
+            ('2025-05', 2, 200.0), ('2025-06', 2, 150.0), ('2025-07', 1, 100.0)
+        ])
+        self.assertEqual(forecast['total']['total_gross'], 535.5)
+        self.assertEqual(forecast['subscriptions'], 2)
+        
+        # Standard wie bei der Generierung: RECURRING_CATCH_UP
+        self.app.config['RECURRING_CATCH_UP'] = False
+        response = self.client.get('/api/recurring-invoices/forecast?months=3', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['subscriptions'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
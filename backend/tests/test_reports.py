@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Tests für die Berichte (Umsatz, Umsatzsteuer, offene Forderungen, Dashboard)
+"""
+
+import unittest
+import os
+import sys
+from datetime import datetime
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from flask_jwt_extended import create_access_token
+from app.models.customer import Customer
+from app.models.invoice import Invoice, InvoiceItem
+
+class ReportTests(unittest.TestCase):
+    """Testklasse für die Berichte"""
+    
+    def setUp(self):
+        """Testumgebung einrichten"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        
+        db.create_all()
+        
+        self.customer_ids = []
+        for name in ("Kunde A GmbH", "Kunde B GmbH"):
+            customer = Customer(
+                company_name=name, street="Kundenstraße", house_number="456", postal_code="54321",
+                city="Kundenstadt", country="Deutschland", email="info@kunde.de"
+            )
+            db.session.add(customer)
+            db.session.flush()
+            self.customer_ids.append(customer.customer_id)
+        
+        # März: eine Rechnung mit 19 % und 7 %, eine später stornierte Rechnung; April: eine Rechnung
+        self.invoice_ids = []
+        for customer_id, invoice_date, due_date, items in (
+            (self.customer_ids[0], '2025-03-05', '2025-03-19', [(100, 19), (50, 7)]),
+            (self.customer_ids[0], '2025-03-20', '2025-04-03', [(200, 19)]),
+            (self.customer_ids[1], '2025-04-01', '2025-04-15', [(100, 19)])
+        ):
+            invoice = Invoice(
+                invoice_number=f"{invoice_date[:7]}-{len(self.invoice_ids) + 1:04d}", customer_id=customer_id,
+                invoice_date=datetime.strptime(invoice_date, '%Y-%m-%d').date(),
+                due_date=datetime.strptime(due_date, '%Y-%m-%d').date(),
+                delivery_date=datetime.strptime(invoice_date, '%Y-%m-%d').date(), status='versendet'
+            )
+            for position, (price_net, vat_rate) in enumerate(items):
+                invoice.items.append(InvoiceItem(
+                    position=position + 1, quantity=1, price_net=price_net, vat_rate=vat_rate, description="Leistung"
+                ))
+            invoice.calculate_totals()
+            db.session.add(invoice)
+            db.session.flush()
+            self.invoice_ids.append(invoice.invoice_id)
+        
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity="test")}'}
+        
+        response = self.client.post(f'/api/invoices/{self.invoice_ids[1]}/cancel', json={}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/api/payments', json={
+            'invoice_id': self.invoice_ids[2], 'payment_date': '2025-04-10', 'amount': '19.00', 'payment_method': 'Überweisung'
+        }, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+    
+    def tearDown(self):
+        """Testumgebung aufräumen"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def _get(self, url):
+        response = self.client.get(url, headers=self.headers)
+        self.assertEqual(response.status_code, 200, response.get_json())
+        return response.get_json()
+    
+    def test_revenue_report(self):
+        """Test: Umsatz je Monat und Steuersatz, Stornorechnungen heben ihre Originalrechnung auf"""
+        report = self._get('/api/reports/revenue?group_by=month')
+        self.assertEqual([
+            (row['month'], row['invoice_count'], row['cancellation_count'], row['total_net'], row['total_vat'], row['total_gross'])
+            for row in report['rows']
+        ], [
+            ('2025-03', 2, 1, 150.0, 22.5, 172.5),
+            ('2025-04', 1, 0, 100.0, 19.0, 119.0)
+        ])
+        self.assertEqual(report['total']['total_gross'], 291.5)
+        
+        report = self._get('/api/reports/revenue?group_by=month,vat_rate&date_to=2025-03-31')
+        self.assertEqual([(row['month'], row['vat_rate'], row['total_net'], row['total_vat']) for row in report['rows']], [
+            ('2025-03', 7.0, 50.0, 3.5),
+            ('2025-03', 19.0, 100.0, 19.0)
+        ])
+        
+        report = self._get(f'/api/reports/revenue?group_by=customer,payment_status&customer_id={self.customer_ids[1]}')
+        self.assertEqual([(row['customer_name'], row['payment_status'], row['total_gross']) for row in report['rows']], [
+            ("Kunde B GmbH", 'teilweise bezahlt', 119.0)
+        ])
+        
+        response = self.client.get('/api/reports/revenue?group_by=month,quartal', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+    
+    def test_receivables_and_dashboard(self):
+        """Test: Offene Forderungen nach Alter, Liste offener Rechnungen und Dashboard aus den Rollups"""
+        report = self._get('/api/reports/receivables?date=2025-04-20')
+        self.assertEqual([
+            (row['customer_id'], row['invoice_count'], row['open_amount'], row['overdue_1_30'], row['overdue_31_60'])
+            for row in report['rows']
+        ], [
+            (self.customer_ids[0], 1, 172.5, 0.0, 172.5),
+            (self.customer_ids[1], 1, 100.0, 100.0, 0.0)
+        ])
+        self.assertEqual(report['total']['open_amount'], 272.5)
+        
+        report = self._get('/api/reports/receivables/invoices?date=2025-04-20&overdue=true')
+        self.assertEqual([(row['invoice_id'], row['open_amount'], row['days_overdue']) for row in report['rows']], [
+            (self.invoice_ids[0], 172.5, 32),
+            (self.invoice_ids[2], 100.0, 5)
+        ])
+        report = self._get('/api/reports/receivables/invoices?date=2025-04-20&min_amount=150')
+        self.assertEqual([row['invoice_id'] for row in report['rows']], [self.invoice_ids[0]])
+        self.assertEqual(report['total_count'], 1)
+        
+        dashboard = self._get('/api/reports/dashboard?date=2025-04-20&months=2')
+        self.assertEqual([(month['month'], month['total_gross']) for month in dashboard['revenue']['months']], [
+            ('2025-03', 172.5),
+            ('2025-04', 119.0)
+        ])
+        self.assertEqual(dashboard['receivables']['open_count'], 2)
+        self.assertEqual(dashboard['receivables']['open_amount'], 272.5)
+        self.assertEqual(dashboard['receivables']['overdue_amount'], 272.5)
+        self.assertEqual(dashboard['receivables']['top_customers'][0]['customer_name'], "Kunde A GmbH")
+
+if __name__ == '__main__':
+    unittest.main()
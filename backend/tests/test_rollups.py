@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests für die fortgeschriebenen Rollup-Tabellen des Dashboards
+"""
+
+import unittest
+import os
+import sys
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from flask_jwt_extended import create_access_token
+from app.models.customer import Customer
+from app.models.invoice import Invoice
+from app.services.rollup_service import ROLLUP_KEYS, rebuild_rollups
+
+class RollupTests(unittest.TestCase):
+    """Testklasse für die Rollup-Tabellen"""
+    
+    def setUp(self):
+        """Testumgebung einrichten"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        
+        db.create_all()
+        
+        self.customer_ids = []
+        for i in range(2):
+            customer = Customer(
+                company_name=f"Kunde {i + 1} GmbH", street="Kundenstraße", house_number="456", postal_code="54321",
+                city="Kundenstadt", country="Deutschland", email=f"info@kunde{i + 1}.de"
+            )
+            db.session.add(customer)
+            db.session.flush()
+            self.customer_ids.append(customer.customer_id)
+        
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity="test")}'}
+    
+    def tearDown(self):
+        """Testumgebung aufräumen"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def _rollups(self):
+        rollups = {}
+        for model in ROLLUP_KEYS:
+            columns = [column for column in model.__table__.columns if column.name != 'updated_at']
+            values = [column for column in columns if not column.primary_key]
+            rows = db.session.execute(db.select(*columns)).all()
+            
+            # Leere Zeilen bleiben beim Fortschreiben stehen, beim Neuberechnen entstehen sie nicht
+            rollups[model.__tablename__] = sorted(
+                tuple(row) for row in rows if any(row._mapping[column.name] for column in values)
+            )
+        return rollups
+    
+    def assertRollupsConsistent(self):
+        """Vergleicht die fortgeschriebenen Rollups mit einer Neuberechnung (ohne Commit)"""
+        incremental = self._rollups()
+        rebuild_rollups()
+        rebuilt = self._rollups()
+        db.session.rollback()
+        
+        self.assertEqual(incremental, rebuilt)
+        self.assertTrue(incremental['rollup_monthly_revenue'])
+    
+    def _invoice_data(self, customer_index, invoice_date, due_date, quantity=1):
+        return {
+            'customer_id': self.customer_ids[customer_index], 'invoice_date': invoice_date, 'due_date': due_date,
+            'delivery_date': invoice_date, 'status': 'versendet',
+            'items': [{'description': "Leistung", 'quantity': quantity, 'price_net': '100.00', 'vat_rate': 19}]
+        }
+    
+    def test_rollups_match_rebuild(self):
+        """Test: Nach jeder Änderung an Rechnungen und Zahlungen entsprechen die Rollups einer Neuberechnung"""
+        # Einzeln und als Stapel anlegen
+        response = self.client.post('/api/invoices', json=self._invoice_data(0, '2025-03-01', '2025-03-15'), headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        first = response.get_json()['invoice_id']
+        self.assertRollupsConsistent()
+        
+        response = self.client.post('/api/invoices/bulk', json={'invoices': [
+            self._invoice_data(0, '2025-03-10', '2025-03-24', quantity=2),
+            self._invoice_data(1, '2025-04-01', '2025-04-15', quantity=3),
+            self._invoice_data(1, '2025-04-02', '2025-03-15')
+        ]}, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        second, third, fourth = [invoice['invoice_id'] for invoice in response.get_json()['invoices']]
+        self.assertRollupsConsistent()
+        
+        # Zahlung erfassen, auf eine andere Rechnung umbuchen und löschen
+        response = self.client.post('/api/payments', json={
+            'invoice_id': first, 'payment_date': '2025-03-20', 'amount': '119.00', 'payment_method': 'Überweisung'
+        }, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        payment_id = response.get_json()['payment_id']
+        self.assertRollupsConsistent()
+        
+        response = self.client.put(f'/api/payments/{payment_id}', json={'invoice_id': second, 'amount': '50.00'}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertRollupsConsistent()
+        
+        response = self.client.delete(f'/api/payments/{payment_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertRollupsConsistent()
+        
+        # Positionen, Fälligkeit und Kunde über das ORM ändern
+        invoice = db.session.get(Invoice, third)
+        invoice.items[0].quantity = 5
+        invoice.due_date = invoice.due_date.replace(day=30)
+        invoice.customer_id = self.customer_ids[0]
+        invoice.calculate_totals()
+        db.session.commit()
+        self.assertRollupsConsistent()
+        
+        # Einzel- und Massenstorno (Stornorechnungen zählen im Monat der Originalrechnung)
+        response = self.client.post(f'/api/invoices/{first}/cancel', json={}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertRollupsConsistent()
+        
+        response = self.client.post('/api/invoices/cancel', json={'invoice_ids': [third, fourth]}, headers=self.headers)
+        self.assertEqual(response.get_json()['cancelled'], 2)
+        self.assertRollupsConsistent()
+        
+        # Rechnung löschen
+        db.session.delete(db.session.get(Invoice, second))
+        db.session.commit()
+        self.assertRollupsConsistent()
+
+if __name__ == '__main__':
+    unittest.main()
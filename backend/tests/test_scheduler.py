@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests für die geplanten Aufgaben (Sperren, Verteilung auf Teile)
+"""
+
+import unittest
+import os
+import sys
+from datetime import datetime, timedelta
+from unittest import mock
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models.customer import Customer
+from app.models.invoice import Invoice
+from app.models.scheduler_lock import SchedulerLock
+from app.scheduler import locked_job, create_scheduler
+from app.services.email_service import send_invoice_emails
+from app.services.scheduler_lock_service import renew_current_lock, get_lock_owner, LockLostError
+
+class SchedulerTests(unittest.TestCase):
+    """Testklasse für die geplanten Aufgaben"""
+    
+    def setUp(self):
+        """Testumgebung einrichten"""
+        self.app = create_app('testing')
+        self.app.config['SCHEDULER_SHARDS'] = 3
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        
+        db.create_all()
+    
+    def tearDown(self):
+        """Testumgebung aufräumen"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def test_lease_renewed_between_chunks(self):
+        """Test: Eine Aufgabe verlängert ihre Sperre und bricht ab, wenn sie ihr nicht mehr gehört"""
+        lease_seconds = 600
+        seen = []
+        
+        def job():
+            # Sperre künstlich fast ablaufen lassen, renew_current_lock verlängert sie wieder
+            db.session.execute(db.update(SchedulerLock).values(locked_until=datetime.utcnow()))
+            db.session.commit()
+            renew_current_lock()
+            seen.append(db.session.get(SchedulerLock, 'renewing').locked_until)
+            
+            # Ein anderer Knoten übernimmt die abgelaufene Sperre
+            db.session.execute(db.update(SchedulerLock).values(owner='anderer-knoten:1'))
+            db.session.commit()
+            with self.assertRaises(LockLostError):
+                renew_current_lock()
+            seen.append(True)
+        
+        locked_job(self.app, 'renewing', job, lease_seconds=lease_seconds)()
+        
+        self.assertEqual(len(seen), 2)
+        self.assertGreater(seen[0], datetime.utcnow() + timedelta(seconds=lease_seconds - 60))
+        
+        # Die fremde Sperre wird nicht freigegeben
+        db.session.expire_all()
+        self.assertEqual(db.session.get(SchedulerLock, 'renewing').owner, 'anderer-knoten:1')
+        
+        # Außerhalb einer geplanten Aufgabe ohne Wirkung
+        renew_current_lock()
+    
+    def test_send_limit_split_across_shards(self):
+        """Test: Das Limit des E-Mail-Versands gilt für alle Teile zusammen"""
+        for i in range(6):
+            customer = Customer(company_name=f"Kunde {i}", email=f"kunde{i}@example.com")
+            db.session.add(customer)
+            db.session.flush()
+            for j in range(3):
+                db.session.add(Invoice(
+                    invoice_number=f"2025-01-{i * 3 + j + 1:04d}", customer_id=customer.customer_id,
+                    invoice_date=datetime(2025, 1, 1).date(), due_date=datetime(2025, 1, 15).date(),
+                    delivery_date=datetime(2025, 1, 1).date(), status='erstellt'
+                ))
+        db.session.commit()
+        
+        totals = []
+        with mock.patch('app.services.email_outbox_service.process_outbox'):
+            job = locked_job(self.app, 'send_invoice_emails', lambda shard: totals.append(
+                send_invoice_emails(limit=5, shard=shard)['total']
+            ), lease_seconds=600, sharded=True)
+            job()
+        
+        self.assertEqual(sorted(totals), [1, 2, 2])
+        self.assertEqual(
+            set(db.session.scalars(db.select(SchedulerLock.name))),
+            {'send_invoice_emails:0', 'send_invoice_emails:1', 'send_invoice_emails:2'}
+        )
+        self.assertEqual(db.session.get(SchedulerLock, 'send_invoice_emails:0').owner, get_lock_owner())
+    
+    def test_jobs_registered_and_run(self):
+        """Test: Alle geplanten Aufgaben sind registriert und laufen mit ihren Sperren"""
+        scheduler = create_scheduler(self.app, start=False)
+        self.assertEqual(
+            {job.id for job in scheduler.get_jobs()},
+            {'generate_recurring_invoices', 'send_invoice_emails', 'retry_failed_emails', 'check_paid_amounts'}
+        )
+        
+        with self.assertNoLogs('app.scheduler', level='ERROR'):
+            for job in scheduler.get_jobs():
+                job.func()
+        
+        self.assertEqual(set(db.session.scalars(db.select(SchedulerLock.name))), {
+            'generate_recurring_invoices:0', 'generate_recurring_invoices:1', 'generate_recurring_invoices:2',
+            'send_invoice_emails:0', 'send_invoice_emails:1', 'send_invoice_emails:2',
+            'retry_failed_emails', 'check_paid_amounts'
+        })
+    
+    def test_scheduler_started_by_create_app(self):
+        """Test: Mit SCHEDULER_ENABLED startet create_app den Scheduler"""
+        with mock.patch('app.scheduler.create_scheduler') as create:
+            with mock.patch.dict(os.environ, {'SCHEDULER_ENABLED': 'False'}):
+                create_app('testing')
+            create.assert_not_called()
+            
+            with mock.patch.dict(os.environ, {'SCHEDULER_ENABLED': 'True'}):
+                app = create_app('testing')
+            create.assert_called_once_with(app)
+
+if __name__ == '__main__':
+    unittest.main()
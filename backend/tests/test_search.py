@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests für die Suche nach Kunden, Artikeln und Rechnungen über den Suchindex
+"""
+
+import unittest
+import os
+import sys
+from datetime import datetime
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from flask_jwt_extended import create_access_token
+from app.models.customer import Customer
+from app.models.item import Item
+from app.models.invoice import Invoice, InvoiceItem
+from app.services.search_service import rebuild_search_indexes
+
+class SearchTests(unittest.TestCase):
+    """Testklasse für die Suche"""
+    
+    def setUp(self):
+        """Testumgebung einrichten"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        
+        db.create_all()
+        
+        # Suchindizes neu aufbauen, damit keine Einträge früherer Tests übrig bleiben
+        rebuild_search_indexes()
+        db.session.commit()
+        
+        self.customer_ids = []
+        for company_name, email in (
+            ("Schmidt Consulting", "info@schmidt-consulting.de"),
+            ("Baustoffe Schmidt KG", "info@baustoffe.de"),
+            ("Meyer AG", "kontakt@meyer.de")
+        ):
+            customer = Customer(
+                company_name=company_name, street="Kundenstraße", house_number="456", postal_code="54321",
+                city="Kundenstadt", country="Deutschland", email=email
+            )
+            db.session.add(customer)
+            db.session.flush()
+            self.customer_ids.append(customer.customer_id)
+        
+        db.session.add_all([
+            Item(item_number="B-100", name="Beratung", description="Beratung pro Stunde", unit="Stunde", price_net=100, vat_rate=19),
+            Item(item_number="M-200", name="Montage", description="Montage inklusive Anfahrt", price_net=250, vat_rate=19),
+            Item(item_number="A-300", name="Anfahrtspauschale", price_net=50, vat_rate=19, is_active=False)
+        ])
+        
+        for invoice_number, customer_index, status in (
+            ("2025-0001", 0, 'versendet'),
+            ("2025-0002", 1, 'bezahlt'),
+            ("STORNO-2025-0001", 0, 'versendet')
+        ):
+            invoice = Invoice(
+                invoice_number=invoice_number, customer_id=self.customer_ids[customer_index],
+                invoice_date=datetime(2025, 3, 1).date(), due_date=datetime(2025, 3, 15).date(),
+                delivery_date=datetime(2025, 3, 1).date(), status=status
+            )
+            invoice.items.append(InvoiceItem(position=1, quantity=1, price_net=100, vat_rate=19, description="Leistung"))
+            invoice.calculate_totals()
+            db.session.add(invoice)
+        
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity="test")}'}
+    
+    def tearDown(self):
+        """Testumgebung aufräumen"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def _search(self, url, key):
+        response = self.client.get(url, headers=self.headers)
+        self.assertEqual(response.status_code, 200, response.get_json())
+        return [entry[key] for entry in response.get_json()]
+    
+    def test_customer_search(self):
+        """Test: Kunden werden über Teilzeichenketten gefunden, Treffer am Anfang zuerst"""
+        self.assertEqual(self._search('/api/customers/search?query=schmidt', 'company_name'), [
+            "Schmidt Consulting", "Baustoffe Schmidt KG"
+        ])
+        self.assertEqual(self._search('/api/customers/search?query=schmidt&limit=1', 'company_name'), ["Schmidt Consulting"])
+        self.assertEqual(self._search('/api/customers/search?query=meyer.de', 'company_name'), ["Meyer AG"])
+        
+        # Kurze Suchbegriffe werden ohne Index ebenfalls als Teilzeichenkette gefunden
+        self.assertEqual(self._search('/api/customers/search?query=sc', 'company_name'), [
+            "Schmidt Consulting", "Baustoffe Schmidt KG"
+        ])
+        self.assertEqual(self._search('/api/customers/search?query=kg', 'company_name'), ["Baustoffe Schmidt KG"])
+        self.assertEqual(self._search('/api/customers/search?query=%25', 'company_name'), [])
+    
+    def test_item_fulltext_search(self):
+        """Test: Die Volltextsuche findet auch Beschreibungen und inaktive Artikel"""
+        self.assertEqual(self._search('/api/items/search?query=anfahrt&fulltext=true', 'name'), [
+            "Anfahrtspauschale", "Montage"
+        ])
+        self.assertEqual(self._search('/api/items/search?query=pro%20stunde&fulltext=true', 'name'), ["Beratung"])
+        self.assertEqual(self._search('/api/items/search?query=%25&fulltext=true', 'name'), [])
+    
+    def test_invoice_search(self):
+        """Test: Rechnungsnummern werden nach Relevanz sortiert, begrenzt und mit weiteren Filtern kombiniert"""
+        self.assertEqual(self._search('/api/invoices/search?invoice_number=2025-0001', 'invoice_number'), [
+            "2025-0001", "STORNO-2025-0001"
+        ])
+        self.assertEqual(self._search('/api/invoices/search?invoice_number=2025&limit=2', 'invoice_number'), [
+            "2025-0001", "2025-0002"
+        ])
+        self.assertEqual(self._search(
+            f'/api/invoices/search?invoice_number=2025&customer_id={self.customer_ids[0]}', 'invoice_number'
+        ), ["2025-0001", "STORNO-2025-0001"])
+        self.assertEqual(self._search('/api/invoices/search?invoice_number=2025&status=bezahlt', 'invoice_number'), ["2025-0002"])
+        self.assertEqual(self._search('/api/invoices/search?invoice_number=ST', 'invoice_number'), ["STORNO-2025-0001"])
+        self.assertEqual(self._search('/api/invoices/search?invoice_number=-0', 'invoice_number'), [
+            "2025-0001", "2025-0002", "STORNO-2025-0001"
+        ])
+        
+        # Geänderte Rechnungsnummern sind sofort auffindbar (Trigger halten den Suchindex aktuell)
+        invoice = db.session.get(Invoice, 2)
+        invoice.invoice_number = "2025-0003"
+        db.session.commit()
+        self.assertEqual(self._search('/api/invoices/search?invoice_number=0003', 'invoice_number'), ["2025-0003"])
+        self.assertEqual(self._search('/api/invoices/search?invoice_number=0002', 'invoice_number'), [])
+
+if __name__ == '__main__':
+    unittest.main()
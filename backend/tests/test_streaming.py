@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests für den Export als NDJSON-Stream (?stream=ndjson)
+"""
+
+import unittest
+import os
+import sys
+import json
+from datetime import datetime
+
+# Füge das Backend-Verzeichnis zum Pfad hinzu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from flask_jwt_extended import create_access_token
+from sqlalchemy.orm import selectinload
+from app.models.customer import Customer
+from app.models.invoice import Invoice, InvoiceItem
+from app.schemas.invoice_schema import invoice_schema
+from app.api.streaming import stream_ndjson
+
+class StreamingTests(unittest.TestCase):
+    """Testklasse für den NDJSON-Export"""
+    
+    def setUp(self):
+        """Testumgebung einrichten"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        
+        db.create_all()
+        
+        customer_ids = []
+        for i in range(3):
+            customer = Customer(
+                company_name=f"Kunde {i + 1} GmbH", street="Kundenstraße", house_number="456", postal_code="54321",
+                city="Kundenstadt", country="Deutschland", email=f"info@kunde{i + 1}.de"
+            )
+            db.session.add(customer)
+            db.session.flush()
+            customer_ids.append(customer.customer_id)
+        
+        for i in range(10):
+            invoice = Invoice(
+                invoice_number=f"2025-03-{i + 1:04d}", customer_id=customer_ids[i % 3],
+                invoice_date=datetime(2025, 3, 1 + i % 4).date(), due_date=datetime(2025, 3, 15).date(),
+                delivery_date=datetime(2025, 3, 1).date(), status='bezahlt' if i % 2 else 'versendet'
+            )
+            invoice.items.append(InvoiceItem(position=1, quantity=i + 1, price_net=100, vat_rate=19, description="Leistung"))
+            invoice.calculate_totals()
+            db.session.add(invoice)
+        
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity="test")}'}
+    
+    def tearDown(self):
+        """Testumgebung aufräumen"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+    
+    def _get(self, url):
+        response = self.client.get(url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+    
+    def _stream(self, url):
+        response = self._get(url)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        
+        # Jede Zeile ist ein vollständiges JSON-Objekt
+        lines = response.get_data(as_text=True).split('\n')
+        self.assertEqual(lines[-1], '')
+        return [json.loads(line) for line in lines[:-1]]
+    
+    def test_streams_match_json_responses(self):
+        """Test: Rechnungen, Kunden und Suchergebnisse sind als Stream identisch mit der JSON-Antwort"""
+        invoices = self._stream('/api/invoices?stream=ndjson')
+        self.assertEqual(len(invoices), 10)
+        self.assertEqual(invoices, self._get('/api/invoices?limit=100').get_json())
+        
+        customers = self._stream('/api/customers?stream=ndjson')
+        self.assertEqual(len(customers), 3)
+        self.assertEqual(customers, sorted(self._get('/api/customers').get_json(), key=lambda customer: customer['customer_id']))
+        
+        found = self._stream('/api/invoices/search?status=bezahlt&stream=ndjson')
+        self.assertEqual(len(found), 5)
+        self.assertEqual(
+            sorted(found, key=lambda invoice: invoice['invoice_id']),
+            sorted(self._get('/api/invoices/search?status=bezahlt').get_json(), key=lambda invoice: invoice['invoice_id'])
+        )
+    
+    def test_session_emptied_per_chunk(self):
+        """Test: Nach jedem Block werden auch die mitgeladenen Kunden und Positionen aus der Session entfernt"""
+        query = Invoice.query.options(selectinload(Invoice.items), selectinload(Invoice.customer)).order_by(Invoice.invoice_id)
+        sizes = []
+        
+        with self.app.test_request_context():
+            db.session.expunge_all()
+            response = stream_ndjson(query, invoice_schema, chunk_size=2)
+            for line in response.response:
+                sizes.append(len(db.session.identity_map))
+                self.assertEqual(json.loads(line)['invoice_id'], len(sizes))
+            
+            self.assertEqual(len(db.session.identity_map), 0)
+        
+        # Höchstens ein Block: zwei Rechnungen, ihre Positionen und Kunden
+        self.assertEqual(len(sizes), 10)
+        self.assertLessEqual(max(sizes), 6)
+
+if __name__ == '__main__':
+    unittest.main()